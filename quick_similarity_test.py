@@ -3,15 +3,44 @@
 Quick Similarity Test - Tests the similarity between two capabilities
 Usage: ./quick_similarity_test.py [capability1] [capability2]
 Example: ./quick_similarity_test.py Assemble Screw
+
+Batch mode - N x N similarity matrix with top-k neighbours (needs numpy)
+Usage: ./quick_similarity_test.py Assemble Screw Drill Store ...
+       ./quick_similarity_test.py --file capabilities.txt --top-k 5
+       ./quick_similarity_test.py --from-configs tests/TestFiles --threshold 0.8
+       ./quick_similarity_test.py --from-configs /tmp/ns300      # namespace_generator.py output
+
+Index mode - top-k neighbours from a prebuilt ANN index (tools/python_mqtt/capability_ann.py)
+Usage: ./quick_similarity_test.py --index /tmp/caps.ivf Drill Screw --top-k 10
 """
+import argparse
+import json
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import math
 
-def get_embedding(text, endpoint="http://localhost:11434", model="nomic-embed-text"):
-    """Get embedding from Ollama"""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "python_mqtt"))
+from masbt_tools.embedding_cache import EmbeddingCache
+
+# Set MASBT_EMBEDDING_CACHE to a directory to relocate the cache, or to "off" to disable it
+_cache = None if os.environ.get("MASBT_EMBEDDING_CACHE", "").lower() == "off" else EmbeddingCache()
+
+SIMILARITY_AGENT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                       "configs", "specific_configs", "NamespaceHolon", "SimilarityAnalysisAgent.json")
+
+def get_embedding(text, endpoint="http://localhost:11434", model="nomic-embed-text", session=None):
+    """Get embedding from Ollama (served from the on-disk cache when seen before)"""
+    if _cache is None:
+        return fetch_embedding(text, endpoint, model, session)
+    return _cache.get_or_compute(_cache.model_key(model, endpoint), text,
+                                 lambda t: fetch_embedding(t, endpoint, model, session))
+
+def fetch_embedding(text, endpoint="http://localhost:11434", model="nomic-embed-text", session=None):
+    """Get embedding from Ollama's /api/embeddings"""
     try:
-        response = requests.post(
+        response = (session or requests).post(
             f'{endpoint}/api/embeddings',
             json={'model': model, 'prompt': text},
             timeout=30
@@ -44,11 +73,174 @@ def interpret_similarity(similarity):
     else:
         return "❌ Very Low Similarity (different concepts)"
 
+def get_embeddings(texts, endpoint="http://localhost:11434", model="nomic-embed-text", workers=8):
+    """Embeddings for many texts, fetched concurrently over one pooled HTTP session"""
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(pool.map(lambda t: get_embedding(t, endpoint, model, session), texts))
+
+def load_capability_file(path):
+    """Capability names from a JSON list or a text file with one name per line ('#' comments)"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.lower().endswith(".json"):
+        return [str(c) for c in json.loads(content)]
+    return [line.strip() for line in content.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+def collect_config_capabilities(root):
+    """Capability names in the JSON files below root: string entries of "Capabilities"/"CapabilityNames"
+    lists (DispatchingAgent.Modules of a dispatcher config) and idShorts of AAS elements with modelType
+    "Capability" (CapabilitySets in messages and product requests)"""
+    names = []
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if not name.lower().endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    stack = [(json.load(f), None)]
+            except (OSError, ValueError):
+                continue
+            while stack:
+                node, parent = stack.pop()
+                if isinstance(node, dict):
+                    if node.get("modelType") == "Capability" and isinstance(node.get("idShort"), str):
+                        names.append(node["idShort"])
+                    for key, value in node.items():
+                        if key in ("Capabilities", "CapabilityNames") and isinstance(value, list):
+                            if parent != "Agent":  # Agent.Capabilities lists agent services (CalcSimilarity)
+                                names.extend(v for v in value if isinstance(v, str))
+                        else:
+                            stack.append((value, key))
+                elif isinstance(node, list):
+                    stack.extend((item, parent) for item in node)
+    return names
+
+def default_threshold():
+    """SimilarityAnalysis.MinSimilarityThreshold of the SimilarityAnalysisAgent config (fallback 0.75)"""
+    try:
+        with open(SIMILARITY_AGENT_CONFIG, "r", encoding="utf-8") as f:
+            return json.load(f)["SimilarityAnalysis"]["MinSimilarityThreshold"]
+    except (OSError, ValueError, KeyError):
+        return 0.75
+
+def batch_main(args, names):
+    """N x N similarity matrix, top-k neighbours and threshold filter"""
+    try:
+        import numpy as np
+        from masbt_tools.similarity import normalize_rows, normalize_threshold, pairs_above, similarity_matrix, top_k
+    except ImportError:
+        print("  ❌ Batch mode needs numpy: python3 -m pip install --user numpy")
+        return 1
+
+    seen = set()
+    unique = []
+    for name in names:
+        if name not in seen:
+            seen.add(name)
+            unique.append(name)
+    names = unique
+    if len(names) < 2:
+        print("  ❌ Need at least two capabilities")
+        return 1
+    threshold = normalize_threshold(args.threshold if args.threshold is not None else default_threshold())
+
+    print(f"  🔄 Fetching {len(names)} embeddings ({args.workers} parallel requests)...")
+    embeddings = get_embeddings(names, args.endpoint, args.model, args.workers)
+    failed = [n for n, e in zip(names, embeddings) if e is None]
+    if failed:
+        print(f"  ❌ Failed to get embeddings for: {', '.join(failed)}")
+        return 1
+
+    similarity = similarity_matrix(normalize_rows(embeddings))
+    neighbours = top_k(similarity, args.top_k, threshold if args.only_above else None)
+    width = min(40, max(len(n) for n in names))
+
+    print("")
+    print(f"  📊 TOP-{args.top_k} NEIGHBOURS (✅ = at or above threshold {threshold:.2f}):")
+    print("")
+    for i, name in enumerate(names):
+        cells = [f"{'✅' if s >= threshold else '  '} {names[j]} {s:.3f}" for j, s in neighbours[i]]
+        print(f"     {name[:width]:<{width}}  " + ("  ".join(cells) if cells else "-"))
+    pairs = pairs_above(similarity, threshold)
+    print("")
+    print(f"     {len(pairs)} of {len(names) * (len(names) - 1) // 2} pairs at or above {threshold:.2f}")
+    print("")
+
+    if args.json:
+        result = {
+            "model": args.model,
+            "threshold": threshold,
+            "capabilities": names,
+            "neighbours": {names[i]: [{"capability": names[j], "similarity": s} for j, s in n]
+                           for i, n in enumerate(neighbours)},
+            "pairs": [{"a": names[i], "b": names[j], "similarity": s} for i, j, s in pairs],
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.csv:
+        np.savetxt(args.csv, similarity, delimiter=",", fmt="%.6f", header=",".join(names), comments="")
+    if _cache is not None:
+        stats = _cache.stats()
+        print(f"  💾 Embedding cache: {stats['memory_hits'] + stats['disk_hits']} hits, "
+              f"{stats['misses']} misses ({_cache.directory})")
+        print("")
+    return 0
+
+def index_main(args, names):
+    """Approximate top-k neighbours of each name from a saved IVF index"""
+    try:
+        from masbt_tools.ann_index import IVFIndex
+        from masbt_tools.similarity import normalize_threshold
+    except ImportError:
+        print("  ❌ Index mode needs numpy: python3 -m pip install --user numpy")
+        return 1
+    threshold = normalize_threshold(args.threshold if args.threshold is not None else default_threshold())
+    index = IVFIndex.load(args.index)
+    print(f"  📚 Index: {len(index)} capabilities, {index.nlist} lists ({args.index})")
+    print("")
+    for name in names:
+        embedding = get_embedding(name, args.endpoint, args.model)
+        if embedding is None:
+            return 1
+        hits = index.query(embedding, args.top_k)
+        print(f"     {name}")
+        for label, score in hits:
+            print(f"        {'✅' if score >= threshold else '  '} {score:.3f}  {label}")
+    print("")
+    return 0
+
 def main():
+    parser = argparse.ArgumentParser(description="Similarity between capabilities via Ollama embeddings")
+    parser.add_argument("capabilities", nargs="*", help="Two names for a pair test, more for batch mode")
+    parser.add_argument("--file", help="Batch mode: capability names (JSON list or one per line)")
+    parser.add_argument("--from-configs", help="Batch mode: collect capability names from the JSON files below this dir "
+                             "(Capability elements, DispatchingAgent.Modules[].Capabilities)")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours listed per capability")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Similarity threshold, fraction or percent (default: SimilarityAnalysis.MinSimilarityThreshold)")
+    parser.add_argument("--only-above", action="store_true", help="List only neighbours at or above the threshold")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel embedding requests")
+    parser.add_argument("--endpoint", default="http://localhost:11434")
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--index", help="Index mode: query a saved ANN index built by capability_ann.py")
+    parser.add_argument("--json", help="Batch mode: write neighbours and pairs to this JSON file")
+    parser.add_argument("--csv", help="Batch mode: write the similarity matrix to this CSV file")
+    args = parser.parse_args()
+
+    names = list(args.capabilities)
+    if args.file:
+        names += load_capability_file(args.file)
+    if args.from_configs:
+        names += collect_config_capabilities(args.from_configs)
+    batch = len(names) > 2 or args.file or args.from_configs
+
     # Get capabilities from command line or use defaults
-    if len(sys.argv) >= 3:
-        cap1 = sys.argv[1]
-        cap2 = sys.argv[2]
+    if not batch and len(names) == 2:
+        cap1, cap2 = names
     else:
         cap1 = "Assemble"
         cap2 = "Screw"
@@ -59,14 +251,23 @@ def main():
     print("╚══════════════════════════════════════════════════════════════╝")
     print("")
     
-    # Check if Ollama is running
-    try:
-        requests.get("http://localhost:11434/api/tags", timeout=2)
-    except:
-        print("  ❌ ERROR: Ollama is not running!")
-        print("     Start it with: ollama serve")
-        print("")
-        return 1
+    # Check if Ollama is running (not needed when all embeddings are cached)
+    wanted = names if batch else (cap1, cap2)
+    cached = _cache is not None and all(_cache.contains(_cache.model_key(args.model, args.endpoint), c)
+                                        for c in wanted)
+    if not cached:
+        try:
+            requests.get(f"{args.endpoint}/api/tags", timeout=2)
+        except:
+            print("  ❌ ERROR: Ollama is not running!")
+            print("     Start it with: ollama serve")
+            print("")
+            return 1
+
+    if args.index:
+        return index_main(args, names or [cap1, cap2])
+    if batch:
+        return batch_main(args, names)
     
     print(f"  🔄 Computing similarity for:")
     print(f"     • '{cap1}' vs '{cap2}'")
@@ -74,8 +275,8 @@ def main():
     
     # Get embeddings
     print("  🔄 Fetching embeddings from Ollama...")
-    embedding1 = get_embedding(cap1)
-    embedding2 = get_embedding(cap2)
+    embedding1 = get_embedding(cap1, args.endpoint, args.model)
+    embedding2 = get_embedding(cap2, args.endpoint, args.model)
     
     if embedding1 is None or embedding2 is None:
         print("  ❌ Failed to get embeddings")
@@ -95,6 +296,11 @@ def main():
     print("")
     print(f"     {interpret_similarity(similarity)}")
     print("")
+    if _cache is not None:
+        stats = _cache.stats()
+        print(f"  💾 Embedding cache: {stats['memory_hits'] + stats['disk_hits']} hits, "
+              f"{stats['misses']} misses ({_cache.directory})")
+        print("")
     print("════════════════════════════════════════════════════════════════")
     print("")
     
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: dict + json.dumps vs. precompiled message templates.
+
+Compares, per message family, the old path (build the nested dict for every
+message, then ``json.dumps(..., indent=2)``) with ``MessageTemplate.render``
+from ``masbt_tools.messages``.
+
+Usage:
+  python3 tools/python_mqtt/bench_messages.py [--number 20000] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+
+from masbt_tools.messages import (
+    Action,
+    Frame,
+    Message,
+    Party,
+    Precondition,
+    frame_message_template,
+    new_conversation_id,
+    now_iso,
+    skill_request_template,
+)
+
+PRODUCT = "https://smartfactory.de/shells/test_product2"
+
+
+def _skill_request_dict(verbose, with_precondition):
+    params = {"ProductId": PRODUCT}
+    if not verbose:
+        params["RetrieveByProductID"] = ("true", "xs:boolean")
+    action = Action("Store" if verbose else "Retrieve", "CA-Module",
+                    status="open" if verbose else "planned",
+                    input_parameters=params,
+                    preconditions=[Precondition(PRODUCT)] if with_precondition else [],
+                    verbose=verbose)
+    frame = Frame(Party("CA-Module_Planning_Agent", "PlanningAgent"),
+                  Party("CA-Module_Execution_Agent", "ExecutionAgent"),
+                  "request", new_conversation_id())
+    return Message(frame, [action]).to_dict()
+
+
+def _proposal_dict():
+    return {
+        "frame": {
+            "conversationId": new_conversation_id(),
+            "type": "proposal",
+            "sender": {"id": "ManualTester"},
+            "timestamp": now_iso(),
+            "receiver": {"id": "Broadcast"},
+        },
+        "interactionElements": [],
+    }
+
+
+def families():
+    """name -> (legacy builder returning a dict, template render callable)."""
+    short = skill_request_template("CA-Module", "Retrieve")
+    precond = skill_request_template("CA-Module", "Retrieve", with_precondition=True)
+    verbose = skill_request_template("CA-Module", "Store", status="open", verbose=True)
+    proposal = frame_message_template("proposal", "ManualTester", "Broadcast")
+    return {
+        "SkillRequest": (lambda: _skill_request_dict(False, False),
+                         lambda: short.render(product_id=PRODUCT)),
+        "SkillRequest+Precondition": (lambda: _skill_request_dict(False, True),
+                                      lambda: precond.render(product_id=PRODUCT)),
+        "SkillRequest (AAS verbose)": (lambda: _skill_request_dict(True, False),
+                                       lambda: verbose.render(product_id=PRODUCT)),
+        "Proposal": (_proposal_dict,
+                     lambda: proposal.render(conversation_id=new_conversation_id())),
+    }
+
+
+def best_rate(fn, number, repeat):
+    return number / min(timeit.repeat(fn, number=number, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message construction + serialization")
+    parser.add_argument("--number", type=int, default=20000, help="Messages per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs (best one is reported)")
+    args = parser.parse_args()
+
+    header = f"{'family':<28} {'dict+indent=2':>14} {'dict+compact':>14} {'template':>14} {'speedup':>8} {'bytes':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, (build, render) in families().items():
+        legacy = best_rate(lambda: json.dumps(build(), indent=2), args.number, args.repeat)
+        compact = best_rate(lambda: json.dumps(build(), separators=(",", ":")), args.number, args.repeat)
+        templ = best_rate(render, args.number, args.repeat)
+        size_old = len(json.dumps(build(), indent=2))
+        size_new = len(render())
+        print(f"{name:<28} {legacy:>12,.0f}/s {compact:>12,.0f}/s {templ:>12,.0f}/s "
+              f"{templ / legacy:>7.1f}x {size_old:>5}->{size_new:<5}")
+
+
+if __name__ == "__main__":
+    main()
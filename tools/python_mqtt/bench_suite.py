@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Benchmark suite: build, serialize, parse and field extraction per payload family.
+
+Families are every payload in tests/TestFiles (ProcessChain, TransportPlan,
+TransportRequest, Offer, ProductionPlan, similarity requests ...) plus the
+messages the load tools generate (SkillRequest shapes, OfferedCapability
+proposal, registerMessage). Payloads without an I4.0 frame (submodels,
+element lists, AAS environments) are wrapped as the interactionElements of
+an ``inform`` message, which is how they travel over MQTT.
+
+Operations per family:
+
+  build        construct the message dict (copy of a template / object model)
+  render       precompiled MessageTemplate with a fresh conversationId
+  serialize    json.dumps, compact
+  indent       json.dumps(indent=2), as the older scripts send it
+  parse        json.loads of the compact bytes
+  extract      parse + frame type, conversationId and one property value
+  scan         the same fields as extract with FrameScanner, without json.loads
+  encode       masbt_tools.codec binary form of the message
+  decode       message from its binary form
+
+Examples:
+  python3 tools/python_mqtt/bench_suite.py --save bench-baseline.json
+  python3 tools/python_mqtt/bench_suite.py --compare bench-baseline.json --threshold 0.1
+  python3 tools/python_mqtt/bench_suite.py --family ProcessChain --op parse --op extract
+
+With --compare the exit code is 1 when any entry's fastest repetition got
+slower than the baseline's by more than the threshold (and more than the
+measured noise), so CI can gate on it. Baselines are machine specific;
+keep one per runner.
+"""
+import argparse
+import json
+import marshal
+import os
+import re
+import sys
+
+from masbt_tools.benchmark import compare, load_baseline, measure, save_baseline
+from masbt_tools.codec import BinaryCodec
+from masbt_tools.messages import (
+    Action,
+    Frame,
+    Message,
+    MessageTemplate,
+    Party,
+    Precondition,
+    Slot,
+    capability_offer_template,
+    find_value,
+    registration_template,
+    skill_request_template,
+)
+from masbt_tools.frame_scan import FrameScanner
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+TEST_FILES = os.path.join(REPO_ROOT, "tests", "TestFiles")
+OPERATIONS = ("build", "render", "serialize", "indent", "parse", "extract", "scan", "encode", "decode")
+CONVERSATION_ID = "7d6f2a4e-93c1-4b8e-a1f0-5c2d9e8b7a61"
+PRODUCT = "https://smartfactory.de/shells/test_product2"
+
+
+def load_test_file(path):
+    """JSON of a test file; files captured from MQTT start with a ``Topic: ... QoS: n`` header."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return json.loads(text[min(starts):]) if starts else json.loads(text)
+
+
+def as_message(name, payload):
+    if isinstance(payload, dict) and isinstance(payload.get("frame"), dict):
+        return payload
+    elements = payload if isinstance(payload, list) else [payload]
+    return {"frame": {"sender": {"identification": {"id": "BenchmarkSuite"}, "role": {"name": "Benchmark"}},
+                      "receiver": {"identification": {"id": "Broadcast"}, "role": {"name": ""}},
+                      "type": f"inform/{name}", "conversationId": CONVERSATION_ID},
+            "interactionElements": elements}
+
+
+def template_builder(message):
+    """Function building a fresh copy of ``message``; ``marshal.loads`` of the prebuilt template, in C."""
+    template = marshal.dumps(json.loads(json.dumps(message)))
+
+    def build(conversation_id):
+        built = marshal.loads(template)
+        built["frame"]["conversationId"] = conversation_id
+        return built
+    return build
+
+
+def probe_key(message):
+    """The last Property idShort in document order, so extraction walks most of the tree."""
+    key = None
+    stack = list(reversed(message.get("interactionElements") or []))
+    while stack:
+        element = stack.pop()
+        if not isinstance(element, dict):
+            continue
+        if element.get("modelType") == "Property" and element.get("idShort"):
+            key = element["idShort"]
+        children = element.get("value")
+        if isinstance(children, list):
+            stack.extend(reversed(children))
+    return key or "ProductId"
+
+
+def file_families():
+    families = {}
+    for filename in sorted(os.listdir(TEST_FILES)):
+        if not filename.endswith(".json"):
+            continue
+        name = filename[:-5]
+        message = as_message(name, load_test_file(os.path.join(TEST_FILES, filename)))
+        slotted = json.loads(json.dumps(message))
+        slotted["frame"]["conversationId"] = Slot("conversation_id")
+        template = MessageTemplate(slotted)
+        families[name] = (message, template_builder(message),
+                          lambda conversation_id, template=template: template.render(conversation_id=conversation_id))
+    return families
+
+
+def _skill_request(verbose, with_precondition):
+    params = {"ProductId": PRODUCT}
+    if not verbose:
+        params["RetrieveByProductID"] = ("true", "xs:boolean")
+    action = Action("Store" if verbose else "Retrieve", "CA-Module", status="open" if verbose else "planned",
+                    input_parameters=params, preconditions=[Precondition(PRODUCT)] if with_precondition else [],
+                    verbose=verbose)
+    return lambda conversation_id: Message(
+        Frame(Party("CA-Module_Planning_Agent", "PlanningAgent"), Party("CA-Module_Execution_Agent", "ExecutionAgent"),
+              "request", conversation_id), [action]).to_dict()
+
+
+def tool_families():
+    """Messages generated by the load tools: object-model builder and their templates."""
+    offer = capability_offer_template("P101")
+    offer_values = dict(receiver_id="DispatchingAgent_phuket", capability="Drill", requirement_id="req-1",
+                        product_id=PRODUCT, offer_id="offer-1", matching_score="0.93", cost="12.5",
+                        start="2025-01-01T10:00:00Z", end="2025-01-01T10:01:00Z", setup_time="5",
+                        cycle_time="60")
+    registration = registration_template("P101", capabilities=("Drill", "Screw"), subagents=("P101_Planning",))
+    shapes = {
+        "SkillRequest": (skill_request_template("CA-Module", "Retrieve"), _skill_request(False, False), {}),
+        "SkillRequest+Precondition": (skill_request_template("CA-Module", "Retrieve", with_precondition=True),
+                                      _skill_request(False, True), {}),
+        "SkillRequest (verbose)": (skill_request_template("CA-Module", "Store", status="open", verbose=True),
+                                   _skill_request(True, False), {}),
+        "OfferedCapability proposal": (offer, None, offer_values),
+        "registerMessage": (registration, None, {}),
+    }
+    families = {}
+    for name, (template, builder, values) in shapes.items():
+        values = {"product_id": PRODUCT, **values} if "product_id" in template.slots else values
+
+        def render(conversation_id, template=template, values=values):
+            return template.render(conversation_id=conversation_id, **values)
+
+        message = json.loads(render(CONVERSATION_ID))
+        if builder is None:
+            builder = template_builder(message)
+        families[name] = (message, builder, render)
+    return families
+
+
+def operations(message, builder, render):
+    compact = json.dumps(message, separators=(",", ":"))
+    raw = compact.encode("utf-8")
+    key = probe_key(message)
+    scanner = FrameScanner((key,))
+    codec = BinaryCodec()
+    wire = codec.encode(message)
+
+    def extract():
+        parsed = json.loads(raw)
+        frame = parsed["frame"]
+        return frame.get("type"), frame.get("conversationId"), find_value(parsed.get("interactionElements"), key)
+
+    ops = {
+        "build": lambda: builder(CONVERSATION_ID),
+        "render": lambda: render(CONVERSATION_ID),
+        "serialize": lambda: json.dumps(message, separators=(",", ":")),
+        "indent": lambda: json.dumps(message, indent=2),
+        "parse": lambda: json.loads(raw),
+        "extract": extract,
+        "scan": lambda: scanner.scan(raw),
+        "encode": lambda: codec.encode(message),
+        "decode": lambda: codec.decode(wire),
+    }
+    return ops, len(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message build/serialize/parse per payload family")
+    parser.add_argument("--family", action="append", default=[], help="Regex on family names (repeatable)")
+    parser.add_argument("--op", action="append", default=[], choices=OPERATIONS, help="Operations (repeatable)")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed repetitions per entry")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed repetitions per entry")
+    parser.add_argument("--min-time", type=float, default=0.02, help="Minimum seconds per repetition")
+    parser.add_argument("--save", help="Write the results as JSON baseline")
+    parser.add_argument("--compare", help="Compare against this baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as regression")
+    parser.add_argument("--list", action="store_true", help="List the families and exit")
+    args = parser.parse_args()
+
+    families = {**file_families(), **tool_families()}
+    if args.family:
+        patterns = [re.compile(p, re.IGNORECASE) for p in args.family]
+        families = {k: v for k, v in families.items() if any(p.search(k) for p in patterns)}
+    if args.list or not families:
+        for name, (message, _build, _render) in families.items():
+            print(f"{name:<34} {message['frame'].get('type')}")
+        return
+    selected = set(args.op or OPERATIONS)
+    try:
+        baseline = load_baseline(args.compare)["results"] if args.compare else None
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read baseline: {e}")
+
+    header = f"{'family':<34} {'op':<10} {'median':>10} {'rate':>12} {'rsd':>6} {'bytes':>8}"
+    print(header + ("   baseline   change (fastest run)" if baseline else ""))
+    print("-" * (len(header) + (20 if baseline else 0)))
+    results = {}
+    for name, (message, build, render) in families.items():
+        ops, size = operations(message, build, render)
+        results[name] = {}
+        for op, fn in ops.items():
+            if op not in selected:
+                continue
+            result = measure(fn, args.repeat, args.warmup, args.min_time)
+            result["bytes"] = size
+            results[name][op] = result
+            line = (f"{name[:34]:<34} {op:<10} {result['median_ns'] / 1000.0:>8.2f}us "
+                    f"{1e9 / result['median_ns']:>10,.0f}/s {100.0 * result['rsd']:>5.1f}% {size:>8}")
+            old = (baseline or {}).get(name, {}).get(op)
+            if old:
+                change = result["min_ns"] / old["min_ns"] - 1.0
+                line += f" {old['min_ns'] / 1000.0:>8.2f}us {100.0 * change:>+7.1f}%"
+            print(line, flush=True)
+
+    if args.save:
+        save_baseline(args.save, results, {"repeat": args.repeat, "min_time": args.min_time})
+        print(f"\nBaseline written to {args.save}")
+    if baseline is not None:
+        rows = compare(results, baseline, args.threshold)
+        regressions = [r for r in rows if r["status"] == "regression"]
+        improvements = [r for r in rows if r["status"] == "improvement"]
+        print(f"\n{len(rows)} compared, {len(regressions)} regressions, {len(improvements)} improvements "
+              f"(threshold {100.0 * args.threshold:.0f}%)")
+        for r in regressions:
+            print(f"  REGRESSION {r['group']} / {r['name']}: {r['baseline_ns'] / 1000.0:.2f}us -> "
+                  f"{r['current_ns'] / 1000.0:.2f}us ({100.0 * r['change']:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
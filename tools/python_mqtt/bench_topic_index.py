@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark: TopicIndex vs. matching every filter in turn.
+
+Builds a simulated namespace with per-module subscriptions
+(``/{ns}/{module}/Planning/OfferedCapability/Request``, ``.../SkillRequest``,
+``.../Inventory`` ...) plus a few namespace-wide wildcard filters, then
+matches a set of distinct topics against it three ways:
+
+  pattern   every filter in turn, split and compared per segment, the way
+            TopicBridgeService's TopicPattern.TryMatch does (with captures)
+  mqtt      every filter in turn with masbt_tools.broker.topic_matches
+  index     masbt_tools.topic_index.TopicIndex (result cache disabled)
+
+Usage:
+  python3 tools/python_mqtt/bench_topic_index.py [--filters 100,1000,10000] [--topics 2000]
+
+The linear loops are timed on the first --linear-topics topics only (they
+take seconds per pass at 10k filters); on those the index results, filters
+and captures, are checked against the pattern loop before timing.
+"""
+import argparse
+import random
+
+from masbt_tools.benchmark import measure
+from masbt_tools.broker import topic_matches
+from masbt_tools.topic_index import TopicIndex
+
+MODULE_TOPICS = ("Planning/OfferedCapability/Request", "Planning/OfferedCapability/Response", "SkillRequest",
+                 "SkillResponse", "Inventory", "State", "+/Request", "Execution/#")
+SHARED_FILTERS = ("/{ns}/+/register", "/{ns}/ModuleHolon/broadcast/#", "/{ns}/+/Inventory")
+
+
+class LinearPattern:
+    """Python port of TopicPattern.TryMatch (case-insensitive, with captures)."""
+
+    def __init__(self, pattern):
+        self.raw = pattern
+        self.segments = [s for s in pattern.strip().split("/") if s]
+
+    def try_match(self, topic):
+        topic_segments = [s for s in topic.strip().split("/") if s]
+        captures = []
+        ti = 0
+        for token in self.segments:
+            if token == "#":
+                captures.append("/".join(topic_segments[ti:]))
+                return captures
+            if ti >= len(topic_segments):
+                return None
+            if token == "+":
+                captures.append(topic_segments[ti])
+            elif token.lower() != topic_segments[ti].lower():
+                return None
+            ti += 1
+        return captures if ti == len(topic_segments) else None
+
+
+def namespace_filters(count, namespace="phuket"):
+    filters = [f.format(ns=namespace) for f in SHARED_FILTERS]
+    module = 0
+    while len(filters) < count:
+        for suffix in MODULE_TOPICS:
+            filters.append(f"/{namespace}/P{module:05d}/{suffix}")
+        module += 1
+    return filters[:count], module
+
+
+def sample_topics(count, modules, namespace="phuket", seed=7):
+    """Up to ``count`` distinct topics; about half of them name modules without subscriptions."""
+    suffixes = ("Planning/OfferedCapability/Request", "SkillRequest", "Inventory", "register",
+                "Execution/Step/1/State", "Unknown/Topic")
+    topics = [f"/{namespace}/P{module:05d}/{suffix}" for module in range(max(1, modules) * 2) for suffix in suffixes]
+    random.Random(seed).shuffle(topics)
+    return topics[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the topic-filter index against linear matching")
+    parser.add_argument("--filters", default="100,1000,10000", help="Comma-separated filter counts")
+    parser.add_argument("--topics", type=int, default=2000, help="Distinct topics matched per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--linear-topics", type=int, default=100,
+                        help="Topics used to time (and check) the linear loops, which are slow at 10k filters")
+    args = parser.parse_args()
+
+    header = f"{'filters':>8} {'pattern':>12} {'mqtt':>12} {'index':>12} {'speedup':>8} {'matches/topic':>14}"
+    print(header + "   (us per topic)")
+    print("-" * len(header))
+    for count in (int(c) for c in args.filters.split(",")):
+        filters, modules = namespace_filters(count)
+        topics = sample_topics(args.topics, modules)
+        patterns = [LinearPattern(f) for f in filters]
+        index = TopicIndex(cache_size=0)
+        for f in filters:
+            index.add(f)
+
+        few = topics[:args.linear_topics]
+
+        def linear_pattern():
+            return [[(p.raw, captures) for p in patterns if (captures := p.try_match(t)) is not None]
+                    for t in few]
+
+        def linear_mqtt():
+            return [[f for f in filters if topic_matches(f, t)] for t in few]
+
+        def indexed():
+            return [index.match(t) for t in topics]
+
+        expected = linear_pattern()
+        got = [[(m.filter, list(m.captures)) for m in matches] for matches in indexed()[:len(few)]]
+        if got != expected:
+            raise SystemExit(f"index and pattern loop disagree at {count} filters")
+        index_us = measure(indexed, args.repeat, 1, args.min_time)["median_ns"] / len(topics) / 1000.0
+        pattern_us = measure(linear_pattern, args.repeat, 0, args.min_time)["median_ns"] / len(few) / 1000.0
+        mqtt_us = measure(linear_mqtt, args.repeat, 0, args.min_time)["median_ns"] / len(few) / 1000.0
+        matches = sum(len(m) for m in indexed()) / len(topics)
+        print(f"{count:>8} {pattern_us:>12.2f} {mqtt_us:>12.2f} {index_us:>12.2f} {pattern_us / index_us:>7.0f}x "
+              f"{matches:>14.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Build and evaluate approximate nearest-neighbour indexes of capability embeddings.
+
+  build    cluster the embeddings of the on-disk embedding cache (or a
+           synthetic catalog) into an IVF index directory
+  recall   recall@k and query time per nprobe against an exact scan
+  query    top-k neighbours of cached texts (text queries that are not
+           cached yet go through quick_similarity_test.py --index)
+
+Examples:
+  python3 tools/python_mqtt/capability_ann.py build --out /tmp/caps.ivf
+  python3 tools/python_mqtt/capability_ann.py build --synthetic 50000 --dim 768 --out /tmp/synth.ivf
+  python3 tools/python_mqtt/capability_ann.py recall /tmp/synth.ivf --k 10 --queries 200
+  python3 tools/python_mqtt/capability_ann.py query /tmp/caps.ivf Drill Screw --k 5
+
+Requires numpy.
+"""
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    print("Missing dependency: numpy.")
+    print(f"Install with: {sys.executable} -m pip install --user numpy")
+    sys.exit(2)
+
+from masbt_tools.ann_index import IVFIndex, format_recall_report, recall_report
+from masbt_tools.embedding_cache import EmbeddingCache
+
+
+def synthetic_catalog(n, dim, clusters, noise, seed):
+    """Clustered random vectors: capability families with per-instance variation."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    family = rng.integers(0, clusters, n)
+    vectors = centers[family] + noise * rng.normal(size=(n, dim)).astype(np.float32)
+    labels = [f"SyntheticCapability_{family[i]}_{i}" for i in range(n)]
+    return vectors, labels
+
+
+def cached_catalog(cache, model):
+    path, dim, rows = cache.matrix_file(model)
+    if not rows:
+        raise ValueError(f"embedding cache {cache.directory} holds no vectors for '{model}'")
+    matrix = np.memmap(path, dtype="<f4", mode="r").reshape(-1, dim)
+    labels = list(rows)
+    return matrix[np.fromiter(rows.values(), dtype=np.int64, count=len(rows))], labels
+
+
+def cmd_build(args):
+    if args.synthetic:
+        vectors, labels = synthetic_catalog(args.synthetic, args.dim, args.clusters, args.noise, args.seed)
+    else:
+        cache = EmbeddingCache(args.cache_dir)
+        vectors, labels = cached_catalog(cache, cache.model_key(args.model, args.endpoint))
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, labels, nlist=args.nlist, seed=args.seed, nprobe=args.nprobe)
+    index.save(args.out)
+    print(f"Indexed {len(index)} vectors ({index.dim} dims) into {index.nlist} lists in "
+          f"{time.perf_counter() - start:.1f}s, default nprobe {index.nprobe} -> {args.out}")
+
+
+def cmd_recall(args):
+    index = IVFIndex.load(args.index)
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(index), min(args.queries, len(index)), replace=False)
+    # perturbed catalog vectors: realistic queries that are not exact duplicates
+    queries = np.asarray(index.vectors[np.sort(rows)]) + args.query_noise * rng.normal(
+        size=(len(rows), index.dim)).astype(np.float32) / np.sqrt(index.dim)
+    nprobes = [int(p) for p in args.nprobes.split(",")]
+    report = recall_report(index, queries, args.k, nprobes)
+    print(f"{len(index)} vectors, {index.nlist} lists, {len(rows)} queries")
+    print(format_recall_report(report, args.k))
+    if args.json_report:
+        with open(args.json_report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def cmd_query(args):
+    index = IVFIndex.load(args.index)
+    cache = EmbeddingCache(args.cache_dir)
+    model = cache.model_key(args.model, args.endpoint)
+    for text in args.texts:
+        vector = cache.get(model, text)
+        if vector is None:
+            print(f"'{text}': not in the embedding cache, use quick_similarity_test.py --index")
+            continue
+        start = time.perf_counter()
+        hits = index.query(vector, args.k, args.nprobe)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        print(f"{text}  ({elapsed_ms:.2f} ms)")
+        for label, score in hits:
+            print(f"    {score:.3f}  {label}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF nearest-neighbour index for capability embeddings")
+    parser.add_argument("--cache-dir", default=None, help="Embedding cache directory (default: MASBT_EMBEDDING_CACHE)")
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--endpoint", default="http://localhost:11434",
+                        help="Ollama that served the cached vectors (selects the model digest)")
+    parser.add_argument("--seed", type=int, default=0)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build an index from the embedding cache or a synthetic catalog")
+    build.add_argument("--out", required=True, help="Index directory")
+    build.add_argument("--nlist", type=int, default=None, help="Inverted lists (default ~4*sqrt(N))")
+    build.add_argument("--nprobe", type=int, default=None, help="Default lists probed per query")
+    build.add_argument("--synthetic", type=int, default=0, help="Index N synthetic vectors instead of the cache")
+    build.add_argument("--dim", type=int, default=768)
+    build.add_argument("--clusters", type=int, default=500, help="Capability families in the synthetic catalog")
+    build.add_argument("--noise", type=float, default=0.5)
+    build.set_defaults(func=cmd_build)
+
+    recall = sub.add_parser("recall", help="Recall vs. exact search per nprobe")
+    recall.add_argument("index")
+    recall.add_argument("--k", type=int, default=10)
+    recall.add_argument("--queries", type=int, default=200)
+    recall.add_argument("--query-noise", type=float, default=0.5, help="Perturbation of the sampled query vectors")
+    recall.add_argument("--nprobes", default="1,2,4,8,16,32")
+    recall.add_argument("--json-report", help="Write the report as JSON to this file")
+    recall.set_defaults(func=cmd_recall)
+
+    query = sub.add_parser("query", help="Top-k neighbours of cached texts")
+    query.add_argument("index")
+    query.add_argument("texts", nargs="+")
+    query.add_argument("--k", type=int, default=5)
+    query.add_argument("--nprobe", type=int, default=None)
+    query.set_defaults(func=cmd_query)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
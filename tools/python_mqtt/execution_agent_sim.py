@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""Simulated Execution agents: SkillRequests through the ActionState lifecycle.
+
+Stands in for the Execution agents of tens to hundreds of modules so the
+Planning agents (SendSkillRequest / AwaitSkillResponse / ApplySkillResponse)
+and the load tools can be exercised without PLCs or real agents.
+
+Every simulated module listens on ``/{ns}/{module}/Execution/SkillRequest``
+and answers on ``/{ns}/{module}/Execution/SkillResponse`` (both templates are
+configurable; the agents' TopicHelper form is
+``/{ns}/{module}/{module}_ExecutionHolon/SkillRequest``). It behaves like
+the SkillRequestLoop of Trees/ExecutionAgent.bt.xml:
+
+* a request is queued; when the module's queue is full it is refused
+  (``refusal``, ActionState ERROR),
+* requests whose InStorage preconditions are not met stay queued (one
+  ``update`` with ActionState PRECONDITION_RETRY, like the requeue in
+  ReadMqttSkillRequestNode) until the product is in the module's storage;
+  after --precondition-timeout they fail,
+* the module executes one action at a time, the first queued one that is
+  ready: ``consent`` PLANNED, ``inform`` EXECUTING, then after the skill
+  duration ``inform`` DONE or ``failure`` ERROR.
+
+Storage model: ``Store`` puts the action's ProductId into the module's
+storage, ``Retrieve`` takes it out. With --restock a product an InStorage
+precondition waits for is delivered after a sampled time, as if another
+module had stored it.
+
+Generated agents:
+
+  python3 tools/python_mqtt/execution_agent_sim.py --modules 200 \
+    --skill-time Store=exp:2 --skill-time Retrieve=uniform:1,3 --error-rate 0.02
+
+or from a JSON file (``--agents agents.json``), module entries override the
+defaults:
+
+  {
+    "defaults": {"skill_time": "uniform:0.5,2", "error_rate": 0.0, "queue_size": 10,
+                 "storage_capacity": 0, "skill_times": {"Store": "exp:2"}},
+    "modules": [
+      {"id": "P101", "storage": ["https://smartfactory.de/shells/p1"]},
+      {"id": "P102", "skill_times": {"Screw": "normal:5,1"}, "queue_size": 3}
+    ]
+  }
+
+Durations are distribution specs in seconds, see ``masbt_tools.distributions``.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import time
+
+from masbt_tools import find_value, new_conversation_id, skill_response_template
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.codec import decode_payload
+from masbt_tools.distributions import parse_distribution
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+DEFAULTS = {
+    "skill_time": "uniform:0.5,2",
+    "error_rate": 0.0,
+    "queue_size": 10,
+    "storage_capacity": 0,
+}
+SUBSCRIBE_BATCH = 100
+
+
+class SkillRequest:
+    __slots__ = ("conversation_id", "requester", "title", "machine_name", "product_id", "in_storage",
+                 "received_at", "announced")
+
+    def __init__(self, conversation_id, requester, title, machine_name, product_id, in_storage, received_at):
+        self.conversation_id = conversation_id
+        self.requester = requester
+        self.title = title
+        self.machine_name = machine_name
+        self.product_id = product_id
+        self.in_storage = in_storage  # SlotValues of the InStorage preconditions
+        self.received_at = received_at
+        self.announced = False        # PRECONDITION_RETRY sent
+
+
+def parse_skill_request(message, received_at):
+    """:class:`SkillRequest` from a decoded message, ``None`` if it is not one."""
+    frame = message.get("frame") if isinstance(message, dict) else None
+    if not isinstance(frame, dict):
+        return None
+    elements = message.get("interactionElements")
+    title = find_value(elements, "ActionTitle")
+    if not title:
+        return None
+    sender = frame.get("sender") or {}
+    requester = (sender.get("identification") or {}).get("id") or sender.get("id") or ""
+    in_storage = []
+    for condition in find_value(elements, "Preconditions") or ():
+        if not isinstance(condition, dict):
+            continue
+        children = condition.get("value")
+        if str(find_value(children, "ConditionType") or "").lower() == "instorage":
+            slot_value = find_value(children, "SlotValue")
+            if slot_value:
+                in_storage.append(str(slot_value))
+    return SkillRequest(str(frame.get("conversationId") or ""), requester, str(title),
+                        str(find_value(elements, "MachineName") or ""),
+                        str(find_value(elements, "ProductId") or ""), in_storage, received_at)
+
+
+class SimAgent:
+    __slots__ = ("id", "skill_time", "skill_times", "error_rate", "queue_size", "storage_capacity",
+                 "storage", "queue", "wake", "busy", "request_topic", "response_topic", "template",
+                 "requests", "refused", "done", "errors", "expired", "max_depth")
+
+    def __init__(self, module_id, settings, storage=()):
+        self.id = module_id
+        self.skill_time = parse_distribution(settings["skill_time"])
+        self.skill_times = {title.lower(): parse_distribution(spec)
+                            for title, spec in (settings.get("skill_times") or {}).items()}
+        self.error_rate = float(settings["error_rate"])
+        self.queue_size = int(settings["queue_size"])
+        self.storage_capacity = int(settings["storage_capacity"])
+        self.storage = set(storage)
+        self.queue: collections.deque[SkillRequest] = collections.deque()
+        self.wake = asyncio.Event()
+        self.busy = False
+        self.template = skill_response_template(module_id)
+        self.requests = 0
+        self.refused = 0
+        self.done = 0
+        self.errors = 0
+        self.expired = 0
+        self.max_depth = 0
+
+    def duration(self, title, rng):
+        return self.skill_times.get(title.lower(), self.skill_time).sample(rng)
+
+    def ready(self, request):
+        return all(product in self.storage for product in request.in_storage)
+
+    def next_ready(self):
+        for i, request in enumerate(self.queue):
+            if self.ready(request):
+                del self.queue[i]
+                return request
+        return None
+
+
+def load_agents(args):
+    overrides = _cli_overrides(args)
+    if args.agents:
+        with open(args.agents, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        defaults = {**DEFAULTS, **overrides, **config.get("defaults", {})}
+        defaults["skill_times"] = {**overrides.get("skill_times", {}), **defaults.get("skill_times", {})}
+        agents = []
+        for entry in config.get("modules", []):
+            settings = {**defaults, **{k: v for k, v in entry.items() if k in DEFAULTS}}
+            settings["skill_times"] = {**defaults["skill_times"], **entry.get("skill_times", {})}
+            agents.append(SimAgent(entry["id"], settings, entry.get("storage", ())))
+        return agents
+
+    settings = {**DEFAULTS, **overrides}
+    width = max(3, len(str(args.modules)))
+    return [SimAgent(f"{args.prefix}{i:0{width}d}", settings) for i in range(1, args.modules + 1)]
+
+
+def _cli_overrides(args):
+    overrides = {key: getattr(args, key) for key in DEFAULTS if getattr(args, key) is not None}
+    skill_times = {}
+    for item in args.skill_time_for or ():
+        title, sep, spec = item.partition("=")
+        if not sep or not title.strip():
+            raise ValueError(f"--skill-time expects TITLE=SPEC, got '{item}'")
+        skill_times[title.strip()] = spec.strip()
+    if skill_times:
+        overrides["skill_times"] = skill_times
+    return overrides
+
+
+class ExecutionAgentSim:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.agents = load_agents(args)
+        if not self.agents:
+            raise ValueError("no agents defined")
+        self.restock = parse_distribution(args.restock) if args.restock else None
+        self.by_topic = {}
+        for agent in self.agents:
+            agent.request_topic = args.request_topic.format(ns=args.namespace, module=agent.id)
+            agent.response_topic = args.response_topic.format(ns=args.namespace, module=agent.id)
+            self.by_topic[agent.request_topic] = agent
+        self.client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("ExecutionAgentSim"),
+                                      username=args.username, password=args.password)
+        self.client.on_message = self._on_message
+        self.responses = collections.Counter()  # ActionState -> count
+        self.unparsable = 0
+        self.ignored = 0
+        self.queue_wait = LatencyHistogram()
+        self.precondition_wait = LatencyHistogram()
+        self.turnaround = LatencyHistogram()
+
+    # --- requests ------------------------------------------------------------
+
+    def _on_message(self, topic, payload, qos, retain):
+        received_at = time.perf_counter()
+        agent = self.by_topic.get(topic)
+        if agent is None:
+            self.ignored += 1
+            return
+        try:
+            request = parse_skill_request(decode_payload(payload), received_at)
+        except ValueError:
+            request = None
+        if request is None or not request.requester:
+            self.unparsable += 1
+            return
+        agent.requests += 1
+        if len(agent.queue) >= agent.queue_size:
+            agent.refused += 1
+            self._respond(agent, request, "refusal", "ERROR",
+                          f"queue of {agent.id} full ({agent.queue_size} actions)")
+            return
+        agent.queue.append(request)
+        agent.max_depth = max(agent.max_depth, len(agent.queue))
+        if not agent.ready(request):
+            request.announced = True
+            missing = ", ".join(p for p in request.in_storage if p not in agent.storage)
+            self._respond(agent, request, "update", "PRECONDITION_RETRY", f"InStorage not satisfied: {missing}")
+            if self.restock is not None:
+                asyncio.get_running_loop().call_later(self.restock.sample(self.rng), self._deliver, agent, request)
+        agent.wake.set()
+
+    def _deliver(self, agent, request):
+        if request in agent.queue:
+            agent.storage.update(request.in_storage)
+            agent.wake.set()
+
+    def _respond(self, agent, request, msg_type, state, log_message=""):
+        payload = agent.template.render(msg_type=msg_type, conversation_id=request.conversation_id,
+                                        receiver_id=request.requester, action_title=request.title,
+                                        action_state=state, machine_name=request.machine_name or agent.id,
+                                        log_message=log_message)
+        try:
+            self.client.publish(agent.response_topic, payload, qos=self.args.qos)
+        except MqttError as e:
+            print(f"publish failed: {e}", file=sys.stderr)
+            return
+        self.responses[state] += 1
+
+    # --- execution -----------------------------------------------------------
+
+    async def agent_loop(self, agent):
+        while True:
+            request = agent.next_ready()
+            if request is None:
+                agent.wake.clear()
+                await agent.wake.wait()
+                continue
+            started = time.perf_counter()
+            (self.precondition_wait if request.announced else self.queue_wait).record(started - request.received_at)
+            agent.busy = True
+            self._respond(agent, request, "consent", "PLANNED")
+            self._respond(agent, request, "inform", "EXECUTING")
+            await asyncio.sleep(agent.duration(request.title, self.rng))
+            agent.busy = False
+            error = self._apply(agent, request)
+            if error is None and self.rng.random() < agent.error_rate:
+                error = "simulated skill failure"
+            if error is not None:
+                agent.errors += 1
+                self._respond(agent, request, "failure", "ERROR", error)
+            else:
+                agent.done += 1
+                self._respond(agent, request, "inform", "DONE")
+            self.turnaround.record(time.perf_counter() - request.received_at)
+
+    @staticmethod
+    def _apply(agent, request):
+        """Storage effect of the action; an error text if it cannot be applied."""
+        title = request.title.lower()
+        product = request.product_id
+        if not product:
+            return None
+        if title == "store":
+            if agent.storage_capacity and len(agent.storage) >= agent.storage_capacity and product not in agent.storage:
+                return f"storage of {agent.id} full ({agent.storage_capacity} slots)"
+            agent.storage.add(product)
+        elif title == "retrieve":
+            if product not in agent.storage:
+                return f"{product} not in storage of {agent.id}"
+            agent.storage.discard(product)
+        return None
+
+    async def expire_loop(self):
+        timeout = self.args.precondition_timeout
+        while True:
+            await asyncio.sleep(min(1.0, timeout / 4))
+            deadline = time.perf_counter() - timeout
+            for agent in self.agents:
+                if not agent.queue:
+                    continue
+                stale = [r for r in agent.queue if r.received_at < deadline and not agent.ready(r)]
+                for request in stale:
+                    agent.queue.remove(request)
+                    agent.expired += 1
+                    self._respond(agent, request, "failure", "ERROR",
+                                  f"precondition not satisfied within {timeout:g}s")
+
+    # --- live stats ----------------------------------------------------------
+
+    def snapshot(self, elapsed):
+        return {
+            "elapsed": round(elapsed, 3),
+            "requests": sum(a.requests for a in self.agents),
+            "responses": dict(self.responses),
+            "queued": sum(len(a.queue) for a in self.agents),
+            "busy": sum(a.busy for a in self.agents),
+            "agents": {a.id: {"queue": len(a.queue), "max_queue": a.max_depth, "busy": a.busy,
+                              "requests": a.requests, "done": a.done, "errors": a.errors,
+                              "refused": a.refused, "expired": a.expired, "storage": len(a.storage)}
+                       for a in self.agents},
+        }
+
+    async def progress_loop(self, start):
+        interval = self.args.progress
+        last_requests = 0
+        last_responses = collections.Counter()
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.snapshot(time.perf_counter() - start)
+            rates = " ".join(f"{state}={(count - last_responses[state]) / interval:.1f}/s"
+                             for state, count in sorted(self.responses.items()))
+            deepest = max(len(a.queue) for a in self.agents)
+            print(f"[{snapshot['elapsed']:7.1f}s] requests={snapshot['requests']} "
+                  f"(+{(snapshot['requests'] - last_requests) / interval:.1f}/s) {rates or 'no responses'} "
+                  f"queued={snapshot['queued']} max_queue={deepest} busy={snapshot['busy']}", flush=True)
+            last_requests = snapshot["requests"]
+            last_responses = collections.Counter(self.responses)
+            if self.args.stats_json:
+                self.write_stats(snapshot)
+
+    def write_stats(self, snapshot):
+        tmp = f"{self.args.stats_json}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.args.stats_json)
+        except OSError as e:
+            print(f"cannot write {self.args.stats_json}: {e}", file=sys.stderr)
+
+    # --- main ----------------------------------------------------------------
+
+    async def run(self):
+        args = self.args
+        await self.client.connect()
+        topics = [a.request_topic for a in self.agents]
+        for i in range(0, len(topics), SUBSCRIBE_BATCH):
+            await self.client.subscribe(*topics[i:i + SUBSCRIBE_BATCH], qos=args.qos)
+        print(f"Connected to {args.broker}:{args.port}; {len(self.agents)} simulated Execution agents on "
+              f"{topics[0]}{' ...' if len(topics) > 1 else ''}")
+
+        start = time.perf_counter()
+        helpers = [asyncio.create_task(self.agent_loop(a)) for a in self.agents]
+        helpers.append(asyncio.create_task(self.expire_loop()))
+        if args.progress > 0:
+            helpers.append(asyncio.create_task(self.progress_loop(start)))
+        try:
+            if args.duration > 0:
+                await asyncio.sleep(args.duration)
+            else:
+                await asyncio.Event().wait()
+        finally:
+            for task in helpers:
+                task.cancel()
+            await self.client.disconnect()
+            elapsed = time.perf_counter() - start
+            if args.stats_json:
+                self.write_stats(self.snapshot(elapsed))
+            self.report(elapsed)
+
+    def report(self, elapsed):
+        requests = sum(a.requests for a in self.agents)
+        print()
+        print(f"{requests} SkillRequests in {elapsed:.1f}s ({requests / elapsed if elapsed else 0.0:.1f}/s), "
+              f"responses {dict(sorted(self.responses.items()))}, "
+              f"{self.unparsable} unparsable, {self.ignored} on unknown topics")
+        print(format_summary_table({"queue wait": self.queue_wait.summary(),
+                                    "precondition wait": self.precondition_wait.summary(),
+                                    "request->terminal": self.turnaround.summary()}))
+        busiest = sorted(self.agents, key=lambda a: a.requests, reverse=True)[:self.args.top]
+        if busiest and busiest[0].requests:
+            print()
+            print(f"{'module':<16} {'requests':>9} {'done':>6} {'errors':>7} {'refused':>8} {'expired':>8} "
+                  f"{'max_queue':>10} {'storage':>8}")
+            for a in busiest:
+                print(f"{a.id:<16} {a.requests:>9} {a.done:>6} {a.errors:>7} {a.refused:>8} {a.expired:>8} "
+                      f"{a.max_depth:>10} {len(a.storage):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Execution agents answering SkillRequests")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--agents", help="JSON agent definition (overrides --modules)")
+    parser.add_argument("--modules", type=int, default=10, help="Number of generated modules")
+    parser.add_argument("--prefix", default="P", help="Id prefix of generated modules")
+    parser.add_argument("--skill-time", dest="skill_time_for", action="append", metavar="TITLE=SPEC",
+                        help="Skill duration distribution (s) of one ActionTitle, repeatable")
+    parser.add_argument("--default-skill-time", dest="skill_time",
+                        help="Skill duration distribution (s) of other ActionTitles")
+    parser.add_argument("--error-rate", dest="error_rate", type=float, help="Probability that a skill fails")
+    parser.add_argument("--queue-size", dest="queue_size", type=int, help="Queued actions per module before refusing")
+    parser.add_argument("--storage-capacity", dest="storage_capacity", type=int,
+                        help="Products per module storage (0 = unlimited)")
+    parser.add_argument("--precondition-timeout", type=float, default=60.0,
+                        help="Seconds a request may wait for its InStorage preconditions")
+    parser.add_argument("--restock", help="Deliver awaited products after this distribution (s); default: wait for Store")
+    parser.add_argument("--request-topic", default="/{ns}/{module}/Execution/SkillRequest")
+    parser.add_argument("--response-topic", default="/{ns}/{module}/Execution/SkillResponse")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--progress", type=float, default=5.0, help="Progress line interval in seconds (0 = off)")
+    parser.add_argument("--stats-json", help="Rewrite live per-module stats (queue depths, counters) to this file")
+    parser.add_argument("--top", type=int, default=10, help="Modules listed in the final report")
+    args = parser.parse_args()
+
+    if args.precondition_timeout <= 0:
+        parser.error("--precondition-timeout must be > 0")
+    try:
+        sim = ExecutionAgentSim(args)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"invalid agent definition: {e}")
+
+    try:
+        asyncio.run(sim.run())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Deterministic local Ollama stand-in for offline similarity benchmarks.
+
+Implements the endpoints MAS-BT and the Python tools use:
+
+  GET  /api/tags         lists the configured models
+  POST /api/embeddings   {"model", "prompt"}          -> {"embedding": [...]}
+  POST /api/embed        {"model", "input": str|list} -> {"embeddings": [[...], ...]}
+  POST /api/generate     {"model", "prompt"}          -> {"response": "Meaning: ...", "done": true}
+
+Embeddings are hash-seeded and therefore identical across runs and machines.
+A text's vector is the normalized sum of its word and character-trigram
+vectors, so related names ("Screw", "Screwing") still score higher than
+unrelated ones. Latency, parallelism, queueing and error rates are
+configurable. This separates pipeline overhead (CreateDescription ->
+CalcSimilarity round trips, MQTT, timeouts) from model inference time:
+
+  python3 tools/python_mqtt/fake_ollama.py --port 11434 --dim 768 \
+    --latency lognormal:-3,0.5 --parallel 4 --max-queue 64 --error-rate 0.01
+
+Latency specs are distributions in seconds (see masbt_tools.distributions).
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import signal
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from masbt_tools.distributions import parse_distribution
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+
+@lru_cache(maxsize=65536)
+def _feature_vector(feature, dim, model):
+    seed = int.from_bytes(hashlib.blake2b(f"{model}\x1f{feature}".encode("utf-8"), digest_size=8).digest(), "little")
+    rng = random.Random(seed)
+    return tuple(rng.gauss(0.0, 1.0) for _ in range(dim))
+
+
+def deterministic_embedding(text, dim, model="", trigram_weight=0.5):
+    """Unit vector for ``text``: normalized sum of word and character-trigram feature vectors."""
+    words = text.lower().split() or [""]
+    acc = [0.0] * dim
+    for word in words:
+        for i, v in enumerate(_feature_vector(f"w:{word}", dim, model)):
+            acc[i] += v
+        padded = f" {word} "
+        for j in range(len(padded) - 2):
+            for i, v in enumerate(_feature_vector(f"t:{padded[j:j + 3]}", dim, model)):
+                acc[i] += trigram_weight * v
+    norm = sum(v * v for v in acc) ** 0.5 or 1.0
+    return [v / norm for v in acc]
+
+
+def deterministic_description(text, model=""):
+    """Stable pseudo description in the shape CreateDescriptionNode asks for."""
+    digest = hashlib.sha1(f"{model}\x1f{text}".encode("utf-8")).hexdigest()[:8]
+    subject = " ".join(text.split()[-12:]) if text.strip() else "element"
+    return (f"Meaning: Submodel element {digest} classified as manufacturing capability; value denotes "
+            f"{subject[:120]}; relevant for capability matching and automated process planning.")
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Overloaded(Exception):
+    pass
+
+
+class FakeOllama:
+    def __init__(self, args):
+        self.args = args
+        self.models = [m.strip() for m in args.models.split(",") if m.strip()]
+        self.latency = parse_distribution(args.latency)
+        self.per_item = parse_distribution(args.per_item_latency)
+        self.generate_latency = parse_distribution(args.generate_latency)
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(args.parallel) if args.parallel > 0 else None
+        self.state_lock = threading.Lock()
+        self.queued = 0
+        self.counters = {"requests": 0, "errors_injected": 0, "rejected": 0, "items": 0}
+        self.histograms = {}
+
+    def known_model(self, model):
+        base = model.split(":", 1)[0]
+        return "*" in self.models or any(base == m.split(":", 1)[0] for m in self.models)
+
+    def sample(self, distribution):
+        with self.rng_lock:
+            return distribution.sample(self.rng)
+
+    def should_fail(self):
+        with self.rng_lock:
+            return self.rng.random() < self.args.error_rate
+
+    def record(self, endpoint, seconds):
+        with self.state_lock:
+            h = self.histograms.get(endpoint)
+            if h is None:
+                h = self.histograms[endpoint] = LatencyHistogram()
+            h.record(seconds)
+
+    def count(self, name, n=1):
+        with self.state_lock:
+            self.counters[name] += n
+
+    def acquire(self):
+        """Wait for a model slot like Ollama's parallel/queue limits; raise when the queue is full."""
+        if self.slots is None:
+            return
+        with self.state_lock:
+            if self.queued >= self.args.max_queue + self.args.parallel:
+                raise Overloaded()
+            self.queued += 1
+        self.slots.acquire()
+
+    def release(self):
+        if self.slots is None:
+            return
+        self.slots.release()
+        with self.state_lock:
+            self.queued -= 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "fake-ollama/0.1"
+    protocol_version = "HTTP/1.1"
+    ollama: FakeOllama = None
+
+    def log_message(self, fmt, *args):
+        if self.ollama.args.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/api/tags", ""):
+            if self.path.rstrip("/") == "":
+                return self._send(200, {"status": "Ollama is running"})
+            now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            models = [{"name": m if ":" in m else f"{m}:latest", "model": m if ":" in m else f"{m}:latest",
+                       "modified_at": now, "size": 0, "digest": hashlib.sha256(m.encode()).hexdigest(),
+                       "details": {"format": "fake", "family": "fake"}} for m in self.ollama.models if m != "*"]
+            return self._send(200, {"models": models})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        ollama = self.ollama
+        started = time.perf_counter()
+        endpoint = self.path.rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": "invalid JSON body"})
+        if endpoint not in ("/api/embeddings", "/api/embed", "/api/generate"):
+            return self._send(404, {"error": "not found"})
+        model = str(body.get("model") or "")
+        if not ollama.known_model(model):
+            return self._send(404, {"error": f'model "{model}" not found, try pulling it first'})
+
+        ollama.count("requests")
+        try:
+            ollama.acquire()
+        except Overloaded:
+            ollama.count("rejected")
+            return self._send(503, {"error": "server busy, please try again. maximum pending requests exceeded"})
+        try:
+            if endpoint == "/api/embed":
+                inputs = body.get("input", "")
+                texts = [inputs] if isinstance(inputs, str) else [str(t) for t in inputs]
+                delay = ollama.sample(ollama.latency) + sum(ollama.sample(ollama.per_item) for _ in texts)
+            elif endpoint == "/api/embeddings":
+                texts = [str(body.get("prompt", ""))]
+                delay = ollama.sample(ollama.latency)
+            else:
+                texts = [str(body.get("prompt", ""))]
+                delay = ollama.sample(ollama.generate_latency)
+            time.sleep(max(0.0, delay))
+            if ollama.should_fail():
+                ollama.count("errors_injected")
+                return self._send(500, {"error": "injected failure"})
+
+            dim = ollama.args.dim
+            ollama.count("items", len(texts))
+            if endpoint == "/api/embeddings":
+                result = {"embedding": deterministic_embedding(texts[0], dim, model)}
+            elif endpoint == "/api/embed":
+                elapsed_ns = int((time.perf_counter() - started) * 1e9)
+                result = {"model": model, "embeddings": [deterministic_embedding(t, dim, model) for t in texts],
+                          "total_duration": elapsed_ns, "load_duration": 0,
+                          "prompt_eval_count": sum(len(t.split()) for t in texts)}
+            else:
+                result = {"model": model, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                          "response": deterministic_description(texts[0], model), "done": True,
+                          "done_reason": "stop", "total_duration": int((time.perf_counter() - started) * 1e9)}
+            self._send(200, result)
+        finally:
+            ollama.release()
+            ollama.record(endpoint, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic Ollama stand-in with latency/error injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="nomic-embed-text,llama3",
+                        help="Comma separated model names to serve ('*' accepts any)")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimensions (nomic-embed-text: 768)")
+    parser.add_argument("--latency", default="const:0", help="Per-request latency distribution for embeddings (s)")
+    parser.add_argument("--per-item-latency", default="const:0", help="Extra latency per input of /api/embed (s)")
+    parser.add_argument("--generate-latency", default="const:0", help="Latency distribution for /api/generate (s)")
+    parser.add_argument("--parallel", type=int, default=0,
+                        help="Requests processed at once (like OLLAMA_NUM_PARALLEL, 0 = unlimited)")
+    parser.add_argument("--max-queue", type=int, default=512,
+                        help="Requests waiting for a slot before answering 503 (like OLLAMA_MAX_QUEUE)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected HTTP 500")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency/error sampling")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    try:
+        ollama = FakeOllama(args)
+    except ValueError as e:
+        parser.error(str(e))
+    Handler.ollama = ollama
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, _stop)  # print the summary when stopped by a benchmark harness
+    print(f"fake Ollama on http://{args.host}:{args.port} serving {', '.join(ollama.models)} "
+          f"({args.dim} dims)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print()
+        print(", ".join(f"{k}={v}" for k, v in ollama.counters.items()))
+        if ollama.histograms:
+            print(format_summary_table({k: h.summary() for k, h in sorted(ollama.histograms.items())}))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""Inventory mirror: where is product X right now, without asking the asset shells.
+
+Subscribes to ``/{ns}/+/Inventory`` (StorageMqttNotifier,
+UpdateInventoryFromActionNode) and applies every message to an in-memory
+``masbt_tools.inventory.InventoryStore``, indexed by module, storage, slot,
+ProductID and CarrierID. Queries are answered from memory over HTTP/JSON:
+
+  GET  /products/<ProductID>            slots holding the product
+  GET  /products?prefix=&from=&to=&limit=  products in id order (range)
+  GET  /carriers/<CarrierID>            slots holding the carrier
+  GET  /modules                         free/occupied/version per module
+  GET  /modules/<module>                storages and slots of a module
+  GET  /slots?module=&storage=&empty=&product_type=&limit=
+  GET  /changes?since=<version>         modules changed after a version
+  GET  /stats                           counters and query latencies
+  POST /snapshot                        write the snapshot now
+
+IDs in paths are URL-encoded (ProductIDs are usually URLs). With
+``--snapshot`` the store is loaded on start and written every
+``--snapshot-interval`` seconds when it changed, and again on exit.
+
+  python3 tools/python_mqtt/inventory_mirror.py --namespace _PHUKET --http-port 8085 \\
+    --snapshot inventory_snapshot.json
+  curl "localhost:8085/products/https%3A%2F%2Fsmartfactory.de%2Fshells%2Fabc"
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from masbt_tools import new_conversation_id
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.codec import decode_payload
+from masbt_tools.inventory import InventoryStore, parse_inventory, write_snapshot
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+
+class InventoryMirror:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.store = InventoryStore()
+        self.saved_version = 0
+        if args.snapshot:
+            try:
+                self.store = InventoryStore.load(args.snapshot)
+                self.saved_version = self.store.version
+                stats = self.store.stats()
+                print(f"Loaded snapshot {args.snapshot}: {stats['modules']} modules, {stats['slots']} slots, "
+                      f"version {stats['version']}")
+            except FileNotFoundError:
+                pass
+        self.messages = 0
+        self.ignored = 0
+        self.unparsable = 0
+        self.apply_time = LatencyHistogram()
+        self.queries = {}
+
+    # --- ingest --------------------------------------------------------------
+
+    def on_message(self, topic, payload, qos, retain):
+        started = time.perf_counter()
+        self.messages += 1
+        try:
+            message = decode_payload(payload)
+        except ValueError:
+            self.unparsable += 1
+            return
+        if not isinstance(message, dict):
+            self.unparsable += 1
+            return
+        storages = parse_inventory(message.get("interactionElements"))
+        if not storages:
+            self.ignored += 1  # e.g. a bare InventorySummary
+            return
+        module_id = module_from_topic(topic)
+        with self.lock:
+            self.store.apply(module_id, storages)
+            self.apply_time.record(time.perf_counter() - started)
+
+    async def snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.args.snapshot_interval)
+            self.save_snapshot()
+
+    def save_snapshot(self, force=False):
+        with self.lock:
+            if not force and self.store.version == self.saved_version:
+                return
+            data = self.store.to_dict()
+            version = self.store.version
+        try:
+            write_snapshot(data, self.args.snapshot)  # serialized outside the lock
+        except OSError as e:
+            print(f"snapshot failed: {e}", file=sys.stderr)
+            return
+        self.saved_version = version
+
+    # --- queries -------------------------------------------------------------
+
+    def query(self, method, path, params):
+        """(status, body) for a request; runs under the store lock."""
+        parts = [unquote(p) for p in path.strip("/").split("/") if p]
+        store = self.store
+
+        def one(name, cast=str, default=None):
+            values = params.get(name)
+            return cast(values[0]) if values else default
+
+        if method == "POST":
+            if parts == ["snapshot"]:
+                return None, None  # handled by the caller outside the lock
+            return 404, {"error": "not found"}
+        if not parts:
+            return 200, store.stats()
+        head, rest = parts[0], parts[1:]
+        if head == "products":
+            if rest:
+                locations = store.locate_product("/".join(rest))
+                return (200 if locations else 404), {"product_id": "/".join(rest), "locations": locations}
+            return 200, {"version": store.version,
+                         "products": store.product_range(one("from"), one("to"), one("prefix"),
+                                                         one("limit", int, self.args.default_limit))}
+        if head == "carriers" and rest:
+            locations = store.locate_carrier("/".join(rest))
+            return (200 if locations else 404), {"carrier_id": "/".join(rest), "locations": locations}
+        if head == "modules":
+            if rest:
+                module = store.module("/".join(rest))
+                return (200, module) if module else (404, {"error": f"unknown module '{'/'.join(rest)}'"})
+            return 200, {"version": store.version, "modules": store.summary()}
+        if head == "slots":
+            empty = one("empty")
+            return 200, {"version": store.version, "slots": store.slots(
+                one("module"), one("storage"), None if empty is None else empty.lower() in ("true", "1"),
+                one("product_type"), one("limit", int, self.args.default_limit))}
+        if head == "changes":
+            return 200, {"version": store.version, "modules": store.changed_since(one("since", int, 0))}
+        if head == "stats":
+            return 200, {**store.stats(), "messages": self.messages, "ignored": self.ignored,
+                         "unparsable": self.unparsable, "apply_ms": self.apply_time.summary(),
+                         "query_ms": {k: h.summary() for k, h in sorted(self.queries.items())}}
+        return 404, {"error": "not found"}
+
+    def record_query(self, endpoint, seconds):
+        h = self.queries.get(endpoint)
+        if h is None:
+            h = self.queries[endpoint] = LatencyHistogram()
+        h.record(seconds)
+
+    def report(self):
+        stats = self.store.stats()
+        print()
+        print(f"{self.messages} inventory messages ({self.ignored} without storages, {self.unparsable} unparsable); "
+              f"{stats['modules']} modules, {stats['slots']} slots, {stats['products']} products, "
+              f"version {stats['version']}")
+        rows = {"apply": self.apply_time.summary()}
+        rows.update({f"/{k}": h.summary() for k, h in sorted(self.queries.items())})
+        print(format_summary_table(rows))
+
+
+def module_from_topic(topic):
+    """``/{ns}/{module}/Inventory`` and the legacy ``/Modules/{module}/Inventory/`` -> module id."""
+    segments = [s for s in topic.split("/") if s]
+    return segments[-2] if len(segments) >= 2 else topic
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "masbt-inventory/0.1"
+    protocol_version = "HTTP/1.1"
+    mirror: InventoryMirror = None
+
+    def log_message(self, fmt, *args):
+        if self.mirror.args.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        mirror = self.mirror
+        try:
+            with mirror.lock:
+                status, body = mirror.query(method, url.path, parse_qs(url.query))
+                endpoint = (url.path.strip("/").split("/")[0] or "stats")
+                mirror.record_query(endpoint, time.perf_counter() - started)
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        if status is None:
+            if not mirror.args.snapshot:
+                return self._send(400, {"error": "no --snapshot file configured"})
+            mirror.save_snapshot(force=True)
+            return self._send(200, {"snapshot": mirror.args.snapshot, "version": mirror.saved_version})
+        self._send(status, body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self._handle("POST")
+
+
+async def run(mirror, args):
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("InventoryMirror"),
+                             username=args.username, password=args.password)
+    client.on_message = mirror.on_message
+    await client.connect()
+    topics = [t.format(ns=args.namespace) for t in args.topic]
+    await client.subscribe(*topics, qos=args.qos)
+    print(f"Connected to {args.broker}:{args.port}; mirroring {', '.join(topics)}")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    helpers = [asyncio.create_task(mirror.snapshot_loop())] if args.snapshot and args.snapshot_interval > 0 else []
+    try:
+        if args.duration > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), args.duration)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await stop.wait()
+    finally:
+        for task in helpers:
+            task.cancel()
+        await client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory inventory mirror with an HTTP/JSON query API")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--topic", action="append", default=None,
+                        help="Inventory topic filter, repeatable (default /{ns}/+/Inventory)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--http-host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=8085)
+    parser.add_argument("--snapshot", help="Snapshot file, loaded on start and rewritten while running")
+    parser.add_argument("--snapshot-interval", type=float, default=10.0,
+                        help="Seconds between snapshots of a changed store (0 = only on exit)")
+    parser.add_argument("--default-limit", type=int, default=1000, help="Result limit of list queries")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args()
+    args.topic = args.topic or ["/{ns}/+/Inventory"]
+
+    try:
+        mirror = InventoryMirror(args)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error: cannot load snapshot: {e}", file=sys.stderr)
+        sys.exit(1)
+    Handler.mirror = mirror
+    try:
+        server = ThreadingHTTPServer((args.http_host, args.http_port), Handler)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Inventory API on http://{args.http_host}:{args.http_port}")
+
+    try:
+        asyncio.run(run(mirror, args))
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if args.snapshot:
+            mirror.save_snapshot()
+        mirror.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Collect the MqttLogger stream into an indexed archive and query it.
+
+  collect   subscribe to +/logs (MqttLoggerProvider publishes on
+            {agentId}/logs) and batch every record into rotating
+            zlib-compressed segments in --out
+  query     records of a time window, filtered by agent (ids or fnmatch
+            patterns), level and message text. Only blocks that the time,
+            agent and level indexes point at are decompressed
+  info      segments, time range, compression, records per agent and level
+  reindex   rebuild the .idx files after a crash or a copied segment
+
+Examples:
+  python3 tools/python_mqtt/log_collector.py collect --out /tmp/logs
+  python3 tools/python_mqtt/log_collector.py query /tmp/logs --agent 'P102_Planning*' --level Warning+ \\
+    --since 10:02 --until 10:05
+  python3 tools/python_mqtt/log_collector.py query /tmp/logs --level Error+ --since 2025-01-01T06:00 --count
+  python3 tools/python_mqtt/log_collector.py info /tmp/logs
+
+Times are epoch seconds, ISO times or HH:MM[:SS] (local time). A bare --since
+clock time is the most recent one that is not in the future, a bare --until
+clock time is on the date of --since. --until must be later than --since.
+Levels are Trace, Debug, Information, Warning, Error, Critical. ``Warning+``
+means Warning and above, ``Debug-`` Debug and below.
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from masbt_tools import AsyncMqttClient, MqttError, new_conversation_id
+from masbt_tools.frame_scan import FrameScanner
+from masbt_tools.log_archive import LEVELS, LogArchive, LogWriter, parse_level, rebuild_index
+
+
+def _parse_time(value, since=None):
+    """Epoch seconds. A bare clock time is taken on the date of ``since`` (epoch seconds) if given,
+    otherwise it is the most recent one that is not in the future."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        clock = datetime.time.fromisoformat(value)
+        if since is not None:
+            moment = datetime.datetime.combine(datetime.datetime.fromtimestamp(since).date(), clock)
+        else:
+            moment = datetime.datetime.combine(datetime.date.today(), clock)
+            if moment > datetime.datetime.now():
+                moment -= datetime.timedelta(days=1)  # 23:58 queried shortly after midnight
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.timestamp()
+
+
+def _time_window(since, until):
+    """``--since``/``--until`` as epoch seconds; ``--until`` is resolved relative to ``--since``."""
+    start = _parse_time(since)
+    end = _parse_time(until, start)
+    if start is not None and end is not None and end <= start:
+        raise ValueError(f"--until {until} ({_format_time(end)}) is not after --since {since} ({_format_time(start)})")
+    return start, end
+
+
+def _level_range(value):
+    """``Warning+`` -> (3, 6), ``Debug-`` -> (0, 1), ``Error`` -> (4, 4)."""
+    if value is None:
+        return 0, 6
+    text = value.strip()
+    if text.endswith("+"):
+        return parse_level(text[:-1]), 6
+    if text.endswith("-"):
+        return 0, parse_level(text[:-1])
+    level = parse_level(text)
+    return level, level
+
+
+def _format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds")
+
+
+# --- collect -----------------------------------------------------------------
+
+class Collector:
+    def __init__(self, writer):
+        self.writer = writer
+        self.scanner = FrameScanner(("LogLevel", "Message"))
+        self.ignored = 0
+
+    def on_message(self, topic, payload, qos, retain):
+        fields = self.scanner.scan(payload)
+        if fields is None or "LogLevel" not in fields.values:
+            self.ignored += 1
+            return
+        values = fields.values
+        agent = fields.sender or topic.rsplit("/", 1)[0]
+        message = values.get("Message")
+        self.writer.append(parse_level(values["LogLevel"]), str(agent), "" if message is None else str(message),
+                           str(fields.sender_role or ""))
+
+
+async def collect(args):
+    writer = LogWriter(args.out, segment_bytes=int(args.segment_mb * 1024 * 1024),
+                       segment_seconds=args.segment_seconds, block_bytes=args.block_kb * 1024,
+                       flush_seconds=args.flush_interval, level=args.level)
+    collector = Collector(writer)
+    filters = args.filter or ["+/logs"]
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("LogCollector"),
+                             username=args.username, password=args.password)
+    client.on_message = collector.on_message
+    lost = asyncio.Event()
+    client.on_disconnect = lambda error: lost.set()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+    deadline = loop.time() + args.duration if args.duration > 0 else None
+    start = time.perf_counter()
+    last_records, last_report = 0, start
+
+    try:
+        while not stop.is_set():
+            lost.clear()
+            try:
+                await client.connect()
+                await client.subscribe(*filters, qos=args.qos)
+            except (OSError, MqttError, asyncio.TimeoutError) as e:
+                if not args.reconnect:
+                    raise
+                print(f"Connect failed ({e}), retrying in {args.reconnect}s", file=sys.stderr)
+                await asyncio.sleep(args.reconnect)
+                continue
+            print(f"Collecting {', '.join(filters)} from {args.broker}:{args.port} into {args.out}", flush=True)
+            while not stop.is_set() and not lost.is_set():
+                if deadline is not None and loop.time() >= deadline:
+                    stop.set()
+                    break
+                await asyncio.sleep(0.25)
+                writer.tick()
+                now = time.perf_counter()
+                if args.progress > 0 and now - last_report >= args.progress:
+                    rate = (writer.records - last_records) / (now - last_report)
+                    print(f"[{now - start:7.1f}s] {writer.records} records (+{rate:.0f}/s), "
+                          f"{writer.written_bytes / 1e6:.1f} MB on disk", flush=True)
+                    last_records, last_report = writer.records, now
+            if lost.is_set() and not stop.is_set():
+                if not args.reconnect:
+                    raise MqttError("connection to the broker lost")
+                print(f"Connection lost, reconnecting in {args.reconnect}s", file=sys.stderr)
+                await asyncio.sleep(args.reconnect)
+    finally:
+        await client.disconnect()
+        writer.close()
+        elapsed = time.perf_counter() - start
+        ratio = writer.raw_bytes / writer.written_bytes if writer.written_bytes else 0.0
+        print()
+        print(f"{writer.records} log records in {elapsed:.1f}s ({writer.records / elapsed if elapsed else 0:.0f}/s), "
+              f"{collector.ignored} other messages ignored, {writer.raw_bytes / 1e6:.1f} MB raw -> "
+              f"{writer.written_bytes / 1e6:.1f} MB (x{ratio:.1f}) in {writer.segments} segment(s)")
+
+
+# --- read side ---------------------------------------------------------------
+
+def cmd_query(args):
+    min_level, max_level = _level_range(args.level)
+    since, until = _time_window(args.since, args.until)
+    with LogArchive(args.path) as archive:
+        started = time.perf_counter()
+        records = archive.query(since, until, args.agent, min_level, max_level, args.grep)
+        count = 0
+        for r in records:
+            count += 1
+            if args.count:
+                continue
+            if args.json:
+                print(json.dumps({"ts": r.timestamp, "level": LEVELS[r.level], "agent": r.agent, "role": r.role,
+                                  "message": r.message}, ensure_ascii=False))
+            else:
+                print(f"{_format_time(r.timestamp)} {LEVELS[r.level]:<8} {r.agent}: {r.message}")
+            if args.limit and count >= args.limit:
+                break
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        summary = (f"{count} records ({elapsed_ms:.1f} ms, {archive.blocks_read} of {archive.block_count()} "
+                   f"blocks decompressed)")
+        print(summary, file=sys.stdout if args.count else sys.stderr)
+
+
+def cmd_info(args):
+    with LogArchive(args.path) as archive:
+        total_disk = 0
+        first = last = None
+        print(f"{'segment':<40} {'records':>9} {'blocks':>7} {'MB':>8}  range")
+        for segment in archive.segments:
+            records = sum(b[1] for b in segment.blocks)
+            size = os.path.getsize(segment.path)
+            total_disk += size
+            if segment.blocks:
+                t0, t1 = segment.starts[0], segment.ends[-1]
+                first = t0 if first is None else min(first, t0)
+                last = t1 if last is None else max(last, t1)
+                span = f"{_format_time(t0)} .. {_format_time(t1)}"
+            else:
+                span = "-"
+            print(f"{os.path.basename(segment.path):<40} {records:>9} {len(segment.blocks):>7} "
+                  f"{size / 1e6:>8.2f}  {span}")
+        print(f"{len(archive)} records in {archive.block_count()} blocks, {total_disk / 1e6:.2f} MB on disk")
+        if first is not None:
+            print(f"{_format_time(first)} .. {_format_time(last)} ({last - first:.1f}s)")
+        print()
+        print(f"{'level':<12} {'records':>9}")
+        for level, count in sorted(archive.levels().items()):
+            print(f"{LEVELS[level]:<12} {count:>9}")
+        counts = sorted(archive.agents().items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        if counts:
+            print()
+            print(f"{'agent':<50} {'records':>9}")
+            for agent, count in counts:
+                print(f"{agent[:50]:<50} {count:>9}")
+
+
+def cmd_reindex(args):
+    paths = [args.path] if args.path.endswith(".mlg") else sorted(glob.glob(os.path.join(args.path, "log-*.mlg")))
+    for path in paths:
+        print(f"{os.path.basename(path)}: {rebuild_index(path)} blocks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched, indexed archive of the MqttLogger stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    col = sub.add_parser("collect", help="Archive live log messages")
+    col.add_argument("--broker", default="localhost")
+    col.add_argument("--port", type=int, default=1883)
+    col.add_argument("--username")
+    col.add_argument("--password")
+    col.add_argument("--filter", action="append", help="Topic filter (repeatable, default +/logs)")
+    col.add_argument("--out", required=True, help="Archive directory")
+    col.add_argument("--qos", type=int, choices=[0, 1], default=0)
+    col.add_argument("--segment-mb", type=float, default=128.0, help="Rotate segments at this size")
+    col.add_argument("--segment-seconds", type=float, default=3600.0, help="Rotate segments after N seconds")
+    col.add_argument("--block-kb", type=int, default=64, help="Uncompressed block size")
+    col.add_argument("--flush-interval", type=float, default=1.0, help="Write partial blocks after N seconds")
+    col.add_argument("--level", type=int, default=6, choices=range(0, 10), help="zlib compression level")
+    col.add_argument("--reconnect", type=float, default=2.0, help="Seconds before reconnecting (0 = exit)")
+    col.add_argument("--duration", type=float, default=0.0, help="Seconds to collect (0 = until Ctrl+C)")
+    col.add_argument("--progress", type=float, default=60.0, help="Progress line interval in seconds (0 = off)")
+
+    query = sub.add_parser("query", help="Records of a time window, agent and level")
+    query.add_argument("path", help="Archive directory or .mlg segment")
+    query.add_argument("--since", help="Start time (inclusive)")
+    query.add_argument("--until", help="End time (exclusive)")
+    query.add_argument("--agent", action="append", help="Agent id or fnmatch pattern (repeatable)")
+    query.add_argument("--level", help="Level, Level+ (and above) or Level- (and below)")
+    query.add_argument("--grep", help="Only messages containing this text")
+    query.add_argument("--limit", type=int, default=0, help="Stop after N records (0 = all)")
+    query.add_argument("--json", action="store_true", help="Print JSON lines")
+    query.add_argument("--count", action="store_true", help="Only count the matches")
+    query.set_defaults(func=cmd_query)
+
+    info = sub.add_parser("info", help="Summarize an archive")
+    info.add_argument("path", help="Archive directory or .mlg segment")
+    info.add_argument("--top", type=int, default=20)
+    info.set_defaults(func=cmd_info)
+
+    reindex = sub.add_parser("reindex", help="Rebuild segment indexes")
+    reindex.add_argument("path")
+    reindex.set_defaults(func=cmd_reindex)
+
+    args = parser.parse_args()
+    if args.command == "collect":
+        try:
+            asyncio.run(collect(args))
+        except (OSError, MqttError, asyncio.TimeoutError) as e:
+            print(f"MQTT error: {e}", file=sys.stderr)
+            sys.exit(3)
+        except KeyboardInterrupt:
+            pass
+        return
+    try:
+        args.func(args)
+    except BrokenPipeError:  # query | head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Shared helpers for the MAS-BT Python MQTT tooling.
+
+The scripts in ``tools/python_mqtt`` import this package directly: Python
+puts a script's own directory on ``sys.path``, so no installation is needed.
+"""
+from .async_client import AsyncMqttClient, MqttError
+from .embedding_cache import EmbeddingCache
+from .messages import (
+    Action,
+    Collection,
+    ElementList,
+    Frame,
+    Message,
+    MessageTemplate,
+    Party,
+    Precondition,
+    Property,
+    ReferenceElement,
+    Slot,
+    capability_offer_template,
+    capability_refusal_template,
+    find_value,
+    frame_message_template,
+    inventory_template,
+    new_conversation_id,
+    now_iso,
+    registration_template,
+    skill_request_template,
+    skill_response_template,
+)
+from .stats import LatencyHistogram
+from .traffic import Record, SegmentWriter, TrafficArchive
+
+__all__ = [
+    "Action",
+    "AsyncMqttClient",
+    "Collection",
+    "ElementList",
+    "EmbeddingCache",
+    "Frame",
+    "LatencyHistogram",
+    "Message",
+    "MessageTemplate",
+    "MqttError",
+    "Party",
+    "Precondition",
+    "Property",
+    "Record",
+    "ReferenceElement",
+    "SegmentWriter",
+    "Slot",
+    "TrafficArchive",
+    "capability_offer_template",
+    "capability_refusal_template",
+    "find_value",
+    "frame_message_template",
+    "inventory_template",
+    "new_conversation_id",
+    "now_iso",
+    "registration_template",
+    "skill_request_template",
+    "skill_response_template",
+]
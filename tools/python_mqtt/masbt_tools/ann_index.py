@@ -0,0 +1,210 @@
+"""Approximate nearest-neighbour index over capability embeddings (requires numpy).
+
+An exact cosine scan touches every vector of the catalog for every query.
+``IVFIndex`` clusters the unit-normalized vectors with spherical k-means into
+``nlist`` inverted lists; a query is compared with the centroids first and
+then only with the vectors of the ``nprobe`` closest lists.
+
+    index = IVFIndex.build(vectors, labels)          # vectors: N x d
+    index.save("caps.ivf")
+    index = IVFIndex.load("caps.ivf")                # memory-mapped
+    index.query(vector, k=5, nprobe=8)               # [(label, score), ...]
+    print(format_recall_report(recall_report(index, queries, k=10)))
+
+On disk an index is a directory of ``.npy`` arrays (loaded with
+``mmap_mode="r"``) plus ``labels.json`` and ``meta.json``.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from .similarity import normalize_rows
+
+_ARRAYS = ("centroids", "vectors", "offsets", "ids")
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0,
+                     sample: int = 50_000, batch: int = 8192) -> np.ndarray:
+    """Unit-norm centroids of ``vectors`` (rows must already be normalized)."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    train = vectors if n <= sample else vectors[np.sort(rng.choice(n, sample, replace=False))]
+    centroids = np.array(train[rng.choice(train.shape[0], nlist, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignment = assign(train, centroids, batch)
+        counts = np.bincount(assignment, minlength=nlist)
+        order = np.argsort(assignment, kind="stable")
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums[filled] = np.add.reduceat(train[order], starts, axis=0)
+        empty = ~filled
+        if empty.any():  # re-seed empty lists with random training vectors
+            sums[empty] = train[rng.choice(train.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for every row, in batches to bound memory."""
+    result = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], batch):
+        result[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+    return result
+
+
+class IVFIndex:
+    """Inverted-file index with cosine similarity."""
+
+    def __init__(self, centroids, vectors, offsets, ids, labels, nprobe: int = 8):
+        self.centroids = centroids      # nlist x d, unit rows
+        self.vectors = vectors          # N x d, unit rows, grouped by list
+        self.offsets = offsets          # nlist + 1, list i is vectors[offsets[i]:offsets[i + 1]]
+        self.ids = ids                  # N, row in ``vectors`` -> position in ``labels``
+        self.labels = labels
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, vectors, labels=None, nlist: int | None = None, iterations: int = 10,
+              seed: int = 0, nprobe: int | None = None) -> "IVFIndex":
+        """Cluster ``vectors`` (N x d, any norm) into ``nlist`` lists.
+
+        The default is ~4*sqrt(N) lists, or a single list (exact scan) below
+        1024 vectors where clustering does not pay off.
+        """
+        normalized = normalize_rows(vectors)
+        n = normalized.shape[0]
+        if n == 0:
+            raise ValueError("cannot build an index without vectors")
+        labels = list(labels) if labels is not None else list(range(n))
+        if len(labels) != n:
+            raise ValueError(f"{len(labels)} labels for {n} vectors")
+        if nlist is None:
+            nlist = int(4 * math.sqrt(n)) if n >= 1024 else 1
+        nlist = max(1, min(nlist, n))
+        centroids = spherical_kmeans(normalized, nlist, iterations, seed)
+        assignment = assign(normalized, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        if nprobe is None:
+            nprobe = max(1, nlist // 16)
+        return cls(centroids, np.ascontiguousarray(normalized[order]), offsets, order.astype(np.int64),
+                   labels, nprobe)
+
+    # --- persistence ---------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(directory, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(self.labels, f, ensure_ascii=False)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"type": "ivf", "metric": "cosine", "size": len(self), "dim": self.dim,
+                       "nlist": self.nlist, "nprobe": self.nprobe}, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "IVFIndex":
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS}
+        with open(os.path.join(directory, "labels.json"), "r", encoding="utf-8") as f:
+            labels = json.load(f)
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(labels=labels, nprobe=meta.get("nprobe", 8), **arrays)
+
+    # --- search --------------------------------------------------------------
+
+    def search(self, vector, k: int = 10, nprobe: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Positions in ``labels`` and scores of the ``k`` approximate nearest neighbours."""
+        q = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        if q.shape[0] != self.dim:
+            raise ValueError(f"query has {q.shape[0]} dimensions, index holds {self.dim}")
+        probes = _top(self.centroids @ q, nprobe or self.nprobe)
+        offsets = self.offsets
+        rows = np.concatenate([np.arange(offsets[p], offsets[p + 1]) for p in probes])
+        if rows.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors[rows] @ q
+        best = _top(scores, k)
+        return np.asarray(self.ids[rows[best]]), scores[best]
+
+    def query(self, text_or_vector, k: int = 10, nprobe: int | None = None, embed=None) -> list[tuple]:
+        """``[(label, score), ...]`` best first; a text is embedded with ``embed(text)`` first."""
+        vector = text_or_vector
+        if isinstance(text_or_vector, str):
+            if embed is None:
+                raise ValueError("querying by text needs an embed function")
+            vector = embed(text_or_vector)
+            if vector is None:
+                raise ValueError(f"no embedding for '{text_or_vector}'")
+        positions, scores = self.search(vector, k, nprobe)
+        return [(self.labels[int(p)], float(s)) for p, s in zip(positions, scores)]
+
+    def exact_search(self, vector, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Brute-force reference: scans every vector."""
+        q = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        scores = self.vectors @ q
+        best = _top(scores, k)
+        return np.asarray(self.ids[best]), scores[best]
+
+
+def recall_report(index: IVFIndex, queries, k: int = 10, nprobes=(1, 2, 4, 8, 16, 32)) -> list[dict]:
+    """recall@k and mean query time per ``nprobe``, measured against exact search."""
+    queries = np.asarray(queries, dtype=np.float32)
+    start = time.perf_counter()
+    truth = [set(index.exact_search(q, k)[0].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            found = index.search(q, k, nprobe)[0]
+            hits += len(expected.intersection(found.tolist()))
+        elapsed_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+        rows.append({
+            "nprobe": nprobe,
+            "recall": hits / max(1, sum(len(t) for t in truth)),
+            "query_ms": elapsed_ms,
+            "exact_ms": exact_ms,
+            "speedup": exact_ms / elapsed_ms if elapsed_ms else math.inf,
+        })
+    return rows
+
+
+def format_recall_report(rows: list[dict], k: int = 10) -> str:
+    header = f"{'nprobe':>7} {f'recall@{k}':>10} {'query ms':>10} {'exact ms':>10} {'speedup':>8}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(f"{r['nprobe']:>7} {r['recall']:>10.3f} {r['query_ms']:>10.3f} "
+                     f"{r['exact_ms']:>10.3f} {r['speedup']:>7.1f}x")
+    return "\n".join(lines)
@@ -0,0 +1,275 @@
+"""Minimal asyncio MQTT 3.1.1 client (QoS 0/1).
+
+paho-mqtt runs its own network thread and calls back into it, which makes
+it awkward to drive thousands of concurrent conversations from one event
+loop. This client keeps everything on the loop:
+
+    client = AsyncMqttClient("localhost", 1883, client_id="loadgen")
+    client.on_message = lambda topic, payload, qos, retain: ...
+    await client.connect()
+    await client.subscribe("/phuket/+/+/SkillResponse")
+    client.publish(topic, payload, qos=1)      # returns a PUBACK future for QoS 1
+    await client.disconnect()
+
+A QoS 1 publish without PUBACK fails with :class:`MqttError` after
+``ack_timeout`` seconds and frees its packet id, also when nobody awaits
+the future; so does one whose future was cancelled (``asyncio.wait_for``).
+``publish`` raises :class:`MqttError` while all 65535 ids are in flight.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+import traceback
+import uuid
+from collections import deque
+
+from . import mqtt_wire as wire
+
+
+class MqttError(Exception):
+    pass
+
+
+class AsyncMqttClient:
+    def __init__(self, host: str = "localhost", port: int = 1883, client_id: str | None = None,
+                 keepalive: int = 60, username: str | None = None, password: str | None = None,
+                 clean_session: bool = True, will: tuple[str, bytes, int, bool] | None = None,
+                 ack_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.client_id = client_id or f"masbt-py-{uuid.uuid4().hex[:12]}"
+        self.keepalive = keepalive
+        self.username = username
+        self.password = password
+        self.clean_session = clean_session
+        self.will = will
+        self.ack_timeout = ack_timeout
+        # on_message(topic: str, payload: bytes, qos: int, retain: bool)
+        self.on_message = None
+        self.on_disconnect = None
+
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._packet_ids = itertools.cycle(range(1, 65536))
+        self._pending: dict[int, asyncio.Future] = {}
+        # (deadline, packet id, future) of QoS 1 publishes in send order, so deadlines are ascending
+        self._unacked: deque = deque()
+        self._connack: asyncio.Future | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.ack_timeouts = 0
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    async def connect(self, timeout: float = 10.0) -> None:
+        if self._writer is not None:  # reconnect after a lost connection
+            await self._close()
+        self._closing = False
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout)
+        loop = asyncio.get_running_loop()
+        self._connack = loop.create_future()
+        self._writer.write(wire.connect(self.client_id, self.keepalive, self.clean_session,
+                                        self.username, self.password, self.will))
+        self._tasks.append(asyncio.create_task(self._read_loop()))
+        return_code = await asyncio.wait_for(self._connack, timeout)
+        if return_code != 0:
+            await self._close()
+            raise MqttError(f"CONNACK refused with return code {return_code}")
+        self.connected = True
+        if self.keepalive:
+            self._tasks.append(asyncio.create_task(self._ping_loop()))
+        self._tasks.append(asyncio.create_task(self._expire_loop()))
+
+    async def disconnect(self) -> None:
+        if self._writer is None:
+            return
+        self._closing = True
+        try:
+            self._writer.write(wire.DISCONNECT_PACKET)
+            await self._writer.drain()
+        except (ConnectionError, RuntimeError):
+            pass
+        await self._close()
+
+    def _next_packet_id(self) -> int:
+        if len(self._pending) >= 65535:
+            self._expire(time.monotonic())
+            if len(self._pending) >= 65535:
+                raise MqttError("all 65535 packet ids are awaiting an acknowledgement")
+        pid = next(self._packet_ids)
+        while pid in self._pending:
+            pid = next(self._packet_ids)
+        return pid
+
+    def publish(self, topic: str, payload, qos: int = 0, retain: bool = False):
+        """Queue a PUBLISH. For QoS 1 returns a future resolved on PUBACK, else ``None``."""
+        if self._writer is None:
+            raise MqttError("not connected")
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        future = None
+        packet_id = None
+        if qos:
+            if qos > 1:
+                raise ValueError("QoS 2 is not supported")
+            packet_id = self._next_packet_id()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[packet_id] = future
+            now = time.monotonic()
+            self._expire(now)
+            self._unacked.append((now + self.ack_timeout, packet_id, future))
+        self._writer.write(wire.publish(topic, payload, qos, retain, packet_id))
+        self.published += 1
+        return future
+
+    async def publish_wait(self, topic: str, payload, qos: int = 0, retain: bool = False) -> None:
+        future = self.publish(topic, payload, qos, retain)
+        await self.drain()
+        if future is not None:
+            await future
+
+    async def drain(self) -> None:
+        if self._writer is not None:
+            await self._writer.drain()
+
+    async def subscribe(self, *filters: str, qos: int = 0, timeout: float = 10.0) -> list[int]:
+        packet_id = self._next_packet_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[packet_id] = future
+        self._writer.write(wire.subscribe(packet_id, [(f, qos) for f in filters]))
+        try:
+            codes = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._forget(packet_id, future)
+            raise
+        if any(code == 0x80 for code in codes):
+            raise MqttError(f"subscription refused for {filters}: {codes}")
+        return codes
+
+    async def unsubscribe(self, *filters: str, timeout: float = 10.0) -> None:
+        packet_id = self._next_packet_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[packet_id] = future
+        self._writer.write(wire.unsubscribe(packet_id, filters))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._forget(packet_id, future)
+            raise
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    async def _read_loop(self) -> None:
+        reader = self._reader
+        try:
+            while True:
+                ptype, flags, body = await wire.read_packet(reader)
+                if ptype == wire.PUBLISH:
+                    topic, payload, qos, retain, _dup, packet_id = wire.parse_publish(flags, body)
+                    if qos == 1:
+                        self._writer.write(wire.puback(packet_id))
+                    self.received += 1
+                    if self.on_message is not None:
+                        try:
+                            self.on_message(topic, payload, qos, retain)
+                        except Exception:
+                            traceback.print_exc()
+                elif ptype == wire.PUBACK or ptype == wire.UNSUBACK:
+                    self._resolve(wire.parse_packet_id(body), None)
+                elif ptype == wire.SUBACK:
+                    packet_id, codes = wire.parse_suback(body)
+                    self._resolve(packet_id, codes)
+                elif ptype == wire.CONNACK:
+                    if self._connack is not None and not self._connack.done():
+                        self._connack.set_result(body[1])
+                elif ptype == wire.PINGRESP:
+                    pass
+                else:
+                    raise wire.MqttProtocolError(f"unexpected packet {wire.PACKET_NAMES.get(ptype, ptype)}")
+        except (asyncio.IncompleteReadError, ConnectionError) as ex:
+            error = ex
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:  # protocol errors
+            error = ex
+        self._fail_pending(MqttError(f"connection lost: {error!r}"))
+        self.connected = False
+        if not self._closing:
+            if self._connack is not None and not self._connack.done():
+                self._connack.set_exception(MqttError(f"connection lost: {error!r}"))
+            if self.on_disconnect is not None:
+                self.on_disconnect(error)
+
+    def _resolve(self, packet_id: int, result) -> None:
+        future = self._pending.pop(packet_id, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def _forget(self, packet_id: int, future: asyncio.Future) -> None:
+        if self._pending.get(packet_id) is future:
+            del self._pending[packet_id]
+
+    def _expire(self, now: float) -> None:
+        """Free the ids of publishes acknowledged, cancelled or past their deadline, from the oldest on."""
+        unacked = self._unacked
+        while unacked:
+            deadline, packet_id, future = unacked[0]
+            if deadline > now and not future.done():
+                break
+            unacked.popleft()
+            self._forget(packet_id, future)
+            if not future.done():
+                self.ack_timeouts += 1
+                future.set_exception(MqttError(f"no PUBACK within {self.ack_timeout}s"))
+                future.exception()
+
+    def _fail_pending(self, error: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        self._unacked.clear()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+                # fire-and-forget QoS 1 publishes never await their future
+                future.exception()
+
+    async def _ping_loop(self) -> None:
+        interval = max(1.0, self.keepalive * 0.75)
+        while True:
+            await asyncio.sleep(interval)
+            self._writer.write(wire.PINGREQ_PACKET)
+
+    async def _expire_loop(self) -> None:
+        interval = min(1.0, self.ack_timeout / 4)
+        while True:
+            await asyncio.sleep(interval)
+            self._expire(time.monotonic())
+
+    async def _close(self) -> None:
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        self._tasks.clear()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, RuntimeError):
+                pass
+        self._writer = None
+        self._reader = None
+        self.connected = False
+        self._fail_pending(MqttError("client disconnected"))
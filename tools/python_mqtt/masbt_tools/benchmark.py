@@ -0,0 +1,114 @@
+"""Small stdlib benchmark runner with JSON baselines.
+
+``measure`` calibrates the number of calls per repetition to at least
+``min_time`` seconds, runs warmup repetitions and reports per-call times.
+``compare`` flags entries whose fastest repetition got slower than the
+baseline's by more than a relative threshold (the minimum is the estimate
+least disturbed by other load on the machine):
+
+    results = {"ProcessChain": {"parse": measure(lambda: json.loads(raw))}}
+    save_baseline("bench.json", results)
+    ...
+    rows = compare(results, load_baseline("bench.json")["results"], threshold=0.10)
+"""
+from __future__ import annotations
+
+import datetime
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+def measure(fn, repeat: int = 7, warmup: int = 1, min_time: float = 0.02) -> dict:
+    """Per-call statistics (nanoseconds) of ``fn`` over ``repeat`` calibrated repetitions.
+
+    The garbage collector is paused while timing, as ``timeit`` does.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(fn, repeat, warmup, min_time)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _measure(fn, repeat, warmup, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        # aim slightly above min_time instead of doubling blindly
+        number = max(number * 2, int(number * min_time * 1.2 / elapsed) if elapsed > 0 else number * 10)
+    for _ in range(warmup):
+        for _ in range(number):
+            fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e9)
+    median = statistics.median(samples)
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    return {
+        "median_ns": median,
+        "min_ns": min(samples),
+        "mean_ns": statistics.fmean(samples),
+        "stdev_ns": stdev,
+        "rsd": stdev / median if median else 0.0,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save_baseline(path: str, results: dict, extra: dict | None = None) -> None:
+    document = {"meta": {**environment(), **(extra or {})}, "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    if "results" not in document:
+        raise ValueError(f"{path} is not a benchmark baseline")
+    return document
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.10, stat: str = "min_ns") -> list[dict]:
+    """One row per (group, name) present in both; ``status`` is regression/improvement/ok.
+
+    A change counts only beyond ``threshold`` and beyond twice the combined
+    relative standard deviation, so noisy entries are not flagged.
+    """
+    rows = []
+    for group, entries in results.items():
+        for name, current in entries.items():
+            old = baseline.get(group, {}).get(name)
+            if old is None:
+                continue
+            change = current[stat] / old[stat] - 1.0 if old[stat] else 0.0
+            noise = 2.0 * (current.get("rsd", 0.0) + old.get("rsd", 0.0))
+            limit = max(threshold, noise)
+            status = "regression" if change > limit else "improvement" if change < -limit else "ok"
+            rows.append({"group": group, "name": name, "baseline_ns": old[stat],
+                         "current_ns": current[stat], "change": change, "status": status})
+    return rows
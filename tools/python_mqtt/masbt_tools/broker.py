@@ -0,0 +1,475 @@
+"""Embeddable asyncio MQTT 3.1.1 broker (QoS 0/1) with per-topic counters.
+
+Covers what MAS-BT agents and the Python tools use: CONNECT with optional
+username/password, clean and persistent sessions, last will, PUBLISH QoS 0/1,
+retained messages, SUBSCRIBE/UNSUBSCRIBE with ``+``/``#`` wildcards and
+keepalive. QoS 2 is not supported (subscriptions are granted QoS 1, QoS 2
+publishes close the connection).
+
+    broker = MqttBroker(port=1883, groups=["/phuket/+/Inventory"])
+    await broker.start()
+    ...
+    print(format_topic_table(broker.snapshot()))
+    await broker.close()
+
+Every published message is counted under its topic (or under the first
+``groups`` filter it matches) with messages/bytes in, fan-out deliveries
+and bytes out. ``snapshot()`` turns the counters into rates since the
+previous snapshot and lists each client's queue depth: unacknowledged QoS 1
+deliveries plus bytes waiting in the socket buffer.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+import uuid
+from collections import deque
+
+from . import mqtt_wire as wire
+from .topic_index import SYS_PREFIX, TopicIndex
+
+OTHER_TOPICS = "(other topics)"
+
+
+def valid_topic_name(topic: str) -> bool:
+    return bool(topic) and "+" not in topic and "#" not in topic and "\x00" not in topic
+
+
+def valid_topic_filter(topic_filter: str) -> bool:
+    if not topic_filter or "\x00" in topic_filter:
+        return False
+    levels = topic_filter.split("/")
+    for i, level in enumerate(levels):
+        if "#" in level and (level != "#" or i != len(levels) - 1):
+            return False
+        if "+" in level and level != "+":
+            return False
+    return True
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """MQTT filter match, e.g. ``/phuket/+/Inventory`` vs ``/phuket/P102/Inventory``."""
+    if topic.startswith(SYS_PREFIX) and topic_filter[:1] in ("+", "#"):
+        return False
+    f_levels = topic_filter.split("/")
+    t_levels = topic.split("/")
+    for i, level in enumerate(f_levels):
+        if level == "#":
+            return True
+        if i >= len(t_levels) or (level != "+" and level != t_levels[i]):
+            return False
+    return len(f_levels) == len(t_levels)
+
+
+class SubscriptionIndex:
+    """Granted QoS per filter and client on a strict, case-sensitive :class:`TopicIndex`, the matcher of
+    the topic groups as well. ``match`` results are cached per topic until subscriptions change."""
+
+    def __init__(self, cache_size: int = 100_000):
+        self._index = TopicIndex(case_sensitive=True, strict=True, cache_size=0)  # merged results cached here
+        self._granted: dict[tuple[str, str], int] = {}  # (filter, client id) -> granted qos
+        self._cache: dict[str, dict[str, int]] = {}
+        self._cache_size = cache_size
+
+    def add(self, topic_filter: str, client_id: str, qos: int) -> None:
+        key = (topic_filter, client_id)
+        if key not in self._granted:
+            self._index.add(topic_filter, client_id)
+        self._granted[key] = qos
+        self._cache.clear()
+
+    def remove(self, topic_filter: str, client_id: str) -> None:
+        if self._granted.pop((topic_filter, client_id), None) is not None:
+            self._index.remove(topic_filter, client_id)
+            self._cache.clear()
+
+    def match(self, topic: str) -> dict[str, int]:
+        """Client id -> highest granted QoS over all matching filters."""
+        result = self._cache.get(topic)
+        if result is not None:
+            return result
+        result = {}
+        granted = self._granted
+        for m in self._index.match(topic):
+            qos = granted[(m.filter, m.value)]
+            if result.get(m.value, -1) < qos:
+                result[m.value] = qos
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[topic] = result
+        return result
+
+
+class TopicCounters:
+    __slots__ = ("messages_in", "bytes_in", "messages_out", "bytes_out", "retained", "_last")
+
+    def __init__(self):
+        self.messages_in = 0
+        self.bytes_in = 0
+        self.messages_out = 0
+        self.bytes_out = 0
+        self.retained = 0
+        self._last = (0, 0, 0, 0)
+
+
+class Session:
+    __slots__ = ("client_id", "clean", "subscriptions", "writer", "inflight", "queue", "packet_ids",
+                 "will", "connected_at", "messages_out", "bytes_out", "dropped", "address")
+
+    def __init__(self, client_id: str, clean: bool):
+        self.client_id = client_id
+        self.clean = clean
+        self.subscriptions: dict[str, int] = {}
+        self.writer: asyncio.StreamWriter | None = None
+        self.inflight: dict[int, bytes] = {}  # packet id -> encoded PUBLISH (for DUP resend)
+        self.queue: deque = deque()           # QoS 1 messages waiting (client offline or slow)
+        self.packet_ids = itertools.cycle(range(1, 65536))
+        self.will = None
+        self.connected_at = 0.0
+        self.messages_out = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.address = ""
+
+    def next_packet_id(self) -> int:
+        pid = next(self.packet_ids)
+        while pid in self.inflight:
+            pid = next(self.packet_ids)
+        return pid
+
+    def buffered(self) -> int:
+        writer = self.writer
+        if writer is None or writer.transport is None or writer.transport.is_closing():
+            return 0
+        return writer.transport.get_write_buffer_size()
+
+
+class MqttBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1883, username: str | None = None,
+                 password: str | None = None, groups=(), max_buffer: int = 8 * 1024 * 1024,
+                 max_inflight: int = 1000, max_queued: int = 10_000, max_topics: int = 10_000):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.groups = list(groups)
+        self._group_index = TopicIndex(case_sensitive=True, strict=True)
+        for group in self.groups:
+            self._group_index.add(group)
+        self.max_buffer = max_buffer
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.max_topics = max_topics
+        self.sessions: dict[str, Session] = {}
+        self.retained: dict[str, tuple[bytes, int]] = {}
+        self.subscriptions = SubscriptionIndex()
+        self.topics: dict[str, TopicCounters] = {}
+        self._topic_keys: dict[str, str] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: set[asyncio.Task] = set()
+        self._snapshot_at = time.perf_counter()
+        self.started_at = time.time()
+        self.connections = 0
+
+    # --- lifecycle -----------------------------------------------------------
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._clients):
+            task.cancel()
+        if self._clients:
+            await asyncio.gather(*self._clients, return_exceptions=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --- connection handling -------------------------------------------------
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)
+        session = None
+        graceful = False
+        try:
+            session, keepalive = await self._connect(reader, writer)
+            if session is None:
+                return
+            graceful = await self._client_loop(session, reader, keepalive)
+        except (asyncio.IncompleteReadError, ConnectionError, wire.MqttProtocolError, asyncio.TimeoutError,
+                UnicodeDecodeError, IndexError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            graceful = True
+        finally:
+            self._clients.discard(task)
+            if session is not None and session.writer is writer:
+                self._disconnected(session, graceful)
+            writer.close()
+
+    async def _connect(self, reader, writer) -> tuple[Session | None, int]:
+        ptype, _flags, body = await asyncio.wait_for(wire.read_packet(reader), 10.0)
+        if ptype != wire.CONNECT:
+            raise wire.MqttProtocolError("first packet must be CONNECT")
+        info = wire.parse_connect(body)
+        if info["level"] not in (3, 4):
+            writer.write(wire.connack(False, 1))  # unacceptable protocol version
+            return None, 0
+        if self.username is not None and (info["username"] != self.username
+                                          or (info["password"] or b"").decode("utf-8", "replace") != (self.password or "")):
+            writer.write(wire.connack(False, 4))  # bad user name or password
+            return None, 0
+        client_id = info["client_id"]
+        if not client_id:
+            if not info["clean_session"]:
+                writer.write(wire.connack(False, 2))  # identifier rejected
+                return None, 0
+            client_id = f"auto-{uuid.uuid4().hex[:12]}"
+
+        old = self.sessions.get(client_id)
+        if old is not None and old.writer is not None:
+            old.will = None  # session takeover is not an ungraceful disconnect
+            old.writer.close()
+            old.writer = None
+        if old is not None and (info["clean_session"] or old.clean):
+            self._drop_session(old)
+            old = None
+        session_present = old is not None
+        session = old or Session(client_id, info["clean_session"])
+        self.sessions[client_id] = session
+        session.writer = writer
+        session.will = info["will"]
+        session.connected_at = time.time()
+        session.address = "%s:%s" % (writer.get_extra_info("peername") or ("?", "?"))[:2]
+        session.clean = info["clean_session"]
+        self.connections += 1
+        writer.write(wire.connack(session_present, 0))
+        if session_present:
+            for data in session.inflight.values():  # resend unacknowledged deliveries with DUP
+                writer.write(bytes((data[0] | 0x08,)) + data[1:])
+            self._flush(session)
+        return session, info["keepalive"]
+
+    async def _client_loop(self, session: Session, reader, keepalive: int) -> bool:
+        writer = session.writer
+        timeout = keepalive * 1.5 if keepalive else None
+        while True:
+            if timeout:
+                ptype, flags, body = await asyncio.wait_for(wire.read_packet(reader), timeout)
+            else:
+                ptype, flags, body = await wire.read_packet(reader)
+            if ptype == wire.PUBLISH:
+                topic, payload, qos, retain, _dup, packet_id = wire.parse_publish(flags, body)
+                if qos > 1:
+                    raise wire.MqttProtocolError("QoS 2 is not supported")
+                if not valid_topic_name(topic):
+                    raise wire.MqttProtocolError(f"invalid topic name {topic!r}")
+                if qos == 1:
+                    writer.write(wire.puback(packet_id))
+                self.publish(topic, bytes(payload), qos, retain)
+            elif ptype == wire.PUBACK:
+                session.inflight.pop(wire.parse_packet_id(body), None)
+                if session.queue:
+                    self._flush(session)
+            elif ptype == wire.SUBSCRIBE:
+                packet_id, filters = wire.parse_subscribe(body)
+                codes = []
+                granted = []
+                for topic_filter, qos in filters:
+                    if not valid_topic_filter(topic_filter):
+                        codes.append(0x80)
+                        continue
+                    qos = min(qos, 1)
+                    session.subscriptions[topic_filter] = qos
+                    self.subscriptions.add(topic_filter, session.client_id, qos)
+                    codes.append(qos)
+                    granted.append((topic_filter, qos))
+                writer.write(wire.suback(packet_id, codes))
+                for topic_filter, qos in granted:
+                    matcher = TopicIndex(case_sensitive=True, strict=True, cache_size=0)
+                    matcher.add(topic_filter)
+                    for topic, (payload, retained_qos) in list(self.retained.items()):
+                        if topic in matcher:
+                            self._deliver(session, topic, payload, min(qos, retained_qos), True)
+            elif ptype == wire.UNSUBSCRIBE:
+                packet_id, filters = wire.parse_unsubscribe(body)
+                for topic_filter in filters:
+                    if session.subscriptions.pop(topic_filter, None) is not None:
+                        self.subscriptions.remove(topic_filter, session.client_id)
+                writer.write(wire.unsuback(packet_id))
+            elif ptype == wire.PINGREQ:
+                writer.write(wire.PINGRESP_PACKET)
+            elif ptype == wire.DISCONNECT:
+                return True
+            else:
+                raise wire.MqttProtocolError(f"unexpected packet {wire.PACKET_NAMES.get(ptype, ptype)}")
+            if session.buffered() > self.max_buffer:
+                await writer.drain()  # back-pressure a fast publisher only when its own socket is full
+
+    def _disconnected(self, session: Session, graceful: bool) -> None:
+        session.writer = None
+        will, session.will = session.will, None
+        if will is not None and not graceful:
+            topic, payload, qos, retain = will
+            self.publish(topic, payload, min(qos, 1), retain)
+        if session.clean:
+            self._drop_session(session)
+
+    def _drop_session(self, session: Session) -> None:
+        for topic_filter in session.subscriptions:
+            self.subscriptions.remove(topic_filter, session.client_id)
+        session.subscriptions.clear()
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+
+    # --- routing -------------------------------------------------------------
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False) -> int:
+        """Route a message to all matching subscribers; returns the number of deliveries."""
+        counters = self._counters(topic)
+        counters.messages_in += 1
+        counters.bytes_in += len(payload)
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+            counters.retained = 1 if payload else 0
+        deliveries = 0
+        sessions = self.sessions
+        for client_id, granted in self.subscriptions.match(topic).items():
+            session = sessions.get(client_id)
+            if session is not None and self._deliver(session, topic, payload, min(qos, granted), False):
+                deliveries += 1
+                counters.messages_out += 1
+                counters.bytes_out += len(payload)
+        return deliveries
+
+    def _deliver(self, session: Session, topic: str, payload: bytes, qos: int, retain: bool) -> bool:
+        """Write a PUBLISH to the client, or queue QoS 1 messages it cannot take right now."""
+        if session.queue:
+            self._flush(session)
+        writer = session.writer
+        if (writer is None or session.queue or session.buffered() > self.max_buffer
+                or (qos and len(session.inflight) >= self.max_inflight)):
+            # offline (persistent session) or slow consumer: queue QoS 1, drop QoS 0
+            if qos and (writer is not None or not session.clean) and len(session.queue) < self.max_queued:
+                session.queue.append((topic, payload, qos, retain))
+                return True
+            session.dropped += 1
+            return False
+        return self._write(session, topic, payload, qos, retain)
+
+    def _flush(self, session: Session) -> None:
+        """Move queued messages to the connection while the client has room."""
+        queue = session.queue
+        while (queue and session.writer is not None and len(session.inflight) < self.max_inflight
+               and session.buffered() <= self.max_buffer):
+            self._write(session, *queue.popleft())
+
+    def _write(self, session: Session, topic: str, payload: bytes, qos: int, retain: bool) -> bool:
+        writer = session.writer
+        packet_id = session.next_packet_id() if qos else None
+        data = wire.publish(topic, payload, qos, retain, packet_id)
+        if qos:
+            session.inflight[packet_id] = data
+        writer.write(data)
+        session.messages_out += 1
+        session.bytes_out += len(payload)
+        return True
+
+    def _counters(self, topic: str) -> TopicCounters:
+        key = self._topic_keys.get(topic)
+        if key is None:
+            group = self._group_index.first(topic)
+            key = group.filter if group is not None else topic
+            if key == topic and len(self.topics) >= self.max_topics and topic not in self.topics:
+                key = OTHER_TOPICS
+            if len(self._topic_keys) < self.max_topics * 4:
+                self._topic_keys[topic] = key
+        counters = self.topics.get(key)
+        if counters is None:
+            counters = self.topics[key] = TopicCounters()
+        return counters
+
+    # --- statistics ----------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """Counters plus rates since the previous snapshot, and per-client queue depths."""
+        now = time.perf_counter()
+        elapsed = max(1e-9, now - self._snapshot_at)
+        self._snapshot_at = now
+        topics = {}
+        for key, c in self.topics.items():
+            last = c._last
+            current = (c.messages_in, c.bytes_in, c.messages_out, c.bytes_out)
+            c._last = current
+            topics[key] = {
+                "messages_in": c.messages_in,
+                "bytes_in": c.bytes_in,
+                "messages_out": c.messages_out,
+                "bytes_out": c.bytes_out,
+                "retained": c.retained,
+                "in_rate": (current[0] - last[0]) / elapsed,
+                "in_bytes_rate": (current[1] - last[1]) / elapsed,
+                "out_rate": (current[2] - last[2]) / elapsed,
+                "out_bytes_rate": (current[3] - last[3]) / elapsed,
+            }
+        clients = {}
+        for client_id, s in self.sessions.items():
+            clients[client_id] = {
+                "connected": s.writer is not None,
+                "address": s.address,
+                "subscriptions": len(s.subscriptions),
+                "inflight": len(s.inflight),
+                "queued": len(s.queue),
+                "buffered_bytes": s.buffered(),
+                "messages_out": s.messages_out,
+                "dropped": s.dropped,
+            }
+        return {
+            "uptime": time.time() - self.started_at,
+            "connections": self.connections,
+            "clients": clients,
+            "retained": len(self.retained),
+            "topics": topics,
+        }
+
+
+def format_topic_table(snapshot: dict, top: int = 15, sort_by: str = "in_rate") -> str:
+    """Busiest topics and the deepest client queues of a ``snapshot()`` as text."""
+    rows = sorted(snapshot["topics"].items(), key=lambda kv: kv[1][sort_by], reverse=True)[:top]
+    width = max([len("topic")] + [len(k) for k, _ in rows])
+    width = min(width, 70)
+    header = f"{'topic':<{width}} {'in/s':>9} {'out/s':>9} {'kB/s in':>9} {'kB/s out':>9} {'msgs in':>10}"
+    lines = [header, "-" * len(header)]
+    for key, t in rows:
+        lines.append(f"{key[-width:]:<{width}} {t['in_rate']:>9.1f} {t['out_rate']:>9.1f} "
+                     f"{t['in_bytes_rate'] / 1024:>9.1f} {t['out_bytes_rate'] / 1024:>9.1f} {t['messages_in']:>10}")
+    queues = sorted(snapshot["clients"].items(),
+                    key=lambda kv: (kv[1]["inflight"] + kv[1]["queued"], kv[1]["buffered_bytes"]),
+                    reverse=True)[:5]
+    queues = [(cid, c) for cid, c in queues if c["inflight"] or c["queued"] or c["buffered_bytes"] or c["dropped"]]
+    if queues:
+        lines.append("")
+        lines.append(f"{'client':<40} {'inflight':>9} {'queued':>8} {'buffered':>10} {'dropped':>8}")
+        for cid, c in queues:
+            lines.append(f"{cid[:40]:<40} {c['inflight']:>9} {c['queued']:>8} "
+                         f"{c['buffered_bytes']:>10} {c['dropped']:>8}")
+    return "\n".join(lines)
@@ -0,0 +1,356 @@
+"""Compact, lossless binary encoding of I4.0 messages for Python-to-Python hops.
+
+AAS interaction elements repeat the same keys (``idShort``, ``modelType``,
+``semanticId``/``keys``/``GlobalReference`` ...) and the same semanticId URLs
+over and over. The codec replaces every string it has seen before with a
+table reference. The table starts with a shared :class:`Dictionary` and
+grows with each new string of the message. Everything else is a one-byte
+tag with varint lengths:
+
+    0xA7  u32 dictionary id            header (0xA7 never starts UTF-8 JSON)
+    0x80|i                             string table entry i < 128
+    0x06 varint                        string table entry 128 + n
+    0x40|n  <n utf-8 bytes>            new string, n < 64 bytes (interned)
+    0x05 varint <bytes>                new string, any length (interned)
+    0x20|n / 0x08 varint               object with n members (key, value ...)
+    0x30|n / 0x07 varint               array with n items
+    0x00 / 0x01 / 0x02                 null / false / true
+    0x03 zigzag-varint / 0x04 f64      int / float
+
+Decoding gives back the same Python object: key order and int vs. float are
+kept. ``canonical_json`` of the decoded object is byte-identical to that of
+the original. The agents themselves speak JSON, so producers opt in per hop.
+``decode_payload`` (also used by ``frame_scan``, ``replay`` and the traffic
+archive) accepts both forms.
+
+    codec = BinaryCodec()                   # DEFAULT_DICTIONARY
+    wire = codec.encode(message)            # or codec.encode_json(payload_bytes)
+    message = decode_payload(wire)          # JSON or binary
+"""
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from collections import Counter
+
+MAGIC = 0xA7
+_HEADER = struct.Struct("<BI")
+_DOUBLE = struct.Struct("<d")
+
+_NULL, _FALSE, _TRUE, _INT, _FLOAT, _STR, _REF, _ARRAY, _OBJECT = range(9)
+_SMALL_OBJECT, _SMALL_ARRAY, _SMALL_STR, _SMALL_REF = 0x20, 0x30, 0x40, 0x80
+
+# Frequent strings of the I4.0 frame, the AAS metamodel and the MAS-BT message
+# shapes, most frequent first (the first 128 table entries cost one byte).
+# Append only: the dictionary id changes with the content.
+DEFAULT_STRINGS = (
+    "value", "type", "modelType", "idShort", "keys", "ExternalReference", "Property", "valueType",
+    "semanticId", "kind", "Instance", "GlobalReference", "SubmodelElementCollection", "xs:string",
+    "string", "language", "text", "en", "referredSemanticId", "Submodel", "description", "id", "double", "",
+    "category", "de", "PARAMETER", "name", "identification", "role", "displayName", "Capability",
+    "frame", "sender", "receiver", "conversationId", "interactionElements", "timestamp", "ReferenceElement",
+    "submodelElements", "ModelReference", "SubmodelElementList", "MultiLanguageProperty",
+    "supplementalSemanticIds", "administration", "valueId", "xs:double", "xs:integer", "xs:float",
+    "xs:boolean", "xs:dateTime", "true", "false", "Broadcast", "Namespace",
+    "request", "inform", "callForProposal", "proposal", "refuseProposal", "registerMessage",
+    "proposal/OfferedCapability", "refuseProposal/OfferedCapability", "consent", "failure",
+    "PlanningAgent", "ExecutionAgent", "PlanningHolon", "DispatchingAgent", "ModuleHolon",
+    "Action001", "ActionTitle", "ActionState", "ActionResponse", "Status", "MachineName", "InputParameters",
+    "FinalResultData", "Preconditions", "Effects", "SkillReference", "ProductId", "ProductIdentifier",
+    "RetrieveByProductID", "Actions", "Station", "planned", "open", "done", "executing", "error",
+    "OfferedCapability", "OfferedCapabilitySequence", "OfferId", "RequirementId", "MatchingScore", "Cost",
+    "EarliestSchedulingInformation", "Scheduling", "StartDateTime", "EndDateTime", "SetupTime", "CycleTime",
+    "InstanceIdentifier", "Capabilities", "SubAgents", "AgentId", "RegisterMessage", "Reason",
+    "Condition_001", "ConditionType", "ConditionValue", "SlotValue", "SlotContentType", "InStorage",
+    "PropertySet", "CapabilitySet", "orderRelevant", "StepTitle", "FinalState", "ProductionPlan",
+    "https://admin-shell.io/idta/CapabilityDescription/PropertyContainer/1/0",
+    "https://admin-shell.io/idta/CapabilityDescription/CapabilityContainer/1/0",
+    "https://admin-shell.io/idta/CapabilityDescription/PropertySet/1/0",
+    "https://admin-shell.io/idta/CapabilityDescription/CapabilitySet/1/0",
+    "https://wiki.eclipse.org/BaSyx_/_Documentation_/_Submodels_/_Capability#Capability",
+    "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action",
+    "https://smartfactory.de/semantics/submodel-element/Step/Scheduling",
+    "https://smartfactory.de/semantics/submodel-element/Scheduling/StartDateTime",
+    "https://smartfactory.de/semantics/submodel-element/Scheduling/EndTime",
+    "https://smartfactory.de/semantics/submodel-element/Scheduling/SetupTime",
+    "https://smartfactory.de/semantics/submodel-element/Scheduling/CycleTime",
+)
+
+
+def canonical_json(message) -> bytes:
+    """Compact UTF-8 JSON, the form both encodings round-trip to."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class Dictionary:
+    """Shared string table; both ends need the same one (matched by ``id``)."""
+
+    def __init__(self, strings):
+        self.strings = tuple(dict.fromkeys(strings))  # unique, order kept
+        self.id = zlib.crc32(json.dumps(self.strings, ensure_ascii=False).encode("utf-8"))
+        self.index = {s: i for i, s in enumerate(self.strings)}
+
+    def __len__(self):
+        return len(self.strings)
+
+    @classmethod
+    def build(cls, messages, size: int = 256, base=DEFAULT_STRINGS, min_count: int = 2) -> "Dictionary":
+        """``base`` plus the most frequent other strings (keys and values) of ``messages``."""
+        counts = Counter()
+        for message in messages:
+            stack = [message]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict):
+                    counts.update(node.keys())
+                    stack.extend(node.values())
+                elif isinstance(node, list):
+                    stack.extend(node)
+                elif isinstance(node, str):
+                    counts[node] += 1
+        known = set(base)
+        # frequent and long strings save the most
+        extra = [s for s, n in counts.items() if n >= min_count and s not in known]
+        extra.sort(key=lambda s: counts[s] * len(s.encode("utf-8")), reverse=True)
+        return cls(list(base) + extra[:max(0, size - len(known))])
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"id": self.id, "strings": list(self.strings)}, f, ensure_ascii=False, indent=0)
+
+    @classmethod
+    def load(cls, path: str) -> "Dictionary":
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        dictionary = cls(document["strings"])
+        if "id" in document and document["id"] != dictionary.id:
+            raise ValueError(f"{path}: dictionary id does not match its strings")
+        return dictionary
+
+
+DEFAULT_DICTIONARY = Dictionary(DEFAULT_STRINGS)
+_DICTIONARIES = {DEFAULT_DICTIONARY.id: DEFAULT_DICTIONARY}
+
+
+def register_dictionary(dictionary: Dictionary) -> Dictionary:
+    """Make ``dictionary`` known to ``decode_payload`` and codecs created without one."""
+    _DICTIONARIES[dictionary.id] = dictionary
+    return dictionary
+
+
+def is_encoded(payload) -> bool:
+    return len(payload) >= _HEADER.size and payload[0] == MAGIC
+
+
+def _varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class BinaryCodec:
+    """Encoder/decoder bound to one dictionary (decoding accepts any registered one)."""
+
+    def __init__(self, dictionary: Dictionary | None = None):
+        self.dictionary = register_dictionary(dictionary) if dictionary is not None else DEFAULT_DICTIONARY
+        self._header = _HEADER.pack(MAGIC, self.dictionary.id)
+
+    # --- encoding -------------------------------------------------------------
+
+    def encode(self, message) -> bytes:
+        out = bytearray(self._header)
+        table = dict(self.dictionary.index)
+        _encode(message, out, table)
+        return bytes(out)
+
+    def encode_json(self, payload) -> bytes:
+        """Binary form of a JSON payload; raises ``ValueError`` if it is not JSON."""
+        return self.encode(json.loads(payload))
+
+    # --- decoding -------------------------------------------------------------
+
+    @staticmethod
+    def decode(data):
+        """Message of a binary payload; ``ValueError`` for corrupt data or an unknown dictionary."""
+        if not is_encoded(data):
+            raise ValueError("not a binary-encoded message")
+        dictionary_id = _HEADER.unpack_from(data, 0)[1]
+        dictionary = _DICTIONARIES.get(dictionary_id)
+        if dictionary is None:
+            raise ValueError(f"unknown codec dictionary {dictionary_id:#010x}")
+        table = list(dictionary.strings)
+        try:
+            value, pos = _decode(bytes(data), _HEADER.size, table)
+        except (IndexError, UnicodeDecodeError, struct.error) as e:
+            raise ValueError(f"corrupt binary message: {e}") from None
+        if pos != len(data):
+            raise ValueError("corrupt binary message: trailing bytes")
+        return value
+
+    def decode_json(self, data) -> bytes:
+        """Canonical JSON of a binary payload."""
+        return canonical_json(self.decode(data))
+
+
+def _encode(value, out, table):
+    t = type(value)
+    if t is str:
+        i = table.get(value)
+        if i is None:
+            table[value] = len(table)
+            raw = value.encode("utf-8")
+            n = len(raw)
+            if n < 64:
+                out.append(_SMALL_STR | n)
+            else:
+                out.append(_STR)
+                _varint(out, n)
+            out += raw
+        elif i < 128:
+            out.append(_SMALL_REF | i)
+        else:
+            out.append(_REF)
+            _varint(out, i - 128)
+    elif t is dict:
+        n = len(value)
+        if n < 16:
+            out.append(_SMALL_OBJECT | n)
+        else:
+            out.append(_OBJECT)
+            _varint(out, n)
+        get = table.get
+        for key, item in value.items():
+            i = get(key)
+            if i is not None and i < 128:  # the common case, inlined
+                out.append(_SMALL_REF | i)
+            elif type(key) is str:
+                _encode(key, out, table)
+            else:
+                raise TypeError(f"object keys must be str, not {type(key).__name__}")
+            if type(item) is str:
+                i = get(item)
+                if i is not None and i < 128:
+                    out.append(_SMALL_REF | i)
+                    continue
+            _encode(item, out, table)
+    elif t is list or t is tuple:
+        n = len(value)
+        if n < 16:
+            out.append(_SMALL_ARRAY | n)
+        else:
+            out.append(_ARRAY)
+            _varint(out, n)
+        for item in value:
+            _encode(item, out, table)
+    elif value is None:
+        out.append(_NULL)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif t is int:
+        out.append(_INT)
+        _varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+    elif t is float:
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, (str, int, float, dict, list)):  # subclasses (IntEnum, OrderedDict ...)
+        base = next(b for b in (bool, str, int, float, dict, list) if isinstance(value, b))
+        _encode(base(value) if base is not dict else dict(value), out, table)
+    else:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _decode(data, pos, table):
+    tag = data[pos]
+    pos += 1
+    if tag >= _SMALL_REF:
+        return table[tag & 0x7F], pos
+    if tag >= _SMALL_STR:
+        end = pos + (tag & 0x3F)
+        if end > len(data):
+            raise IndexError("string past end of data")
+        value = data[pos:end].decode("utf-8")
+        table.append(value)
+        return value, end
+    if tag >= _SMALL_OBJECT:
+        if tag >= _SMALL_ARRAY:
+            return _decode_array(data, pos, table, tag & 0x0F)
+        return _decode_object(data, pos, table, tag & 0x0F)
+    if tag == _REF:
+        n, pos = _read_varint(data, pos)
+        return table[128 + n], pos
+    if tag == _STR:
+        n, pos = _read_varint(data, pos)
+        if pos + n > len(data):
+            raise IndexError("string past end of data")
+        value = data[pos:pos + n].decode("utf-8")
+        table.append(value)
+        return value, pos + n
+    if tag == _OBJECT:
+        n, pos = _read_varint(data, pos)
+        return _decode_object(data, pos, table, n)
+    if tag == _ARRAY:
+        n, pos = _read_varint(data, pos)
+        return _decode_array(data, pos, table, n)
+    if tag == _NULL:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        n, pos = _read_varint(data, pos)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+    raise ValueError(f"unknown tag {tag:#04x}")
+
+
+def _decode_object(data, pos, table, n):
+    value = {}
+    for _ in range(n):
+        tag = data[pos]
+        if tag >= _SMALL_REF:  # the common case, inlined
+            key = table[tag & 0x7F]
+            pos += 1
+        else:
+            key, pos = _decode(data, pos, table)
+            if type(key) is not str:
+                raise ValueError("object key is not a string")
+        tag = data[pos]
+        if tag >= _SMALL_REF:
+            value[key] = table[tag & 0x7F]
+            pos += 1
+        else:
+            value[key], pos = _decode(data, pos, table)
+    return value, pos
+
+
+def _decode_array(data, pos, table, n):
+    value = []
+    append = value.append
+    for _ in range(n):
+        item, pos = _decode(data, pos, table)
+        append(item)
+    return value, pos
+
+
+def decode_payload(payload):
+    """Parsed payload of either encoding; ``ValueError`` if it is neither."""
+    if is_encoded(payload):
+        return BinaryCodec.decode(payload)
+    return json.loads(payload)
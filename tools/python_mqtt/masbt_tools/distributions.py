@@ -0,0 +1,84 @@
+"""Parse small distribution specs used on the command line and in simulator configs.
+
+A spec is ``kind:arg1,arg2`` (seconds for durations):
+
+    const:0.05            always 0.05
+    uniform:0.01,0.2      uniform in [0.01, 0.2]
+    exp:0.1               exponential with mean 0.1
+    normal:1.0,0.2        normal(mean, std), clipped at 0
+    lognormal:-2.3,0.5    lognormal(mu, sigma) of the underlying normal
+    triangular:1,2,5      triangular(low, mode, high)
+    choice:1,2,5          one of the listed values
+
+A bare number is shorthand for ``const``.
+"""
+from __future__ import annotations
+
+import math
+import random
+
+
+class Distribution:
+    __slots__ = ("spec", "kind", "args")
+
+    def __init__(self, spec):
+        self.spec = str(spec)
+        kind, _, rest = self.spec.partition(":")
+        kind = kind.strip().lower()
+        if not rest:
+            try:
+                value = float(kind)
+            except ValueError:
+                raise ValueError(f"invalid distribution spec '{spec}'") from None
+            kind, args = "const", (value,)
+        else:
+            try:
+                args = tuple(float(a) for a in rest.split(","))
+            except ValueError:
+                raise ValueError(f"invalid distribution arguments in '{spec}'") from None
+        expected = {"const": 1, "uniform": 2, "exp": 1, "normal": 2, "lognormal": 2, "triangular": 3}
+        if kind == "choice":
+            if not args:
+                raise ValueError(f"'{spec}': choice needs at least one value")
+        elif kind not in expected:
+            raise ValueError(f"unknown distribution '{kind}' in '{spec}'")
+        elif len(args) != expected[kind]:
+            raise ValueError(f"'{spec}': {kind} takes {expected[kind]} argument(s)")
+        self.kind = kind
+        self.args = args
+
+    def sample(self, rng: random.Random = random) -> float:
+        kind, a = self.kind, self.args
+        if kind == "const":
+            return a[0]
+        if kind == "uniform":
+            return rng.uniform(a[0], a[1])
+        if kind == "exp":
+            return rng.expovariate(1.0 / a[0]) if a[0] > 0 else 0.0
+        if kind == "normal":
+            return max(0.0, rng.gauss(a[0], a[1]))
+        if kind == "lognormal":
+            return rng.lognormvariate(a[0], a[1])
+        if kind == "triangular":
+            return rng.triangular(a[0], a[2], a[1])
+        return rng.choice(a)
+
+    @property
+    def mean(self) -> float:
+        kind, a = self.kind, self.args
+        if kind in ("const", "exp", "normal"):
+            return a[0]
+        if kind == "uniform":
+            return (a[0] + a[1]) / 2
+        if kind == "lognormal":
+            return math.exp(a[0] + a[1] ** 2 / 2)
+        if kind == "triangular":
+            return sum(a) / 3
+        return sum(a) / len(a)
+
+    def __repr__(self):
+        return f"Distribution({self.spec!r})"
+
+
+def parse_distribution(spec) -> Distribution:
+    return spec if isinstance(spec, Distribution) else Distribution(spec)
@@ -0,0 +1,324 @@
+"""Persistent embedding cache for the similarity tooling.
+
+Embedding a capability name through Ollama costs an HTTP round trip, while
+the set of names we embed ("Assemble", "Screw", "Drill", ...) barely
+changes. The cache keeps every vector ever fetched on disk:
+
+    <dir>/<key>.f32     append-only float32 matrix, one row per text
+    <dir>/<key>.idx     append-only JSON lines: a header with the dimension,
+                        then {"t": <normalized text>, "r": <row>}
+    <dir>/digests.json  model digest last seen per endpoint and model
+
+``<key>`` is :meth:`EmbeddingCache.model_key`: the model name plus the digest
+``/api/tags`` reports for it. A fake_ollama.py serving the same model name,
+or a model re-pulled under its old name, gets its own vectors.
+
+The matrix is memory-mapped for reads, an LRU dict in front of it serves
+repeated lookups without touching the map. Rows are written before their
+index line, so a reader never sees a key whose vector is incomplete; other
+processes' appends are picked up on the next miss. Writers serialize on an
+advisory lock of the index file (POSIX only; elsewhere a single writer is
+assumed). One cache object may be shared by threads: lookups and appends
+hold a lock, ``compute`` in :meth:`EmbeddingCache.get_or_compute` runs
+outside it.
+
+    cache = EmbeddingCache()
+    model = cache.model_key("nomic-embed-text", "http://localhost:11434")
+    vector = cache.get_or_compute(model, "Screw", fetch)
+    print(cache.stats())
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+import urllib.request
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "masbt", "embeddings")
+
+_ITEM_SIZE = 4  # float32
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a text: NFC, surrounding whitespace stripped, inner runs collapsed."""
+    return unicodedata.normalize("NFC", " ".join(str(text).split()))
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("MASBT_EMBEDDING_CACHE") or DEFAULT_CACHE_DIR
+
+
+def _served_digest(endpoint: str, model: str, timeout: float) -> str | None:
+    """Digest of ``model`` in the ``/api/tags`` list of ``endpoint`` (``None`` if unreachable or not listed)."""
+    try:
+        with urllib.request.urlopen(f"{endpoint}/api/tags", timeout=timeout) as response:
+            models = json.loads(response.read()).get("models") or ()
+    except (OSError, ValueError, AttributeError):
+        return None
+    names = {model} if ":" in model else {model, f"{model}:latest"}
+    for entry in models:
+        if isinstance(entry, dict) and (entry.get("name") in names or entry.get("model") in names):
+            digest = entry.get("digest")
+            return str(digest).removeprefix("sha256:") if digest else None
+    return None
+
+
+class _ModelStore:
+    """Vector file + index of one model (not thread-safe, EmbeddingCache holds its lock around every call)."""
+
+    __slots__ = ("model", "idx_path", "vec_path", "dim", "rows", "_idx_offset", "_map", "_map_size")
+
+    def __init__(self, directory: str, model: str):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model) or "model"
+        self.model = model
+        self.idx_path = os.path.join(directory, f"{slug}.idx")
+        self.vec_path = os.path.join(directory, f"{slug}.f32")
+        self.dim = None
+        self.rows: dict[str, int] = {}
+        self._idx_offset = 0
+        self._map = None
+        self._map_size = 0
+
+    def refresh(self) -> None:
+        """Read index lines appended since the last refresh (by us or other processes)."""
+        try:
+            with open(self.idx_path, "rb") as f:
+                f.seek(self._idx_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1  # ignore a line that is still being written
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "dim" in entry:
+                if entry.get("model") not in (None, self.model):
+                    raise ValueError(f"{self.idx_path} belongs to model '{entry.get('model')}'")
+                self.dim = int(entry["dim"])
+            else:
+                self.rows[entry["t"]] = int(entry["r"])
+        self._idx_offset += end
+
+    def read(self, row: int) -> list[float] | None:
+        row_size = self.dim * _ITEM_SIZE
+        end = (row + 1) * row_size
+        if end > self._map_size:
+            self._remap()
+            if end > self._map_size:
+                return None
+        return list(struct.unpack_from(f"<{self.dim}f", self._map, row * row_size))  # files are little-endian
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._map_size = 0
+        try:
+            with open(self.vec_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._map_size = size
+        except FileNotFoundError:
+            pass
+
+    def append(self, key: str, vector) -> int:
+        with open(self.idx_path, "ab") as idx:
+            if fcntl is not None:
+                fcntl.flock(idx.fileno(), fcntl.LOCK_EX)
+            try:
+                self.refresh()  # another writer may have added the key or the header meanwhile
+                if key in self.rows:
+                    return self.rows[key]
+                if self.dim is None:
+                    self.dim = len(vector)
+                    idx.write(json.dumps({"model": self.model, "dim": self.dim, "dtype": "float32"}).encode() + b"\n")
+                elif len(vector) != self.dim:
+                    raise ValueError(f"embedding of '{key}' has {len(vector)} dimensions, "
+                                     f"cache for '{self.model}' holds {self.dim}")
+                row_size = self.dim * _ITEM_SIZE
+                with open(self.vec_path, "ab") as vec:
+                    size = vec.seek(0, os.SEEK_END)
+                    if size % row_size:  # torn row from a crashed writer
+                        vec.truncate(size - size % row_size)
+                        size -= size % row_size
+                    vec.write(struct.pack(f"<{self.dim}f", *vector))
+                row = size // row_size
+                # vector first, index line second: readers only see complete rows
+                line = json.dumps({"t": key, "r": row}, ensure_ascii=False).encode("utf-8") + b"\n"
+                idx.write(line)
+                idx.flush()
+                self._idx_offset = idx.tell()
+                self.rows[key] = row
+                return row
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(idx.fileno(), fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._map_size = 0
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by (model key, normalized text) with an LRU front."""
+
+    def __init__(self, directory: str | None = None, capacity: int = 4096):
+        self.directory = directory or default_cache_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.capacity = capacity
+        self._lru: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._stores: dict[str, _ModelStore] = {}
+        self._model_keys: dict[tuple[str, str], str] = {}
+        self._lock = threading.RLock()  # the LRU, the stores and their maps are shared by the caller's threads
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def model_key(self, model: str, endpoint: str, timeout: float = 2.0) -> str:
+        """Cache key of ``model`` as served by the Ollama at ``endpoint``: ``<model>@<digest>``.
+
+        The digest comes from ``/api/tags``. If the server is unreachable, the digest last seen there is
+        used, and ``<model>@<host:port>`` if there is none.
+        """
+        endpoint = endpoint.strip().rstrip("/")
+        with self._lock:
+            key = self._model_keys.get((endpoint, model))
+        if key is not None:
+            return key
+        digest = _served_digest(endpoint, model, timeout)
+        with self._lock:
+            seen_path = os.path.join(self.directory, "digests.json")
+            try:
+                with open(seen_path, "r", encoding="utf-8") as f:
+                    seen = json.load(f)
+            except (OSError, ValueError):
+                seen = {}
+            name = f"{endpoint} {model}"
+            if digest is None:
+                digest = seen.get(name)
+            elif seen.get(name) != digest:
+                seen[name] = digest
+                tmp = f"{seen_path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(seen, f, indent=1, sort_keys=True)
+                os.replace(tmp, seen_path)
+            if digest:
+                key = f"{model}@{digest[:12]}"
+            else:
+                key = f"{model}@{re.sub(r'^[A-Za-z][A-Za-z0-9+.-]*://', '', endpoint)}"
+            self._model_keys[(endpoint, model)] = key
+            return key
+
+    def _store(self, model: str) -> _ModelStore:
+        store = self._stores.get(model)
+        if store is None:
+            store = self._stores[model] = _ModelStore(self.directory, model)
+            store.refresh()
+        return store
+
+    def _remember(self, key, vector) -> None:
+        lru = self._lru
+        lru[key] = vector
+        if len(lru) > self.capacity:
+            lru.popitem(last=False)
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = (model, normalize_text(text))
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key) -> list[float] | None:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+        store = self._store(key[0])
+        row = store.rows.get(key[1])
+        if row is None:
+            store.refresh()
+            row = store.rows.get(key[1])
+        if row is not None:
+            vector = store.read(row)
+            if vector is not None:
+                self.disk_hits += 1
+                self._remember(key, vector)
+                return vector
+        self.misses += 1
+        return None
+
+    def put(self, model: str, text: str, vector) -> None:
+        key = (model, normalize_text(text))
+        vector = [float(v) for v in vector]
+        with self._lock:
+            self._store(model).append(key[1], vector)
+            self._remember(key, vector)
+
+    def get_or_compute(self, model: str, text: str, compute):
+        """Cached vector, or ``compute(text)`` stored for next time (``None`` results are not cached)."""
+        vector = self.get(model, text)
+        if vector is None:
+            vector = compute(text)
+            if vector is not None:
+                self.put(model, text, vector)
+        return vector
+
+    def contains(self, model: str, text: str) -> bool:
+        """Whether a vector is cached, without touching the hit/miss counters."""
+        key = normalize_text(text)
+        with self._lock:
+            if (model, key) in self._lru:
+                return True
+            store = self._store(model)
+            if key not in store.rows:
+                store.refresh()
+            return key in store.rows
+
+    def matrix_file(self, model: str) -> tuple[str, int | None, dict[str, int]]:
+        """``(path, dim, {text: row})`` of the float32 matrix for bulk readers such as the ANN index."""
+        with self._lock:
+            store = self._store(model)
+            store.refresh()
+            return store.vec_path, store.dim, dict(store.rows)
+
+    def count(self, model: str) -> int:
+        """Number of texts cached for ``model``."""
+        with self._lock:
+            store = self._store(model)
+            store.refresh()
+            return len(store.rows)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "lru_size": len(self._lru),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
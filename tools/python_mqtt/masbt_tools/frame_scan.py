@@ -0,0 +1,208 @@
+"""Frame fields and selected idShort values straight from the payload bytes.
+
+Monitors and responders on broadcast topics mostly need ``frame.type``,
+``frame.conversationId``, the sender/receiver and perhaps ``ActionState``.
+``json.loads`` builds the whole interactionElements tree for that. The
+scanner instead
+
+* decodes only the ``frame`` object, with ``JSONDecoder.raw_decode``
+  starting at its opening brace (escapes, ``\\u`` sequences etc. are handled
+  by the C decoder),
+* locates ``"idShort": "<name>"`` with a regex and reads the ``value`` key
+  of the same object: directly if only scalar members lie in between (the
+  usual layout), otherwise by stepping over the remaining members, each
+  value skipped by the C decoder. It stops as soon as every requested name
+  is found. The first element of each name counts, at any depth (``value``
+  collections as well as ``submodelElements``).
+
+A quote preceded by an odd number of backslashes is inside a string, and in
+valid JSON an unescaped ``"key"`` followed by ``:`` is always a key. The
+fast path relies on both facts. Anything unusual falls back to a full parse
+with the same result: ``frame`` not being the first key, a ``value`` before
+its ``idShort``, or invalid JSON. Payloads shorter than ``small`` characters
+(default :data:`SMALL_PAYLOAD`) with idShort names are parsed in full as
+well, since ``json.loads`` is as fast there. Binary payloads
+(``masbt_tools.codec``) are decoded.
+
+    scanner = FrameScanner(("ActionState", "ActionTitle"))
+    fields = scanner.scan(payload)      # None for non-I4.0 payloads
+    fields.conversation_id, fields.type, fields.values.get("ActionState")
+"""
+from __future__ import annotations
+
+import json
+import re
+from collections import namedtuple
+
+from .codec import BinaryCodec, is_encoded
+
+FrameFields = namedtuple("FrameFields", "type conversation_id sender sender_role receiver receiver_role values")
+
+_DECODER = json.JSONDecoder()
+_FRAME_FIRST = re.compile(r'\s*\{\s*"frame"\s*:\s*(?=\{)')
+_WS = re.compile(r"\s*")
+_NESTING = re.compile(r"[{}\[\]]")
+# below this many characters json.loads + _find_all beats the idShort scan (see README)
+SMALL_PAYLOAD = 1024
+
+
+def _party(frame, key):
+    party = frame.get(key)
+    if not isinstance(party, dict):
+        return None, None
+    identification = party.get("identification")
+    party_id = identification.get("id") if isinstance(identification, dict) else None
+    role = party.get("role")
+    return party_id or party.get("id"), role.get("name") if isinstance(role, dict) else None
+
+
+def _fields(frame, values) -> FrameFields:
+    sender, sender_role = _party(frame, "sender")
+    receiver, receiver_role = _party(frame, "receiver")
+    return FrameFields(frame.get("type"), frame.get("conversationId"), sender, sender_role,
+                       receiver, receiver_role, values)
+
+
+def _find_all(elements, names) -> dict:
+    """First ``value`` per idShort in document order, at any depth (also ``submodelElements``)."""
+    found = {}
+
+    def walk(node):  # True once every name is found; only containers are descended into
+        if type(node) is dict:
+            name = node.get("idShort")
+            if name in names and name not in found and "value" in node:
+                found[name] = node["value"]
+                if len(found) == len(names):
+                    return True
+            children = node.values()
+        else:
+            children = node
+        for child in children:
+            if (type(child) is dict or type(child) is list) and walk(child):
+                return True
+        return False
+
+    if type(elements) is dict or type(elements) is list:
+        walk(elements)
+    return found
+
+
+def _escaped(text: str, quote: int) -> bool:
+    backslashes = 0
+    i = quote - 1
+    while i >= 0 and text[i] == "\\":
+        backslashes += 1
+        i -= 1
+    return backslashes % 2 == 1
+
+
+class FrameScanner:
+    """Reusable scanner for a fixed set of idShort names."""
+
+    def __init__(self, id_shorts=(), small=SMALL_PAYLOAD):
+        self.id_shorts = tuple(id_shorts)
+        self.small = small
+        self._id_short = None
+        self._names = {json.dumps(name)[1:-1]: name for name in self.id_shorts}  # JSON-escaped -> name
+        if self.id_shorts:
+            alternatives = "|".join(re.escape(escaped) for escaped in self._names)
+            self._id_short = re.compile(r'"idShort"\s*:\s*"(' + alternatives + r')"')
+        self.fallbacks = 0
+
+    def scan(self, payload) -> FrameFields | None:
+        """Frame fields and requested values, or ``None`` if the payload is not an I4.0 message."""
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            if is_encoded(payload):
+                return self._binary(payload)
+            text = payload.decode("utf-8", "replace")
+        else:
+            text = payload
+        if self.id_shorts and len(text) < self.small:
+            return self._full(text, fallback=False)
+        m = _FRAME_FIRST.match(text)
+        if m is None:
+            return self._full(text)
+        try:
+            frame, _end = _DECODER.raw_decode(text, m.end())
+        except ValueError:
+            return self._full(text)
+        values = {}
+        if self._id_short is not None:
+            for match in self._id_short.finditer(text):
+                name = self._names[match.group(1)]
+                if name in values or _escaped(text, match.start()):
+                    continue
+                found, value = self._value_after(text, match.end())
+                if not found:
+                    return self._full(text)
+                values[name] = value
+                if len(values) == len(self.id_shorts):
+                    break
+        return _fields(frame, values)
+
+    @staticmethod
+    def _value_after(text: str, pos: int):
+        """``value`` of the object whose ``idShort`` ends at ``pos``; ``(False, None)`` if it came earlier."""
+        # the usual layout: idShort, scalar members such as modelType/valueType, then value. An unescaped
+        # "value" followed by ':' is a key, and without a bracket in between it belongs to the same object.
+        key = text.find('"value"', pos)
+        if key != -1 and _NESTING.search(text, pos, key) is None and not _escaped(text, key):
+            colon = _WS.match(text, key + 7).end()
+            if text[colon:colon + 1] == ":":
+                start = _WS.match(text, colon + 1).end()
+                if text[start:start + 1] == '"':
+                    end = text.find('"', start + 1)
+                    value = text[start + 1:end]
+                    if end != -1 and "\\" not in value:
+                        return True, value  # plain string, nothing to unescape
+                try:
+                    return True, _DECODER.raw_decode(text, start)[0]
+                except ValueError:
+                    return False, None
+        # otherwise step over the remaining members of the object, each value skipped by the C decoder
+        try:
+            while True:
+                pos = _WS.match(text, pos).end()
+                if text[pos:pos + 1] != ",":
+                    return False, None  # '}': the object ended without a value
+                key, pos = _DECODER.raw_decode(text, _WS.match(text, pos + 1).end())
+                pos = _WS.match(text, pos).end()
+                if not isinstance(key, str) or text[pos:pos + 1] != ":":
+                    return False, None
+                member, pos = _DECODER.raw_decode(text, _WS.match(text, pos + 1).end())
+                if key == "value":
+                    return True, member
+        except ValueError:
+            return False, None
+
+    def _full(self, text: str, fallback=True) -> FrameFields | None:
+        if '"frame"' not in text:
+            return None  # cheap exit for non-I4.0 payloads (Inventory, states, ...)
+        if fallback:
+            self.fallbacks += 1
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return None
+        return self._message(message)
+
+    def _binary(self, payload) -> FrameFields | None:
+        try:
+            message = BinaryCodec.decode(payload)
+        except ValueError:
+            return None
+        return self._message(message)
+
+    def _message(self, message) -> FrameFields | None:
+        if not isinstance(message, dict) or not isinstance(message.get("frame"), dict):
+            return None
+        values = _find_all(message.get("interactionElements"), self.id_shorts) if self.id_shorts else {}
+        return _fields(message["frame"], values)
+
+
+_FRAME_ONLY = FrameScanner()
+
+
+def scan_frame(payload, id_shorts=()) -> FrameFields | None:
+    """One-off scan; keep a :class:`FrameScanner` for repeated use with idShort names."""
+    return (FrameScanner(id_shorts) if id_shorts else _FRAME_ONLY).scan(payload)
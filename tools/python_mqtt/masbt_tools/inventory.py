@@ -0,0 +1,295 @@
+"""In-memory inventory mirror built from ``/{ns}/{module}/Inventory`` messages.
+
+``parse_inventory`` reads the ``StorageUnits`` collection of an
+InventoryMessage (UpdateInventoryFromActionNode sends every storage of a
+module, StorageMqttNotifier only the storage that changed). Storages are
+the child collections of ``StorageUnits``, named by their idShort or a
+``Name`` property. Their slots come from the ``Slots`` child (``Slot_{i}``
+with Index, CarrierID, CarrierType, ProductID, ProductType, IsSlotEmpty,
+flat or below ``Content``). ``InventorySummary`` is skipped: the store
+counts free and occupied slots itself.
+
+:class:`InventoryStore` keeps ``module -> storage -> slots`` and indexes
+ProductID and CarrierID to their slot locations. ``apply`` replaces only the
+storages contained in a message. It touches the indexes only for slots
+whose content changed. Every change bumps a global version, so pollers can
+ask for ``changed_since(version)``.
+
+    store = InventoryStore()
+    store.apply("P102", parse_inventory(message["interactionElements"]))
+    store.locate_product("https://smartfactory.de/shells/abc")
+    store.save("inventory.json")   # InventoryStore.load() on restart
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import time
+from collections import namedtuple
+
+SlotState = namedtuple("SlotState", "index carrier_id carrier_type product_id product_type empty")
+
+_SLOT_FIELDS = {
+    "index": "index",
+    "carrierid": "carrier_id",
+    "carriertype": "carrier_type",
+    "productid": "product_id",
+    "producttype": "product_type",
+    "isslotempty": "empty",
+}
+
+
+def _children(element):
+    value = element.get("value") if isinstance(element, dict) else None
+    if isinstance(value, list):
+        return [e for e in value if isinstance(e, dict)]
+    return []
+
+
+def _bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "1", "yes")
+
+
+def _slot(element, position: int) -> SlotState:
+    fields = {"index": position, "carrier_id": "", "carrier_type": "", "product_id": "", "product_type": "",
+              "empty": None}
+    stack = [element]
+    while stack:
+        for child in _children(stack.pop()):
+            key = _SLOT_FIELDS.get(str(child.get("idShort") or "").lower())
+            if key is not None and not isinstance(child.get("value"), list):
+                fields[key] = child.get("value")
+            elif isinstance(child.get("value"), list):
+                stack.append(child)  # Content collection
+    try:
+        fields["index"] = int(fields["index"])
+    except (TypeError, ValueError):
+        fields["index"] = position
+    for key in ("carrier_id", "carrier_type", "product_id", "product_type"):
+        fields[key] = "" if fields[key] is None else str(fields[key])
+    if fields["empty"] is None:
+        fields["empty"] = not (fields["carrier_id"] or fields["product_id"])
+    else:
+        fields["empty"] = _bool(fields["empty"])
+    return SlotState(**fields)
+
+
+def parse_inventory(elements) -> list[tuple[str, tuple[SlotState, ...]]]:
+    """``[(storage_name, slots), ...]`` from the interactionElements of an inventory message."""
+    units = None
+    stack = [e for e in elements or () if isinstance(e, dict)]
+    while stack:
+        element = stack.pop(0)
+        if str(element.get("idShort") or "").lower() == "storageunits":
+            units = element
+            break
+        stack.extend(_children(element))
+    if units is None:
+        return []
+    storages = []
+    for storage in _children(units):
+        id_short = str(storage.get("idShort") or "")
+        if id_short.lower() == "inventorysummary" or not isinstance(storage.get("value"), list):
+            continue
+        name = id_short
+        slots = []
+        for child in _children(storage):
+            child_id = str(child.get("idShort") or "").lower()
+            if child_id == "name" and child.get("value"):
+                name = str(child["value"])
+            elif child_id == "slots":
+                slots = [_slot(s, i) for i, s in enumerate(_children(child))]
+        storages.append((name, tuple(slots)))
+    return storages
+
+
+class InventoryStore:
+    """Module/storage/slot state with ProductID and CarrierID indexes."""
+
+    def __init__(self):
+        self.modules: dict[str, dict] = {}
+        self.by_product: dict[str, set] = {}
+        self.by_carrier: dict[str, set] = {}
+        self.version = 0
+        self.updates = 0
+        self.slot_changes = 0
+        self._product_keys: list[str] | None = None
+
+    # --- updates -------------------------------------------------------------
+
+    def apply(self, module_id: str, storages, updated: float | None = None) -> int:
+        """Replace the given storages of a module; returns the number of slots that changed."""
+        updated = time.time() if updated is None else updated
+        module = self.modules.get(module_id)
+        if module is None:
+            module = self.modules[module_id] = {"storages": {}, "updated": updated, "version": self.version}
+        self.updates += 1
+        changed = 0
+        added = False
+        for name, slots in storages:
+            old = module["storages"].get(name)
+            if old is None:
+                added = True  # recorded even when it arrives without slots
+                old = ()
+            elif old == tuple(slots):
+                continue
+            old_by_index = {s.index: s for s in old}
+            new_by_index = {s.index: s for s in slots}
+            for index in old_by_index.keys() | new_by_index.keys():
+                before, after = old_by_index.get(index), new_by_index.get(index)
+                if before == after:
+                    continue
+                changed += 1
+                location = (module_id, name, index)
+                if before is not None:
+                    self._unindex(before, location)
+                if after is not None:
+                    self._index(after, location)
+            module["storages"][name] = tuple(slots)
+        module["updated"] = updated
+        if changed or added:
+            self.version += 1
+            module["version"] = self.version
+            self.slot_changes += changed
+        return changed
+
+    def _index(self, slot: SlotState, location) -> None:
+        if slot.product_id:
+            if slot.product_id not in self.by_product:
+                self._product_keys = None
+            self.by_product.setdefault(slot.product_id, set()).add(location)
+        if slot.carrier_id:
+            self.by_carrier.setdefault(slot.carrier_id, set()).add(location)
+
+    def _unindex(self, slot: SlotState, location) -> None:
+        for index, key in ((self.by_product, slot.product_id), (self.by_carrier, slot.carrier_id)):
+            locations = index.get(key)
+            if locations is None:
+                continue
+            locations.discard(location)
+            if not locations:
+                del index[key]
+                if index is self.by_product:
+                    self._product_keys = None
+
+    # --- queries -------------------------------------------------------------
+
+    def _located(self, location) -> dict:
+        module_id, storage, index = location
+        for slot in self.modules[module_id]["storages"].get(storage, ()):
+            if slot.index == index:
+                return {"module": module_id, "storage": storage, **slot._asdict()}
+        return {"module": module_id, "storage": storage, "index": index}
+
+    def locate_product(self, product_id: str) -> list[dict]:
+        return [self._located(loc) for loc in sorted(self.by_product.get(product_id, ()))]
+
+    def locate_carrier(self, carrier_id: str) -> list[dict]:
+        return [self._located(loc) for loc in sorted(self.by_carrier.get(carrier_id, ()))]
+
+    def product_range(self, start: str | None = None, end: str | None = None, prefix: str | None = None,
+                      limit: int | None = None) -> list[dict]:
+        """Products with ``start <= id < end`` and/or ``id.startswith(prefix)``, in id order."""
+        keys = self._product_keys
+        if keys is None:
+            keys = self._product_keys = sorted(self.by_product)
+        if prefix:
+            start = max(start or prefix, prefix)
+        lo = bisect.bisect_left(keys, start) if start else 0
+        result = []
+        for key in keys[lo:]:
+            if end is not None and key >= end:
+                break
+            if prefix and not key.startswith(prefix):
+                break
+            result.append({"product_id": key, "locations": self.locate_product(key)})
+            if limit and len(result) >= limit:
+                break
+        return result
+
+    def slots(self, module_id: str | None = None, storage: str | None = None, empty: bool | None = None,
+              product_type: str | None = None, limit: int | None = None) -> list[dict]:
+        modules = [module_id] if module_id else sorted(self.modules)
+        result = []
+        for m in modules:
+            entry = self.modules.get(m)
+            if entry is None:
+                continue
+            for name in sorted(entry["storages"]):
+                if storage and name != storage:
+                    continue
+                for slot in entry["storages"][name]:
+                    if empty is not None and slot.empty != empty:
+                        continue
+                    if product_type and slot.product_type != product_type:
+                        continue
+                    result.append({"module": m, "storage": name, **slot._asdict()})
+                    if limit and len(result) >= limit:
+                        return result
+        return result
+
+    def module(self, module_id: str) -> dict | None:
+        entry = self.modules.get(module_id)
+        if entry is None:
+            return None
+        return {**self._summary(module_id, entry),
+                "storages": {name: [s._asdict() for s in slots] for name, slots in sorted(entry["storages"].items())}}
+
+    def summary(self) -> list[dict]:
+        return [self._summary(m, self.modules[m]) for m in sorted(self.modules)]
+
+    @staticmethod
+    def _summary(module_id, entry) -> dict:
+        slots = [s for storage in entry["storages"].values() for s in storage]
+        free = sum(1 for s in slots if s.empty)
+        return {"module": module_id, "storages": len(entry["storages"]), "free": free,
+                "occupied": len(slots) - free, "updated": entry["updated"], "version": entry["version"]}
+
+    def changed_since(self, version: int) -> list[dict]:
+        """Modules whose slots changed after ``version`` (pass the ``version`` of the previous answer)."""
+        return [self.module(m) for m in sorted(self.modules) if self.modules[m]["version"] > version]
+
+    def stats(self) -> dict:
+        return {"version": self.version, "modules": len(self.modules), "products": len(self.by_product),
+                "carriers": len(self.by_carrier), "updates": self.updates, "slot_changes": self.slot_changes,
+                "slots": sum(len(s) for m in self.modules.values() for s in m["storages"].values())}
+
+    # --- snapshots -----------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "modules": {m: {"updated": e["updated"], "version": e["version"],
+                            "storages": {name: [list(s) for s in slots] for name, slots in e["storages"].items()}}
+                        for m, e in self.modules.items()},
+        }
+
+    def save(self, path: str) -> None:
+        write_snapshot(self.to_dict(), path)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InventoryStore":
+        store = cls()
+        for module_id, entry in (data.get("modules") or {}).items():
+            storages = [(name, tuple(SlotState(*s) for s in slots)) for name, slots in entry["storages"].items()]
+            store.apply(module_id, storages, entry.get("updated"))
+            store.modules[module_id]["version"] = entry.get("version", 0)
+        store.version = max(int(data.get("version") or 0), store.version)
+        store.updates = store.slot_changes = 0
+        return store
+
+    @classmethod
+    def load(cls, path: str) -> "InventoryStore":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def write_snapshot(data: dict, path: str) -> None:
+    """Write ``InventoryStore.to_dict()`` output atomically (temporary file, then rename)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,378 @@
+"""Block-compressed archive of MqttLogger records with time, agent and level indexes.
+
+MqttLoggerProvider publishes every log record as its own I4.0 message on
+``{agentId}/logs`` (a ``LogMessage`` collection with ``LogLevel`` and
+``Message``). The archive stores only what a query needs: receive time,
+level, agent id, agent role and message text. Records are batched into
+zlib-compressed blocks, written to rotating segment pairs:
+
+    log-<start>-<n>.mlg   b"MLGSEG1\\n", then blocks of
+                          [u32 compressed][u32 raw][u32 records][zlib data]
+    log-<start>-<n>.idx   one JSON line per block, written after the block:
+                          {"block": offset, "n": count, "t0": .., "t1": ..,
+                           "agent": {id: [i, ...]}, "level": {"3": [i, ...]}}
+
+A record inside a block is ``[f64 ts][u8 level][u8 role][u16 agent][u32 message]``
+followed by the role, agent and message bytes. Levels are numbered as in
+``Microsoft.Extensions.Logging`` (Trace 0 ... Critical 5, None 6).
+
+The block ``t0``/``t1`` values are a sparse time index. Bisecting them
+finds the blocks of a time window, and the per-block agent and level
+postings then tell which of those blocks hold matching records, and at
+which positions. ``LogArchive.query`` therefore decompresses only blocks
+with at least one hit. Like ``masbt_tools.traffic``, index lines follow
+their block, so a crash loses at most the block being filled, and
+``rebuild_index`` recreates a missing ``.idx``.
+
+    with LogArchive("/tmp/logs") as archive:
+        for r in archive.query(start, end, agents=("P102_Planning*",), min_level=parse_level("Warning")):
+            print(r.timestamp, LEVELS[r.level], r.agent, r.message)
+"""
+from __future__ import annotations
+
+import bisect
+import fnmatch
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+MAGIC = b"MLGSEG1\n"
+_BLOCK_HEADER = struct.Struct("<III")
+_RECORD_HEADER = struct.Struct("<dBBHI")
+
+LEVELS = ("TRACE", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL", "NONE")
+_LEVEL_ALIASES = {
+    "trace": 0, "trce": 0,
+    "debug": 1, "dbug": 1,
+    "info": 2, "information": 2,
+    "warning": 3, "warn": 3,
+    "error": 4, "fail": 4,
+    "critical": 5, "crit": 5,
+    "none": 6,
+}
+
+LogRecord = namedtuple("LogRecord", "timestamp level agent role message")
+
+
+def parse_level(value) -> int:
+    """Level number of ``"Warning"``, ``"WARNING"``, ``"warn"``, ``3`` ...; unknown names are None (6)."""
+    text = str(value).strip()
+    if text.isdigit():
+        return min(int(text), 6)
+    return _LEVEL_ALIASES.get(text.lower(), 6)
+
+
+class _BlockBuilder:
+    __slots__ = ("parts", "size", "count", "t0", "t1", "agent", "level")
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.count = 0
+        self.t0 = None
+        self.t1 = None
+        self.agent: dict[str, list[int]] = {}
+        self.level: dict[str, list[int]] = {}
+
+    def add(self, timestamp, level, agent, role, message):
+        agent_bytes = agent.encode("utf-8")
+        role_bytes = role.encode("utf-8")[:255]
+        message_bytes = message.encode("utf-8")
+        index = self.count
+        self.parts.append(_RECORD_HEADER.pack(timestamp, level, len(role_bytes), len(agent_bytes),
+                                              len(message_bytes)))
+        self.parts.append(role_bytes)
+        self.parts.append(agent_bytes)
+        self.parts.append(message_bytes)
+        self.size += _RECORD_HEADER.size + len(role_bytes) + len(agent_bytes) + len(message_bytes)
+        self.count += 1
+        if self.t0 is None:
+            self.t0 = timestamp
+        self.t1 = timestamp
+        self.agent.setdefault(agent, []).append(index)
+        self.level.setdefault(str(level), []).append(index)
+
+    def entry(self, offset: int) -> dict:
+        return {"block": offset, "n": self.count, "t0": self.t0, "t1": self.t1,
+                "agent": self.agent, "level": self.level}
+
+
+class LogWriter:
+    """Appends log records to rotating segments below ``directory``."""
+
+    def __init__(self, directory: str, segment_bytes: int = 128 * 1024 * 1024, segment_seconds: float = 3600.0,
+                 block_bytes: int = 64 * 1024, flush_seconds: float = 1.0, level: int = 6):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.block_bytes = block_bytes
+        self.flush_seconds = flush_seconds
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+        self._data = None
+        self._index = None
+        self._segment_started = 0.0
+        self._sequence = len(glob.glob(os.path.join(directory, "log-*.mlg")))
+        self._block = _BlockBuilder()
+        self._block_started = 0.0
+        self.records = 0
+        self.raw_bytes = 0
+        self.written_bytes = 0
+        self.segments = 0
+
+    def append(self, level: int, agent: str, message: str, role: str = "", timestamp: float | None = None) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        block = self._block
+        if not block.count:
+            self._block_started = time.monotonic()
+        block.add(timestamp, level, agent, role, message)
+        self.records += 1
+        if block.size >= self.block_bytes:
+            self.flush()
+
+    def tick(self) -> None:
+        """Flush a partially filled block once it is older than ``flush_seconds``."""
+        if self._block.count and time.monotonic() - self._block_started >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        block = self._block
+        if not block.count:
+            return
+        self._block = _BlockBuilder()
+        if self._data is None or self._segment_full():
+            self._rotate()
+        raw = b"".join(block.parts)
+        compressed = zlib.compress(raw, self.level)
+        offset = self._data.tell()
+        self._data.write(_BLOCK_HEADER.pack(len(compressed), len(raw), block.count) + compressed)
+        self._data.flush()
+        self._index.write(json.dumps(block.entry(offset), separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._index.flush()
+        self.raw_bytes += len(raw)
+        self.written_bytes += _BLOCK_HEADER.size + len(compressed)
+
+    def _segment_full(self) -> bool:
+        return (self._data.tell() >= self.segment_bytes
+                or time.monotonic() - self._segment_started >= self.segment_seconds)
+
+    def _rotate(self) -> None:
+        self._close_files()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        base = os.path.join(self.directory, f"log-{stamp}-{self._sequence:06d}")
+        self._sequence += 1
+        self._data = open(base + ".mlg", "wb")
+        self._data.write(MAGIC)
+        self._index = open(base + ".idx", "w", encoding="utf-8")
+        self._segment_started = time.monotonic()
+        self.segments += 1
+
+    def _close_files(self) -> None:
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = None
+        self._index = None
+
+    def close(self) -> None:
+        self.flush()
+        self._close_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_block(buf, offset: int) -> list[LogRecord]:
+    compressed_len, raw_len, count = _BLOCK_HEADER.unpack_from(buf, offset)
+    start = offset + _BLOCK_HEADER.size
+    raw = zlib.decompress(buf[start:start + compressed_len], bufsize=raw_len)
+    records = []
+    pos = 0
+    for _ in range(count):
+        timestamp, level, role_len, agent_len, message_len = _RECORD_HEADER.unpack_from(raw, pos)
+        pos += _RECORD_HEADER.size
+        role = raw[pos:pos + role_len].decode("utf-8", "replace")
+        pos += role_len
+        agent = raw[pos:pos + agent_len].decode("utf-8")
+        pos += agent_len
+        message = raw[pos:pos + message_len].decode("utf-8", "replace")
+        pos += message_len
+        records.append(LogRecord(timestamp, level, agent, role, message))
+    return records
+
+
+def rebuild_index(segment_path: str) -> int:
+    """Recreate the ``.idx`` of a log segment by scanning it; returns the number of blocks."""
+    with open(segment_path, "rb") as f:
+        buf = f.read()
+    if not buf.startswith(MAGIC):
+        raise ValueError(f"{segment_path} is not a log segment")
+    lines = []
+    offset = len(MAGIC)
+    while offset + _BLOCK_HEADER.size <= len(buf):
+        compressed_len = _BLOCK_HEADER.unpack_from(buf, offset)[0]
+        if offset + _BLOCK_HEADER.size + compressed_len > len(buf):
+            break  # torn block at the end
+        block = _BlockBuilder()
+        for r in _read_block(buf, offset):
+            block.add(r.timestamp, r.level, r.agent, r.role, r.message)
+        lines.append(json.dumps(block.entry(offset), separators=(",", ":"), ensure_ascii=False))
+        offset += _BLOCK_HEADER.size + compressed_len
+    with open(segment_path[:-4] + ".idx", "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+    return len(lines)
+
+
+class _LogSegment:
+    __slots__ = ("path", "blocks", "agent", "ends", "starts", "_file", "_map")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blocks = []  # (offset, count, t0, t1, {level: positions})
+        self.agent: dict[str, dict[int, list[int]]] = {}  # agent -> block number -> positions
+        self._file = None
+        self._map = None
+        index_path = path[:-4] + ".idx"
+        if not os.path.exists(index_path):
+            rebuild_index(path)
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # line still being written
+                entry = json.loads(line)
+                number = len(self.blocks)
+                self.blocks.append((entry["block"], entry["n"], entry["t0"], entry["t1"],
+                                    {int(k): v for k, v in entry["level"].items()}))
+                for agent, positions in entry["agent"].items():
+                    self.agent.setdefault(agent, {})[number] = positions
+        # running max of t1 / running min (from the end) of t0: sorted even if the clock stepped back
+        self.ends = []
+        for block in self.blocks:
+            self.ends.append(max(block[3], self.ends[-1]) if self.ends else block[3])
+        self.starts = [0.0] * len(self.blocks)
+        low = float("inf")
+        for i in range(len(self.blocks) - 1, -1, -1):
+            low = min(low, self.blocks[i][2])
+            self.starts[i] = low
+
+    def window(self, start: float | None, end: float | None) -> range:
+        """Numbers of the blocks that can hold records with ``start <= ts < end``."""
+        lo = bisect.bisect_left(self.ends, start) if start is not None else 0
+        hi = bisect.bisect_left(self.starts, end) if end is not None else len(self.blocks)
+        return range(lo, max(lo, hi))
+
+    def buffer(self):
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+
+class LogArchive:
+    """Reader over all log segments of a directory (or a single ``.mlg`` file)."""
+
+    def __init__(self, path: str):
+        paths = [path] if path.endswith(".mlg") else sorted(glob.glob(os.path.join(path, "log-*.mlg")))
+        self.segments = [_LogSegment(p) for p in paths]
+        self.blocks_read = 0
+
+    def agents(self) -> dict[str, int]:
+        """Agent ids with their record counts."""
+        counts: dict[str, int] = {}
+        for segment in self.segments:
+            for agent, blocks in segment.agent.items():
+                counts[agent] = counts.get(agent, 0) + sum(len(p) for p in blocks.values())
+        return counts
+
+    def levels(self) -> dict[int, int]:
+        counts: dict[int, int] = {}
+        for segment in self.segments:
+            for block in segment.blocks:
+                for level, positions in block[4].items():
+                    counts[level] = counts.get(level, 0) + len(positions)
+        return counts
+
+    def query(self, start: float | None = None, end: float | None = None, agents=None, min_level: int = 0,
+              max_level: int = 6, contains: str | None = None):
+        """Records with ``start <= ts < end`` and ``min_level <= level <= max_level``, in archive order.
+
+        ``agents`` are agent ids or ``fnmatch`` patterns (``P102_*``), ``contains``
+        a substring of the message. Only blocks with an indexed hit are read.
+        """
+        for segment in self.segments:
+            blocks = segment.window(start, end)
+            if not blocks:
+                continue
+            by_agent = None
+            if agents is not None:
+                by_agent = {}
+                for agent in _matching(segment.agent, agents):
+                    for number, positions in segment.agent[agent].items():
+                        if number in blocks:
+                            by_agent.setdefault(number, []).extend(positions)
+                numbers = sorted(by_agent)
+            else:
+                numbers = blocks
+            for number in numbers:
+                offset, _count, t0, t1, levels = segment.blocks[number]
+                if (start is not None and t1 < start) or (end is not None and t0 >= end):
+                    continue
+                hits = set()
+                for level, positions in levels.items():
+                    if min_level <= level <= max_level:
+                        hits.update(positions)
+                if by_agent is not None:
+                    hits.intersection_update(by_agent[number])
+                if not hits:
+                    continue
+                self.blocks_read += 1
+                records = _read_block(segment.buffer(), offset)
+                for i in sorted(hits):
+                    r = records[i]
+                    if (start is not None and r.timestamp < start) or (end is not None and r.timestamp >= end):
+                        continue
+                    if contains is not None and contains not in r.message:
+                        continue
+                    yield r
+
+    def __len__(self) -> int:
+        return sum(block[1] for s in self.segments for block in s.blocks)
+
+    def block_count(self) -> int:
+        return sum(len(s.blocks) for s in self.segments)
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _matching(index: dict, patterns) -> list[str]:
+    result = []
+    for pattern in patterns:
+        if any(c in pattern for c in "*?["):
+            result.extend(fnmatch.filter(index, pattern))
+        elif pattern in index:
+            result.append(pattern)
+    return sorted(set(result))
@@ -0,0 +1,553 @@
+"""I4.0 message model and precompiled payload templates.
+
+The tools in this directory used to build every message as a freshly
+nested dict literal and serialize it with ``json.dumps(..., indent=2)``.
+This module replaces those copies with:
+
+* small ``__slots__`` classes for the frame and the AAS elements we send
+  (Property, SubmodelElementCollection, ReferenceElement, Action,
+  Precondition), and
+* :class:`MessageTemplate`, which serializes a message once with named
+  placeholders and afterwards only splices the variable fields
+  (conversationId, ProductId, timestamps, SlotValue, ...) into the
+  pre-rendered JSON text.
+
+Example::
+
+    tpl = skill_request_template("P102", "Screw")
+    payload = tpl.render(conversation_id=new_conversation_id(),
+                         product_id="https://smartfactory.de/shells/p1")
+"""
+from __future__ import annotations
+
+import functools
+import json
+import uuid
+from datetime import datetime, timezone
+from json.encoder import encode_basestring_ascii
+
+SEMANTIC_ACTION_BASE = "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action"
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def new_conversation_id(prefix: str = "conv") -> str:
+    """Unique conversation id (the old ``conv_{int(time.time())}`` collided within a second)."""
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def find_value(elements, id_short: str):
+    """Depth-first search for the ``value`` of the first element named ``id_short``."""
+    stack = list(reversed(elements or ()))
+    while stack:
+        element = stack.pop()
+        if not isinstance(element, dict):
+            continue
+        if element.get("idShort") == id_short:
+            return element.get("value")
+        children = element.get("value")
+        if isinstance(children, list):
+            stack.extend(reversed(children))
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+
+def _semantic_id(value):
+    keys = [] if not value else [{"type": "GlobalReference", "value": value}]
+    return {"type": "ExternalReference", "keys": keys}
+
+
+class Party:
+    """Sender or receiver of a frame.
+
+    With a role the I4.0 shape ``{"identification": {"id"}, "role": {"name"}}``
+    is emitted, without one the short ``{"id": ...}`` shape used by the
+    negotiation test scripts.
+    """
+
+    __slots__ = ("id", "role")
+
+    def __init__(self, id: str, role: str | None = None):
+        self.id = id
+        self.role = role
+
+    def to_dict(self) -> dict:
+        if self.role is None:
+            return {"id": self.id}
+        return {"identification": {"id": self.id}, "role": {"name": self.role}}
+
+
+class Frame:
+    __slots__ = ("sender", "receiver", "type", "conversation_id", "timestamp")
+
+    def __init__(self, sender: Party, receiver: Party | None, type: str,
+                 conversation_id: str, timestamp: str | None = None):
+        self.sender = sender
+        self.receiver = receiver
+        self.type = type
+        self.conversation_id = conversation_id
+        self.timestamp = timestamp
+
+    def to_dict(self) -> dict:
+        frame = {"sender": self.sender.to_dict()}
+        if self.receiver is not None:
+            frame["receiver"] = self.receiver.to_dict()
+        frame["type"] = self.type
+        frame["conversationId"] = self.conversation_id
+        if self.timestamp is not None:
+            frame["timestamp"] = self.timestamp
+        return frame
+
+
+class Property:
+    __slots__ = ("id_short", "value", "value_type", "kind", "semantic_id")
+
+    def __init__(self, id_short: str, value, value_type: str = "xs:string",
+                 kind: str | None = None, semantic_id: str | None = None):
+        self.id_short = id_short
+        self.value = value
+        self.value_type = value_type
+        self.kind = kind
+        self.semantic_id = semantic_id
+
+    def to_dict(self) -> dict:
+        d = {"idShort": self.id_short}
+        if self.kind is not None:
+            d["kind"] = self.kind
+        d["modelType"] = "Property"
+        if self.semantic_id is not None:
+            d["semanticId"] = _semantic_id(self.semantic_id)
+        d["valueType"] = self.value_type
+        d["value"] = self.value
+        return d
+
+
+class Collection:
+    """SubmodelElementCollection."""
+
+    __slots__ = ("id_short", "value", "kind", "semantic_id")
+
+    def __init__(self, id_short: str, value=(), kind: str | None = None,
+                 semantic_id: str | None = None):
+        self.id_short = id_short
+        self.value = list(value)
+        self.kind = kind
+        self.semantic_id = semantic_id
+
+    def to_dict(self) -> dict:
+        d = {"idShort": self.id_short}
+        if self.kind is not None:
+            d["kind"] = self.kind
+        d["modelType"] = "SubmodelElementCollection"
+        if self.semantic_id is not None:
+            d["semanticId"] = _semantic_id(self.semantic_id)
+        d["value"] = [e.to_dict() for e in self.value]
+        return d
+
+
+class ElementList:
+    """SubmodelElementList (e.g. ``OfferedCapabilitySequence``, ``Actions``)."""
+
+    __slots__ = ("id_short", "value", "kind")
+
+    def __init__(self, id_short: str, value=(), kind: str | None = None):
+        self.id_short = id_short
+        self.value = list(value)
+        self.kind = kind
+
+    def to_dict(self) -> dict:
+        d = {"idShort": self.id_short}
+        if self.kind is not None:
+            d["kind"] = self.kind
+        d["modelType"] = "SubmodelElementList"
+        d["value"] = [e.to_dict() for e in self.value]
+        return d
+
+
+class ReferenceElement:
+    __slots__ = ("id_short", "submodel", "kind", "semantic_id")
+
+    def __init__(self, id_short: str, submodel: str, kind: str | None = None,
+                 semantic_id: str | None = None):
+        self.id_short = id_short
+        self.submodel = submodel
+        self.kind = kind
+        self.semantic_id = semantic_id
+
+    def to_dict(self) -> dict:
+        d = {"idShort": self.id_short}
+        if self.kind is not None:
+            d["kind"] = self.kind
+        d["modelType"] = "ReferenceElement"
+        if self.semantic_id is not None:
+            d["semanticId"] = _semantic_id(self.semantic_id)
+        d["value"] = {"type": "ModelReference",
+                      "keys": [{"type": "Submodel", "value": self.submodel}]}
+        return d
+
+
+class Precondition:
+    """``InStorage``-style precondition as checked by ``SkillPreconditionChecker``."""
+
+    __slots__ = ("condition_type", "slot_content_type", "slot_value", "id_short")
+
+    def __init__(self, slot_value: str, condition_type: str = "InStorage",
+                 slot_content_type: str = "ProductId", id_short: str = "Condition_001"):
+        self.slot_value = slot_value
+        self.condition_type = condition_type
+        self.slot_content_type = slot_content_type
+        self.id_short = id_short
+
+    def to_element(self) -> Collection:
+        return Collection(self.id_short, [
+            Property("ConditionType", self.condition_type),
+            Collection("ConditionValue", [
+                Property("SlotContentType", self.slot_content_type),
+                Property("SlotValue", self.slot_value),
+            ]),
+        ])
+
+    def to_dict(self) -> dict:
+        return self.to_element().to_dict()
+
+
+class Action:
+    """Action SubmodelElementCollection carried by a SkillRequest.
+
+    ``verbose=True`` produces the full AAS form (kind, semanticIds,
+    SkillReference) the Planning agent sends, otherwise the short form of
+    the manual test publishers.
+    """
+
+    __slots__ = ("title", "machine_name", "status", "input_parameters", "preconditions",
+                 "effects", "final_result_data", "skill_reference", "id_short", "verbose")
+
+    def __init__(self, title: str, machine_name: str, status: str = "planned",
+                 input_parameters=None, preconditions=(), effects=(), final_result_data=(),
+                 skill_reference: str = "https://example.com/sm", id_short: str = "Action001",
+                 verbose: bool = False):
+        self.title = title
+        self.machine_name = machine_name
+        self.status = status
+        # name -> value or name -> (value, valueType)
+        self.input_parameters = dict(input_parameters or {})
+        self.preconditions = list(preconditions)
+        self.effects = list(effects)
+        self.final_result_data = list(final_result_data)
+        self.skill_reference = skill_reference
+        self.id_short = id_short
+        self.verbose = verbose
+
+    def _parameters(self, value_type: str, kind, semantic):
+        params = []
+        for name, value in self.input_parameters.items():
+            vt = value_type
+            if isinstance(value, tuple):
+                value, vt = value
+            params.append(Property(name, value, vt, kind, semantic))
+        return params
+
+    def to_element(self) -> Collection:
+        preconditions = [p.to_element() if isinstance(p, Precondition) else p for p in self.preconditions]
+        if not self.verbose:
+            return Collection(self.id_short, [
+                Property("ActionTitle", self.title),
+                Property("Status", self.status),
+                Property("MachineName", self.machine_name),
+                Collection("InputParameters", self._parameters("xs:string", None, None)),
+                Collection("Preconditions", preconditions),
+                Collection("Effects", self.effects),
+                Collection("FinalResultData", self.final_result_data),
+            ])
+
+        base = SEMANTIC_ACTION_BASE
+        kind = "Instance"
+        return Collection(self.id_short, [
+            Property("ActionTitle", self.title, "string", kind, f"{base}/ActionTitle"),
+            Property("Status", self.status, "string", kind, f"{base}/Status"),
+            Collection("InputParameters", self._parameters("string", kind, ""), kind, f"{base}/InputParameters"),
+            Collection("FinalResultData", self.final_result_data, kind, f"{base}/FinalResultData"),
+            Collection("Preconditions", preconditions, kind, f"{base}/Preconditions"),
+            ReferenceElement("SkillReference", self.skill_reference, kind, f"{base}/SkillReference"),
+            # "Effecs" is the semanticId actually used in the AAS step definitions
+            Collection("Effects", self.effects, kind, f"{base}/Effecs"),
+            Property("MachineName", self.machine_name, "string", kind, f"{base}/MachineName"),
+        ], kind, base)
+
+    def to_dict(self) -> dict:
+        return self.to_element().to_dict()
+
+
+class Message:
+    __slots__ = ("frame", "interaction_elements")
+
+    def __init__(self, frame: Frame, interaction_elements=()):
+        self.frame = frame
+        self.interaction_elements = list(interaction_elements)
+
+    def to_dict(self) -> dict:
+        elements = []
+        for e in self.interaction_elements:
+            elements.append(e if isinstance(e, dict) else e.to_dict())
+        return {"frame": self.frame.to_dict(), "interactionElements": elements}
+
+    def to_json(self, indent: int | None = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+# ---------------------------------------------------------------------------
+# Precompiled templates
+# ---------------------------------------------------------------------------
+
+class Slot:
+    """Placeholder for a variable field inside a message passed to :class:`MessageTemplate`."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def marker(self) -> str:
+        return f"\x00slot:{self.name}\x00"
+
+
+_MISSING = object()
+# How json.dumps renders the quoted ``Slot.marker`` string.
+_MARKER_START = encode_basestring_ascii("\x00slot:")[:-1]
+_MARKER_END = encode_basestring_ascii("\x00")[1:]
+
+
+class MessageTemplate:
+    """A message serialized once, with named string slots filled in per render.
+
+    Static text is kept as a ``%``-format string; :meth:`render` only
+    JSON-escapes the slot values and performs a single formatting call.
+    Slot values must be strings; the same slot may occur several times.
+    """
+
+    __slots__ = ("_format", "slots", "_defaults")
+
+    def __init__(self, message, defaults: dict | None = None):
+        payload = message.to_dict() if hasattr(message, "to_dict") else message
+        text = json.dumps(_replace_slots(payload), separators=(",", ":"))
+        text = text.replace("%", "%%")
+        slots = []
+        start = 0
+        while True:
+            i = text.find(_MARKER_START, start)
+            if i < 0:
+                break
+            end = text.index(_MARKER_END, i + len(_MARKER_START))
+            name = text[i + len(_MARKER_START):end]
+            if name not in slots:
+                slots.append(name)
+            text = f"{text[:i]}%({name})s{text[end + len(_MARKER_END):]}"
+            start = i
+        self._format = text
+        self.slots = tuple(slots)
+        self._defaults = dict(defaults or {})
+        unknown = set(self._defaults) - set(self.slots)
+        if unknown:
+            raise ValueError(f"defaults for unknown slots: {sorted(unknown)}")
+
+    def render(self, **values) -> str:
+        encoded = {}
+        for name in self.slots:
+            value = values.get(name, _MISSING)
+            if value is _MISSING:
+                default = self._defaults.get(name, _MISSING)
+                if default is _MISSING:
+                    raise KeyError(f"missing value for slot '{name}'")
+                value = default() if callable(default) else default
+            encoded[name] = encode_basestring_ascii(value)
+        return self._format % encoded
+
+    def render_bytes(self, **values) -> bytes:
+        return self.render(**values).encode("ascii")
+
+
+def _replace_slots(obj):
+    if isinstance(obj, Slot):
+        return obj.marker
+    if isinstance(obj, dict):
+        return {k: _replace_slots(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_replace_slots(v) for v in obj]
+    if hasattr(obj, "to_dict"):
+        return _replace_slots(obj.to_dict())
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# Message families
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def skill_request_template(module_id: str, action_title: str = "Retrieve", *,
+                           machine_name: str | None = None,
+                           sender_id: str | None = None,
+                           receiver_id: str | None = None,
+                           status: str = "planned",
+                           with_precondition: bool = False,
+                           retrieve_by_product_id: bool = True,
+                           verbose: bool = False) -> MessageTemplate:
+    """SkillRequest from ``{module}_Planning_Agent`` to ``{module}_Execution_Agent``.
+
+    Slots: ``conversation_id`` and ``product_id`` (also used as SlotValue of
+    the InStorage precondition when ``with_precondition`` is set).
+    """
+    product = Slot("product_id")
+    params = {"ProductId": product}
+    if retrieve_by_product_id and not verbose:
+        params["RetrieveByProductID"] = ("true", "xs:boolean")
+    preconditions = [Precondition(product)] if with_precondition else []
+    action = Action(action_title, machine_name or module_id, status=status,
+                    input_parameters=params, preconditions=preconditions, verbose=verbose)
+    frame = Frame(Party(sender_id or f"{module_id}_Planning_Agent", "PlanningAgent"),
+                  Party(receiver_id or f"{module_id}_Execution_Agent", "ExecutionAgent"),
+                  "request", Slot("conversation_id"))
+    return MessageTemplate(Message(frame, [action]), defaults={"conversation_id": new_conversation_id})
+
+
+@functools.lru_cache(maxsize=None)
+def skill_response_template(module_id: str, *, sender_id: str | None = None) -> MessageTemplate:
+    """SkillResponse from ``{module}_Execution_Agent`` as sent by ``SendSkillResponseNode``.
+
+    Slots: ``msg_type`` (consent, inform, refusal, failure or update),
+    ``conversation_id``, ``receiver_id``, ``action_title``, ``action_state``
+    (PLANNED, EXECUTING, DONE, ERROR, PRECONDITION_RETRY ...), ``machine_name``
+    (default ``module_id``) and ``log_message`` (default empty).
+    """
+    elements = [
+        Property("ActionTitle", Slot("action_title")),
+        Property("ActionState", Slot("action_state")),
+        Property("MachineName", Slot("machine_name")),
+        Property("LogMessage", Slot("log_message")),
+    ]
+    frame = Frame(Party(sender_id or f"{module_id}_Execution_Agent", "ExecutionAgent"),
+                  Party(Slot("receiver_id"), "PlanningAgent"), Slot("msg_type"), Slot("conversation_id"))
+    return MessageTemplate(Message(frame, elements), defaults={"machine_name": module_id, "log_message": ""})
+
+
+def frame_message_template(msg_type: str, sender_id: str, receiver_id: str | None = None,
+                           extra_payload=None) -> MessageTemplate:
+    """Short-frame message as sent by ``send_proposal.py`` / ``wait_and_respond.py``.
+
+    Slots: ``conversation_id`` and ``timestamp`` (defaults to now).
+    """
+    if extra_payload is None:
+        return _cached_frame_message_template(msg_type, sender_id, receiver_id)
+    return _frame_message_template(msg_type, sender_id, receiver_id, extra_payload)
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_frame_message_template(msg_type, sender_id, receiver_id):
+    return _frame_message_template(msg_type, sender_id, receiver_id, None)
+
+
+def _frame_message_template(msg_type, sender_id, receiver_id, extra_payload):
+    frame = {
+        "conversationId": Slot("conversation_id"),
+        "type": msg_type,
+        "sender": {"id": sender_id},
+        "timestamp": Slot("timestamp"),
+    }
+    if receiver_id:
+        frame["receiver"] = {"id": receiver_id}
+    elements = [{"value": extra_payload}] if extra_payload else []
+    return MessageTemplate({"frame": frame, "interactionElements": elements},
+                           defaults={"timestamp": now_iso})
+
+
+@functools.lru_cache(maxsize=None)
+def registration_template(agent_id: str, role: str = "ModuleHolon", capabilities: tuple = (),
+                          subagents: tuple = (), receiver_id: str = "Namespace",
+                          msg_type: str = "registerMessage") -> MessageTemplate:
+    """``registerMessage`` as published by ``RegisterAgentNode``. Slot: ``conversation_id``."""
+    register = Collection("RegisterMessage", [
+        Property("AgentId", agent_id),
+        Collection("SubAgents", [Property(f"SubAgent_{i}", a) for i, a in enumerate(subagents)]),
+        Collection("Capabilities", [Property(f"Capability_{i}", c) for i, c in enumerate(capabilities)]),
+    ])
+    # RegisterAgentNode addresses the parent (or "Namespace") without a role
+    frame = Frame(Party(agent_id, role), Party(receiver_id, ""), msg_type, Slot("conversation_id"))
+    return MessageTemplate(Message(frame, [register]), defaults={"conversation_id": new_conversation_id})
+
+
+@functools.lru_cache(maxsize=None)
+def inventory_template(module_id: str, agent_id: str | None = None, storages: tuple = ("Storage",)) -> MessageTemplate:
+    """``inventoryUpdate`` as published by ``UpdateInventoryFromActionNode`` on ``/{ns}/{module}/Inventory``.
+
+    One empty collection per storage plus the ``InventorySummary`` the
+    dispatcher reads. Slots: ``conversation_id``, ``free``, ``occupied``.
+    """
+    units = [Collection(name, []) for name in storages]
+    units.append(Collection("InventorySummary", [
+        Property("free", Slot("free"), "xs:int"),
+        Property("occupied", Slot("occupied"), "xs:int"),
+    ]))
+    frame = Frame(Party(agent_id or module_id, "ExecutionAgent"), Party("Broadcast", "System"), "inventoryUpdate",
+                  Slot("conversation_id"))
+    return MessageTemplate(Message(frame, [Collection("StorageUnits", units)]),
+                           defaults={"conversation_id": new_conversation_id})
+
+
+@functools.lru_cache(maxsize=None)
+def capability_offer_template(module_id: str, role: str = "PlanningHolon", *,
+                              msg_type: str = "proposal/OfferedCapability",
+                              as_sequence: bool = False) -> MessageTemplate:
+    """Proposal answering an OfferedCapability CfP, shaped like ``CapabilityOfferProposalMessage``.
+
+    Slots: ``conversation_id``, ``receiver_id``, ``receiver_role`` (default empty),
+    ``capability``, ``requirement_id``, ``product_id``, ``offer_id``, ``matching_score``,
+    ``cost``, ``start``, ``end``, ``setup_time``, ``cycle_time``. With ``as_sequence`` the OfferedCapability is
+    wrapped in an ``OfferedCapabilitySequence`` list (ManufacturingSequence flow).
+    """
+    action = Action(Slot("capability"), module_id, input_parameters={"ProductId": Slot("product_id")})
+    offered = Collection("OfferedCapability", [
+        Property("InstanceIdentifier", Slot("offer_id")),
+        Property("Station", module_id),
+        Property("MatchingScore", Slot("matching_score"), "xs:double"),
+        Property("Cost", Slot("cost"), "xs:double"),
+        Collection("EarliestSchedulingInformation", [
+            Property("StartDateTime", Slot("start"), "xs:dateTime"),
+            Property("EndDateTime", Slot("end"), "xs:dateTime"),
+            Property("SetupTime", Slot("setup_time")),
+            Property("CycleTime", Slot("cycle_time")),
+        ]),
+        ElementList("Actions", [action]),
+    ])
+    elements = [
+        Property("Capability", Slot("capability")),
+        Property("RequirementId", Slot("requirement_id")),
+        Property("OfferId", Slot("offer_id")),
+        Property("ProductId", Slot("product_id")),
+        ElementList("OfferedCapabilitySequence", [offered]) if as_sequence else offered,
+    ]
+    frame = Frame(Party(module_id, role), Party(Slot("receiver_id"), Slot("receiver_role")), msg_type,
+                  Slot("conversation_id"))
+    return MessageTemplate(Message(frame, elements), defaults={"receiver_role": ""})
+
+
+@functools.lru_cache(maxsize=None)
+def capability_refusal_template(module_id: str, role: str = "PlanningHolon", *,
+                                msg_type: str = "refuseProposal/OfferedCapability") -> MessageTemplate:
+    """Refusal for an OfferedCapability CfP.
+
+    Slots: ``conversation_id``, ``receiver_id``, ``receiver_role`` (default empty),
+    ``capability``, ``requirement_id``, ``reason``.
+    """
+    elements = [
+        Property("Capability", Slot("capability")),
+        Property("RequirementId", Slot("requirement_id")),
+        Property("Reason", Slot("reason")),
+    ]
+    frame = Frame(Party(module_id, role), Party(Slot("receiver_id"), Slot("receiver_role")), msg_type,
+                  Slot("conversation_id"))
+    return MessageTemplate(Message(frame, elements), defaults={"receiver_role": ""})
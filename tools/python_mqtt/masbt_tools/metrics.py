@@ -0,0 +1,230 @@
+"""Windowed counters and latency sketches with Prometheus text exposition.
+
+Every series keeps a cumulative total (Prometheus ``counter`` / the
+``_sum``/``_count`` of a ``summary``) plus a ring of ``slots`` time buckets
+covering the last ``window`` seconds. Rates and quantiles are reported over
+that window. A bucket is a count, or a :class:`LatencyHistogram` with a
+bounded number of buckets, so memory per series is fixed. The number of
+series per metric is capped as well: label sets beyond ``max_series`` are
+folded into one series whose labels are all ``other``. Weeks of uptime
+therefore cannot grow the process.
+
+    registry = MetricsRegistry(window=60.0, slots=6)
+    messages = registry.counter("masbt_messages", "Messages seen", ("agent", "topic", "type"))
+    messages.inc(("P102", "offer_response", "proposal"))
+    latency = registry.sketch("masbt_response_latency_seconds", "Request to response", ("topic",))
+    latency.observe(("offer_response",), 0.42)
+    text = registry.render()
+"""
+from __future__ import annotations
+
+import math
+import time
+
+from .stats import LatencyHistogram
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, label_names=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.series: dict[tuple, object] = {}
+        self.folded = 0
+
+    def _series(self, labels: tuple):
+        series = self.series.get(labels)
+        if series is None:
+            if len(self.series) >= self.registry.max_series:
+                self.folded += 1
+                labels = ("other",) * len(self.label_names)
+                series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = self._new()
+        return series
+
+    def _new(self):
+        raise NotImplementedError
+
+    def header(self, name: str | None = None, kind: str | None = None, help_text: str | None = None) -> list[str]:
+        name = name or self.name
+        return [f"# HELP {name} {help_text or self.help}", f"# TYPE {name} {kind or self.kind}"]
+
+
+class _Ring:
+    """``slots`` buckets of ``width`` seconds; ``bucket()`` rotates lazily to the current one."""
+
+    __slots__ = ("values", "stamps", "width", "factory")
+
+    def __init__(self, slots: int, width: float, factory):
+        self.values = [factory() for _ in range(slots)]
+        self.stamps = [-1] * slots
+        self.width = width
+        self.factory = factory
+
+    def bucket(self, now: float) -> int:
+        tick = int(now // self.width)
+        i = tick % len(self.values)
+        if self.stamps[i] != tick:
+            self.values[i] = self.factory()
+            self.stamps[i] = tick
+        return i
+
+    def live(self, now: float):
+        oldest = int(now // self.width) - len(self.values) + 1
+        return [v for v, stamp in zip(self.values, self.stamps) if stamp >= oldest]
+
+
+class _CounterSeries:
+    __slots__ = ("total", "ring")
+
+    def __init__(self, slots, width):
+        self.total = 0.0
+        self.ring = _Ring(slots, width, float)
+
+
+class Counter(_Metric):
+    """Cumulative ``<name>_total`` plus ``<name>_rate`` (per second over the window)."""
+
+    kind = "counter"
+
+    def _new(self):
+        return _CounterSeries(self.registry.slots, self.registry.slot_width)
+
+    def inc(self, labels: tuple = (), amount: float = 1.0, now: float | None = None) -> None:
+        now = self.registry.clock() if now is None else now
+        series = self._series(labels)
+        series.total += amount
+        ring = series.ring
+        i = ring.bucket(now)
+        ring.values[i] += amount
+
+    def render(self, now: float) -> list[str]:
+        lines = self.header(f"{self.name}_total")
+        rates = self.header(f"{self.name}_rate", "gauge",
+                            f"{self.help}, per second over the last {self.registry.window:g}s")
+        for labels, series in sorted(self.series.items()):
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_total{label_text} {_number(series.total)}")
+            rates.append(f"{self.name}_rate{label_text} {_number(sum(series.ring.live(now)) / self.registry.window)}")
+        return lines + rates
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new(self):
+        return [0.0]
+
+    def set(self, labels: tuple, value: float) -> None:
+        self._series(labels)[0] = value
+
+    def render(self, now: float) -> list[str]:
+        lines = self.header()
+        for labels, series in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(series[0])}")
+        return lines
+
+
+class _SketchSeries:
+    __slots__ = ("count", "total", "ring")
+
+    def __init__(self, slots, width):
+        self.count = 0
+        self.total = 0.0
+        self.ring = _Ring(slots, width, LatencyHistogram)
+
+
+class Sketch(_Metric):
+    """Prometheus ``summary``: window quantiles from merged histograms, cumulative sum and count."""
+
+    kind = "summary"
+
+    def _new(self):
+        return _SketchSeries(self.registry.slots, self.registry.slot_width)
+
+    def observe(self, labels: tuple, value: float, now: float | None = None) -> None:
+        now = self.registry.clock() if now is None else now
+        series = self._series(labels)
+        series.count += 1
+        series.total += value
+        ring = series.ring
+        ring.values[ring.bucket(now)].record(value)
+
+    def render(self, now: float) -> list[str]:
+        lines = self.header()
+        for labels, series in sorted(self.series.items()):
+            merged = LatencyHistogram()
+            for h in series.ring.live(now):
+                merged.merge(h)
+            pct = merged.percentiles(tuple(q * 100 for q in QUANTILES))
+            for q in QUANTILES:
+                quantile = f'quantile="{q}"'
+                lines.append(f"{self.name}{_labels(self.label_names, labels, quantile)} {_number(pct[q * 100])}")
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(series.total)}")
+            lines.append(f"{self.name}_count{label_text} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, window: float = 60.0, slots: int = 6, max_series: int = 2000, clock=time.monotonic):
+        if window <= 0 or slots < 1:
+            raise ValueError("window and slots must be positive")
+        self.window = window
+        self.slots = slots
+        self.slot_width = window / slots
+        self.max_series = max_series
+        self.clock = clock
+        self.metrics: list[_Metric] = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()) -> Counter:
+        return self._add(Counter(self, name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()) -> Gauge:
+        return self._add(Gauge(self, name, help_text, label_names))
+
+    def sketch(self, name, help_text, label_names=()) -> Sketch:
+        return self._add(Sketch(self, name, help_text, label_names))
+
+    def series_count(self) -> int:
+        return sum(len(m.series) for m in self.metrics)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        now = self.clock()
+        lines = []
+        for metric in self.metrics:
+            if metric.series:
+                lines.extend(metric.render(now))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,232 @@
+"""MQTT 3.1.1 packet encoding/decoding (QoS 0/1 subset).
+
+Only what the asyncio client and the test broker need: CONNECT/CONNACK,
+PUBLISH/PUBACK, SUBSCRIBE/SUBACK, UNSUBSCRIBE/UNSUBACK, PINGREQ/PINGRESP
+and DISCONNECT. QoS 2 packets are rejected by the callers.
+"""
+from __future__ import annotations
+
+import asyncio
+import struct
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+PACKET_NAMES = {
+    CONNECT: "CONNECT", CONNACK: "CONNACK", PUBLISH: "PUBLISH", PUBACK: "PUBACK",
+    PUBREC: "PUBREC", PUBREL: "PUBREL", PUBCOMP: "PUBCOMP", SUBSCRIBE: "SUBSCRIBE",
+    SUBACK: "SUBACK", UNSUBSCRIBE: "UNSUBSCRIBE", UNSUBACK: "UNSUBACK",
+    PINGREQ: "PINGREQ", PINGRESP: "PINGRESP", DISCONNECT: "DISCONNECT",
+}
+
+MAX_REMAINING_LENGTH = 268_435_455
+
+_U16 = struct.Struct("!H")
+
+
+class MqttProtocolError(Exception):
+    pass
+
+
+def encode_remaining_length(n: int) -> bytes:
+    if n < 0 or n > MAX_REMAINING_LENGTH:
+        raise MqttProtocolError(f"remaining length out of range: {n}")
+    if n < 128:
+        return bytes((n,))
+    out = bytearray()
+    while True:
+        digit = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(digit | 0x80)
+        else:
+            out.append(digit)
+            return bytes(out)
+
+
+def encode_string(s: str | bytes) -> bytes:
+    data = s.encode("utf-8") if isinstance(s, str) else s
+    return _U16.pack(len(data)) + data
+
+
+def decode_string(buf, offset: int) -> tuple[str, int]:
+    (n,) = _U16.unpack_from(buf, offset)
+    start = offset + 2
+    return bytes(buf[start:start + n]).decode("utf-8"), start + n
+
+
+def packet(ptype: int, flags: int, body: bytes = b"") -> bytes:
+    return bytes(((ptype << 4) | flags,)) + encode_remaining_length(len(body)) + body
+
+
+# --- encoders ---------------------------------------------------------------
+
+def connect(client_id: str, keepalive: int = 60, clean_session: bool = True,
+            username: str | None = None, password: str | None = None,
+            will: tuple[str, bytes, int, bool] | None = None) -> bytes:
+    flags = 0x02 if clean_session else 0
+    payload = encode_string(client_id)
+    if will is not None:
+        will_topic, will_payload, will_qos, will_retain = will
+        flags |= 0x04 | (will_qos << 3) | (0x20 if will_retain else 0)
+        payload += encode_string(will_topic) + encode_string(will_payload)
+    if username is not None:
+        flags |= 0x80
+        payload += encode_string(username)
+    if password is not None:
+        flags |= 0x40
+        payload += encode_string(password)
+    header = encode_string("MQTT") + bytes((4, flags)) + _U16.pack(keepalive)
+    return packet(CONNECT, 0, header + payload)
+
+
+def connack(session_present: bool = False, return_code: int = 0) -> bytes:
+    return packet(CONNACK, 0, bytes((1 if session_present else 0, return_code)))
+
+
+def publish(topic: str, payload: bytes, qos: int = 0, retain: bool = False,
+            packet_id: int | None = None, dup: bool = False) -> bytes:
+    flags = (0x08 if dup else 0) | (qos << 1) | (0x01 if retain else 0)
+    body = encode_string(topic)
+    if qos:
+        body += _U16.pack(packet_id)
+    return packet(PUBLISH, flags, body + payload)
+
+
+def puback(packet_id: int) -> bytes:
+    return packet(PUBACK, 0, _U16.pack(packet_id))
+
+
+def subscribe(packet_id: int, filters) -> bytes:
+    body = bytearray(_U16.pack(packet_id))
+    for topic, qos in filters:
+        body += encode_string(topic)
+        body.append(qos)
+    return packet(SUBSCRIBE, 0x02, bytes(body))
+
+
+def suback(packet_id: int, return_codes) -> bytes:
+    return packet(SUBACK, 0, _U16.pack(packet_id) + bytes(return_codes))
+
+
+def unsubscribe(packet_id: int, filters) -> bytes:
+    body = bytearray(_U16.pack(packet_id))
+    for topic in filters:
+        body += encode_string(topic)
+    return packet(UNSUBSCRIBE, 0x02, bytes(body))
+
+
+def unsuback(packet_id: int) -> bytes:
+    return packet(UNSUBACK, 0, _U16.pack(packet_id))
+
+
+PINGREQ_PACKET = packet(PINGREQ, 0)
+PINGRESP_PACKET = packet(PINGRESP, 0)
+DISCONNECT_PACKET = packet(DISCONNECT, 0)
+
+
+# --- decoders ---------------------------------------------------------------
+
+async def read_packet(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """Read one control packet; returns ``(type, flags, body)``.
+
+    Raises ``asyncio.IncompleteReadError`` when the peer closes the stream.
+    """
+    first = (await reader.readexactly(1))[0]
+    length = 0
+    shift = 0
+    while True:
+        digit = (await reader.readexactly(1))[0]
+        length |= (digit & 0x7F) << shift
+        if not digit & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise MqttProtocolError("malformed remaining length")
+    body = await reader.readexactly(length) if length else b""
+    return first >> 4, first & 0x0F, body
+
+
+def parse_publish(flags: int, body: bytes):
+    """Returns ``(topic, payload, qos, retain, dup, packet_id)``."""
+    qos = (flags >> 1) & 0x03
+    topic, offset = decode_string(body, 0)
+    packet_id = None
+    if qos:
+        (packet_id,) = _U16.unpack_from(body, offset)
+        offset += 2
+    return topic, body[offset:], qos, bool(flags & 0x01), bool(flags & 0x08), packet_id
+
+
+def parse_packet_id(body: bytes) -> int:
+    return _U16.unpack_from(body, 0)[0]
+
+
+def parse_connect(body: bytes) -> dict:
+    protocol, offset = decode_string(body, 0)
+    level = body[offset]
+    flags = body[offset + 1]
+    (keepalive,) = _U16.unpack_from(body, offset + 2)
+    offset += 4
+    if protocol not in ("MQTT", "MQIsdp"):
+        raise MqttProtocolError(f"unsupported protocol name {protocol!r}")
+    client_id, offset = decode_string(body, offset)
+    result = {
+        "protocol": protocol,
+        "level": level,
+        "clean_session": bool(flags & 0x02),
+        "keepalive": keepalive,
+        "client_id": client_id,
+        "will": None,
+        "username": None,
+        "password": None,
+    }
+    if flags & 0x04:
+        will_topic, offset = decode_string(body, offset)
+        (n,) = _U16.unpack_from(body, offset)
+        will_payload = bytes(body[offset + 2:offset + 2 + n])
+        offset += 2 + n
+        result["will"] = (will_topic, will_payload, (flags >> 3) & 0x03, bool(flags & 0x20))
+    if flags & 0x80:
+        result["username"], offset = decode_string(body, offset)
+    if flags & 0x40:
+        (n,) = _U16.unpack_from(body, offset)
+        result["password"] = bytes(body[offset + 2:offset + 2 + n])
+    return result
+
+
+def parse_subscribe(body: bytes) -> tuple[int, list[tuple[str, int]]]:
+    (packet_id,) = _U16.unpack_from(body, 0)
+    offset = 2
+    filters = []
+    while offset < len(body):
+        topic, offset = decode_string(body, offset)
+        filters.append((topic, body[offset] & 0x03))
+        offset += 1
+    return packet_id, filters
+
+
+def parse_unsubscribe(body: bytes) -> tuple[int, list[str]]:
+    (packet_id,) = _U16.unpack_from(body, 0)
+    offset = 2
+    filters = []
+    while offset < len(body):
+        topic, offset = decode_string(body, offset)
+        filters.append(topic)
+    return packet_id, filters
+
+
+def parse_suback(body: bytes) -> tuple[int, list[int]]:
+    return _U16.unpack_from(body, 0)[0], list(body[2:])
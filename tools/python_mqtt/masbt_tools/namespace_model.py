@@ -0,0 +1,406 @@
+"""Virtual-time model of a namespace: products, CfP rounds, skills and transport.
+
+The model runs on :mod:`masbt_tools.des` and follows the agents' flow:
+
+1. A product arrives with a process chain (a list of capabilities, drawn
+   from a weighted mix).
+2. The ManufacturingDispatcher handles one ProcessChain request at a time
+   (ProcessChainLoop). It sends a CfP per requirement to every registered
+   module and collects replies until all modules have answered or
+   ``OfferCollectionTimeoutSeconds`` expires. A module that never answers
+   therefore costs the full timeout. With ``SequentialCapabilityDispatch``
+   the requirements are negotiated one after the other. The dispatcher then
+   waits ``ProcessChainIdleDelayMs`` before taking the next request. A chain
+   with a capability no module offers is refused.
+3. Each step runs on the least loaded module offering the capability: a
+   transport hop when the product changes modules, then the module's FIFO
+   queue and the skill duration. A failed skill, or one exceeding
+   ``Timeouts.SkillExecutionDefault``, is repeated on the same module.
+
+Modules, stations and timeouts come from ``configs/specific_configs``
+(:func:`load_namespace`). Everything the configs do not contain (which
+capabilities a station offers, skill and transport durations, arrivals) is
+part of the model dict, see :data:`DEFAULT_MODEL`.
+"""
+from __future__ import annotations
+
+import copy
+import glob
+import json
+import math
+import os
+import random
+import re
+
+from .des import Resource, Simulation
+from .distributions import parse_distribution
+from .stats import LatencyHistogram
+
+DEFAULT_MODEL = {
+    "arrival": "exp:300",
+    "chains": [{"name": "Cab_A_Blue", "steps": ["Drill", "Screw", "Assemble"], "weight": 1}],
+    "stations": {
+        "DrillingStation": ["Drill"],
+        "ScrewingStation": ["Screw"],
+        "AssemblyStation": ["Assemble"],
+    },
+    "skill_time": {"Drill": "normal:40,8", "Screw": "normal:50,10", "Assemble": "normal:70,15"},
+    "default_skill_time": "uniform:30,90",
+    "error_rate": 0.0,
+    "offer_time": "uniform:0.05,0.5",
+    "no_reply_rate": 0.0,
+    "transport_time": "uniform:20,40",
+    "transports": 2,
+    # None: taken from the dispatcher / Execution agent configs (modules without one have no skill timeout)
+    "offer_collection_timeout": None,
+    "idle_delay": None,
+    "sequential_dispatch": None,
+    "skill_timeout": None,
+    # "P107=ScrewingStation" or a module id defined in the config directory
+    "add_modules": [],
+    # per-module overrides: {"P102": {"skill_time": {"Assemble": "const:200"}, "error_rate": 0.1}}
+    "modules": {},
+}
+
+_DURATION = re.compile(r"^\s*([0-9.]+)\s*([smhdw]?)\s*$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(text) -> float:
+    """Seconds from ``3600``, ``90m``, ``8h``, ``7d`` or ``2w``."""
+    m = _DURATION.match(str(text))
+    if m is None:
+        raise ValueError(f"invalid duration '{text}'")
+    return float(m.group(1)) * _UNITS[m.group(2)]
+
+
+class ModuleSpec:
+    __slots__ = ("id", "station", "skill_timeout")
+
+    def __init__(self, module_id, station, skill_timeout=None):
+        self.id = module_id
+        self.station = station
+        self.skill_timeout = skill_timeout
+
+
+class Namespace:
+    """Modules and dispatcher settings of one namespace."""
+
+    __slots__ = ("name", "modules", "offer_collection_timeout", "idle_delay", "sequential_dispatch", "catalog")
+
+    def __init__(self, name, modules, offer_collection_timeout=60.0, idle_delay=0.2, sequential_dispatch=False,
+                 catalog=None):
+        self.name = name
+        self.modules = list(modules)
+        self.offer_collection_timeout = offer_collection_timeout
+        self.idle_delay = idle_delay
+        self.sequential_dispatch = sequential_dispatch
+        self.catalog = dict(catalog or {})  # every ModuleHolon config found: id -> ModuleSpec
+
+
+def _agent_configs(config_dir):
+    """``{file stem: [(path, config), ...]}`` of every JSON agent config below ``config_dir``."""
+    configs = {}
+    for path in sorted(glob.glob(os.path.join(config_dir, "**", "*.json"), recursive=True)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(config, dict):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            configs.setdefault(stem.lower(), []).append((path, config))
+    return configs
+
+
+def _resolve(configs, name, near):
+    """Config named ``name``, preferring the one in directory ``near``."""
+    candidates = configs.get(str(name).lower(), [])
+    for path, config in candidates:
+        if os.path.dirname(os.path.abspath(path)) == near:
+            return config
+    return candidates[0][1] if candidates else None
+
+
+def _module_spec(configs, config, near):
+    agent = config.get("Agent") or {}
+    skill_timeout = None
+    for sub in config.get("SubHolons") or ():
+        sub_config = _resolve(configs, sub, near)
+        timeout_ms = ((sub_config or {}).get("Timeouts") or {}).get("SkillExecutionDefault")
+        if timeout_ms:
+            skill_timeout = float(timeout_ms) / 1000.0
+    return ModuleSpec(agent.get("AgentId"), agent.get("ModuleName") or agent.get("AgentId"), skill_timeout)
+
+
+def load_namespace(config_dir, namespace_config="NamespaceHolon/NamespaceHolon.json") -> Namespace:
+    """Modules and dispatcher settings of the namespace described by ``namespace_config``.
+
+    ``namespace_config`` (relative to ``config_dir`` or absolute) lists its
+    agents in ``SubHolons`` (NamespaceHolon) or ``Agents``
+    (``module_agents.json``). Each name is looked up as a config file stem,
+    preferring the file next to the namespace config.
+    """
+    configs = _agent_configs(config_dir)
+    path = namespace_config if os.path.isabs(namespace_config) else os.path.join(config_dir, namespace_config)
+    with open(path, "r", encoding="utf-8") as f:
+        root = json.load(f)
+    near = os.path.dirname(os.path.abspath(path))
+    names = root.get("SubHolons") or root.get("Agents") or []
+
+    modules = []
+    dispatching = {}
+    for name in names:
+        config = _resolve(configs, name, near)
+        if config is None:
+            raise ValueError(f"no config for agent '{name}' below {config_dir}")
+        if (config.get("Agent") or {}).get("Role") == "ModuleHolon":
+            modules.append(_module_spec(configs, config, near))
+        elif "DispatchingAgent" in config and not dispatching:
+            dispatching = config["DispatchingAgent"]
+    if not dispatching:
+        dispatcher = _resolve(configs, "dispatching_agent", near)
+        dispatching = (dispatcher or {}).get("DispatchingAgent") or {}
+
+    catalog = {}
+    for candidates in configs.values():
+        for candidate_path, config in candidates:
+            agent = config.get("Agent") or {}
+            if agent.get("Role") == "ModuleHolon" and agent.get("AgentId") not in catalog:
+                catalog[agent["AgentId"]] = _module_spec(configs, config, os.path.dirname(
+                    os.path.abspath(candidate_path)))
+    name = (root.get("Agent") or {}).get("AgentId") or root.get("Namespace") or os.path.basename(path)
+    return Namespace(name, modules,
+                     offer_collection_timeout=float(dispatching.get("OfferCollectionTimeoutSeconds", 60)),
+                     idle_delay=float(dispatching.get("ProcessChainIdleDelayMs", 200)) / 1000.0,
+                     sequential_dispatch=bool(dispatching.get("SequentialCapabilityDispatch", False)),
+                     catalog=catalog)
+
+
+def merge_model(overrides=None) -> dict:
+    """:data:`DEFAULT_MODEL` with ``overrides`` merged in (one level deep for dict values)."""
+    model = copy.deepcopy(DEFAULT_MODEL)
+    for key, value in (overrides or {}).items():
+        if key not in model:
+            raise ValueError(f"unknown model key '{key}'")
+        if isinstance(model[key], dict) and isinstance(value, dict):
+            model[key] = {**model[key], **value}
+        else:
+            model[key] = value
+    return model
+
+
+def set_path(model: dict, path: str, value) -> None:
+    """Set a dotted ``path`` such as ``skill_time.Screw`` or ``modules.P102.error_rate``."""
+    keys = path.split(".")
+    if keys[0] not in DEFAULT_MODEL:
+        raise ValueError(f"unknown model key '{keys[0]}'")
+    node = model
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+class _Module:
+    __slots__ = ("spec", "resource", "capabilities", "skill_time", "default_skill_time", "error_rate",
+                 "skill_timeout", "errors", "timeouts")
+
+    def __init__(self, spec, resource, capabilities, model, overrides):
+        self.spec = spec
+        self.resource = resource
+        self.capabilities = capabilities
+        skill_time = {**model["skill_time"], **overrides.get("skill_time", {})}
+        self.skill_time = {c.lower(): parse_distribution(s) for c, s in skill_time.items()}
+        self.default_skill_time = parse_distribution(overrides.get("default_skill_time",
+                                                                   model["default_skill_time"]))
+        self.error_rate = float(overrides.get("error_rate", model["error_rate"]))
+        self.skill_timeout = overrides.get("skill_timeout", model["skill_timeout"]) or spec.skill_timeout
+        self.errors = 0
+        self.timeouts = 0
+
+    def load(self):
+        return self.resource.users + len(self.resource.queue)
+
+
+class NamespaceSimulation:
+    def __init__(self, namespace: Namespace, model: dict, seed=None):
+        self.namespace = namespace
+        self.model = model
+        self.rng = random.Random(seed)
+        self.sim = Simulation()
+        sim = self.sim
+
+        specs = list(namespace.modules)
+        for entry in model["add_modules"] or ():
+            module_id, _, station = str(entry).partition("=")
+            known = namespace.catalog.get(module_id)
+            if not station and known is None:
+                raise ValueError(f"module '{module_id}' not found in the configs; use {module_id}=<ModuleName>")
+            specs.append(ModuleSpec(module_id, station or known.station, known.skill_timeout if known else None))
+
+        stations = {k.lower(): v for k, v in model["stations"].items()}
+        self.modules = []
+        self.by_capability: dict[str, list[_Module]] = {}
+        for spec in specs:
+            overrides = model["modules"].get(spec.id, {})
+            capabilities = overrides.get("capabilities") or stations.get(str(spec.station).lower()) or [spec.station]
+            module = _Module(spec, Resource(sim, spec.id), capabilities, model, overrides)
+            self.modules.append(module)
+            for capability in capabilities:
+                self.by_capability.setdefault(capability.lower(), []).append(module)
+
+        self.dispatcher = Resource(sim, "Dispatcher")
+        transports = int(model["transports"])
+        self.transport = Resource(sim, "Transport", transports) if transports > 0 else None
+        self.arrival = parse_distribution(model["arrival"])
+        self.offer_time = parse_distribution(model["offer_time"])
+        self.transport_time = parse_distribution(model["transport_time"])
+        self.no_reply_rate = float(model["no_reply_rate"])
+        self.collection_timeout = float(_setting(model, "offer_collection_timeout", namespace))
+        self.idle_delay = float(_setting(model, "idle_delay", namespace))
+        self.sequential = bool(_setting(model, "sequential_dispatch", namespace))
+        self.chains = [(c.get("name") or "+".join(c["steps"]), list(c["steps"])) for c in model["chains"]]
+        self.chain_weights = [float(c.get("weight", 1)) for c in model["chains"]]
+
+        self.warmup = 0.0
+        self.arrived = 0
+        self.completed = 0
+        self.refused = 0
+        self.lead_time = LatencyHistogram()
+        self.negotiation = LatencyHistogram()
+        self.per_chain: dict[str, int] = {}
+
+    # --- processes -----------------------------------------------------------
+
+    def _arrivals(self):
+        product = 0
+        while True:
+            yield self.arrival.sample(self.rng)
+            product += 1
+            self.sim.process(self._product(product))
+
+    def _collection_time(self):
+        """Time until every registered module has answered one CfP round, or the timeout."""
+        latest = 0.0
+        for _module in self.modules:
+            if self.rng.random() < self.no_reply_rate:
+                return self.collection_timeout
+            latest = max(latest, self.offer_time.sample(self.rng))
+        return min(latest, self.collection_timeout)
+
+    def _product(self, product):
+        sim = self.sim
+        arrived = sim.now
+        counted = arrived >= self.warmup
+        if counted:
+            self.arrived += 1
+        name, steps = self.rng.choices(self.chains, self.chain_weights)[0]
+
+        yield self.dispatcher.acquire()
+        started = sim.now
+        if self.sequential:
+            negotiation = sum(self._collection_time() for _step in steps)
+        else:
+            negotiation = self._collection_time()
+        yield negotiation
+        if counted:
+            self.negotiation.record(sim.now - started)
+        yield self.idle_delay
+        self.dispatcher.release()
+        if any(not self.by_capability.get(step.lower()) for step in steps):
+            if counted:
+                self.refused += 1
+            return
+
+        location = None
+        for step in steps:
+            candidates = self.by_capability[step.lower()]
+            module = min(candidates, key=lambda m: (m.load(), self.rng.random()))
+            if self.transport is not None and location is not module:
+                yield self.transport.acquire()
+                yield self.transport_time.sample(self.rng)
+                self.transport.release()
+            while True:
+                yield module.resource.acquire()
+                duration = module.skill_time.get(step.lower(), module.default_skill_time).sample(self.rng)
+                timeout = module.skill_timeout
+                if timeout and duration > timeout:
+                    yield timeout
+                    module.resource.release()
+                    module.timeouts += 1
+                    continue
+                yield duration
+                module.resource.release()
+                if self.rng.random() < module.error_rate:
+                    module.errors += 1
+                    continue
+                break
+            location = module
+
+        if arrived >= self.warmup:
+            self.completed += 1
+            self.lead_time.record(sim.now - arrived)
+            self.per_chain[name] = self.per_chain.get(name, 0) + 1
+
+    # --- run -----------------------------------------------------------------
+
+    def _resources(self):
+        resources = [self.dispatcher] + [m.resource for m in self.modules]
+        return resources + ([self.transport] if self.transport is not None else [])
+
+    def _end_warmup(self):
+        for resource in self._resources():
+            resource.reset_stats()
+        for module in self.modules:
+            module.errors = module.timeouts = 0
+
+    def run(self, horizon: float, warmup: float = 0.0) -> dict:
+        self.warmup = warmup
+        if warmup > 0:
+            self.sim.schedule(warmup, self._end_warmup)
+        self.sim.process(self._arrivals())
+        self.sim.run(horizon)
+        return self.result(horizon - warmup)
+
+    def result(self, measured: float) -> dict:
+        def row(resource, kind, module=None):
+            return {
+                "name": resource.name,
+                "kind": kind,
+                "capabilities": list(module.capabilities) if module else [],
+                "utilization": resource.utilization(),
+                "mean_queue": resource.mean_queue(),
+                "max_queue": resource.max_queue,
+                "mean_wait": resource.mean_wait(),
+                "served": resource.served,
+                "errors": module.errors if module else 0,
+                "timeouts": module.timeouts if module else 0,
+            }
+
+        resources = [row(self.dispatcher, "dispatcher")]
+        resources += [row(m.resource, m.spec.station, m) for m in self.modules]
+        if self.transport is not None:
+            resources.append(row(self.transport, f"transport x{self.transport.capacity}"))
+        hours = measured / 3600.0
+        return {
+            "modules": len(self.modules),
+            "arrived": self.arrived,
+            "completed": self.completed,
+            "refused": self.refused,
+            "throughput_per_hour": self.completed / hours if hours > 0 else math.nan,
+            "per_chain": dict(self.per_chain),
+            "lead_time": self.lead_time.summary(scale=1.0),
+            "negotiation": self.negotiation.summary(scale=1.0),
+            "resources": resources,
+            "events": self.sim.events,
+        }
+
+
+def _setting(model, key, namespace):
+    value = model[key]
+    return getattr(namespace, key) if value is None else value
+
+
+def simulate(namespace: Namespace, model: dict, horizon: float, warmup: float = 0.0, seed=None) -> dict:
+    """One run of the namespace model; see :meth:`NamespaceSimulation.result` for the result dict."""
+    return NamespaceSimulation(namespace, model, seed).run(horizon, warmup)
@@ -0,0 +1,171 @@
+"""Loading, filtering and id rewriting for traffic replays.
+
+A capture is a list of :class:`~masbt_tools.traffic.Record` in time order.
+``load_capture`` reads
+
+* a traffic_recorder.py directory or ``.mtr`` segment,
+* JSONL with one ``{"ts", "topic", "qos", "retain", "payload"}`` object per
+  line (``traffic_recorder.py export``; ``timestamp``/``time`` also work,
+  as epoch seconds or ISO strings),
+* a JSON list of such objects, e.g. the CabABlue exports in
+  ``tests/TestResults``. Their ``direction: "in"`` entries repeat what
+  another actor published and are skipped, as are entries without a topic.
+
+Records without a timestamp keep their file order and are spaced ``gap``
+seconds apart.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import uuid
+
+from .codec import decode_payload
+from .messages import find_value
+from .topic_index import TopicIndex
+from .traffic import Record, TrafficArchive
+
+PRODUCT_KEYS = ("ProductId", "ProductIdentifier")
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.astimezone()
+        return moment.timestamp()
+
+
+def _capture_entry(entry):
+    topic = entry.get("topic")
+    if not topic or topic == "n/a" or entry.get("direction") == "in":
+        return None
+    payload = entry.get("payload", b"")
+    if not isinstance(payload, (bytes, str)):
+        payload = json.dumps(payload, ensure_ascii=False)
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    ts = _timestamp(entry.get("ts", entry.get("timestamp", entry.get("time"))))
+    return Record(ts, topic, int(entry.get("qos", 0)), bool(entry.get("retain", False)), payload)
+
+
+def load_capture(path: str, reverse: bool = False, gap: float = 0.0) -> list[Record]:
+    """Records of a capture file or recording, oldest first (see module docstring)."""
+    if os.path.isdir(path) or path.endswith(".mtr"):
+        with TrafficArchive(path) as archive:
+            return list(archive)
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if reverse:
+        entries.reverse()
+    records = []
+    for entry in entries:
+        record = _capture_entry(entry)
+        if record is not None:
+            records.append(record)
+    if any(r.timestamp is None for r in records):
+        previous = 0.0
+        for i, r in enumerate(records):
+            if r.timestamp is None:
+                records[i] = r._replace(timestamp=previous + gap if i else 0.0)
+            previous = records[i].timestamp
+    else:
+        records.sort(key=lambda r: r.timestamp)
+    return records
+
+
+def parse_message(payload: bytes):
+    """The I4.0 message of a JSON or binary payload, or ``None`` for payloads that are not one."""
+    try:
+        message = decode_payload(payload)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) and isinstance(message.get("frame"), dict) else None
+
+
+def sender_role(message) -> str:
+    role = ((message or {}).get("frame", {}).get("sender") or {}).get("role") or {}
+    return role.get("name") or ""
+
+
+class ReplayFilter:
+    """Selects the producers to replay.
+
+    A record is kept when its sender role *or* its frame type is listed
+    (e.g. ProductAgent CfPs plus every ``registerMessage``) and its topic
+    matches one of the topic filters. Empty criteria match everything.
+    """
+
+    def __init__(self, roles=(), types=(), topics=()):
+        self.roles = {r.lower() for r in roles}
+        self.types = {t.lower() for t in types}
+        self.topics = list(topics)
+        self._topic_index = TopicIndex(case_sensitive=True, strict=True)
+        for topic_filter in self.topics:
+            self._topic_index.add(topic_filter)
+
+    def matches(self, record: Record, message) -> bool:
+        if self.roles or self.types:
+            msg_type = ((message or {}).get("frame", {}).get("type") or "").lower()
+            if sender_role(message).lower() not in self.roles and msg_type not in self.types:
+                return False
+        if self.topics:
+            return record.topic in self._topic_index
+        return True
+
+
+class IdRewriter:
+    """Maps conversation and product ids of a capture to run-specific ids.
+
+    Every string value equal to a known id is replaced, wherever it occurs
+    in the message, as is every topic level equal to one. The same id
+    therefore stays consistent between a CfP, its replies and the
+    product-specific topics. In the CabABlue captures the conversationId
+    *is* the product id.
+    """
+
+    def __init__(self, tag: str | None = None, product_keys=PRODUCT_KEYS):
+        self.tag = tag or uuid.uuid4().hex[:6]
+        self.product_keys = tuple(product_keys)
+        self.mapping: dict[str, str] = {}
+
+    def collect(self, messages) -> None:
+        for message in messages:
+            if message is None:
+                continue
+            conversation_id = message["frame"].get("conversationId")
+            if conversation_id:
+                self._add(conversation_id)
+            elements = message.get("interactionElements")
+            for key in self.product_keys:
+                value = find_value(elements, key)
+                if isinstance(value, str) and value:
+                    self._add(value)
+
+    def _add(self, value: str) -> None:
+        if value not in self.mapping:
+            self.mapping[value] = f"{value}-{self.tag}"
+
+    def _rewrite(self, node):
+        if isinstance(node, str):
+            return self.mapping.get(node, node)
+        if isinstance(node, list):
+            return [self._rewrite(v) for v in node]
+        if isinstance(node, dict):
+            return {k: self._rewrite(v) for k, v in node.items()}
+        return node
+
+    def topic(self, topic: str) -> str:
+        return "/".join(self.mapping.get(level, level) for level in topic.split("/"))
+
+    def message(self, message) -> bytes:
+        return json.dumps(self._rewrite(message), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
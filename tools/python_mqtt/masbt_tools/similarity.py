@@ -0,0 +1,65 @@
+"""Vectorized cosine similarity for capability embeddings (requires numpy).
+
+The pairwise path (``quick_similarity_test.cosine_similarity``,
+``CalcPairwiseSimilarityNode``) loops over every pair and every dimension in
+Python. Here the vectors are L2-normalized once and the full N x N matrix is
+a single matrix product.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """float32 matrix with unit-length rows; zero vectors stay zero (similarity 0)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError(f"expected a 2-D array of embeddings, got shape {matrix.shape}")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def similarity_matrix(normalized: np.ndarray, other: np.ndarray | None = None) -> np.ndarray:
+    """Cosine similarity of all rows of ``normalized`` against ``other`` (default: itself)."""
+    return normalized @ (normalized if other is None else other).T
+
+
+def top_k(similarity: np.ndarray, k: int, threshold: float | None = None,
+          exclude_self: bool = True) -> list[list[tuple[int, float]]]:
+    """Per row the ``k`` best column indices with score, best first.
+
+    ``threshold`` drops neighbours below it; ``exclude_self`` ignores the
+    diagonal of a square self-similarity matrix.
+    """
+    scores = np.array(similarity, dtype=np.float32, copy=True)
+    rows, cols = scores.shape
+    if exclude_self and rows == cols:
+        np.fill_diagonal(scores, -np.inf)
+    k = max(0, min(k, cols - (1 if exclude_self and rows == cols else 0)))
+    if k == 0:
+        return [[] for _ in range(rows)]
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    result = []
+    for i in range(rows):
+        idx = candidates[i][np.argsort(-scores[i, candidates[i]], kind="stable")]
+        neighbours = [(int(j), float(scores[i, j])) for j in idx]
+        if threshold is not None:
+            neighbours = [(j, s) for j, s in neighbours if s >= threshold]
+        result.append(neighbours)
+    return result
+
+
+def pairs_above(similarity: np.ndarray, threshold: float) -> list[tuple[int, int, float]]:
+    """Unordered pairs (i < j) of a square matrix with similarity >= threshold, best first."""
+    upper = np.triu(similarity >= threshold, k=1)
+    ii, jj = np.nonzero(upper)
+    scores = similarity[ii, jj]
+    order = np.argsort(-scores, kind="stable")
+    return [(int(ii[o]), int(jj[o]), float(scores[o])) for o in order]
+
+
+def normalize_threshold(value: float) -> float:
+    """Accept thresholds as fraction (0.75) or percent (75.0, as in SimilarityAnalysisAgent.json)."""
+    value = float(value)
+    return value / 100.0 if value > 1.0 else value
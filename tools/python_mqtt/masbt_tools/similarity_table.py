@@ -0,0 +1,200 @@
+"""Precomputed cosine similarity table of capability texts (requires numpy).
+
+Every text gets one row; the table holds the cosine similarity of every
+pair of rows, so answering "how similar are A and B" is two dict lookups
+and one read from a memory-mapped file. Adding a text computes a single
+new row against the stored unit vectors (one matrix-vector product) and
+never recomputes the rest:
+
+    <dir>/<model>.vec   float32 unit vectors, one row per text
+    <dir>/<model>.tri   float32 lower triangle of the cosine matrix; row i
+                        holds sim(i, 0..i), so adding text i appends i + 1
+                        values at the end of the file
+    <dir>/<model>.idx   JSON lines: a header {"model", "dim"}, then
+                        {"t": <text>, "r": <row>}
+
+All three files are append-only. Vector and triangle rows are written
+before their index line, and torn rows beyond the index are cut off when
+the table is opened. One process writes at a time.
+
+    table = SimilarityTable("/tmp/simtable", "nomic-embed-text")
+    table.add("Capability_0: Assemble", vector)
+    table.similarity("Capability_0: Assemble", "Capability_1: Screw")
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+from .similarity import normalize_rows
+
+_F32 = struct.Struct("<f")
+
+
+def _triangle(row: int) -> int:
+    """Number of values stored before ``row`` in the packed lower triangle."""
+    return row * (row + 1) // 2
+
+
+class SimilarityTable:
+    def __init__(self, directory: str, model: str = "nomic-embed-text"):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model) or "model"
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.model = model
+        self.idx_path = os.path.join(directory, f"{slug}.idx")
+        self.vec_path = os.path.join(directory, f"{slug}.vec")
+        self.tri_path = os.path.join(directory, f"{slug}.tri")
+        self.dim: int | None = None
+        self.rows: dict[str, int] = {}
+        self._vec = None
+        self._tri = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.idx_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        end = data.rfind(b"\n") + 1  # a torn last line is dropped below
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "dim" in entry:
+                if entry.get("model") not in (None, self.model):
+                    raise ValueError(f"{self.idx_path} belongs to model '{entry.get('model')}'")
+                self.dim = int(entry["dim"])
+            else:
+                self.rows[entry["t"]] = int(entry["r"])
+        if end != len(data):
+            with open(self.idx_path, "r+b") as f:
+                f.truncate(end)
+        if self.dim is not None:
+            n = len(self.rows)
+            self._cut(self.vec_path, n * self.dim * 4)
+            self._cut(self.tri_path, _triangle(n) * 4)
+        self._remap()
+
+    @staticmethod
+    def _cut(path: str, size: int) -> None:
+        """Drop rows written after the last index line (crashed writer)."""
+        try:
+            actual = os.path.getsize(path)
+        except FileNotFoundError:
+            actual = 0
+        if actual < size:
+            raise ValueError(f"{path} is shorter than its index ({actual} < {size} bytes)")
+        if actual > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _remap(self) -> None:
+        self.close()
+        maps = []
+        for path in (self.vec_path, self.tri_path):
+            try:
+                with open(path, "rb") as f:
+                    maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                                if os.fstat(f.fileno()).st_size else None)
+            except FileNotFoundError:
+                maps.append(None)
+        self._vec, self._tri = maps
+
+    # --- lookups -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self.rows
+
+    def row(self, text: str) -> int | None:
+        return self.rows.get(text)
+
+    def similarity_rows(self, i: int, j: int) -> float:
+        if i < j:
+            i, j = j, i
+        return _F32.unpack_from(self._tri, (_triangle(i) + j) * 4)[0]
+
+    def similarity(self, a: str, b: str) -> float | None:
+        """Cosine similarity of two stored texts, ``None`` if either is unknown."""
+        i = self.rows.get(a)
+        j = self.rows.get(b)
+        if i is None or j is None:
+            return None
+        return self.similarity_rows(i, j)
+
+    def vectors(self) -> np.ndarray:
+        """The stored unit vectors as a read-only ``(rows, dim)`` view of the map (copy it to keep it)."""
+        if self._vec is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.frombuffer(self._vec, dtype="<f4", count=len(self.rows) * self.dim).reshape(-1, self.dim)
+
+    # --- updates -------------------------------------------------------------
+
+    def add(self, text: str, vector) -> int:
+        """Row of ``text``; a new text appends one vector and one triangle row."""
+        return self.add_many([text], [vector])[0]
+
+    def add_many(self, texts, vectors) -> list[int]:
+        """Rows of ``texts``; the new ones are scored with two matrix products, not pair by pair."""
+        new_texts, new_vectors, seen = [], [], set()
+        for text, vector in zip(texts, vectors):
+            if text not in self.rows and text not in seen:
+                seen.add(text)
+                new_texts.append(text)
+                new_vectors.append(vector)
+        if new_texts:
+            self._append(new_texts, normalize_rows(new_vectors))
+        return [self.rows[t] for t in texts]
+
+    def _append(self, texts, unit: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = unit.shape[1]
+            with open(self.idx_path, "ab") as idx:
+                idx.write(json.dumps({"model": self.model, "dim": self.dim, "dtype": "float32"}).encode() + b"\n")
+        elif unit.shape[1] != self.dim:
+            raise ValueError(f"embeddings have {unit.shape[1]} dimensions, the table holds {self.dim}")
+        old = self.vectors()
+        against_old = unit @ old.T
+        del old  # the map is replaced below and must not be exported any more
+        against_new = unit @ unit.T
+        # a zero vector has similarity 0 with everything, itself included (as in CalcPairwiseSimilarity)
+        np.fill_diagonal(against_new, (np.linalg.norm(unit, axis=1) > 0).astype(np.float32))
+        with open(self.vec_path, "ab") as vec, open(self.tri_path, "ab") as tri:
+            vec.write(unit.astype("<f4").tobytes())
+            for k in range(len(texts)):
+                tri.write(against_old[k].astype("<f4").tobytes())
+                tri.write(against_new[k, :k + 1].astype("<f4").tobytes())
+        first = len(self.rows)
+        with open(self.idx_path, "ab") as idx:
+            for k, text in enumerate(texts):
+                idx.write(json.dumps({"t": text, "r": first + k}, ensure_ascii=False).encode("utf-8") + b"\n")
+        for k, text in enumerate(texts):
+            self.rows[text] = first + k
+        self._remap()
+
+    def stats(self) -> dict:
+        n = len(self.rows)
+        return {"texts": n, "dim": self.dim, "pairs": n * (n - 1) // 2,
+                "bytes": (n * (self.dim or 0) + _triangle(n)) * 4}
+
+    def close(self) -> None:
+        for name in ("_vec", "_tri"):
+            m = getattr(self, name)
+            if m is not None:
+                m.close()
+                setattr(self, name, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,100 @@
+"""Latency histograms and simple rate counters for the load tools."""
+from __future__ import annotations
+
+import math
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram with bounded memory and ~1 % relative error.
+
+    Values are recorded in seconds; percentiles are reported from the
+    bucket's geometric midpoint, min/max/mean are exact.
+    """
+
+    __slots__ = ("_buckets", "_inv_log_growth", "_growth", "_floor", "count", "total", "min", "max")
+
+    def __init__(self, relative_error: float = 0.01, floor: float = 1e-6):
+        self._growth = 1.0 + 2.0 * relative_error
+        self._inv_log_growth = 1.0 / math.log(self._growth)
+        self._floor = floor
+        self._buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        if value < self._floor:
+            index = 0
+        else:
+            index = int(math.log(value / self._floor) * self._inv_log_growth) + 1
+        buckets = self._buckets
+        buckets[index] = buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, n in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _bucket_value(self, index: int) -> float:
+        if index == 0:
+            return self._floor
+        low = self._floor * self._growth ** (index - 1)
+        return low * math.sqrt(self._growth)
+
+    def percentile(self, p: float) -> float:
+        return self.percentiles((p,))[p]
+
+    def percentiles(self, ps=(50, 95, 99)) -> dict[float, float]:
+        """Several percentiles in one pass over the buckets."""
+        result = {}
+        if not self.count:
+            return {p: math.nan for p in ps}
+        ordered = sorted(self._buckets.items())
+        for p in sorted(ps):
+            if p >= 100:
+                result[p] = self.max
+                continue
+            rank = max(1, math.ceil(self.count * p / 100.0))
+            seen = 0
+            for index, n in ordered:
+                seen += n
+                if seen >= rank:
+                    result[p] = min(max(self._bucket_value(index), self.min), self.max)
+                    break
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def summary(self, scale: float = 1000.0) -> dict:
+        """count/mean/p50/p95/p99/max, values multiplied by ``scale`` (default: ms)."""
+        pct = self.percentiles((50, 95, 99))
+        return {
+            "count": self.count,
+            "mean": self.mean * scale,
+            "p50": pct[50] * scale,
+            "p95": pct[95] * scale,
+            "p99": pct[99] * scale,
+            "max": (self.max if self.count else math.nan) * scale,
+        }
+
+
+def format_summary_table(rows: dict[str, dict], unit: str = "ms") -> str:
+    """Render ``name -> LatencyHistogram.summary()`` rows as a text table."""
+    header = f"{'':<22} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  ({unit})"
+    lines = [header, "-" * len(header)]
+    for name, s in rows.items():
+        lines.append(f"{name:<22} {s['count']:>8} {s['mean']:>9.2f} {s['p50']:>9.2f} "
+                     f"{s['p95']:>9.2f} {s['p99']:>9.2f} {s['max']:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,334 @@
+"""Deterministic synthetic namespaces for scaling tests.
+
+:func:`plan_namespace` turns a module count, a capability vocabulary and a
+neighbour topology into a plan: modules with station names, capabilities
+and neighbours, plus product process chains. The chains are walks along
+the topology, so every step is offered by a module that is reachable from
+the previous step. :func:`render_files` derives the agent configs from the
+existing hand-written ones (NamespaceHolon, ManufacturingDispatcher,
+TransportManager, SimilarityAnalysisAgent and one module triplet), so the
+schema stays that of ``configs/specific_configs`` and only ids, names,
+namespace and endpoints change. The same seed always gives the same files.
+
+    plan = plan_namespace(100, DEFAULT_VOCABULARY, "grid", seed=7)
+    files = render_files(plan, "configs/specific_configs")  # {relative path: JSON object}
+"""
+from __future__ import annotations
+
+import collections
+import copy
+import json
+import math
+import os
+import random
+import uuid
+
+DEFAULT_VOCABULARY = {
+    "Drill": "Drills holes of a given depth and diameter into a workpiece",
+    "Screw": "Fastens parts with screws at a given torque",
+    "Assemble": "Joins two or more parts into an assembly with a gripper",
+    "PickAndPlace": "Picks a part from one position and places it at another",
+    "Mill": "Removes material with a rotating cutter to shape a surface",
+    "Weld": "Joins metal parts by fusing them with heat",
+    "Glue": "Applies adhesive and bonds two parts",
+    "Press": "Presses parts together or forms sheet metal with force",
+    "Cut": "Cuts material to length or along a contour",
+    "Polish": "Smooths a surface by abrasion",
+    "Paint": "Coats a part with paint or lacquer",
+    "Label": "Prints and applies a label to a product",
+    "Inspect": "Checks dimensions and surface quality of a part optically",
+    "Package": "Packs a finished product for shipping",
+    "Store": "Stores a carrier or part in a storage slot",
+    "Retrieve": "Retrieves a carrier or part from a storage slot",
+}
+# skill durations for namespace_sim (seconds, masbt_tools.distributions specs)
+DEFAULT_SKILL_TIME = {"Drill": "normal:40,8", "Screw": "normal:50,10", "Assemble": "normal:70,15"}
+TOPOLOGIES = ("line", "ring", "grid", "random")
+
+NAMESPACE_DIR = "NamespaceHolon"
+NAMESPACE_AGENTS = ("ManufacturingDispatcher", "TransportManager")
+SIMILARITY_AGENT = "SimilarityAnalysisAgent"
+
+
+def load_vocabulary(spec: str | None, size: int | None = None) -> dict[str, str]:
+    """Capability name -> description.
+
+    ``spec`` is a comma separated list of names (described from
+    :data:`DEFAULT_VOCABULARY` where known), a JSON file with a name ->
+    description object, or a text file with ``Name: description`` lines.
+    Without ``spec`` the first ``size`` default capabilities are used; a
+    larger ``size`` adds synthetic ``Process<k>`` steps.
+    """
+    if spec and os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            text = f.read()
+        if text.lstrip().startswith("{"):
+            vocabulary = {str(k): str(v) for k, v in json.loads(text).items()}
+        else:
+            vocabulary = {}
+            for line in text.splitlines():
+                name, _, description = line.partition(":")
+                if name.strip() and not name.lstrip().startswith("#"):
+                    vocabulary[name.strip()] = description.strip() or f"Performs the {name.strip()} process step"
+    elif spec:
+        names = [n.strip() for n in spec.split(",") if n.strip()]
+        vocabulary = {n: DEFAULT_VOCABULARY.get(n, f"Performs the {n} process step") for n in names}
+    else:
+        vocabulary = dict(DEFAULT_VOCABULARY)
+        if size is not None:
+            vocabulary = dict(list(vocabulary.items())[:size])
+            for k in range(len(vocabulary), size):
+                vocabulary[f"Process{k:03d}"] = f"Synthetic process step {k}"
+    if not vocabulary:
+        raise ValueError("capability vocabulary is empty")
+    return vocabulary
+
+
+def build_topology(n: int, kind: str, rng: random.Random, degree: float = 3.0) -> list[list[int]]:
+    """Sorted neighbour indexes per module for a ``line``, ``ring``, ``grid`` or connected ``random`` graph."""
+    edges = set()
+    if kind in ("line", "ring"):
+        edges.update((i, i + 1) for i in range(n - 1))
+        if kind == "ring" and n > 2:
+            edges.add((0, n - 1))
+    elif kind == "grid":
+        side = math.ceil(math.sqrt(n))
+        for i in range(n):
+            if (i + 1) % side and i + 1 < n:
+                edges.add((i, i + 1))
+            if i + side < n:
+                edges.add((i, i + side))
+    elif kind == "random":
+        for i in range(1, n):  # random spanning tree keeps the graph connected
+            edges.add((rng.randrange(i), i))
+        wanted = min(int(round(degree * n / 2)), n * (n - 1) // 2)
+        while len(edges) < wanted:
+            a, b = rng.randrange(n), rng.randrange(n)
+            if a != b:
+                edges.add((min(a, b), max(a, b)))
+    else:
+        raise ValueError(f"unknown topology '{kind}' (choose from {', '.join(TOPOLOGIES)})")
+    neighbors = [[] for _ in range(n)]
+    for a, b in edges:
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    return [sorted(adjacent) for adjacent in neighbors]
+
+
+def hop_stats(neighbors: list[list[int]], sources) -> tuple[int, float]:
+    """Largest and mean hop distance from ``sources`` to every reachable module (BFS)."""
+    longest, total, pairs = 0, 0, 0
+    for source in sources:
+        distance = {source: 0}
+        queue = collections.deque([source])
+        while queue:
+            node = queue.popleft()
+            for other in neighbors[node]:
+                if other not in distance:
+                    distance[other] = distance[node] + 1
+                    queue.append(other)
+        longest = max(longest, max(distance.values()))
+        total += sum(distance.values())
+        pairs += len(distance) - 1
+    return longest, total / pairs if pairs else 0.0
+
+
+def _assign_capabilities(n, names, per_module, redundancy, rng):
+    """Capability sets per module: every capability on ``redundancy`` modules, then filled to ``per_module``."""
+    caps = [set() for _ in range(n)]
+    for name in names:  # the least loaded modules, ties broken at random
+        ranked = sorted(range(n), key=lambda i: (len(caps[i]), rng.random()))
+        for i in ranked[:min(redundancy, n)]:
+            caps[i].add(name)
+    for module_caps in caps:
+        missing = [c for c in names if c not in module_caps]
+        rng.shuffle(missing)
+        module_caps.update(missing[:max(0, per_module - len(module_caps))])
+    rank = {name: k for k, name in enumerate(names)}
+    return [sorted(module_caps, key=rank.get) for module_caps in caps]
+
+
+def _new_uuid(rng) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def plan_namespace(modules: int, vocabulary: dict[str, str], topology: str = "grid", *, seed: int = 1,
+                   namespace: str = "_SYNTHETIC", prefix: str = "P", first_id: int = 1000, caps_per_module: int = 2,
+                   redundancy: int = 2, degree: float = 3.0, chains: int = 5, min_steps: int = 3,
+                   max_steps: int = 6) -> dict:
+    """The scenario as plain data (the ``scenario.json`` manifest)."""
+    if modules < 1:
+        raise ValueError("need at least one module")
+    if not 1 <= min_steps <= max_steps:
+        raise ValueError("need 1 <= min_steps <= max_steps")
+    if caps_per_module < 1:
+        raise ValueError("need at least one capability per module")
+    rng = random.Random(seed)
+    names = list(vocabulary)
+    neighbors = build_topology(modules, topology, rng, degree)
+    capabilities = _assign_capabilities(modules, names, caps_per_module, redundancy, rng)
+    ids = [f"{prefix}{first_id + i}" for i in range(modules)]
+    plan_modules = [{"id": ids[i], "module_name": "".join(capabilities[i]) + "Station",
+                     "capabilities": capabilities[i], "neighbors": [ids[j] for j in neighbors[i]]}
+                    for i in range(modules)]
+
+    plan_chains = []
+    for k in range(chains):
+        node = rng.randrange(modules)
+        steps, route = [], []
+        for _ in range(rng.randint(min_steps, max_steps)):
+            steps.append(rng.choice(capabilities[node]))
+            route.append(ids[node])
+            if neighbors[node] and rng.random() < 0.7:  # otherwise the next step stays on the module
+                node = rng.choice(neighbors[node])
+        plan_chains.append({"name": f"Product_{k:03d}", "steps": steps, "route": route, "weight": 1,
+                            "identifier": f"https://example.org/shells/{namespace.strip('_').lower()}/product/{k:03d}",
+                            "order_number": _new_uuid(rng), "conversation_id": _new_uuid(rng)})
+    return {"seed": seed, "namespace": namespace, "topology": topology, "capabilities": vocabulary,
+            "modules": plan_modules, "chains": plan_chains}
+
+
+# --- config rendering --------------------------------------------------------
+
+def _load_template(template_dir, name):
+    for path in (os.path.join(template_dir, NAMESPACE_DIR, f"{name}.json"),
+                 os.path.join(template_dir, "Module_configs", name.split("_")[0], f"{name}.json")):
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    raise ValueError(f"template config '{name}' not found below {template_dir}")
+
+
+def _set(config, path, value):
+    """Set a dotted ``path`` if its parent object exists in the template (no new sections)."""
+    keys = path.split(".")
+    node = config
+    for key in keys[:-1]:
+        node = node.get(key)
+        if not isinstance(node, dict):
+            return
+    node[keys[-1]] = value
+
+
+def _mqtt(config, broker, port):
+    mqtt = config.get("MQTT")
+    if not isinstance(mqtt, dict):
+        return
+    if broker:
+        for key in ("Broker", "BrokerAddress"):
+            if key in mqtt:
+                mqtt[key] = broker
+    if port:
+        mqtt["Port"] = port
+
+
+def product_request(template: dict, chain: dict) -> dict:
+    """ProcessChain CfP of ``chain`` in the format of tests/TestFiles/ProcessChain.json."""
+    message = copy.deepcopy(template)
+    elements = {e.get("idShort"): e for e in message["interactionElements"]}
+    capability_set = elements["CapabilitySet"]
+    containers = {}
+    for container in capability_set["value"]:
+        capability = next((e["idShort"] for e in container.get("value", ()) if e.get("modelType") == "Capability"),
+                          container["idShort"])
+        containers[capability] = container
+    value = []
+    for step in chain["steps"]:
+        container = containers.get(step) or {
+            "idShort": f"{step}Container", "kind": "Instance", "modelType": "SubmodelElementCollection",
+            "value": [{"idShort": step, "kind": "Instance", "modelType": "Capability"}]}
+        value.append(container)
+    capability_set["value"] = value
+    product = {"Identifier": chain["identifier"], "ProductName": chain["name"],
+               "OrderNumber": chain["order_number"], "RootOrderNumber": chain["order_number"]}
+    for prop in (elements.get("ProductIdentification") or {}).get("value", ()):
+        if prop.get("idShort") in product:
+            prop["value"] = product[prop["idShort"]]
+    message["frame"]["sender"]["identification"]["id"] = chain["identifier"]
+    message["frame"]["conversationId"] = chain["conversation_id"]
+    return message
+
+
+def render_files(plan: dict, template_dir: str, *, template_module: str = "P102", product_template: str | None = None,
+                 broker: str | None = None, port: int | None = None, dispatcher_modules: bool = True,
+                 opcua_endpoint: str = "opc.tcp://localhost:{port}", opcua_base_port: int = 14840,
+                 skill_time: dict | None = None) -> dict[str, object]:
+    """Relative path -> JSON object (text for ``descriptions.txt``) of every generated file.
+
+    ``NamespaceHolon/`` holds the namespace agents and all module triplets
+    side by side, because SubHolons are resolved next to the parent config.
+    """
+    ns = plan["namespace"]
+    suffix = ns.strip("_").lower() or "namespace"
+    files = {}
+
+    def agent(name, config):
+        _mqtt(config, broker, port)
+        _set(config, "Namespace", ns)
+        files[f"{NAMESPACE_DIR}/{name}.json"] = config
+
+    agent_ids = {name: f"{name}_{suffix}" for name in NAMESPACE_AGENTS}
+    root = _load_template(template_dir, "NamespaceHolon")
+    for key in ("Agent.AgentId", "Agent.ModuleId", "ExternalNamespace"):
+        _set(root, key, ns)
+    _set(root, "MQTT.ClientId", f"NamespaceHolon_{suffix}")
+    _set(root, "NamespaceHolon.ManufacturingAgentId", agent_ids["ManufacturingDispatcher"])
+    _set(root, "NamespaceHolon.TransportAgentId", agent_ids["TransportManager"])
+    root["SubHolons"] = [*NAMESPACE_AGENTS, *(m["id"] for m in plan["modules"]), SIMILARITY_AGENT]
+    agent("NamespaceHolon", root)
+
+    for name in NAMESPACE_AGENTS:
+        config = _load_template(template_dir, name)
+        for key in ("Agent.AgentId", "Agent.ModuleId", "MQTT.ClientId"):
+            _set(config, key, agent_ids[name])
+        if name == "ManufacturingDispatcher" and dispatcher_modules:
+            # seeds DispatchingState like registrations would (InitializeAgentState reads DispatchingAgent.Modules)
+            _set(config, "DispatchingAgent.Modules", [
+                {"ModuleId": m["id"], "Capabilities": m["capabilities"], "Neighbors": m["neighbors"]}
+                for m in plan["modules"]])
+        agent(name, config)
+
+    similarity = _load_template(template_dir, SIMILARITY_AGENT)
+    _set(similarity, "MQTT.ClientId", f"{SIMILARITY_AGENT}_{suffix}")
+    agent(SIMILARITY_AGENT, similarity)
+
+    module = _load_template(template_dir, template_module)
+    planning = _load_template(template_dir, f"{template_module}_Planning_agent")
+    execution = _load_template(template_dir, f"{template_module}_Execution_agent")
+    for k, m in enumerate(plan["modules"]):
+        module_id = m["id"]
+        holon = copy.deepcopy(module)
+        _set(holon, "Agent.AgentId", module_id)
+        _set(holon, "Agent.ModuleName", m["module_name"])
+        holon["SubHolons"] = [f"{module_id}_Planning_agent", f"{module_id}_Execution_agent"]
+        agent(module_id, holon)
+        for sub, template in (("Planning_agent", planning), ("Execution_agent", execution)):
+            config = copy.deepcopy(template)
+            for key in ("Agent.AgentId", "Agent.ModuleId"):
+                _set(config, key, module_id)
+            _set(config, "Agent.ModuleName", m["module_name"])
+            _set(config, "OPCUA.Endpoint", opcua_endpoint.format(port=opcua_base_port + k, id=module_id))
+            agent(f"{module_id}_{sub}", config)
+
+    if product_template:
+        with open(product_template, "r", encoding="utf-8") as f:
+            template = json.load(f)
+        for chain in plan["chains"]:
+            files[f"products/{chain['name']}.json"] = product_request(template, chain)
+
+    times = {**DEFAULT_SKILL_TIME, **(skill_time or {})}
+    stations = {}
+    for m in plan["modules"]:
+        stations.setdefault(m["module_name"], m["capabilities"])
+    files["model.json"] = {  # namespace_sim.py --model
+        "chains": [{"name": c["name"], "steps": c["steps"], "weight": c["weight"]} for c in plan["chains"]],
+        "stations": stations,
+        "skill_time": {name: times[name] for name in plan["capabilities"] if name in times},
+    }
+    files["fleet.json"] = {"modules": [{"id": m["id"], "capabilities": m["capabilities"]}  # module_holon_fleet.py
+                                       for m in plan["modules"]]}
+    # similarity_responder.py --texts: what the dispatcher sends to CalcSimilarity
+    files["descriptions.txt"] = "".join(f"{name}\n{description}\n"
+                                        for name, description in plan["capabilities"].items())
+    files["scenario.json"] = plan
+    return files
@@ -0,0 +1,183 @@
+"""Topic-filter index: all matching filters of a topic in time proportional to its depth.
+
+A segment trie over MQTT filters with ``+`` and ``#`` wildcards. Every
+wildcard captures the topic segment(s) it matched, as ``TopicPattern`` of
+the agents' ``TopicBridgeService`` does. Matching walks the topic once and
+follows at most the exact, ``+`` and ``#`` child of each node, so the cost
+does not grow with the number of filters:
+
+    index = TopicIndex()
+    index.add("/phuket/+/Planning/OfferedCapability/Request", planning_handler)
+    index.add("/phuket/#", recorder)
+    for m in index.match("/phuket/P102/Planning/OfferedCapability/Request"):
+        m.value(m.captures)                    # ("P102",) / ("P102/Planning/...",)
+    format_topic("/{0}/Inventory", ("P102",))  # "/P102/Inventory"
+
+By default topics and filters are normalized like ``TopicPattern``: a
+leading ``/`` is added, empty segments are dropped and literal segments
+compare case-insensitively. ``strict=True`` keeps MQTT semantics instead
+(empty levels count, ``$`` topics are not matched by leading wildcards),
+and ``case_sensitive=True`` compares segments exactly. Results come back in
+the order the filters were added, so ``first`` gives the bridge's
+first-rule-wins behaviour.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+
+SYS_PREFIX = "$"
+TopicMatch = namedtuple("TopicMatch", "filter value captures")
+
+
+class _Node:
+    __slots__ = ("children", "plus", "hash", "entries")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.plus: _Node | None = None
+        self.hash: list = []     # (seq, filter, value) of filters ending in "#" below this node
+        self.entries: list = []  # (seq, filter, value) of filters ending at this node
+
+    def empty(self) -> bool:
+        return not (self.children or self.plus or self.hash or self.entries)
+
+
+class TopicIndex:
+    """Segment trie of topic filters, each mapped to one or more values."""
+
+    def __init__(self, case_sensitive: bool = False, strict: bool = False, cache_size: int = 10_000):
+        self.case_sensitive = case_sensitive
+        self.strict = strict
+        self._root = _Node()
+        self._seq = 0
+        self._count = 0
+        self._cache: dict[str, list[TopicMatch]] = {}
+        self._cache_size = cache_size
+
+    def _levels(self, topic: str) -> list[str]:
+        if self.strict:
+            return topic.split("/")
+        return [level for level in topic.strip().split("/") if level]
+
+    def _key(self, level: str) -> str:
+        return level if self.case_sensitive else level.lower()
+
+    def _walk(self, topic_filter: str, create: bool):
+        """``([(node, level), ...], ends_in_hash)`` from the root; the path is ``None`` if not indexed."""
+        levels = self._levels(topic_filter)
+        path = [(self._root, None)]
+        node = self._root
+        for i, level in enumerate(levels):
+            if level == "#":
+                if i != len(levels) - 1:
+                    raise ValueError(f"'#' must be the last level: {topic_filter!r}")
+                return path, True
+            if level == "+":
+                child = node.plus
+                if child is None:
+                    if not create:
+                        return None, False
+                    child = node.plus = _Node()
+            else:
+                if "+" in level or "#" in level:
+                    raise ValueError(f"wildcards must fill a whole level: {topic_filter!r}")
+                key = self._key(level)
+                child = node.children.get(key)
+                if child is None:
+                    if not create:
+                        return None, False
+                    child = node.children[key] = _Node()
+            path.append((child, level))
+            node = child
+        return path, False
+
+    def add(self, topic_filter: str, value=None) -> None:
+        """Index ``topic_filter``; the same filter may carry several values."""
+        path, multi = self._walk(topic_filter, create=True)
+        node = path[-1][0]
+        (node.hash if multi else node.entries).append((self._seq, topic_filter, value))
+        self._seq += 1
+        self._count += 1
+        self._cache.clear()
+
+    def remove(self, topic_filter: str, value=None) -> int:
+        """Remove the filter's entries with ``value`` (all of them if ``None``); returns how many."""
+        path, multi = self._walk(topic_filter, create=False)
+        if path is None:
+            return 0
+        node = path[-1][0]
+        bucket = node.hash if multi else node.entries
+        kept = [e for e in bucket if e[1] != topic_filter or (value is not None and e[2] != value)]
+        removed = len(bucket) - len(kept)
+        bucket[:] = kept
+        # prune empty branches
+        for depth in range(len(path) - 1, 0, -1):
+            child, level = path[depth]
+            if not child.empty():
+                break
+            parent = path[depth - 1][0]
+            if level == "+":
+                parent.plus = None
+            else:
+                del parent.children[self._key(level)]
+        self._count -= removed
+        self._cache.clear()
+        return removed
+
+    def __len__(self) -> int:
+        return self._count
+
+    def match(self, topic: str) -> list[TopicMatch]:
+        """All matching filters in the order they were added, with their captures."""
+        result = self._cache.get(topic)
+        if result is not None:
+            return result
+        levels = self._levels(topic)
+        keys = levels if self.case_sensitive else [level.lower() for level in levels]
+        n = len(levels)
+        system = self.strict and topic.startswith(SYS_PREFIX)
+        found = []
+        stack = [(self._root, 0, ())]
+        while stack:
+            node, depth, captures = stack.pop()
+            wildcard_ok = not (system and depth == 0)
+            if node.hash and wildcard_ok:
+                rest = ("/".join(levels[depth:]),)
+                found.extend((entry, captures + rest) for entry in node.hash)
+            if depth == n:
+                found.extend((entry, captures) for entry in node.entries)
+                continue
+            child = node.children.get(keys[depth])
+            if child is not None:
+                stack.append((child, depth + 1, captures))
+            if node.plus is not None and wildcard_ok:
+                stack.append((node.plus, depth + 1, captures + (levels[depth],)))
+        found.sort(key=lambda item: item[0][0])
+        result = [TopicMatch(entry[1], entry[2], captures) for entry, captures in found]
+        if self._cache_size > 0:  # 0 disables the cache
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[topic] = result
+        return result
+
+    def first(self, topic: str) -> TopicMatch | None:
+        """The earliest added matching filter, or ``None``."""
+        matches = self.match(topic)
+        return matches[0] if matches else None
+
+    def __contains__(self, topic: str) -> bool:
+        return bool(self.match(topic))
+
+
+def format_topic(template: str, captures) -> str:
+    """Fill ``{0}``, ``{1}`` ... with captures and normalize, like ``TopicPattern.Format``."""
+    topic = template
+    if captures and "{" in template:
+        try:
+            topic = template.format(*captures)
+        except (IndexError, KeyError, ValueError):
+            topic = template
+    topic = topic.strip()
+    if not topic.startswith("/"):
+        topic = "/" + topic
+    return topic.rstrip("/")
@@ -0,0 +1,377 @@
+"""Append-only, block-compressed MQTT traffic segments with side indexes.
+
+A recording directory holds rotating segment pairs:
+
+    seg-<start>-<n>.mtr   b"MTRSEG1\\n", then blocks of
+                          [u32 compressed][u32 raw][u32 records][zlib data]
+    seg-<start>-<n>.idx   one JSON line per block, written after the block:
+                          {"block": offset, "n": count, "t0": .., "t1": ..,
+                           "conversation": {id: [i, ...]}, "topic": {...}, "type": {...}}
+
+A record inside a block is ``[f64 ts][u8 flags][u16 topic][u32 payload]``
+followed by topic and payload bytes (flags: QoS in bits 0-1, retain bit 2,
+bit 3 for payloads stored in the ``masbt_tools.codec`` binary form; those
+are read back as canonical JSON, and a non-default dictionary is kept next
+to the segments as ``dictionary-<id>.json``).
+Records are addressed as ``(segment, block offset, index)``, so the reader
+decompresses only the blocks that hold the requested conversation, topic or
+frame type. Segment files are memory-mapped for reading. Index lines are
+written only after their block, so a crash loses at most the block being
+filled; ``rebuild_index`` recreates a missing or truncated ``.idx``.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from .codec import DEFAULT_DICTIONARY, BinaryCodec, Dictionary, canonical_json, register_dictionary
+from .frame_scan import FrameScanner
+
+MAGIC = b"MTRSEG1\n"
+_BLOCK_HEADER = struct.Struct("<III")
+_RECORD_HEADER = struct.Struct("<dBHI")
+
+Record = namedtuple("Record", "timestamp topic qos retain payload")
+
+_FRAME_SCANNER = FrameScanner()
+
+
+def frame_fields(payload: bytes) -> tuple[str | None, str | None]:
+    """``(conversationId, frame type)`` of an I4.0 message, ``(None, None)`` for other payloads."""
+    fields = _FRAME_SCANNER.scan(payload)
+    if fields is None:
+        return None, None
+    return fields.conversation_id, fields.type
+
+
+class _BlockBuilder:
+    __slots__ = ("parts", "size", "count", "t0", "t1", "conversation", "topic", "type")
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.count = 0
+        self.t0 = None
+        self.t1 = None
+        self.conversation: dict[str, list[int]] = {}
+        self.topic: dict[str, list[int]] = {}
+        self.type: dict[str, list[int]] = {}
+
+    def add(self, timestamp, topic, qos, retain, payload, encoded=None):
+        """Index ``payload``; store ``encoded`` (its binary form) instead if given."""
+        topic_bytes = topic.encode("utf-8")
+        index = self.count
+        flags = qos | (4 if retain else 0)
+        stored = payload
+        if encoded is not None:
+            flags |= 8
+            stored = encoded
+        self.parts.append(_RECORD_HEADER.pack(timestamp, flags, len(topic_bytes), len(stored)))
+        self.parts.append(topic_bytes)
+        self.parts.append(stored)
+        self.size += _RECORD_HEADER.size + len(topic_bytes) + len(stored)
+        self.count += 1
+        if self.t0 is None:
+            self.t0 = timestamp
+        self.t1 = timestamp
+        self.topic.setdefault(topic, []).append(index)
+        conversation_id, msg_type = frame_fields(payload)
+        if conversation_id:
+            self.conversation.setdefault(conversation_id, []).append(index)
+        if msg_type:
+            self.type.setdefault(msg_type, []).append(index)
+
+
+class SegmentWriter:
+    """Writes records into rotating segments below ``directory``.
+
+    With a ``codec`` (:class:`masbt_tools.codec.BinaryCodec`) JSON payloads
+    are stored in binary form; other payloads are stored as they are.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 256 * 1024 * 1024, segment_seconds: float = 3600.0,
+                 block_bytes: int = 64 * 1024, flush_seconds: float = 1.0, level: int = 1,
+                 codec: BinaryCodec | None = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.block_bytes = block_bytes
+        self.flush_seconds = flush_seconds
+        self.level = level
+        self.codec = codec
+        os.makedirs(directory, exist_ok=True)
+        if codec is not None and codec.dictionary.id != DEFAULT_DICTIONARY.id:
+            codec.dictionary.save(os.path.join(directory, f"dictionary-{codec.dictionary.id:08x}.json"))
+        self._data = None
+        self._index = None
+        self._segment_started = 0.0
+        self._sequence = len(glob.glob(os.path.join(directory, "seg-*.mtr")))
+        self._block = _BlockBuilder()
+        self._block_started = 0.0
+        self.records = 0
+        self.raw_bytes = 0
+        self.written_bytes = 0
+        self.segments = 0
+
+    def append(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False,
+               timestamp: float | None = None) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        block = self._block
+        if not block.count:
+            self._block_started = time.monotonic()
+        encoded = None
+        if self.codec is not None:
+            try:
+                encoded = self.codec.encode_json(payload)
+            except ValueError:
+                pass  # not JSON, stored as is
+        block.add(timestamp, topic, qos, retain, payload, encoded)
+        self.records += 1
+        if block.size >= self.block_bytes:
+            self.flush()
+
+    def tick(self) -> None:
+        """Flush a partially filled block once it is older than ``flush_seconds``."""
+        if self._block.count and time.monotonic() - self._block_started >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        block = self._block
+        if not block.count:
+            return
+        self._block = _BlockBuilder()
+        if self._data is None or self._segment_full():
+            self._rotate()
+        raw = b"".join(block.parts)
+        compressed = zlib.compress(raw, self.level)
+        offset = self._data.tell()
+        self._data.write(_BLOCK_HEADER.pack(len(compressed), len(raw), block.count) + compressed)
+        self._data.flush()
+        entry = {"block": offset, "n": block.count, "t0": block.t0, "t1": block.t1,
+                 "conversation": block.conversation, "topic": block.topic, "type": block.type}
+        self._index.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._index.flush()
+        self.raw_bytes += len(raw)
+        self.written_bytes += _BLOCK_HEADER.size + len(compressed)
+
+    def _segment_full(self) -> bool:
+        return (self._data.tell() >= self.segment_bytes
+                or time.monotonic() - self._segment_started >= self.segment_seconds)
+
+    def _rotate(self) -> None:
+        self._close_files()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        base = os.path.join(self.directory, f"seg-{stamp}-{self._sequence:06d}")
+        self._sequence += 1
+        self._data = open(base + ".mtr", "wb")
+        self._data.write(MAGIC)
+        self._index = open(base + ".idx", "w", encoding="utf-8")
+        self._segment_started = time.monotonic()
+        self.segments += 1
+
+    def _close_files(self) -> None:
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = None
+        self._index = None
+
+    def close(self) -> None:
+        self.flush()
+        self._close_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_block(buf, offset: int) -> list[Record]:
+    compressed_len, raw_len, count = _BLOCK_HEADER.unpack_from(buf, offset)
+    start = offset + _BLOCK_HEADER.size
+    raw = zlib.decompress(buf[start:start + compressed_len], bufsize=raw_len)
+    records = []
+    pos = 0
+    for _ in range(count):
+        timestamp, flags, topic_len, payload_len = _RECORD_HEADER.unpack_from(raw, pos)
+        pos += _RECORD_HEADER.size
+        topic = raw[pos:pos + topic_len].decode("utf-8")
+        pos += topic_len
+        payload = raw[pos:pos + payload_len]
+        if flags & 8:
+            payload = canonical_json(BinaryCodec.decode(payload))
+        records.append(Record(timestamp, topic, flags & 3, bool(flags & 4), payload))
+        pos += payload_len
+    return records
+
+
+def _block_offsets(buf) -> list[int]:
+    offsets = []
+    offset = len(MAGIC)
+    size = len(buf)
+    while offset + _BLOCK_HEADER.size <= size:
+        compressed_len = _BLOCK_HEADER.unpack_from(buf, offset)[0]
+        if offset + _BLOCK_HEADER.size + compressed_len > size:
+            break  # torn block at the end
+        offsets.append(offset)
+        offset += _BLOCK_HEADER.size + compressed_len
+    return offsets
+
+
+def load_dictionaries(directory: str) -> None:
+    """Register the codec dictionaries stored in a recording directory."""
+    for path in glob.glob(os.path.join(directory, "dictionary-*.json")):
+        register_dictionary(Dictionary.load(path))
+
+
+def rebuild_index(segment_path: str) -> int:
+    """Recreate the ``.idx`` of a segment by scanning it; returns the number of blocks."""
+    with open(segment_path, "rb") as f:
+        buf = f.read()
+    if not buf.startswith(MAGIC):
+        raise ValueError(f"{segment_path} is not a traffic segment")
+    load_dictionaries(os.path.dirname(segment_path))
+    lines = []
+    for offset in _block_offsets(buf):
+        block = _BlockBuilder()
+        for r in _read_block(buf, offset):
+            block.add(r.timestamp, r.topic, r.qos, r.retain, r.payload)
+        lines.append(json.dumps({"block": offset, "n": block.count, "t0": block.t0, "t1": block.t1,
+                                 "conversation": block.conversation, "topic": block.topic, "type": block.type},
+                                separators=(",", ":"), ensure_ascii=False))
+    with open(segment_path[:-4] + ".idx", "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+    return len(lines)
+
+
+class _Segment:
+    __slots__ = ("path", "blocks", "conversation", "topic", "type", "_file", "_map")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blocks = []  # (offset, count, t0, t1)
+        self.conversation: dict[str, list[tuple[int, int]]] = {}
+        self.topic: dict[str, list[tuple[int, int]]] = {}
+        self.type: dict[str, list[tuple[int, int]]] = {}
+        self._file = None
+        self._map = None
+        index_path = path[:-4] + ".idx"
+        if not os.path.exists(index_path):
+            rebuild_index(path)
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # line still being written
+                entry = json.loads(line)
+                offset = entry["block"]
+                self.blocks.append((offset, entry["n"], entry["t0"], entry["t1"]))
+                for key in ("conversation", "topic", "type"):
+                    target = getattr(self, key)
+                    for value, positions in entry[key].items():
+                        target.setdefault(value, []).extend((offset, i) for i in positions)
+
+    def buffer(self):
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __iter__(self):
+        buf = self.buffer()
+        for offset, _count, _t0, _t1 in self.blocks:
+            yield from _read_block(buf, offset)
+
+    def raw_size(self) -> int:
+        """Uncompressed size of all indexed blocks, read from the block headers."""
+        buf = self.buffer()
+        return sum(_BLOCK_HEADER.unpack_from(buf, offset)[1] for offset, _n, _t0, _t1 in self.blocks)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+
+class TrafficArchive:
+    """Reader over all segments of a recording directory (or a single ``.mtr`` file)."""
+
+    def __init__(self, path: str):
+        paths = [path] if path.endswith(".mtr") else sorted(glob.glob(os.path.join(path, "seg-*.mtr")))
+        load_dictionaries(os.path.dirname(path) if path.endswith(".mtr") else path)
+        self.segments = [_Segment(p) for p in paths]
+        self._cache_key = None
+        self._cache_records = None
+
+    def _records(self, segment: _Segment, refs) -> list[Record]:
+        result = []
+        for offset, i in refs:
+            key = (segment.path, offset)
+            if key != self._cache_key:
+                self._cache_records = _read_block(segment.buffer(), offset)
+                self._cache_key = key
+            result.append(self._cache_records[i])
+        return result
+
+    def _lookup(self, field: str, value: str) -> list[Record]:
+        result = []
+        for segment in self.segments:
+            refs = getattr(segment, field).get(value)
+            if refs:
+                result.extend(self._records(segment, refs))
+        result.sort(key=lambda r: r.timestamp)
+        return result
+
+    def conversation(self, conversation_id: str) -> list[Record]:
+        return self._lookup("conversation", conversation_id)
+
+    def topic(self, topic: str) -> list[Record]:
+        return self._lookup("topic", topic)
+
+    def type(self, msg_type: str) -> list[Record]:
+        return self._lookup("type", msg_type)
+
+    def keys(self, field: str) -> dict[str, int]:
+        """Distinct conversation ids / topics / types with their record counts."""
+        counts: dict[str, int] = {}
+        for segment in self.segments:
+            for value, refs in getattr(segment, field).items():
+                counts[value] = counts.get(value, 0) + len(refs)
+        return counts
+
+    def __iter__(self):
+        """All records in recording order."""
+        for segment in self.segments:
+            yield from segment
+
+    def between(self, start: float | None = None, end: float | None = None):
+        """Records with ``start <= timestamp < end``; blocks outside the window are skipped."""
+        for segment in self.segments:
+            for offset, _count, t0, t1 in segment.blocks:
+                if (end is not None and t0 >= end) or (start is not None and t1 < start):
+                    continue
+                for r in _read_block(segment.buffer(), offset):
+                    if (start is None or r.timestamp >= start) and (end is None or r.timestamp < end):
+                        yield r
+
+    def __len__(self) -> int:
+        return sum(count for s in self.segments for _o, count, _t0, _t1 in s.blocks)
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
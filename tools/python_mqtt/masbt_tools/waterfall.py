@@ -0,0 +1,282 @@
+"""Per-hop latency analysis of process-chain negotiations.
+
+Messages are grouped into negotiations by conversationId. Each message is
+classified into a hop (``cfp_broadcast``, ``offer_response`` ...) from its
+topic and frame type, and linked to the message that triggered it: the
+latest earlier message addressed to its sender (or broadcast). The gap
+between the two is the time the sender needed to react, including broker
+transit. Following these links back from the ProcessChain /
+ManufacturingSequence response gives the critical path of the negotiation.
+
+Timestamps are the times a subscriber saw the messages, so one recorder
+(traffic_recorder.py) or one live subscription provides a common clock for
+all agents.
+"""
+from __future__ import annotations
+
+import re
+from collections import namedtuple
+
+from .replay import parse_message
+from .stats import LatencyHistogram
+
+Event = namedtuple("Event", "timestamp topic hop type sender role receiver")
+
+BROADCAST_RECEIVERS = {"", "broadcast", "all", "*"}
+
+# (hop, pattern on the topic without namespace); the first match wins
+HOP_RULES = [
+    ("process_chain_request", re.compile(r"(^|/)(ProcessChain|ManufacturingSequence)/Request$")),
+    ("process_chain_response", re.compile(r"(^|/)(ProcessChain|ManufacturingSequence)/Response$")),
+    ("cfp_broadcast", re.compile(r"^ModuleHolon/broadcast/OfferedCapability/Request$")),
+    ("cfp_forward", re.compile(r"(^|/)Planning/OfferedCapability/Request$")),
+    ("offer_response", re.compile(r"(^|/)OfferedCapability/Response$")),
+    ("create_description", re.compile(r"(^|/)CreateDescription$")),
+    ("calc_similarity", re.compile(r"(^|/)Calc(Described|Pairwise)?Similarity$")),
+    ("similarity_response", re.compile(r"(^|/)Dispatching/Similarity$")),
+    ("transport_request", re.compile(r"(^|/)TransportPlan/Request$")),
+    ("transport_response", re.compile(r"(^|/)TransportPlan/Response$")),
+    ("book_step", re.compile(r"(^|/)BookStep/(Request|Response)$")),
+]
+# CreateDescription / CalcSimilarity answers come back on the request topic
+_REQUEST_TYPES = ("calc", "create", "callforproposal", "request")
+
+
+def classify(topic: str, msg_type: str) -> str:
+    """Hop name of a message; unknown topics fall back to their last two levels."""
+    levels = topic.strip("/").split("/", 1)
+    relative = levels[1] if len(levels) > 1 else levels[0]
+    for hop, pattern in HOP_RULES:
+        if pattern.search(relative):
+            if hop in ("create_description", "calc_similarity") and not msg_type.lower().startswith(_REQUEST_TYPES):
+                return hop + "_reply"
+            return hop
+    return "/".join(relative.split("/")[-2:])
+
+
+class Negotiation:
+    """All messages of one conversation with their trigger links."""
+
+    def __init__(self, conversation_id: str, events: list[Event]):
+        self.conversation_id = conversation_id
+        self.events = sorted(events, key=lambda e: e.timestamp)
+        self.parents = self._link()
+
+    @property
+    def start(self) -> float:
+        return self.events[0].timestamp
+
+    @property
+    def end(self) -> float:
+        return self.events[self.final].timestamp
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def complete(self) -> bool:
+        return any(e.hop == "process_chain_response" for e in self.events)
+
+    @property
+    def final(self) -> int:
+        """Index of the last ProcessChain response, or of the last message."""
+        for i in range(len(self.events) - 1, -1, -1):
+            if self.events[i].hop == "process_chain_response":
+                return i
+        return len(self.events) - 1
+
+    def _link(self) -> list[int | None]:
+        parents = []
+        for i, event in enumerate(self.events):
+            sender = event.sender.lower()
+            parent = None
+            for j in range(i - 1, -1, -1):
+                candidate = self.events[j]
+                if candidate.sender.lower() == sender:
+                    continue
+                if candidate.receiver.lower() == sender or candidate.receiver.lower() in BROADCAST_RECEIVERS:
+                    parent = j
+                    break
+            if parent is None and i:
+                parent = i - 1
+            parents.append(parent)
+        return parents
+
+    def edges(self):
+        """``(label, parent, child, seconds)`` for every linked message."""
+        for i, parent in enumerate(self.parents):
+            if parent is None:
+                continue
+            a, b = self.events[parent], self.events[i]
+            yield f"{a.hop} -> {b.hop}", parent, i, b.timestamp - a.timestamp
+
+    def critical_path(self) -> list[tuple[str, int, int, float]]:
+        """Edges from the first message to the final response, in time order."""
+        path = []
+        i = self.final
+        while self.parents[i] is not None:
+            parent = self.parents[i]
+            a, b = self.events[parent], self.events[i]
+            path.append((f"{a.hop} -> {b.hop}", parent, i, b.timestamp - a.timestamp))
+            i = parent
+        path.reverse()
+        return path
+
+
+def _party(frame, key):
+    party = frame.get(key) or {}
+    identification = party.get("identification") or {}
+    role = party.get("role") or {}
+    return identification.get("id") or party.get("id") or "", role.get("name") or ""
+
+
+def build_negotiations(records, require_request: bool = True) -> list[Negotiation]:
+    """Group ``Record``s into negotiations (conversations that contain a ProcessChain request)."""
+    conversations: dict[str, list[Event]] = {}
+    for record in records:
+        message = parse_message(record.payload)
+        if message is None:
+            continue
+        frame = message["frame"]
+        conversation_id = frame.get("conversationId")
+        if not conversation_id:
+            continue
+        msg_type = frame.get("type") or ""
+        sender, role = _party(frame, "sender")
+        receiver, _ = _party(frame, "receiver")
+        conversations.setdefault(conversation_id, []).append(
+            Event(record.timestamp, record.topic, classify(record.topic, msg_type), msg_type, sender, role, receiver))
+    negotiations = []
+    for conversation_id, events in conversations.items():
+        if require_request and not any(e.hop == "process_chain_request" for e in events):
+            continue
+        negotiations.append(Negotiation(conversation_id, events))
+    negotiations.sort(key=lambda n: n.start)
+    return negotiations
+
+
+# --- reports -------------------------------------------------------------------
+
+def format_waterfall(negotiation: Negotiation, width: int = 48) -> str:
+    total = negotiation.duration or 1e-9
+    critical = {child for _label, _parent, child, _s in negotiation.critical_path()}
+    lines = [f"{negotiation.conversation_id}  {negotiation.duration * 1000.0:.1f} ms"
+             f"{'' if negotiation.complete else '  (no response)'}"]
+    for i, event in enumerate(negotiation.events):
+        parent = negotiation.parents[i]
+        offset = event.timestamp - negotiation.start
+        begin = negotiation.events[parent].timestamp - negotiation.start if parent is not None else offset
+        a = min(width - 1, int(begin / total * width))
+        b = max(a + 1, min(width, int(round(offset / total * width))))
+        bar = " " * a + ("#" if i in critical else "=") * (b - a) + " " * (width - b)
+        delta = f"+{(offset - begin) * 1000.0:.1f}" if parent is not None else ""
+        lines.append(f"  {offset * 1000.0:9.1f} |{bar}| {delta:>9}  {event.hop:<24} "
+                     f"{event.sender or '?'} -> {event.receiver or '*'}")
+    return "\n".join(lines)
+
+
+def format_critical_path(negotiation: Negotiation) -> str:
+    path = negotiation.critical_path()
+    total = negotiation.duration or 1e-9
+    lines = [f"critical path ({len(path)} hops):"]
+    for label, _parent, child, seconds in path:
+        actor = negotiation.events[child].sender or "?"
+        lines.append(f"  {seconds * 1000.0:9.1f} ms {100.0 * seconds / total:5.1f}%  {label:<50} at {actor}")
+    return "\n".join(lines)
+
+
+class HopStatistics:
+    """Per-hop percentiles and critical-path shares over many negotiations."""
+
+    def __init__(self):
+        self.hops: dict[str, LatencyHistogram] = {}
+        self.critical: dict[str, float] = {}
+        self.end_to_end = LatencyHistogram()
+        self.negotiations = 0
+        self.incomplete = 0
+
+    def add(self, negotiation: Negotiation) -> None:
+        self.negotiations += 1
+        if not negotiation.complete:
+            self.incomplete += 1
+            return
+        self.end_to_end.record(negotiation.duration)
+        for label, _parent, _child, seconds in negotiation.edges():
+            histogram = self.hops.get(label)
+            if histogram is None:
+                histogram = self.hops[label] = LatencyHistogram()
+            histogram.record(seconds)
+        for label, _parent, _child, seconds in negotiation.critical_path():
+            self.critical[label] = self.critical.get(label, 0.0) + seconds
+
+    def format(self) -> str:
+        critical_total = sum(self.critical.values()) or 1e-9
+        header = (f"{'hop':<50} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'crit%':>6}  (ms)")
+        lines = [f"{self.negotiations} negotiations, {self.incomplete} without response", header, "-" * len(header)]
+        rows = sorted(self.hops.items(), key=lambda kv: self.critical.get(kv[0], 0.0), reverse=True)
+        for label, h in rows + [("end-to-end", self.end_to_end)]:
+            if not h.count:
+                continue
+            s = h.summary()
+            share = "" if label == "end-to-end" else f"{100.0 * self.critical.get(label, 0.0) / critical_total:.1f}"
+            lines.append(f"{label[:50]:<50} {s['count']:>7} {s['p50']:>9.1f} {s['p95']:>9.1f} "
+                         f"{s['p99']:>9.1f} {s['max']:>9.1f} {share:>6}")
+        return "\n".join(lines)
+
+
+# --- trace export ----------------------------------------------------------------
+
+def chrome_trace(negotiations: list[Negotiation]) -> dict:
+    """Chrome trace event JSON (chrome://tracing, Perfetto, speedscope import).
+
+    One process per negotiation, one thread per agent; every linked message
+    is a complete event spanning from its trigger to its publication.
+    """
+    events = []
+    for pid, negotiation in enumerate(negotiations, 1):
+        events.append({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": negotiation.conversation_id}})
+        threads = {}
+        critical = {child for _label, _parent, child, _s in negotiation.critical_path()}
+        for i, event in enumerate(negotiation.events):
+            actor = event.sender or "?"
+            if actor not in threads:
+                threads[actor] = len(threads) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": threads[actor],
+                               "args": {"name": f"{actor} ({event.role})" if event.role else actor}})
+            parent = negotiation.parents[i]
+            begin = negotiation.events[parent].timestamp if parent is not None else event.timestamp
+            events.append({"ph": "X", "name": event.hop, "cat": "critical" if i in critical else "hop",
+                           "pid": pid, "tid": threads[actor], "ts": begin * 1e6,
+                           "dur": (event.timestamp - begin) * 1e6,
+                           "args": {"type": event.type, "topic": event.topic, "receiver": event.receiver}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def speedscope_profile(negotiations: list[Negotiation]) -> dict:
+    """Speedscope file with one evented profile (the critical path) per negotiation."""
+    frames: list[dict] = []
+    index: dict[str, int] = {}
+
+    def frame(name):
+        if name not in index:
+            index[name] = len(frames)
+            frames.append({"name": name})
+        return index[name]
+
+    profiles = []
+    for negotiation in negotiations:
+        start = negotiation.start
+        root = frame("negotiation")
+        events = [{"type": "O", "frame": root, "at": 0.0}]
+        for label, parent, child, _seconds in negotiation.critical_path():
+            f = frame(f"{label} @ {negotiation.events[child].sender or '?'}")
+            events.append({"type": "O", "frame": f, "at": (negotiation.events[parent].timestamp - start) * 1000.0})
+            events.append({"type": "C", "frame": f, "at": (negotiation.events[child].timestamp - start) * 1000.0})
+        end = negotiation.duration * 1000.0
+        events.append({"type": "C", "frame": root, "at": end})
+        profiles.append({"type": "evented", "name": negotiation.conversation_id, "unit": "milliseconds",
+                         "startValue": 0.0, "endValue": end, "events": events})
+    return {"$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames}, "profiles": profiles, "name": "MAS-BT negotiations",
+            "exporter": "masbt_tools.waterfall"}
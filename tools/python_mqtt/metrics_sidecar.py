@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Live per-agent metrics of a namespace in Prometheus text format.
+
+Subscribes to the namespace (by default ``/{ns}/#`` plus ``+/logs``, the
+topic MqttLogger publishes to). Every message is counted per sending
+agent, topic kind and frame type. The topic kind is the negotiation hop
+(``offer_response``, ``process_chain_request`` ... as in
+``masbt_tools.waterfall``) or else the topic's last level (``logs``,
+``State``, ``register``, ``Inventory`` ...). Replies are timed against the
+latest request-type message of their conversation (CfP, request,
+CalcSimilarity ...). That gives, for example, how long modules take to
+answer OfferedCapability CfPs and how long ProcessChain requests wait for
+the dispatcher.
+
+Scrape ``http://<host>:<port>/metrics``. ``_total`` counters are cumulative;
+``_rate`` gauges and the summary quantiles cover the last ``--window``
+seconds. Memory is bounded: series per metric are capped by
+``--max-series``, and open conversations by ``--max-conversations`` and
+``--conversation-ttl``.
+
+  python3 tools/python_mqtt/metrics_sidecar.py --namespace _PHUKET --http-port 9108
+
+  # alert when offers slow down
+  masbt_response_latency_seconds{topic="offer_response",quantile="0.95"} > 10
+"""
+import argparse
+import asyncio
+import collections
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from masbt_tools import new_conversation_id
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.frame_scan import FrameScanner
+from masbt_tools.metrics import MetricsRegistry
+from masbt_tools.waterfall import HOP_RULES, classify
+
+HOPS = {hop for hop, _pattern in HOP_RULES}
+REQUEST_TYPES = ("callforproposal", "request", "calc", "create")
+
+
+def topic_kind(topic, msg_type):
+    """Negotiation hop of a topic, else its last level (keeps module ids out of the labels)."""
+    hop = classify(topic, msg_type)
+    if hop in HOPS or hop.endswith("_reply"):
+        return hop
+    levels = [level for level in topic.split("/") if level]
+    return levels[-1] if levels else topic
+
+
+class MetricsSidecar:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.scanner = FrameScanner(("LogLevel",))
+        self.registry = registry = MetricsRegistry(args.window, args.slots, args.max_series)
+        self.messages = registry.counter("masbt_messages", "MQTT messages by sending agent, topic kind and frame type",
+                                         ("agent", "topic", "type"))
+        self.bytes = registry.counter("masbt_message_bytes", "Payload bytes by topic kind", ("topic",))
+        self.logs = registry.counter("masbt_log_messages", "Log lines published over MQTT by agent and level",
+                                     ("agent", "level"))
+        self.latency = registry.sketch("masbt_response_latency_seconds",
+                                       "Latest request of the conversation to a reply, by reply topic kind and type",
+                                       ("topic", "type"))
+        self.agent_latency = registry.sketch("masbt_agent_response_latency_seconds",
+                                             "Latest request of the conversation to a reply, by replying agent",
+                                             ("agent",))
+        self.last_seen = registry.gauge("masbt_agent_last_seen_timestamp_seconds",
+                                        "Unix time of the last message from the agent", ("agent",))
+        self.unparsable = registry.counter("masbt_unparsable_messages", "Messages without an I4.0 frame", ("topic",))
+        self.ingest = registry.sketch("masbt_sidecar_ingest_seconds", "Sidecar processing time per message")
+        self.pending_gauge = registry.gauge("masbt_sidecar_open_conversations",
+                                            "Conversations with a request waiting for replies")
+        self.series_gauge = registry.gauge("masbt_sidecar_series", "Series held per metric", ("metric",))
+        self.folded_gauge = registry.gauge("masbt_sidecar_folded_samples",
+                                           "Samples folded into the 'other' series because of --max-series",
+                                           ("metric",))
+        # conversation id -> (request time, requester); oldest first
+        self.pending = collections.OrderedDict()
+        self.received = 0
+
+    # --- ingest --------------------------------------------------------------
+
+    def on_message(self, topic, payload, qos, retain):
+        started = time.perf_counter()
+        fields = self.scanner.scan(payload)
+        with self.lock:
+            self.received += 1
+            if fields is None:
+                self.unparsable.inc((topic_kind(topic, ""),))
+            else:
+                self._account(topic, payload, fields, started)
+            self.ingest.observe((), time.perf_counter() - started)
+
+    def _account(self, topic, payload, fields, now):
+        msg_type = str(fields.type or "")
+        agent = str(fields.sender or "unknown")
+        kind = topic_kind(topic, msg_type)
+        self.messages.inc((agent, kind, msg_type))
+        self.bytes.inc((kind,), len(payload))
+        self.last_seen.set((agent,), time.time())
+        level = fields.values.get("LogLevel")
+        if level is not None:
+            self.logs.inc((agent, str(level)))
+
+        conversation_id = fields.conversation_id
+        if not conversation_id:
+            return
+        pending = self.pending
+        if msg_type.lower().startswith(REQUEST_TYPES):
+            pending[conversation_id] = (now, agent)
+            pending.move_to_end(conversation_id)
+            self._expire(now)
+            return
+        request = pending.get(conversation_id)
+        if request is not None and request[1] != agent:
+            waited = now - request[0]
+            self.latency.observe((kind, msg_type), waited)
+            self.agent_latency.observe((agent,), waited)
+
+    def _expire(self, now):
+        pending = self.pending
+        ttl = self.args.conversation_ttl
+        while pending:
+            started, _agent = next(iter(pending.values()))
+            if len(pending) <= self.args.max_conversations and now - started <= ttl:
+                break
+            pending.popitem(last=False)
+
+    # --- exposition ----------------------------------------------------------
+
+    def render(self):
+        with self.lock:
+            self._expire(time.perf_counter())
+            self.pending_gauge.set((), len(self.pending))
+            for metric in self.registry.metrics:
+                self.series_gauge.set((metric.name,), len(metric.series))
+                self.folded_gauge.set((metric.name,), metric.folded)
+            return self.registry.render()
+
+    async def progress_loop(self):
+        interval = self.args.progress
+        last = 0
+        while True:
+            await asyncio.sleep(interval)
+            with self.lock:
+                received = self.received
+                series = self.registry.series_count()
+                pending = len(self.pending)
+            print(f"[{time.strftime('%H:%M:%S')}] {received} messages (+{(received - last) / interval:.1f}/s), "
+                  f"{series} series, {pending} open conversations", flush=True)
+            last = received
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "masbt-metrics/0.1"
+    protocol_version = "HTTP/1.1"
+    sidecar: MetricsSidecar = None
+
+    def log_message(self, fmt, *args):
+        if self.sidecar.args.verbose:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") not in ("/metrics", ""):
+            data, status, content_type = b"not found\n", 404, "text/plain; charset=utf-8"
+        else:
+            data, status = self.sidecar.render().encode("utf-8"), 200
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+async def run(sidecar, args):
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("MetricsSidecar"),
+                             username=args.username, password=args.password)
+    client.on_message = sidecar.on_message
+    await client.connect()
+    topics = [t.format(ns=args.namespace) for t in args.topic]
+    await client.subscribe(*topics, qos=args.qos)
+    print(f"Connected to {args.broker}:{args.port}; watching {', '.join(topics)}")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    helpers = [asyncio.create_task(sidecar.progress_loop())] if args.progress > 0 else []
+    try:
+        if args.duration > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), args.duration)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await stop.wait()
+    finally:
+        for task in helpers:
+            task.cancel()
+        await client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prometheus metrics sidecar for a MAS-BT namespace")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--topic", action="append", default=None,
+                        help="Topic filter, repeatable (default /{ns}/# and +/logs)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=0)
+    parser.add_argument("--http-host", default="0.0.0.0")
+    parser.add_argument("--http-port", type=int, default=9108)
+    parser.add_argument("--window", type=float, default=60.0, help="Seconds covered by rates and quantiles")
+    parser.add_argument("--slots", type=int, default=6, help="Buckets per window (rotation granularity)")
+    parser.add_argument("--max-series", type=int, default=2000, help="Label sets per metric before folding")
+    parser.add_argument("--max-conversations", type=int, default=100_000,
+                        help="Open conversations tracked for reply latency")
+    parser.add_argument("--conversation-ttl", type=float, default=600.0,
+                        help="Seconds a request waits for replies before it is forgotten")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--progress", type=float, default=60.0, help="Status line interval in seconds (0 = off)")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args()
+    args.topic = args.topic or ["/{ns}/#", "+/logs"]
+
+    try:
+        sidecar = MetricsSidecar(args)
+    except ValueError as e:
+        parser.error(str(e))
+    Handler.sidecar = sidecar
+    try:
+        server = ThreadingHTTPServer((args.http_host, args.http_port), Handler)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://{args.http_host}:{args.http_port}/metrics")
+
+    try:
+        asyncio.run(run(sidecar, args))
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""Simulated ModuleHolon fleet answering OfferedCapability CfPs.
+
+Stands in for dozens to hundreds of module agents so the dispatcher's
+CfP fan-out, CollectCapabilityOffersNode and the OfferCollectionTimeout can
+be exercised without starting real agents.
+
+The fleet listens on ``/{ns}/ModuleHolon/broadcast/OfferedCapability/Request``
+(the topic DispatchCapabilityRequestsNode publishes to). A CfP addressed to
+a simulated module is answered by that module; a CfP without receiver (or
+addressed to ``Broadcast``) is answered by every module. Each module replies
+after a think time drawn from its distribution with either a
+``proposal/OfferedCapability`` (OfferedCapability with scheduling info,
+cost and an Action) or a ``refuseProposal/OfferedCapability`` on
+``/{ns}/{requester}/OfferedCapability/Response``.
+
+Fleet definition, either generated:
+
+  python3 tools/python_mqtt/module_holon_fleet.py --modules 200 \
+    --capabilities Drill,Screw,Assemble --caps-per-module 2 --think-time exp:0.2
+
+or from a JSON file (``--fleet fleet.json``), module entries override the
+defaults:
+
+  {
+    "defaults": {"think_time": "uniform:0.05,0.5", "refusal_rate": 0.1,
+                 "cost": "normal:10,2", "cycle_time": "const:60",
+                 "setup_time": "const:5", "matching_score": "uniform:0.7,1.0"},
+    "modules": [
+      {"id": "P101", "capabilities": ["Drill", "Screw"]},
+      {"id": "P102", "capabilities": ["Assemble"], "think_time": "exp:2.0"}
+    ]
+  }
+
+Durations and think times are distribution specs in seconds, see
+``masbt_tools.distributions``.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import random
+import sys
+import time
+
+from masbt_tools import (
+    capability_offer_template,
+    capability_refusal_template,
+    find_value,
+    new_conversation_id,
+    registration_template,
+)
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.codec import decode_payload
+from masbt_tools.distributions import parse_distribution
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+BROADCAST_RECEIVERS = {"", "broadcast", "moduleholon", "all"}
+
+DEFAULTS = {
+    "think_time": "uniform:0.05,0.5",
+    "refusal_rate": 0.0,
+    "cost": "normal:10,2",
+    "cycle_time": "const:60",
+    "setup_time": "const:0",
+    "matching_score": "uniform:0.7,1.0",
+}
+
+
+def format_timespan(seconds):
+    """TimeSpan text ``hh:mm:ss`` as parsed by CollectCapabilityOffersNode."""
+    seconds = int(round(max(0.0, seconds)))
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class SimModule:
+    __slots__ = ("id", "capabilities", "any_capability", "think_time", "refusal_rate", "cost",
+                 "cycle_time", "setup_time", "matching_score", "cfps", "proposals", "refusals")
+
+    def __init__(self, module_id, capabilities, settings):
+        self.id = module_id
+        self.capabilities = {c.lower() for c in capabilities}
+        self.any_capability = "*" in self.capabilities
+        self.think_time = parse_distribution(settings["think_time"])
+        self.refusal_rate = float(settings["refusal_rate"])
+        self.cost = parse_distribution(settings["cost"])
+        self.cycle_time = parse_distribution(settings["cycle_time"])
+        self.setup_time = parse_distribution(settings["setup_time"])
+        self.matching_score = parse_distribution(settings["matching_score"])
+        self.cfps = 0
+        self.proposals = 0
+        self.refusals = 0
+
+    def offers(self, capability):
+        return self.any_capability or (capability or "").lower() in self.capabilities
+
+
+def load_fleet(args, rng):
+    if args.fleet:
+        with open(args.fleet, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        defaults = {**DEFAULTS, **_cli_overrides(args), **config.get("defaults", {})}
+        modules = []
+        for entry in config.get("modules", []):
+            settings = {**defaults, **{k: v for k, v in entry.items() if k in DEFAULTS}}
+            modules.append(SimModule(entry["id"], entry.get("capabilities", ["*"]), settings))
+        return modules
+
+    settings = {**DEFAULTS, **_cli_overrides(args)}
+    pool = [c.strip() for c in args.capabilities.split(",") if c.strip()]
+    width = max(3, len(str(args.modules)))
+    modules = []
+    for i in range(1, args.modules + 1):
+        k = min(args.caps_per_module, len(pool)) if args.caps_per_module > 0 else len(pool)
+        capabilities = rng.sample(pool, k) if pool else ["*"]
+        modules.append(SimModule(f"{args.prefix}{i:0{width}d}", capabilities, settings))
+    return modules
+
+
+def _cli_overrides(args):
+    overrides = {}
+    for key in DEFAULTS:
+        value = getattr(args, key)
+        if value is not None:
+            overrides[key] = value
+    return overrides
+
+
+class ModuleHolonFleet:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.modules = load_fleet(args, self.rng)
+        if not self.modules:
+            raise ValueError("fleet is empty")
+        self.by_id = {m.id.lower(): m for m in self.modules}
+        self.client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("ModuleHolonFleet"),
+                                      username=args.username, password=args.password)
+        self.client.on_message = self._on_message
+        self.offer_seq = itertools.count(1)
+        self.cfps = 0
+        self.ignored = 0
+        self.unparsable = 0
+        self.replies = 0
+        self.reply_lag = LatencyHistogram()
+        self.think = LatencyHistogram()
+
+    # --- CfP handling --------------------------------------------------------
+
+    def _on_message(self, topic, payload, qos, retain):
+        received_at = time.perf_counter()
+        try:
+            message = decode_payload(payload)  # JSON, or binary from Python producers
+        except ValueError:
+            self.unparsable += 1
+            return
+        frame = message.get("frame") or {}
+        msg_type = str(frame.get("type") or "")
+        if not msg_type.lower().startswith("callforproposal"):
+            return
+        self.cfps += 1
+        elements = message.get("interactionElements")
+        sender = frame.get("sender") or {}
+        requester = (sender.get("identification") or {}).get("id") or sender.get("id") or ""
+        receiver = frame.get("receiver") or {}
+        receiver_id = (receiver.get("identification") or {}).get("id") or receiver.get("id") or ""
+        cfp = {
+            "conversation_id": str(frame.get("conversationId") or ""),
+            "receiver_id": requester,
+            "receiver_role": str((sender.get("role") or {}).get("name") or ""),
+            "capability": str(find_value(elements, "Capability") or ""),
+            "requirement_id": str(find_value(elements, "RequirementId") or ""),
+            "product_id": str(find_value(elements, "ProductId") or ""),
+        }
+        if not requester:
+            self.unparsable += 1
+            return
+
+        module = self.by_id.get(receiver_id.lower())
+        if module is not None:
+            targets = (module,)
+        elif receiver_id.lower() in BROADCAST_RECEIVERS:
+            targets = self.modules
+        else:
+            self.ignored += 1  # addressed to a real module outside the fleet
+            return
+
+        topic = self.args.response_topic.format(ns=self.args.namespace, requester=requester)
+        loop = asyncio.get_running_loop()
+        for module in targets:
+            module.cfps += 1
+            delay = module.think_time.sample(self.rng)
+            self.think.record(delay)
+            loop.call_later(delay, self._reply, module, cfp, topic, received_at + delay)
+
+    def _reply(self, module, cfp, topic, due):
+        self.reply_lag.record(max(0.0, time.perf_counter() - due))
+        if not module.offers(cfp["capability"]):
+            if self.args.ignore_unknown:
+                return
+            payload = capability_refusal_template(module.id, self.args.role).render(
+                reason=f"capability '{cfp['capability']}' not offered by {module.id}", **_refusal_fields(cfp))
+            module.refusals += 1
+        elif self.rng.random() < module.refusal_rate:
+            payload = capability_refusal_template(module.id, self.args.role).render(
+                reason="simulated refusal", **_refusal_fields(cfp))
+            module.refusals += 1
+        else:
+            payload = self._proposal(module, cfp)
+            module.proposals += 1
+        try:
+            self.client.publish(topic, payload, qos=self.args.qos)
+        except MqttError as e:
+            print(f"publish failed: {e}", file=sys.stderr)
+            return
+        self.replies += 1
+
+    def _proposal(self, module, cfp):
+        rng = self.rng
+        setup = module.setup_time.sample(rng)
+        cycle = module.cycle_time.sample(rng)
+        start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=setup)
+        end = start + datetime.timedelta(seconds=cycle)
+        return capability_offer_template(module.id, self.args.role, as_sequence=self.args.sequence).render(
+            offer_id=f"{module.id}_offer_{next(self.offer_seq)}",
+            matching_score=f"{min(1.0, max(0.0, module.matching_score.sample(rng))):.3f}",
+            cost=f"{max(0.0, module.cost.sample(rng)):.2f}",
+            start=start.isoformat(),
+            end=end.isoformat(),
+            setup_time=format_timespan(setup),
+            cycle_time=format_timespan(cycle),
+            **cfp,
+        )
+
+    # --- registration --------------------------------------------------------
+
+    async def register_loop(self):
+        args = self.args
+        topic = args.register_topic.format(ns=args.namespace)
+        while True:
+            for module in self.modules:
+                capabilities = tuple(sorted(module.capabilities - {"*"}))
+                tpl = registration_template(module.id, "ModuleHolon", capabilities)
+                self.client.publish(topic, tpl.render(), qos=args.qos)
+            await self.client.drain()
+            if args.register_interval <= 0:
+                return
+            await asyncio.sleep(args.register_interval)
+
+    # --- main ----------------------------------------------------------------
+
+    async def progress_loop(self, start):
+        interval = self.args.progress
+        last_cfps = last_replies = 0
+        while True:
+            await asyncio.sleep(interval)
+            elapsed = time.perf_counter() - start
+            print(f"[{elapsed:7.1f}s] cfps={self.cfps} (+{(self.cfps - last_cfps) / interval:.1f}/s) "
+                  f"replies={self.replies} (+{(self.replies - last_replies) / interval:.1f}/s) "
+                  f"ignored={self.ignored}", flush=True)
+            last_cfps, last_replies = self.cfps, self.replies
+
+    async def run(self):
+        args = self.args
+        await self.client.connect()
+        request_topic = args.request_topic.format(ns=args.namespace)
+        await self.client.subscribe(request_topic, qos=args.qos)
+        print(f"Connected to {args.broker}:{args.port}; {len(self.modules)} simulated modules listening on "
+              f"{request_topic}")
+
+        start = time.perf_counter()
+        helpers = []
+        if args.register:
+            helpers.append(asyncio.create_task(self.register_loop()))
+        if args.progress > 0:
+            helpers.append(asyncio.create_task(self.progress_loop(start)))
+        try:
+            if args.duration > 0:
+                await asyncio.sleep(args.duration)
+            else:
+                await asyncio.Event().wait()
+        finally:
+            for task in helpers:
+                task.cancel()
+            await self.client.disconnect()
+            self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        proposals = sum(m.proposals for m in self.modules)
+        refusals = sum(m.refusals for m in self.modules)
+        print()
+        print(f"{self.cfps} CfPs in {elapsed:.1f}s, {proposals} proposals, {refusals} refusals, "
+              f"{self.ignored} ignored (other receivers), {self.unparsable} unparsable")
+        print(format_summary_table({"think time": self.think.summary(), "reply lag": self.reply_lag.summary()}))
+        busiest = sorted(self.modules, key=lambda m: m.cfps, reverse=True)[:self.args.top]
+        if busiest and busiest[0].cfps:
+            print()
+            print(f"{'module':<16} {'cfps':>7} {'proposals':>10} {'refusals':>9}")
+            for m in busiest:
+                print(f"{m.id:<16} {m.cfps:>7} {m.proposals:>10} {m.refusals:>9}")
+
+
+def _refusal_fields(cfp):
+    return {k: cfp[k] for k in ("conversation_id", "receiver_id", "receiver_role", "capability", "requirement_id")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated ModuleHolon fleet answering OfferedCapability CfPs")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--fleet", help="JSON fleet definition (overrides --modules/--capabilities)")
+    parser.add_argument("--modules", type=int, default=10, help="Number of generated modules")
+    parser.add_argument("--prefix", default="SIM", help="Id prefix of generated modules")
+    parser.add_argument("--capabilities", default="Drill,Screw,Assemble,Store,Retrieve",
+                        help="Capability pool for generated modules")
+    parser.add_argument("--caps-per-module", type=int, default=2, help="Capabilities per generated module (0 = all)")
+    parser.add_argument("--think-time", dest="think_time", help="Think time distribution (s), e.g. exp:0.2")
+    parser.add_argument("--refusal-rate", dest="refusal_rate", type=float, help="Probability to refuse a matching CfP")
+    parser.add_argument("--cost", help="Offer cost distribution")
+    parser.add_argument("--cycle-time", dest="cycle_time", help="CycleTime distribution (s)")
+    parser.add_argument("--setup-time", dest="setup_time", help="SetupTime distribution (s)")
+    parser.add_argument("--matching-score", dest="matching_score", help="MatchingScore distribution")
+    parser.add_argument("--ignore-unknown", action="store_true",
+                        help="Stay silent instead of refusing CfPs for capabilities a module does not offer")
+    parser.add_argument("--sequence", action="store_true",
+                        help="Wrap offers in an OfferedCapabilitySequence (ManufacturingSequence responses)")
+    parser.add_argument("--role", default="PlanningHolon", help="Sender role of the replies")
+    parser.add_argument("--request-topic", default="/{ns}/ModuleHolon/broadcast/OfferedCapability/Request")
+    parser.add_argument("--response-topic", default="/{ns}/{requester}/OfferedCapability/Response")
+    parser.add_argument("--register", action="store_true", help="Publish a registerMessage per module on start")
+    parser.add_argument("--register-interval", type=float, default=0.0,
+                        help="Re-register every N seconds (heartbeat), 0 = once")
+    parser.add_argument("--register-topic", default="/{ns}/register")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--progress", type=float, default=5.0, help="Progress line interval in seconds (0 = off)")
+    parser.add_argument("--top", type=int, default=10, help="Modules listed in the final report")
+    args = parser.parse_args()
+
+    try:
+        fleet = ModuleHolonFleet(args)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"invalid fleet definition: {e}")
+
+    try:
+        asyncio.run(fleet.run())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Pure-Python MQTT 3.1.1 broker for hermetic load tests.
+
+Python tools and the .NET agents (MQTTnet, protocol 3.1.1) can connect to it
+in place of Mosquitto. Every --stats-interval seconds it prints the busiest
+topics (messages/s and kB/s in and out) and the deepest client queues. The
+same snapshot is published as retained JSON on $SYS/masbt/stats.
+
+Examples:
+  python3 tools/python_mqtt/mqtt_broker.py --port 1883 \
+    --group "/phuket/+/Inventory" --group "/phuket/ModuleHolon/broadcast/#"
+
+  # .NET integration tests against it
+  python3 tools/python_mqtt/mqtt_broker.py --port 1883 &
+  ./run_mqtt_test.sh localhost 1883
+
+--group aggregates every topic matching a filter into one row. Without it,
+per-module topics such as /phuket/P102/Inventory each get their own row.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+
+from masbt_tools.broker import MqttBroker, format_topic_table
+
+
+async def stats_loop(broker, args):
+    while True:
+        await asyncio.sleep(args.stats_interval)
+        snapshot = broker.snapshot()
+        if args.sys_topic:
+            broker.publish(args.sys_topic, json.dumps(snapshot).encode("utf-8"), 0, True)
+        if not args.quiet and snapshot["topics"]:
+            connected = sum(1 for c in snapshot["clients"].values() if c["connected"])
+            print(f"\n[{snapshot['uptime']:8.1f}s] {connected} clients, {snapshot['retained']} retained")
+            print(format_topic_table(snapshot, args.top, args.sort), flush=True)
+
+
+async def run(args):
+    broker = MqttBroker(args.host, args.port, args.username, args.password, args.group,
+                        max_buffer=args.max_buffer, max_inflight=args.max_inflight,
+                        max_queued=args.max_queued)
+    await broker.start()
+    print(f"MQTT broker listening on {args.host}:{broker.port}", flush=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+    stats = asyncio.create_task(stats_loop(broker, args)) if args.stats_interval > 0 else None
+    try:
+        if args.duration > 0:
+            await asyncio.wait_for(stop.wait(), args.duration)
+        else:
+            await stop.wait()
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        if stats is not None:
+            stats.cancel()
+        snapshot = broker.snapshot()
+        await broker.close()
+    # final table sorted by totals; its rates cover only the last interval
+    print()
+    print(format_topic_table(snapshot, args.top, "messages_in"))
+    if args.stats_json:
+        with open(args.stats_json, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio MQTT 3.1.1 broker with per-topic throughput counters")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (0.0.0.0 for remote agents)")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username", help="Require this user name (and --password)")
+    parser.add_argument("--password")
+    parser.add_argument("--group", action="append", default=[],
+                        help="Aggregate topics matching this filter into one row (repeatable)")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between stats (0 = off)")
+    parser.add_argument("--top", type=int, default=15, help="Topics listed per stats table")
+    parser.add_argument("--sort", default="in_rate", choices=["in_rate", "out_rate", "in_bytes_rate", "out_bytes_rate"])
+    parser.add_argument("--sys-topic", default="$SYS/masbt/stats", help="Retained JSON stats topic ('' = off)")
+    parser.add_argument("--stats-json", help="Write the final snapshot as JSON to this file")
+    parser.add_argument("--max-buffer", type=int, default=8 * 1024 * 1024,
+                        help="Socket buffer per client (bytes) before messages are queued or dropped")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Unacknowledged QoS 1 deliveries per client")
+    parser.add_argument("--max-queued", type=int, default=10_000, help="Queued QoS 1 messages per client")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after N seconds (0 = until Ctrl+C)")
+    parser.add_argument("--quiet", action="store_true", help="No periodic stats tables")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -7,206 +7,21 @@ Sendet eine manuelle SkillRequest Message an den Execution Agent
 import json
 import time
 import paho.mqtt.client as mqtt
-from datetime import datetime, timezone
-import time
+
+from masbt_tools import find_value, new_conversation_id, skill_request_template
+
 # MQTT Broker Configuration
 BROKER_HOST = "localhost"
 BROKER_PORT = 1883
 TOPIC = "/Modules/CA-Module/SkillRequest/"
 
-# I4.0 Message with Action
-def create_skill_request(action_title="Retrieve"):
-    """Erstellt eine I4.0 Message mit Action für SkillRequest"""
-    
-    conversation_id = f"conv_{int(time.time())}"
-    
-    message = {
-        "frame": {
-    "sender": {
-      "identification": {
-        "id": "CA-Module_Planning_Agent"
-      },
-      "role": {
-        "name": "PlanningAgent"
-      }
-    },
-    "receiver": {
-      "identification": {
-        "id": "CA-Module_Execution_Agent"
-      },
-      "role": {
-        "name": "ExecutionAgent"
-      }
-    },
-    "type": "request",
-    "conversationId": conversation_id
-  },
-  "interactionElements": [
-    {
-      "idShort": "Action001",
-      "kind": "Instance",
-      "modelType": "SubmodelElementCollection",
-      "semanticId": {
-        "type": "ExternalReference",
-        "keys": [
-          {
-            "type": "GlobalReference",
-            "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action"
-          }
-        ]
-      },
-      "value": [
-        {
-          "idShort": "ActionTitle",
-          "kind": "Instance",
-          "modelType": "Property",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/ActionTitle"
-              }
-            ]
-          },
-          "valueType": "string",
-          "value": "Store"
-        },
-        {
-          "idShort": "Status",
-          "kind": "Instance",
-          "modelType": "Property",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/Status"
-              }
-            ]
-          },
-          "valueType": "string",
-          "value": "open"
-        },
-        {
-          "idShort": "InputParameters",
-          "kind": "Instance",
-          "modelType": "SubmodelElementCollection",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/InputParameters"
-              }
-            ]
-          },
-          "value": [
-            {
-              "idShort": "ProductId",
-              "kind": "Instance",
-              "modelType": "Property",
-              "semanticId": {
-                "type": "ExternalReference",
-                "keys": []
-              },
-              "valueType": "string",
-              "value": "DemoProduct"
-            }
-          ]
-        },
-        {
-          "idShort": "FinalResultData",
-          "kind": "Instance",
-          "modelType": "SubmodelElementCollection",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/FinalResultData"
-              }
-            ]
-          },
-          "value": []
-        },
-        {
-          "idShort": "Preconditions",
-          "kind": "Instance",
-          "modelType": "SubmodelElementCollection",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/Preconditions"
-              }
-            ]
-          },
-          "value": []
-        },
-        {
-          "idShort": "SkillReference",
-          "kind": "Instance",
-          "modelType": "ReferenceElement",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/SkillReference"
-              }
-            ]
-          },
-          "value": {
-            "type": "ModelReference",
-            "keys": [
-              {
-                "type": "Submodel",
-                "value": "https://example.com/sm"
-              }
-            ]
-          }
-        },
-        {
-          "idShort": "Effects",
-          "kind": "Instance",
-          "modelType": "SubmodelElementCollection",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/Effecs"
-              }
-            ]
-          },
-          "value": []
-        },
-        {
-          "idShort": "MachineName",
-          "kind": "Instance",
-          "modelType": "Property",
-          "semanticId": {
-            "type": "ExternalReference",
-            "keys": [
-              {
-                "type": "GlobalReference",
-                "value": "https://smartfactory.de/semantics/submodel-element/Step/Actions/Action/MachineName"
-              }
-            ]
-          },
-          "valueType": "string",
-          "value": "CA-Module"
-        }
-      ]
-    }
-  ]
-    }
-    
-    return message
+# I4.0 Message with Action (volle AAS Form wie vom Planning Agent)
+SKILL_REQUEST = skill_request_template("CA-Module", "Store", status="open", verbose=True)
 
 
+def create_skill_request(product_id="DemoProduct"):
+    """Erstellt die SkillRequest Payload (vorkompiliertes Template, nur IDs werden eingesetzt)"""
+    return SKILL_REQUEST.render(conversation_id=new_conversation_id(), product_id=product_id)
 
 
 def on_connect(client, userdata, flags, rc):
@@ -226,20 +41,13 @@ def on_message(client, userdata, msg):
     """Callback für eingehende Messages (SkillResponse)"""
     print(f"\n📨 Empfangene SkillResponse auf {msg.topic}:")
     try:
-        response = json.loads(msg.payload.decode())
-        
-        # Extrahiere ActionState
-        elements = response.get("interactionElements", [])
-        for element in elements:
-            if element.get("idShort") == "ActionResponse":
-                values = element.get("value", [])
-                for prop in values:
-                    if prop.get("idShort") == "ActionState":
-                        action_state = prop.get("value")
-                        print(f"   ActionState: {action_state}")
-                    elif prop.get("idShort") == "ActionTitle":
-                        action_title = prop.get("value")
-                        print(f"   ActionTitle: {action_title}")
+        # einmal parsen: ActionState/ActionTitle und die volle Ausgabe kommen aus demselben Dict
+        response = json.loads(msg.payload)
+        elements = response.get("interactionElements")
+        for key in ("ActionState", "ActionTitle"):
+            value = find_value(elements, key)
+            if value is not None:
+                print(f"   {key}: {value}")
         
         print(f"   Full Response: {json.dumps(response, indent=2)}")
     except Exception as e:
@@ -275,9 +83,7 @@ def main():
         # Erstelle und sende SkillRequest
         print(f"\n📤 Sende SkillRequest auf Topic: {TOPIC}")
         
-        skill_request = create_skill_request()
-        
-        payload = json.dumps(skill_request, indent=2)
+        payload = create_skill_request()
         print(f"\n📋 Payload:\n{payload}\n")
         
         result = client.publish(TOPIC, payload, qos=1)
@@ -7,118 +7,24 @@ Sendet eine manuelle SkillRequest Message an den Execution Agent
 import json
 import time
 import paho.mqtt.client as mqtt
-from datetime import datetime, timezone
-import time
+
+from masbt_tools import find_value, new_conversation_id, skill_request_template
+
 # MQTT Broker Configuration
 BROKER_HOST = "localhost"
 BROKER_PORT = 1883
 TOPIC = "/Modules/CA-Module/SkillRequest/"
 
-# I4.0 Message with Action
-def create_skill_request(action_title="Retrieve", id=0):
-    """Erstellt eine I4.0 Message mit Action für SkillRequest"""
-    
-    conversation_id = f"conv_{int(time.time())}"
-    
-    message = {
-        "frame": {
-            "sender": {
-                "identification": {
-                    "id": "Module2_Planning_Agent"
-                },
-                "role": {
-                    "name": "PlanningAgent"
-                }
-            },
-            "receiver": {
-                "identification": {
-                    "id": "Module2_Execution_Agent"
-                },
-                "role": {
-                    "name": "ExecutionAgent"
-                }
-            },
-            "type": "request",
-            "conversationId": conversation_id
-        },
-        "interactionElements": [
-            {
-                "idShort": "Action001",
-                "modelType": "SubmodelElementCollection",
-                "value": [
-                    {
-                        "idShort": "ActionTitle",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": action_title
-                    },
-                    {
-                        "idShort": "Status",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": "planned"
-                    },
-                    {
-                        "idShort": "MachineName",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": "CA-Module"
-                    },
-                    {
-                        "idShort": "InputParameters",
-                        "modelType": "SubmodelElementCollection",
-                        "value": [
-                            {
-                                "idShort": "ProductId",
-                                "modelType": "Property",
-                                "valueType": "xs:string",
-                                "value": f"https://smartfactory.de/shells/test_product{id}"
-                            },
-                            {
-                                "idShort": "RetrieveByProductID",
-                                "modelType": "Property",
-                                "valueType": "xs:boolean",
-                                "value": "true"
-                            }
-                        ]
-                    },
-                    {
-                        "idShort": "Preconditions",
-                        "modelType": "SubmodelElementCollection",
-                        "value": [
-                            {
-                            "idShort": "Condition_001",
-                            "modelType": "SubmodelElementCollection",
-                            "value": [
-                                { "idShort": "ConditionType", "modelType": "Property", "valueType": "xs:string", "value": "InStorage" },
-                                {
-                                "idShort": "ConditionValue",
-                                "modelType": "SubmodelElementCollection",
-                                "value": [
-                                    { "idShort": "SlotContentType", "modelType": "Property", "valueType": "xs:string", "value": "ProductId" },
-                                    { "idShort": "SlotValue", "modelType": "Property", "valueType": "xs:string", "value": f"https://smartfactory.de/shells/test_product{id}" }
-                                ]
-                                }
-                            ]
-                            }
-                        ]
-                    },
-                    {
-                        "idShort": "Effects",
-                        "modelType": "SubmodelElementCollection",
-                        "value": []
-                    },
-                    {
-                        "idShort": "FinalResultData",
-                        "modelType": "SubmodelElementCollection",
-                        "value": []
-                    }
-                ]
-            }
-        ]
-    }
-    
-    return message
+# I4.0 Message with Action and InStorage Precondition
+SKILL_REQUEST = skill_request_template("Module2", "Retrieve", machine_name="CA-Module", with_precondition=True)
+
+
+def create_skill_request(id=0):
+    """Erstellt die SkillRequest Payload mit InStorage Precondition für test_product{id}"""
+    return SKILL_REQUEST.render(
+        conversation_id=new_conversation_id(),
+        product_id=f"https://smartfactory.de/shells/test_product{id}",
+    )
 
 
 def on_connect(client, userdata, flags, rc):
@@ -138,20 +44,13 @@ def on_message(client, userdata, msg):
     """Callback für eingehende Messages (SkillResponse)"""
     print(f"\n📨 Empfangene SkillResponse auf {msg.topic}:")
     try:
-        response = json.loads(msg.payload.decode())
-        
-        # Extrahiere ActionState
-        elements = response.get("interactionElements", [])
-        for element in elements:
-            if element.get("idShort") == "ActionResponse":
-                values = element.get("value", [])
-                for prop in values:
-                    if prop.get("idShort") == "ActionState":
-                        action_state = prop.get("value")
-                        print(f"   ActionState: {action_state}")
-                    elif prop.get("idShort") == "ActionTitle":
-                        action_title = prop.get("value")
-                        print(f"   ActionTitle: {action_title}")
+        # einmal parsen: ActionState/ActionTitle und die volle Ausgabe kommen aus demselben Dict
+        response = json.loads(msg.payload)
+        elements = response.get("interactionElements")
+        for key in ("ActionState", "ActionTitle"):
+            value = find_value(elements, key)
+            if value is not None:
+                print(f"   {key}: {value}")
         
         print(f"   Full Response: {json.dumps(response, indent=2)}")
     except Exception as e:
@@ -187,9 +86,7 @@ def main():
         # Erstelle und sende SkillRequest
         print(f"\n📤 Sende SkillRequest auf Topic: {TOPIC}")
         id=i+2
-        skill_request = create_skill_request(id=id)
-        
-        payload = json.dumps(skill_request, indent=2)
+        payload = create_skill_request(id=id)
         print(f"\n📋 Payload:\n{payload}\n")
         
         result = client.publish(TOPIC, payload, qos=1)
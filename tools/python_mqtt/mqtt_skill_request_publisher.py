@@ -7,104 +7,21 @@ Sendet eine manuelle SkillRequest Message an den Execution Agent
 import json
 import time
 import paho.mqtt.client as mqtt
-from datetime import datetime, timezone
-import time
+
+from masbt_tools import find_value, new_conversation_id, skill_request_template
+
 # MQTT Broker Configuration
 BROKER_HOST = "localhost"
 BROKER_PORT = 1883
 TOPIC = "/Modules/CA-Module/SkillRequest/"
 
 # I4.0 Message with Action
-def create_skill_request(action_title="Retrieve"):
-    """Erstellt eine I4.0 Message mit Action für SkillRequest"""
-    
-    conversation_id = f"conv_{int(time.time())}"
-    
-    message = {
-        "frame": {
-            "sender": {
-                "identification": {
-                    "id": "CA-Module_Planning_Agent"
-                },
-                "role": {
-                    "name": "PlanningAgent"
-                }
-            },
-            "receiver": {
-                "identification": {
-                    "id": "CA-Module_Execution_Agent"
-                },
-                "role": {
-                    "name": "ExecutionAgent"
-                }
-            },
-            "type": "request",
-            "conversationId": conversation_id
-        },
-        "interactionElements": [
-            {
-                "idShort": "Action001",
-                "modelType": "SubmodelElementCollection",
-                "value": [
-                    {
-                        "idShort": "ActionTitle",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": action_title
-                    },
-                    {
-                        "idShort": "Status",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": "planned"
-                    },
-                    {
-                        "idShort": "MachineName",
-                        "modelType": "Property",
-                        "valueType": "xs:string",
-                        "value": "CA-Module"
-                    },
-                    {
-                        "idShort": "InputParameters",
-                        "modelType": "SubmodelElementCollection",
-                        "value": [
-                            {
-                                "idShort": "ProductId",
-                                "modelType": "Property",
-                                "valueType": "xs:string",
-                                "value": "https://smartfactory.de/shells/test_product2"
-                            },
-                            {
-                                "idShort": "RetrieveByProductID",
-                                "modelType": "Property",
-                                "valueType": "xs:boolean",
-                                "value": "true"
-                            }
-                        ]
-                    },
-                    {
-                        "idShort": "Preconditions",
-                        "modelType": "SubmodelElementCollection",
-                        "value": []
-                    },
-                    {
-                        "idShort": "Effects",
-                        "modelType": "SubmodelElementCollection",
-                        "value": []
-                    },
-                    {
-                        "idShort": "FinalResultData",
-                        "modelType": "SubmodelElementCollection",
-                        "value": []
-                    }
-                ]
-            }
-        ]
-    }
-    
-    return message
+SKILL_REQUEST = skill_request_template("CA-Module", "Retrieve")
 
 
+def create_skill_request(product_id="https://smartfactory.de/shells/test_product2"):
+    """Erstellt die SkillRequest Payload (vorkompiliertes Template, nur IDs werden eingesetzt)"""
+    return SKILL_REQUEST.render(conversation_id=new_conversation_id(), product_id=product_id)
 
 
 def on_connect(client, userdata, flags, rc):
@@ -124,20 +41,13 @@ def on_message(client, userdata, msg):
     """Callback für eingehende Messages (SkillResponse)"""
     print(f"\n📨 Empfangene SkillResponse auf {msg.topic}:")
     try:
-        response = json.loads(msg.payload.decode())
-        
-        # Extrahiere ActionState
-        elements = response.get("interactionElements", [])
-        for element in elements:
-            if element.get("idShort") == "ActionResponse":
-                values = element.get("value", [])
-                for prop in values:
-                    if prop.get("idShort") == "ActionState":
-                        action_state = prop.get("value")
-                        print(f"   ActionState: {action_state}")
-                    elif prop.get("idShort") == "ActionTitle":
-                        action_title = prop.get("value")
-                        print(f"   ActionTitle: {action_title}")
+        # einmal parsen: ActionState/ActionTitle und die volle Ausgabe kommen aus demselben Dict
+        response = json.loads(msg.payload)
+        elements = response.get("interactionElements")
+        for key in ("ActionState", "ActionTitle"):
+            value = find_value(elements, key)
+            if value is not None:
+                print(f"   {key}: {value}")
         
         print(f"   Full Response: {json.dumps(response, indent=2)}")
     except Exception as e:
@@ -173,9 +83,7 @@ def main():
         # Erstelle und sende SkillRequest
         print(f"\n📤 Sende SkillRequest auf Topic: {TOPIC}")
         
-        skill_request = create_skill_request()
-        
-        payload = json.dumps(skill_request, indent=2)
+        payload = create_skill_request()
         print(f"\n📋 Payload:\n{payload}\n")
         
         result = client.publish(TOPIC, payload, qos=1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Generate a synthetic namespace of N modules for scaling tests.
+
+Writes a config tree with the schema of configs/specific_configs (each
+file is derived from the hand-written config of the same kind), plus the
+inputs of the other tools. The output only depends on the arguments and
+--seed:
+
+  NamespaceHolon/           NamespaceHolon.json (SubHolons lists every agent),
+                            ManufacturingDispatcher.json, TransportManager.json,
+                            SimilarityAnalysisAgent.json and per module
+                            <id>.json, <id>_Planning_agent.json,
+                            <id>_Execution_agent.json
+  products/<name>.json      ProcessChain CfP per product, in the format of
+                            tests/TestFiles/ProcessChain.json
+  model.json                namespace_sim.py --model (stations, chains, skill times)
+  fleet.json                module_holon_fleet.py --fleet
+  descriptions.txt          similarity_responder.py --texts
+  scenario.json             the plan: modules with capabilities and neighbours,
+                            capability descriptions, product chains with routes
+
+Every capability is offered by --redundancy modules. Product chains are
+walks along the neighbour topology, so consecutive steps are on the same or
+on neighbouring modules. The dispatcher config lists all modules with their
+capabilities and neighbours in DispatchingAgent.Modules (what
+InitializeAgentState seeds the DispatchingState from); --no-dispatcher-modules
+leaves discovery to the registrations.
+
+  python3 tools/python_mqtt/namespace_generator.py --modules 100 --topology grid --out /tmp/ns100
+  python3 tools/python_mqtt/namespace_generator.py --modules 1000 --topology random --degree 4 \\
+    --vocabulary-size 40 --caps-per-module 3 --chains 50 --out /tmp/ns1000 --force
+
+  # start it like the hand-written namespace
+  dotnet run -- /tmp/ns100/NamespaceHolon/NamespaceHolon.json
+  python3 tools/python_mqtt/namespace_sim.py --config-dir /tmp/ns100 --model /tmp/ns100/model.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from masbt_tools.synthetic_namespace import TOPOLOGIES, hop_stats, load_vocabulary, plan_namespace, render_files
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+DEFAULT_TEMPLATE_DIR = os.path.join(REPO_ROOT, "configs", "specific_configs")
+DEFAULT_PRODUCT_TEMPLATE = os.path.join(REPO_ROOT, "tests", "TestFiles", "ProcessChain.json")
+MANIFEST = "scenario.json"
+
+
+def previous_files(out):
+    """Files written by an earlier run into ``out`` (from its manifest)."""
+    try:
+        with open(os.path.join(out, MANIFEST), "r", encoding="utf-8") as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        return None
+    modules = [m["id"] for m in plan.get("modules", ())]
+    paths = {os.path.join("NamespaceHolon", f"{name}.json")
+             for name in ("NamespaceHolon", "ManufacturingDispatcher", "TransportManager", "SimilarityAnalysisAgent")}
+    for module_id in modules:
+        for suffix in ("", "_Planning_agent", "_Execution_agent"):
+            paths.add(os.path.join("NamespaceHolon", f"{module_id}{suffix}.json"))
+    paths.update(os.path.join("products", f"{c['name']}.json") for c in plan.get("chains", ()))
+    paths.update(("model.json", "fleet.json", "descriptions.txt", MANIFEST))
+    return paths
+
+
+def write_files(out, files, force):
+    if os.path.isdir(out) and os.listdir(out):
+        old = previous_files(out)
+        if not force or old is None:
+            raise ValueError(f"{out} is not empty (use --force to replace a generated namespace)")
+        for path in sorted(old - set(files)):
+            try:
+                os.remove(os.path.join(out, path))
+            except FileNotFoundError:
+                pass
+    for path, content in files.items():
+        target = os.path.join(out, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8", newline="\n") as f:
+            f.write(content if isinstance(content, str) else json.dumps(content, indent=2, ensure_ascii=False) + "\n")
+
+
+def report(plan, files, elapsed):
+    modules = plan["modules"]
+    index = {m["id"]: k for k, m in enumerate(modules)}
+    neighbors = [[index[n] for n in m["neighbors"]] for m in modules]
+    degrees = [len(n) for n in neighbors]
+    # exact up to 2000 modules, beyond that from 64 evenly spread modules (a lower bound)
+    sources = range(len(modules)) if len(modules) <= 2000 else range(0, len(modules), len(modules) // 64)
+    longest, mean_hops = hop_stats(neighbors, sources)
+    offered = {}
+    for m in modules:
+        for capability in m["capabilities"]:
+            offered[capability] = offered.get(capability, 0) + 1
+    stations = {m["module_name"] for m in modules}
+    steps = [len(c["steps"]) for c in plan["chains"]]
+    print(f"{len(modules)} modules ({len(stations)} station types), topology {plan['topology']}: "
+          f"{sum(degrees) // 2} links, degree {min(degrees)}..{max(degrees)} (mean {sum(degrees) / len(modules):.1f}), "
+          f"{'' if len(modules) <= 2000 else '>= '}{longest} hops max, {mean_hops:.1f} mean")
+    print(f"{len(plan['capabilities'])} capabilities, {min(offered.values())}..{max(offered.values())} modules each")
+    if steps:
+        print(f"{len(steps)} product chains, {min(steps)}..{max(steps)} steps")
+    print(f"{len(files)} files in {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic synthetic MAS-BT namespace for scaling tests")
+    parser.add_argument("--modules", type=int, required=True, help="Number of modules")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--force", action="store_true", help="Replace a namespace generated into --out before")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--namespace", default="_SYNTHETIC")
+    parser.add_argument("--prefix", default="P", help="Module id prefix")
+    parser.add_argument("--first-id", type=int, default=1000, help="Number of the first module id")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="grid", help="Neighbour topology")
+    parser.add_argument("--degree", type=float, default=3.0, help="Mean neighbours per module (random topology)")
+    parser.add_argument("--vocabulary", help="Comma separated capabilities, or a JSON/text file with descriptions")
+    parser.add_argument("--vocabulary-size", type=int,
+                        help="Capabilities from the built-in vocabulary (more adds synthetic Process<k> steps)")
+    parser.add_argument("--caps-per-module", type=int, default=2, help="Capabilities per module")
+    parser.add_argument("--redundancy", type=int, default=2, help="Modules offering each capability (at least)")
+    parser.add_argument("--chains", type=int, default=5, help="Product process chains")
+    parser.add_argument("--min-steps", type=int, default=3)
+    parser.add_argument("--max-steps", type=int, default=6)
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR, help="Hand-written configs the files derive from")
+    parser.add_argument("--template-module", default="P102", help="Module whose config triplet is the template")
+    parser.add_argument("--product-template", default=DEFAULT_PRODUCT_TEMPLATE,
+                        help="ProcessChain CfP the product requests derive from ('' to skip)")
+    parser.add_argument("--broker", help="MQTT broker of every agent (default: the templates')")
+    parser.add_argument("--mqtt-port", type=int, help="MQTT port of every agent (default: the templates')")
+    parser.add_argument("--opcua-endpoint", default="opc.tcp://localhost:{port}",
+                        help="Execution agent OPC UA endpoint; {port} and {id} are filled in per module")
+    parser.add_argument("--opcua-base-port", type=int, default=14840, help="{port} of the first module")
+    parser.add_argument("--dispatcher-modules", action=argparse.BooleanOptionalAction, default=True,
+                        help="List the modules in DispatchingAgent.Modules of the dispatcher config")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        vocabulary = load_vocabulary(args.vocabulary, args.vocabulary_size)
+        plan = plan_namespace(args.modules, vocabulary, args.topology, seed=args.seed, namespace=args.namespace,
+                              prefix=args.prefix, first_id=args.first_id, caps_per_module=args.caps_per_module,
+                              redundancy=args.redundancy, degree=args.degree, chains=args.chains,
+                              min_steps=args.min_steps, max_steps=args.max_steps)
+        files = render_files(plan, args.template_dir, template_module=args.template_module,
+                             product_template=args.product_template or None, broker=args.broker,
+                             port=args.mqtt_port, dispatcher_modules=args.dispatcher_modules,
+                             opcua_endpoint=args.opcua_endpoint, opcua_base_port=args.opcua_base_port)
+        write_files(args.out, files, args.force)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    report(plan, files, time.perf_counter() - started)
+    print(f"Namespace {args.namespace} in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Capacity planning: simulate weeks of a namespace's production in virtual time.
+
+Loads the namespace's modules and dispatcher timeouts from
+configs/specific_configs and runs the discrete-event model of
+``masbt_tools.namespace_model``: products with process chains, CfP/offer
+rounds bounded by OfferCollectionTimeoutSeconds, module skill durations and
+transport hops. Reports throughput, lead time and utilization, queueing and
+waiting per module.
+
+  python3 tools/python_mqtt/namespace_sim.py --horizon 2w --warmup 1d
+  python3 tools/python_mqtt/namespace_sim.py --add-module P107=ScrewingStation --arrival exp:120
+
+  # parameter sweep: one line per combination, values separated by ';'
+  python3 tools/python_mqtt/namespace_sim.py --horizon 1w --runs 3 \
+    --sweep "arrival=exp:300;exp:200;exp:150" --sweep "add_modules=-;P107=ScrewingStation"
+
+--model takes a JSON file with keys of DEFAULT_MODEL in
+masbt_tools/namespace_model.py (chains, stations, skill_time, transports
+...). Sweep keys are dotted paths into the same dict, e.g.
+``skill_time.Screw``, ``offer_collection_timeout`` or
+``modules.P102.error_rate``. Values are JSON where they parse as JSON and
+strings otherwise. For ``add_modules`` a value lists modules separated by
+``+``, and ``-`` means none.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+
+from masbt_tools.namespace_model import (
+    DEFAULT_MODEL,
+    load_namespace,
+    merge_model,
+    parse_duration,
+    set_path,
+    simulate,
+)
+from masbt_tools.stats import format_summary_table
+
+DEFAULT_CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "configs",
+                                  "specific_configs")
+
+
+def parse_sweep(spec):
+    key, sep, values = spec.partition("=")
+    if not sep or not key.strip():
+        raise ValueError(f"--sweep expects KEY=V1;V2;..., got '{spec}'")
+    if key.strip().split(".")[0] not in DEFAULT_MODEL:
+        raise ValueError(f"unknown model key '{key.strip()}'")
+    return key.strip(), [_value(key.strip(), v.strip()) for v in values.split(";")]
+
+
+def _value(key, text):
+    if key == "add_modules":
+        return [] if text in ("", "-") else [m for m in text.split("+") if m]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _label(value):
+    if isinstance(value, list):
+        return "+".join(map(str, value)) or "-"
+    return str(value)
+
+
+def run_point(namespace, model, args):
+    return [simulate(namespace, model, args.horizon, args.warmup, None if args.seed is None else args.seed + i)
+            for i in range(args.runs)]
+
+
+def print_run(result, elapsed, args):
+    print(f"{result['modules']} modules, {result['arrived']} products arrived, {result['completed']} completed, "
+          f"{result['refused']} refused; {result['throughput_per_hour']:.2f} products/h "
+          f"({result['events']} events in {elapsed:.2f}s)")
+    if len(result["per_chain"]) > 1:
+        print("  per chain: " + ", ".join(f"{k}={v}" for k, v in sorted(result["per_chain"].items())))
+    print()
+    print(format_summary_table({"lead time": result["lead_time"], "negotiation": result["negotiation"]}, unit="s"))
+    print()
+    print(f"{'resource':<16} {'kind':<18} {'util':>6} {'mean_q':>8} {'max_q':>6} {'mean_wait':>10} "
+          f"{'served':>8} {'errors':>7} {'timeouts':>8}")
+    for r in result["resources"][:args.top + 2] if args.top else result["resources"]:
+        print(f"{r['name']:<16} {r['kind'][:18]:<18} {100 * r['utilization']:>5.1f}% {r['mean_queue']:>8.2f} "
+              f"{r['max_queue']:>6} {r['mean_wait']:>9.1f}s {r['served']:>8} {r['errors']:>7} {r['timeouts']:>8}")
+
+
+def sweep_row(results):
+    """Mean over replications of the numbers compared across sweep points."""
+    def mean(values):
+        values = [v for v in values if not math.isnan(v)]
+        return sum(values) / len(values) if values else math.nan
+
+    modules = [[r for r in result["resources"] if r["kind"] not in ("dispatcher",)
+                and not r["kind"].startswith("transport")] for result in results]
+    busiest = [max(rows, key=lambda r: r["utilization"]) if rows else None for rows in modules]
+    return {
+        "throughput_per_hour": mean([r["throughput_per_hour"] for r in results]),
+        "lead_p50": mean([r["lead_time"]["p50"] for r in results]),
+        "lead_p95": mean([r["lead_time"]["p95"] for r in results]),
+        "negotiation_p95": mean([r["negotiation"]["p95"] for r in results]),
+        "dispatcher_util": mean([r["resources"][0]["utilization"] for r in results]),
+        "busiest": busiest[0]["name"] if busiest[0] else "-",
+        "busiest_util": mean([b["utilization"] for b in busiest if b]),
+        "refused": mean([r["refused"] for r in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event capacity model of a namespace")
+    parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, help="configs/specific_configs directory")
+    parser.add_argument("--namespace-config", default="NamespaceHolon/NamespaceHolon.json",
+                        help="Config listing the namespace's agents (SubHolons or Agents)")
+    parser.add_argument("--model", help="JSON model file (keys of DEFAULT_MODEL)")
+    parser.add_argument("--arrival", help="Product inter-arrival distribution (s), e.g. exp:300")
+    parser.add_argument("--add-module", action="append", default=[], metavar="ID[=ModuleName]",
+                        help="Add a module (what-if); an id from the configs or ID=ModuleName, repeatable")
+    parser.add_argument("--transports", type=int, help="Parallel transports (0 = no transport hops)")
+    parser.add_argument("--horizon", default="1w", help="Simulated time: seconds or 90m, 8h, 7d, 2w")
+    parser.add_argument("--warmup", default="0", help="Simulated time excluded from the statistics")
+    parser.add_argument("--runs", type=int, default=1, help="Replications per point (different seeds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sweep", action="append", default=[], metavar="KEY=V1;V2",
+                        help="Sweep a model parameter; several --sweep give the cartesian product")
+    parser.add_argument("--top", type=int, default=0, help="Modules listed per run (0 = all)")
+    parser.add_argument("--json-report", help="Write all results as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        args.horizon = parse_duration(args.horizon)
+        args.warmup = parse_duration(args.warmup)
+        if args.warmup >= args.horizon:
+            parser.error("--warmup must be shorter than --horizon")
+        if args.runs < 1:
+            parser.error("--runs must be >= 1")
+        sweeps = [parse_sweep(s) for s in args.sweep]
+        overrides = {}
+        if args.model:
+            with open(args.model, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+        base = merge_model(overrides)
+        if args.arrival:
+            base["arrival"] = args.arrival
+        if args.transports is not None:
+            base["transports"] = args.transports
+        base["add_modules"] = list(base["add_modules"]) + args.add_module
+        namespace = load_namespace(args.config_dir, args.namespace_config)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Namespace {namespace.name}: {', '.join(f'{m.id} ({m.station})' for m in namespace.modules)}; "
+          f"OfferCollectionTimeout {namespace.offer_collection_timeout:g}s, "
+          f"idle delay {namespace.idle_delay:g}s, sequential dispatch {namespace.sequential_dispatch}")
+    print(f"Horizon {args.horizon / 86400:g} days, warm-up {args.warmup / 86400:g} days, {args.runs} run(s) per point")
+    print()
+
+    report = []
+    keys = [key for key, _values in sweeps]
+    points = list(itertools.product(*[values for _key, values in sweeps])) if sweeps else [()]
+    if sweeps:
+        header = "".join(f"{key[:22]:<24}" for key in keys) + (
+            f"{'prod/h':>8} {'lead p50':>9} {'lead p95':>9} {'neg p95':>8} {'disp':>6} {'busiest':>10} "
+            f"{'util':>6} {'refused':>8}")
+        print(header + "   (lead/negotiation in s)")
+        print("-" * len(header))
+    for point in points:
+        model = json.loads(json.dumps(base))
+        try:
+            for key, value in zip(keys, point):
+                if key == "add_modules":
+                    value = list(base["add_modules"]) + value
+                set_path(model, key, value)
+            started = time.perf_counter()
+            results = run_point(namespace, model, args)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        elapsed = time.perf_counter() - started
+        report.append({"parameters": dict(zip(keys, point)), "results": results})
+        if not sweeps:
+            for result in results:
+                print_run(result, elapsed / len(results), args)
+                print()
+            continue
+        row = sweep_row(results)
+        print("".join(f"{_label(v)[:22]:<24}" for v in point)
+              + f"{row['throughput_per_hour']:>8.2f} {row['lead_p50']:>9.0f} {row['lead_p95']:>9.0f} "
+                f"{row['negotiation_p95']:>8.1f} {100 * row['dispatcher_util']:>5.1f}% {row['busiest'][:10]:>10} "
+                f"{100 * row['busiest_util']:>5.1f}% {row['refused']:>8.1f}", flush=True)
+
+    if args.json_report:
+        with open(args.json_report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Where do the seconds of a process-chain negotiation go?
+
+Stitches the hops of each negotiation together by conversationId:
+
+  ProcessChain/Request -> ModuleHolon/broadcast/OfferedCapability/Request
+    -> {module}/Planning/OfferedCapability/Request
+    -> CreateDescription / CalcSimilarity (optional detour)
+    -> OfferedCapability/Response -> ProcessChain/Response
+
+and prints a waterfall per negotiation, its critical path, and per-hop
+percentiles with the share of critical-path time each hop accounts for.
+
+Input is a capture (traffic_recorder.py directory, JSONL export or a JSON
+list) or a live subscription:
+
+  python3 tools/python_mqtt/negotiation_waterfall.py /tmp/traffic --waterfalls 3 --chrome trace.json
+  python3 tools/python_mqtt/negotiation_waterfall.py --live --namespace phuket --duration 120 --follow
+
+--chrome writes Chrome trace events (chrome://tracing, ui.perfetto.dev,
+speedscope) with one row per agent. --speedscope writes the critical path
+of every negotiation as a speedscope profile.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+
+from masbt_tools import AsyncMqttClient, MqttError, Record, new_conversation_id
+from masbt_tools.replay import load_capture
+from masbt_tools.traffic import frame_fields
+from masbt_tools.waterfall import (
+    HopStatistics,
+    Negotiation,
+    build_negotiations,
+    chrome_trace,
+    classify,
+    format_critical_path,
+    format_waterfall,
+    speedscope_profile,
+)
+
+
+async def capture_live(args):
+    """Subscribe to the namespace and collect records until --duration or Ctrl+C."""
+    records = []
+    by_conversation = {}
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("NegotiationWaterfall"),
+                             username=args.username, password=args.password)
+
+    def on_message(topic, payload, qos, retain):
+        record = Record(time.time(), topic, qos, retain, payload)
+        records.append(record)
+        if not args.follow:
+            return
+        conversation_id, msg_type = frame_fields(payload)
+        if not conversation_id:
+            return
+        by_conversation.setdefault(conversation_id, []).append(record)
+        if classify(topic, msg_type or "") == "process_chain_response":
+            negotiations = build_negotiations(by_conversation[conversation_id])
+            if negotiations:
+                print_follow(negotiations[0])
+
+    client.on_message = on_message
+    await client.connect()
+    await client.subscribe(f"/{args.namespace}/#", qos=0)
+    print(f"Listening on /{args.namespace}/# at {args.broker}:{args.port}", flush=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+    try:
+        await asyncio.wait_for(stop.wait(), args.duration if args.duration > 0 else None)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await client.disconnect()
+    return records
+
+
+def print_follow(negotiation: Negotiation):
+    path = negotiation.critical_path()
+    slowest = max(path, key=lambda edge: edge[3]) if path else None
+    hint = f", slowest hop {slowest[0]} {slowest[3] * 1000.0:.1f} ms" if slowest else ""
+    print(f"{negotiation.conversation_id}: {negotiation.duration * 1000.0:.1f} ms, "
+          f"{len(negotiation.events)} messages{hint}", flush=True)
+
+
+def report(negotiations, args):
+    if args.conversation:
+        negotiations = [n for n in negotiations if n.conversation_id == args.conversation]
+    if not negotiations:
+        print("No negotiations found (conversations need a ProcessChain/ManufacturingSequence request; "
+              "see --any-conversation).")
+        return
+    shown = negotiations
+    if args.sort == "slowest":
+        shown = sorted(negotiations, key=lambda n: n.duration, reverse=True)
+    for negotiation in shown[:args.waterfalls]:
+        print(format_waterfall(negotiation, args.width))
+        print(format_critical_path(negotiation))
+        print()
+    stats = HopStatistics()
+    for negotiation in negotiations:
+        stats.add(negotiation)
+    print(stats.format())
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(negotiations), f)
+        print(f"Chrome trace -> {args.chrome}")
+    if args.speedscope:
+        with open(args.speedscope, "w", encoding="utf-8") as f:
+            json.dump(speedscope_profile(negotiations), f)
+        print(f"speedscope profile -> {args.speedscope}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-hop latency waterfall of process-chain negotiations")
+    parser.add_argument("capture", nargs="?", help="Recording directory, .mtr segment, JSONL or JSON capture")
+    parser.add_argument("--live", action="store_true", help="Subscribe to the namespace instead of reading a capture")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--duration", type=float, default=0.0, help="Live: seconds to listen (0 = until Ctrl+C)")
+    parser.add_argument("--follow", action="store_true", help="Live: print a line per completed negotiation")
+    parser.add_argument("--reverse", action="store_true", help="Capture list is newest first (CabABlue exports)")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between records without timestamps")
+    parser.add_argument("--any-conversation", action="store_true",
+                        help="Also analyze conversations without a ProcessChain request")
+    parser.add_argument("--conversation", help="Only this conversationId")
+    parser.add_argument("--waterfalls", type=int, default=5, help="Negotiations printed as waterfall")
+    parser.add_argument("--sort", choices=["first", "slowest"], default="slowest")
+    parser.add_argument("--width", type=int, default=48, help="Waterfall bar width")
+    parser.add_argument("--chrome", help="Write a Chrome trace JSON file")
+    parser.add_argument("--speedscope", help="Write a speedscope JSON file")
+    args = parser.parse_args()
+    if bool(args.capture) == args.live:
+        parser.error("give either a capture or --live")
+
+    try:
+        if args.live:
+            records = asyncio.run(capture_live(args))
+        else:
+            records = load_capture(args.capture, args.reverse, args.gap)
+    except (OSError, MqttError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3 if args.live else 1)
+    except ValueError as e:
+        print(f"Cannot read capture: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    report(build_negotiations(records, require_request=not args.any_conversation), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""Product-level workload: ProcessChain and ManufacturingSequence requests per product.
+
+Plays many ProductHolons. Per product the driver does what
+Trees/ProductAgent.bt.xml does:
+
+  1. ``callForProposal/ProcessChain`` (SendProcessChainRequest) with a
+     CapabilitySet and ProductIdentification, then it waits for
+     ``proposal``/``refuseProposal`` with the same conversationId,
+  2. ``callForProposal/ManufacturingSequence`` (SendManufacturingRequest)
+     on a new conversation, with the ProcessChain of the proposal attached,
+     then it waits for the dispatcher's answer.
+
+Both requests go to ``/{ns}/ManufacturingSequence/Request`` and the
+answers come on ``/{ns}/ManufacturingSequence/Response``, the topics the
+agents use. Payloads are derived from tests/TestFiles/ProcessChain.json.
+Every product gets a random subset of its capability containers (or of
+--capabilities; names without a container get a bare one), its own
+Identifier, OrderNumber and timestamps.
+
+Products arrive open loop (poisson/fixed at --rate products/s) or closed
+loop. At most --concurrency products are in negotiation; later arrivals
+wait for a slot, and that wait is reported as admission.
+
+  python3 tools/python_mqtt/product_workload.py --namespace phuket --rate 0.5 --duration 600 --concurrency 5
+  python3 tools/python_mqtt/product_workload.py --mode closed --concurrency 3 --count 50 --records products.jsonl
+
+Reported per product: time-to-process-chain (PC request -> proposal),
+time-to-sequence (MS request -> proposal) and the product total from
+admission. --records writes one JSON line per product.
+"""
+import argparse
+import asyncio
+import copy
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from masbt_tools import MessageTemplate, Slot
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.codec import decode_payload
+from masbt_tools.frame_scan import FrameScanner
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_TEMPLATE = os.path.join(REPO_ROOT, "tests", "TestFiles", "ProcessChain.json")
+RESPONSE_SCANNER = FrameScanner()
+_PROCESS_CHAIN = "\x00process_chain\x00"  # stand-in for the embedded element, replaced after rendering
+PRODUCT_SLOTS = {"Identifier": "product_id", "OrderNumber": "order_number", "RootOrderNumber": "order_number",
+                 "EffectiveDate": "order_time", "OrderTimeIso": "order_time", "OrderTimestamp": "order_timestamp"}
+
+
+class ProductTemplates:
+    """Request templates per capability subset, derived from a ProcessChain CfP."""
+
+    def __init__(self, path, ms_receiver):
+        with open(path, "r", encoding="utf-8") as f:
+            message = json.load(f)
+        elements = {e.get("idShort"): e for e in message["interactionElements"]}
+        self.capability_set = elements["CapabilitySet"]
+        self.containers = {}
+        for container in self.capability_set["value"]:
+            capability = next((e["idShort"] for e in container.get("value", ()) if e.get("modelType") == "Capability"),
+                              container["idShort"])
+            self.containers[capability] = container
+        self.product = copy.deepcopy(elements["ProductIdentification"])
+        for prop in self.product["value"]:
+            slot = PRODUCT_SLOTS.get(prop.get("idShort"))
+            if slot:
+                prop["value"] = Slot(slot)
+        self.extra = [e for name, e in elements.items() if name not in ("CapabilitySet", "ProductIdentification")]
+        self.sender_role = ((message["frame"].get("sender") or {}).get("role") or {}).get("name") or "ProductHolon"
+        self.ms_receiver = ms_receiver
+        self._cache = {}
+
+    def _capability_set(self, capabilities):
+        value = []
+        for name in capabilities:
+            container = self.containers.get(name)
+            if container is None:
+                container = {"idShort": f"{name}Container", "kind": "Instance",
+                             "modelType": "SubmodelElementCollection",
+                             "value": [{"idShort": name, "kind": "Instance", "modelType": "Capability"}]}
+            value.append(container)
+        return {**self.capability_set, "value": value}
+
+    def render(self, kind, capabilities, msg_type, process_chain=None, **values) -> str:
+        """Request text; ``process_chain`` (an element dict) is embedded in ManufacturingSequence requests."""
+        text = self.request(kind, capabilities, msg_type).render(**values)
+        if kind == "ManufacturingSequence":
+            if process_chain is None:  # no element at all rather than an empty one
+                return text.replace("," + json.dumps(_PROCESS_CHAIN), "")
+            text = text.replace(json.dumps(_PROCESS_CHAIN), json.dumps(process_chain, separators=(",", ":")))
+        return text
+
+    def request(self, kind, capabilities, msg_type) -> MessageTemplate:
+        """Slots: conversation_id, product_id, order_number, order_time, order_timestamp (+ process_chain for MS)."""
+        key = (kind, tuple(capabilities), msg_type)
+        tpl = self._cache.get(key)
+        if tpl is None:
+            if kind == "ProcessChain":
+                receiver = {"identification": {"id": "Broadcast"}, "role": {"name": "System"}}
+            else:
+                receiver = {"identification": {"id": self.ms_receiver}, "role": {"name": "DispatchingAgent"}}
+            elements = [self._capability_set(capabilities), self.product] + self.extra
+            if kind == "ManufacturingSequence":
+                elements.append(Slot("process_chain"))
+            frame = {"sender": {"identification": {"id": Slot("product_id")}, "role": {"name": self.sender_role}},
+                     "receiver": receiver, "type": msg_type, "conversationId": Slot("conversation_id")}
+            defaults = {"process_chain": _PROCESS_CHAIN} if kind == "ManufacturingSequence" else None
+            tpl = self._cache[key] = MessageTemplate({"frame": frame, "interactionElements": elements}, defaults)
+        return tpl
+
+
+class Product:
+    __slots__ = ("seq", "product_id", "capabilities", "arrived", "admitted", "pc_sent", "pc_done", "pc_result",
+                 "ms_sent", "ms_done", "ms_result", "conversations")
+
+    def __init__(self, seq, product_id, capabilities, arrived):
+        self.seq = seq
+        self.product_id = product_id
+        self.capabilities = capabilities
+        self.arrived = arrived
+        self.admitted = self.pc_sent = self.pc_done = self.ms_sent = self.ms_done = None
+        self.pc_result = self.ms_result = None
+        self.conversations = []
+
+    def record(self):
+        def span(a, b):
+            return None if a is None or b is None else round(b - a, 6)
+
+        return {"product": self.product_id, "capabilities": self.capabilities,
+                "admission": span(self.arrived, self.admitted),
+                "process_chain": self.pc_result, "time_to_process_chain": span(self.pc_sent, self.pc_done),
+                "sequence": self.ms_result, "time_to_sequence": span(self.ms_sent, self.ms_done),
+                "total": span(self.admitted, self.ms_done or self.pc_done), "conversations": self.conversations}
+
+
+class ProductWorkload:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.run_id = f"{int(time.time()):x}"
+        self.templates = ProductTemplates(args.template, args.ms_receiver.format(ns=args.namespace))
+        pool = [c.strip() for c in args.capabilities.split(",") if c.strip()] if args.capabilities else []
+        self.pool = pool or list(self.templates.containers)
+        self.client = AsyncMqttClient(args.broker, args.port, client_id=f"ProductWorkload_{self.run_id}",
+                                      username=args.username, password=args.password)
+        self.client.on_message = self._on_message
+        self.request_topic = args.request_topic.format(ns=args.namespace)
+        self.response_topic = args.response_topic.format(ns=args.namespace)
+        self.waiting: dict[str, asyncio.Future] = {}
+        self.slots = asyncio.Semaphore(args.concurrency)
+        self.seq = itertools.count(1)
+        self.products: list[Product] = []
+        self.histograms = {name: LatencyHistogram() for name in
+                           ("admission", "time-to-process-chain", "time-to-sequence", "product total")}
+        self.results = {}
+        self.in_negotiation = 0
+        self.unmatched = 0
+        self.records = open(args.records, "w", encoding="utf-8") if args.records else None
+
+    # --- messages ------------------------------------------------------------
+
+    def _capabilities(self):
+        low = max(1, min(self.args.min_caps, len(self.pool)))
+        high = max(low, min(self.args.max_caps or len(self.pool), len(self.pool)))
+        chosen = set(self.rng.sample(self.pool, self.rng.randint(low, high)))
+        return [c for c in self.pool if c in chosen]  # keep the process order of the pool
+
+    def _on_message(self, topic, payload, qos, retain):
+        fields = RESPONSE_SCANNER.scan(payload)
+        if fields is None:
+            return
+        future = self.waiting.get(fields.conversation_id)
+        if future is None or future.done():
+            if future is None and str(fields.type or "").lower().startswith(("proposal", "refuse")):
+                self.unmatched += 1
+            return
+        msg_type = str(fields.type or "").lower()
+        if msg_type.startswith("callforproposal"):
+            return  # our own request, when request and response topic are the same
+        future.set_result((msg_type, payload))
+
+    async def _ask(self, product, kind, msg_type, extra):
+        conversation_id = str(uuid.uuid4())
+        product.conversations.append(conversation_id)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        payload = self.templates.render(
+            kind, product.capabilities, msg_type, conversation_id=conversation_id, product_id=product.product_id, order_number=str(uuid.uuid4()),
+            order_time=now.isoformat(), order_timestamp=str(int(now.timestamp() * 1000)), **extra)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[conversation_id] = future
+        sent = time.perf_counter()
+        try:
+            self.client.publish(self.request_topic, payload, qos=self.args.qos)
+            msg_type, response = await asyncio.wait_for(future, self.args.timeout)
+            result = "proposal" if msg_type.startswith("proposal") else "refusal"
+        except asyncio.TimeoutError:
+            response, result = None, "timeout"
+        except MqttError:
+            response, result = None, "publish_error"
+        finally:
+            self.waiting.pop(conversation_id, None)
+        return sent, time.perf_counter(), result, response
+
+    # --- products ------------------------------------------------------------
+
+    async def product(self, product):
+        args = self.args
+        async with self.slots:
+            product.admitted = time.perf_counter()
+            self.histograms["admission"].record(product.admitted - product.arrived)
+            self.in_negotiation += 1
+            try:
+                process_chain = None
+                if args.flow != "sequence":
+                    product.pc_sent, product.pc_done, product.pc_result, response = await self._ask(
+                        product, "ProcessChain", args.process_chain_type, {})
+                    self._count("process_chain", product.pc_result)
+                    if product.pc_result != "proposal":
+                        return
+                    self.histograms["time-to-process-chain"].record(product.pc_done - product.pc_sent)
+                    process_chain = _first_element(response)
+                if args.flow == "process-chain":
+                    return
+                extra = {"process_chain": process_chain}
+                product.ms_sent, product.ms_done, product.ms_result, _response = await self._ask(
+                    product, "ManufacturingSequence", args.sequence_type, extra)
+                self._count("sequence", product.ms_result)
+                if product.ms_result == "proposal":
+                    self.histograms["time-to-sequence"].record(product.ms_done - product.ms_sent)
+            finally:
+                self.in_negotiation -= 1
+                end = product.ms_done or product.pc_done
+                if end is not None and (product.ms_result or product.pc_result) == "proposal":
+                    self.histograms["product total"].record(end - product.admitted)
+                if self.records is not None:
+                    self.records.write(json.dumps(product.record()) + "\n")
+
+    def _count(self, stage, result):
+        key = (stage, result)
+        self.results[key] = self.results.get(key, 0) + 1
+
+    def new_product(self):
+        seq = next(self.seq)
+        product = Product(seq, f"https://smartfactory.de/shells/load_{self.run_id}_{seq}", self._capabilities(),
+                          time.perf_counter())
+        self.products.append(product)
+        return asyncio.create_task(self.product(product))
+
+    async def run_open_loop(self, deadline, tasks):
+        fixed = self.args.mode == "fixed"
+        next_at = time.perf_counter()
+        while not self._count_reached():
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            while next_at <= now and not self._count_reached():
+                tasks.append(self.new_product())
+                next_at += (1.0 / self.args.rate) if fixed else self.rng.expovariate(self.args.rate)
+            await asyncio.sleep(max(0.0, min(next_at, deadline) - time.perf_counter()))
+
+    async def run_closed_loop(self, deadline, tasks):
+        while time.perf_counter() < deadline and not self._count_reached():
+            active = [t for t in tasks if not t.done()]
+            if len(active) < self.args.concurrency:
+                tasks.append(self.new_product())
+                continue
+            await asyncio.wait(active, timeout=max(0.0, deadline - time.perf_counter()),
+                               return_when=asyncio.FIRST_COMPLETED)
+
+    def _count_reached(self):
+        return self.args.count is not None and len(self.products) >= self.args.count
+
+    async def progress_loop(self, start):
+        interval = self.args.progress
+        while True:
+            await asyncio.sleep(interval)
+            done = sum(v for (stage, _r), v in self.results.items()
+                       if stage == ("process_chain" if self.args.flow == "process-chain" else "sequence"))
+            print(f"[{time.perf_counter() - start:7.1f}s] products={len(self.products)} "
+                  f"in_negotiation={self.in_negotiation} finished={done} "
+                  f"{' '.join(f'{s}:{r}={v}' for (s, r), v in sorted(self.results.items()))}", flush=True)
+
+    # --- main ----------------------------------------------------------------
+
+    async def run(self):
+        args = self.args
+        await self.client.connect()
+        await self.client.subscribe(self.response_topic, qos=args.qos)
+        print(f"Connected to {args.broker}:{args.port}; requests on {self.request_topic}, responses on "
+              f"{self.response_topic}; capabilities {', '.join(self.pool)}; flow={args.flow}")
+        start = time.perf_counter()
+        deadline = start + args.duration
+        tasks = []
+        helpers = [asyncio.create_task(self.progress_loop(start))] if args.progress > 0 else []
+        try:
+            if args.mode == "closed":
+                await self.run_closed_loop(deadline, tasks)
+            else:
+                await self.run_open_loop(deadline, tasks)
+            send_elapsed = time.perf_counter() - start
+            if tasks:
+                await asyncio.gather(*tasks)  # each conversation ends by answer or --timeout
+        finally:
+            for task in helpers:
+                task.cancel()
+            await self.client.disconnect()
+            if self.records is not None:
+                self.records.close()
+        self.report(send_elapsed, time.perf_counter() - start)
+
+    def report(self, send_elapsed, elapsed):
+        print()
+        print(f"{len(self.products)} products in {send_elapsed:.1f}s "
+              f"({len(self.products) / send_elapsed if send_elapsed else 0.0:.2f}/s), finished after {elapsed:.1f}s; "
+              + ", ".join(f"{stage} {result}: {count}" for (stage, result), count in sorted(self.results.items()))
+              + (f"; {self.unmatched} unmatched responses" if self.unmatched else ""))
+        print(format_summary_table({name: h.summary(scale=1.0) for name, h in self.histograms.items()}, unit="s"))
+
+
+def _first_element(payload):
+    try:
+        message = decode_payload(payload)
+    except ValueError:
+        return None
+    elements = message.get("interactionElements") if isinstance(message, dict) else None
+    return elements[0] if elements else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProcessChain / ManufacturingSequence workload per product")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="ProcessChain CfP the requests are derived from")
+    parser.add_argument("--capabilities", help="Comma separated capability pool (default: the template's)")
+    parser.add_argument("--min-caps", type=int, default=1, help="Fewest capabilities per product")
+    parser.add_argument("--max-caps", type=int, default=0, help="Most capabilities per product (0 = whole pool)")
+    parser.add_argument("--flow", choices=["both", "process-chain", "sequence"], default="both",
+                        help="ProcessChain then ManufacturingSequence, or only one of them")
+    parser.add_argument("--mode", choices=["poisson", "fixed", "closed"], default="poisson")
+    parser.add_argument("--rate", type=float, default=0.2, help="Product arrivals per second (open loop)")
+    parser.add_argument("--concurrency", type=int, default=5, help="Max products in negotiation")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to generate products")
+    parser.add_argument("--count", type=int, default=None, help="Stop after this many products")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for each answer")
+    parser.add_argument("--request-topic", default="/{ns}/ManufacturingSequence/Request")
+    parser.add_argument("--response-topic", default="/{ns}/ManufacturingSequence/Response")
+    parser.add_argument("--process-chain-type", default="callForProposal/ProcessChain")
+    parser.add_argument("--sequence-type", default="callForProposal/ManufacturingSequence")
+    parser.add_argument("--ms-receiver", default="{ns}/DispatchingAgent", help="Receiver of ManufacturingSequence CfPs")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--progress", type=float, default=10.0, help="Progress line interval in seconds (0 = off)")
+    parser.add_argument("--records", help="Write one JSON line per product to this file")
+    args = parser.parse_args()
+
+    if args.mode != "closed" and args.rate <= 0:
+        parser.error("--rate must be > 0")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be >= 1")
+
+    try:
+        workload = ProductWorkload(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        asyncio.run(workload.run())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""Cold-start storm: hundreds to thousands of agents register at once.
+
+Simulates a hall restart. Each simulated module starts after a delay drawn
+from ``--jitter``. Its Planning and Execution agents then register on
+``/{ns}/{module}/register`` and the ModuleHolon registers on
+``/{ns}/register``. The module publishes an initial ``inventoryUpdate`` on
+``/{ns}/{module}/Inventory`` and re-registers every ``--heartbeat``
+seconds. The dispatcher prunes modules without a heartbeat after
+AgentTimeoutSeconds.
+
+A separate observer connection measures convergence:
+
+* acknowledged: the module shows up in the dispatcher's state. That is the
+  ``dispatchingStateLog`` published by PublishAgentStateNode on
+  ``/{ns}/{dispatcher}/{dispatcher}_{Role}/logs``, or the SubAgents of a
+  registerMessage from a non-simulated sender (IncludeAggregatedSubAgents).
+* in CfP fan-out: the first OfferedCapability CfP addressed to the module
+  on ``/{ns}/ModuleHolon/broadcast/OfferedCapability/Request``. CfPs only
+  flow while products arrive, so run product_workload.py alongside.
+  ``--answer-cfps`` refuses them so the dispatcher does not wait for the
+  OfferCollectionTimeout.
+
+The report separates where messages queue up:
+
+* broker echo: publish to observer delivery of the storm's own messages.
+* ack lag: first registration until the dispatcher lists the module. If it
+  grows with the start order, the dispatcher's registration handling is the
+  backlog, not the broker.
+* client and broker queues: QoS 1 messages in flight per publisher
+  connection, and the deepest client queues from mqtt_broker.py's
+  ``$SYS/masbt/stats``.
+
+  python3 tools/python_mqtt/registration_storm.py --namespace _PHUKET --modules 1000 \\
+    --jitter uniform:0,10 --heartbeat 1 --connections 20 --until acked
+
+  # fan-out as well, with products arriving every second
+  python3 tools/python_mqtt/product_workload.py --namespace _PHUKET --rate 1 --duration 120 &
+  python3 tools/python_mqtt/registration_storm.py --namespace _PHUKET --modules 500 \\
+    --capabilities Drill,Screw --answer-cfps --until fanout
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+
+from masbt_tools import (
+    capability_refusal_template,
+    inventory_template,
+    new_conversation_id,
+    registration_template,
+)
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.codec import decode_payload
+from masbt_tools.distributions import parse_distribution
+from masbt_tools.frame_scan import FrameScanner
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+SUB_ROLES = (("Planning_Agent", "PlanningHolon"), ("Execution_Agent", "ExecutionHolon"))
+
+
+class StormModule:
+    __slots__ = ("id", "index", "capabilities", "client", "offset", "registered_at", "acked_at", "fanout_at",
+                 "present", "lost", "heartbeats")
+
+    def __init__(self, module_id, index, capabilities, client, offset):
+        self.id = module_id
+        self.index = index
+        self.capabilities = capabilities
+        self.client = client
+        self.offset = offset
+        self.registered_at = None
+        self.acked_at = None
+        self.fanout_at = None
+        self.present = False
+        self.lost = 0
+        self.heartbeats = 0
+
+    def record(self):
+        def rel(t):
+            return None if t is None else round(t, 4)
+        return {"module": self.id, "capabilities": list(self.capabilities), "offset": round(self.offset, 4),
+                "registered": rel(self.registered_at), "acked": rel(self.acked_at), "fanout": rel(self.fanout_at),
+                "lost": self.lost, "heartbeats": self.heartbeats}
+
+
+class RegistrationStorm:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.seq = 0
+        ns = args.namespace
+        self.register_topic = args.register_topic.format(ns=ns)
+        self.sub_register_topic = args.sub_register_topic
+        self.inventory_topic = args.inventory_topic
+        self.cfp_topic = args.cfp_topic.format(ns=ns)
+
+        self.clients = [AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("RegistrationStorm"),
+                                        username=args.username, password=args.password)
+                        for _ in range(max(1, min(args.connections, args.modules)))]
+        self.observer = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("StormObserver"),
+                                        username=args.username, password=args.password)
+        self.observer.on_message = self._on_message
+        self.scanner = FrameScanner(("DispatchingState", "Capability", "RequirementId"))
+
+        jitter = parse_distribution(args.jitter)
+        self.sub_jitter = parse_distribution(args.sub_jitter)
+        pool = [c.strip() for c in args.capabilities.split(",") if c.strip()]
+        width = max(3, len(str(args.modules)))
+        self.modules = []
+        for i in range(args.modules):
+            k = min(args.caps_per_module, len(pool)) if args.caps_per_module > 0 else len(pool)
+            caps = tuple(sorted(self.rng.sample(pool, k)))
+            self.modules.append(StormModule(f"{args.prefix}{i + 1:0{width}d}", i, caps,
+                                            self.clients[i % len(self.clients)], jitter.sample(self.rng)))
+        self.by_id = {m.id.lower(): m for m in self.modules}
+
+        self.start = None
+        self.sent = {}  # conversation id -> publish time, until the observer sees the echo
+        self.published = 0
+        self.send_errors = 0
+        self.echo = LatencyHistogram()
+        self.window_echo = LatencyHistogram()
+        self.ack_lag = LatencyHistogram()
+        self.fanout_lag = LatencyHistogram()
+        self.window_ack = LatencyHistogram()
+        self.started = 0
+        self.acked = 0
+        self.present = 0
+        self.fanned_out = 0
+        self.states = 0
+        self.ack_source = {"state": 0, "register": 0}
+        self.converged_at = None
+        self.fanout_all_at = None
+        self.cfps = 0
+        self.refusals = 0
+        self.max_inflight = 0
+        self.broker_peaks = {}
+        self.broker_snapshots = 0
+        self.timeline = []
+        self.done = asyncio.Event()
+
+    # --- publishing ----------------------------------------------------------
+
+    def _now(self):
+        return time.perf_counter() - self.start
+
+    def _publish(self, client, topic, tpl, **values):
+        self.seq += 1
+        conversation_id = f"storm_{self.run_id}_{self.seq}"
+        try:
+            client.publish(topic, tpl.render(conversation_id=conversation_id, **values), qos=self.args.qos)
+        except MqttError:
+            self.send_errors += 1
+            return
+        self.sent[conversation_id] = time.perf_counter()
+        self.published += 1
+
+    def _register_subagents(self, module):
+        args = self.args
+        topic = self.sub_register_topic.format(ns=args.namespace, module=module.id)
+        for suffix, role in SUB_ROLES:
+            self._publish(module.client, topic,
+                          registration_template(f"{module.id}_{suffix}", role, module.capabilities, (), module.id))
+
+    def _register(self, module):
+        subagents = tuple(f"{module.id}_{suffix}" for suffix, _role in SUB_ROLES) if self.args.subagents else ()
+        self._publish(module.client, self.register_topic,
+                      registration_template(module.id, "ModuleHolon", module.capabilities, subagents,
+                                            self.args.receiver))
+
+    def _start_module(self, module):
+        loop = asyncio.get_running_loop()
+        module.registered_at = self._now()
+        self.started += 1
+        if self.args.subagents:
+            loop.call_later(self.sub_jitter.sample(self.rng), self._register_subagents, module)
+        self._register(module)
+        if self.args.inventory:
+            free = self.args.slots
+            self._publish(module.client, self.inventory_topic.format(ns=self.args.namespace, module=module.id),
+                          inventory_template(module.id), free=str(free), occupied="0")
+        if self.args.heartbeat > 0:
+            loop.call_later(self.args.heartbeat, self._heartbeat, module)
+
+    def _heartbeat(self, module):
+        module.heartbeats += 1
+        self._register(module)
+        if self.args.subagents:
+            self._register_subagents(module)
+        asyncio.get_running_loop().call_later(self.args.heartbeat, self._heartbeat, module)
+
+    # --- observer ------------------------------------------------------------
+
+    def _on_message(self, topic, payload, qos, retain):
+        received_at = time.perf_counter()
+        if topic.startswith("$SYS/"):
+            self._broker_stats(payload)
+            return
+        fields = self.scanner.scan(payload)
+        if fields is None:
+            return
+        sent_at = self.sent.pop(fields.conversation_id, None) if fields.conversation_id else None
+        if sent_at is not None:
+            self.echo.record(received_at - sent_at)
+            self.window_echo.record(received_at - sent_at)
+            return
+        msg_type = (fields.type or "").lower()
+        if msg_type == "dispatchingstatelog":
+            try:
+                state = json.loads(fields.values.get("DispatchingState") or "[]")
+            except ValueError:
+                return
+            ids = {str(entry.get("ModuleId") or "").lower() for entry in state if isinstance(entry, dict)}
+            self._dispatcher_view(ids, "state")
+        elif msg_type in ("registermessage", "moduleregistration"):
+            if (fields.sender or "").lower() in self.by_id:
+                return  # a storm registration from an earlier run
+            try:
+                message = decode_payload(payload)
+            except ValueError:
+                return
+            subagents = _sub_agents(message.get("interactionElements"))
+            if subagents:
+                self._dispatcher_view({s.lower() for s in subagents}, "register")
+        elif msg_type.startswith("callforproposal") and topic == self.cfp_topic:
+            self._cfp(fields)
+
+    def _dispatcher_view(self, ids, source):
+        if source == "register" and not any(i in self.by_id for i in ids):
+            return  # a module announcing its own sub-agents
+        now = self._now()
+        self.states += 1
+        self.ack_source[source] += 1
+        present = 0
+        for module in self.modules:
+            if module.id.lower() in ids:
+                present += 1
+                if module.acked_at is None and module.registered_at is not None:
+                    module.acked_at = now
+                    self.acked += 1
+                    self.ack_lag.record(now - module.registered_at)
+                    self.window_ack.record(now - module.registered_at)
+                module.present = True
+            elif module.present:
+                module.present = False
+                module.lost += 1
+        self.present = present
+        if present == len(self.modules) and self.converged_at is None:
+            self.converged_at = now
+            if self.args.until == "acked":
+                self.done.set()
+
+    def _cfp(self, fields):
+        self.cfps += 1
+        module = self.by_id.get((fields.receiver or "").lower())
+        if module is None:
+            return
+        if module.fanout_at is None and module.registered_at is not None:
+            now = self._now()
+            module.fanout_at = now
+            self.fanned_out += 1
+            self.fanout_lag.record(now - module.registered_at)
+            if self.fanned_out == len(self.modules):
+                self.fanout_all_at = now
+                if self.args.until == "fanout":
+                    self.done.set()
+        if self.args.answer_cfps and fields.sender:
+            topic = self.args.response_topic.format(ns=self.args.namespace, requester=fields.sender)
+            payload = capability_refusal_template(module.id).render(
+                conversation_id=fields.conversation_id or "", receiver_id=fields.sender,
+                receiver_role=fields.sender_role or "", capability=str(fields.values.get("Capability") or ""),
+                requirement_id=str(fields.values.get("RequirementId") or ""), reason="registration storm")
+            try:
+                self.observer.publish(topic, payload, qos=self.args.qos)
+                self.refusals += 1
+            except MqttError:
+                self.send_errors += 1
+
+    def _broker_stats(self, payload):
+        try:
+            snapshot = json.loads(payload)
+        except ValueError:
+            return
+        self.broker_snapshots += 1
+        for client_id, c in (snapshot.get("clients") or {}).items():
+            peak = self.broker_peaks.setdefault(client_id, {"queued": 0, "inflight": 0, "buffered_bytes": 0,
+                                                            "dropped": 0})
+            for key in peak:
+                peak[key] = max(peak[key], int(c.get(key) or 0))
+
+    # --- main ----------------------------------------------------------------
+
+    async def progress_loop(self):
+        interval = self.args.progress
+        last_published = 0
+        while True:
+            await asyncio.sleep(interval)
+            inflight = max(c.inflight for c in self.clients)
+            self.max_inflight = max(self.max_inflight, inflight)
+            echo_p95 = self.window_echo.percentile(95) * 1000
+            ack_p95 = self.window_ack.percentile(95)
+            row = {"t": round(self._now(), 3), "started": self.started, "acked": self.acked,
+                   "present": self.present, "fanout": self.fanned_out,
+                   "publish_rate": (self.published - last_published) / interval,
+                   "echo_p95_ms": None if math.isnan(echo_p95) else echo_p95,
+                   "ack_lag_p95_s": None if math.isnan(ack_p95) else ack_p95,
+                   "client_inflight": inflight, "unechoed": len(self.sent)}
+            self.timeline.append(row)
+            if not self.args.quiet:
+                print(f"[{row['t']:7.1f}s] started {self.started}/{len(self.modules)} acked {self.acked} "
+                      f"(listed {self.present}) fan-out {self.fanned_out} | pub {row['publish_rate']:.0f}/s "
+                      f"echo p95 {echo_p95:.1f}ms ack lag p95 {ack_p95:.2f}s inflight {inflight}", flush=True)
+            last_published = self.published
+            self.window_echo = LatencyHistogram()
+            self.window_ack = LatencyHistogram()
+
+    async def run(self):
+        args = self.args
+        await self.observer.connect()
+        ns = args.namespace
+        filters = {self.register_topic, self.cfp_topic, args.state_topic.format(ns=ns),
+                   self.sub_register_topic.format(ns=ns, module="+"),
+                   self.inventory_topic.format(ns=ns, module="+")}
+        await self.observer.subscribe(*sorted(filters), qos=args.qos)
+        if args.sys_topic:
+            await self.observer.subscribe(args.sys_topic, qos=0)
+        await asyncio.gather(*(c.connect() for c in self.clients))
+        print(f"Connected to {args.broker}:{args.port}; {len(self.modules)} modules on {len(self.clients)} "
+              f"connection(s), start jitter {args.jitter}, heartbeat {args.heartbeat:g}s")
+
+        loop = asyncio.get_running_loop()
+        self.start = time.perf_counter()
+        for module in self.modules:
+            loop.call_later(module.offset, self._start_module, module)
+        progress = asyncio.create_task(self.progress_loop()) if args.progress > 0 else None
+        try:
+            await asyncio.wait_for(self.done.wait(), args.duration)
+            if args.settle > 0:
+                await asyncio.sleep(args.settle)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            elapsed = self._now()
+            if progress:
+                progress.cancel()
+            for client in self.clients:
+                await client.disconnect()
+            await self.observer.disconnect()
+        self.report(elapsed)
+
+    def _reached(self, attr, fraction):
+        times = sorted(getattr(m, attr) for m in self.modules if getattr(m, attr) is not None)
+        need = max(1, math.ceil(fraction * len(self.modules)))
+        return times[need - 1] if len(times) >= need else None
+
+    def report(self, elapsed):
+        n = len(self.modules)
+        last_start = max(m.offset for m in self.modules)
+        print()
+        print(f"{n} modules{f' (+{2 * n} sub-agents)' if self.args.subagents else ''} in {elapsed:.1f}s, "
+              f"last start at {last_start:.1f}s; {self.acked} acknowledged, {self.fanned_out} in CfP fan-out")
+        for label, attr in (("acknowledged", "acked_at"), ("in fan-out", "fanout_at")):
+            marks = [(f, self._reached(attr, f)) for f in (0.5, 0.9, 1.0)]
+            print(f"  {label:<13} " + ", ".join(
+                f"{int(f * 100)}% {'-' if t is None else f'{t:.2f}s'}" for f, t in marks))
+        if self.converged_at is not None:
+            print(f"  dispatcher listed all {n} modules at {self.converged_at:.2f}s "
+                  f"({self.converged_at - last_start:.2f}s after the last start)")
+        lost = sum(1 for m in self.modules if m.lost)
+        print(f"  {self.states} dispatcher views (state {self.ack_source['state']}, register "
+              f"{self.ack_source['register']}); {lost} modules dropped out again after being listed")
+        print(f"  {self.published} messages published, {len(self.sent)} not echoed, {self.send_errors} send errors; "
+              f"{self.cfps} CfPs seen, {self.refusals} refused")
+        print()
+        print(format_summary_table({"broker echo": self.echo.summary()}))
+        print()
+        print(format_summary_table({"ack lag": self.ack_lag.summary(scale=1.0),
+                                    "fan-out lag": self.fanout_lag.summary(scale=1.0)}, unit="s"))
+        by_start = self.lag_by_start_order()
+        if by_start:
+            print()
+            print("ack lag by start order (p50 s): " + "  ".join(f"Q{i + 1} {v:.2f}" for i, v in by_start))
+        print()
+        print(f"publisher connections: max {self.max_inflight} QoS 1 messages in flight")
+        if self.broker_peaks:
+            top = sorted(self.broker_peaks.items(),
+                         key=lambda kv: (kv[1]["queued"], kv[1]["buffered_bytes"]), reverse=True)[:self.args.top]
+            print(f"broker client queues, peak over {self.broker_snapshots} $SYS snapshots:")
+            print(f"  {'client':<40} {'queued':>8} {'inflight':>9} {'buffered':>10} {'dropped':>8}")
+            for client_id, p in top:
+                print(f"  {client_id[:40]:<40} {p['queued']:>8} {p['inflight']:>9} {p['buffered_bytes']:>10} "
+                      f"{p['dropped']:>8}")
+        missing = [m.id for m in self.modules if m.acked_at is None]
+        if missing:
+            print()
+            print(f"never acknowledged ({len(missing)}): {', '.join(missing[:20])}{' ...' if len(missing) > 20 else ''}")
+
+    def lag_by_start_order(self):
+        ordered = sorted((m for m in self.modules if m.acked_at is not None), key=lambda m: m.registered_at)
+        if len(ordered) < 4:
+            return []
+        quarters = []
+        for q in range(4):
+            part = ordered[q * len(ordered) // 4:(q + 1) * len(ordered) // 4]
+            hist = LatencyHistogram()
+            for m in part:
+                hist.record(m.acked_at - m.registered_at)
+            quarters.append((q, hist.percentile(50)))
+        return quarters
+
+    def json_report(self):
+        return {
+            "modules": len(self.modules),
+            "converged_at": self.converged_at,
+            "fanout_all_at": self.fanout_all_at,
+            "published": self.published,
+            "broker_echo_ms": self.echo.summary(),
+            "ack_lag_s": self.ack_lag.summary(scale=1.0),
+            "fanout_lag_s": self.fanout_lag.summary(scale=1.0),
+            "broker_peaks": self.broker_peaks,
+            "timeline": self.timeline,
+            "per_module": [m.record() for m in self.modules],
+        }
+
+
+def _sub_agents(elements):
+    for element in elements or ():
+        if not isinstance(element, dict):
+            continue
+        if element.get("idShort") == "SubAgents" and isinstance(element.get("value"), list):
+            return [str(e.get("value")) for e in element["value"] if isinstance(e, dict) and e.get("value")]
+        if isinstance(element.get("value"), list):
+            found = _sub_agents(element["value"])
+            if found:
+                return found
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration/heartbeat storm and convergence measurement")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--modules", type=int, default=100, help="Simulated ModuleHolons")
+    parser.add_argument("--prefix", default="STORM", help="Id prefix of the simulated modules")
+    parser.add_argument("--capabilities", default="Drill,Screw,Assemble,Store,Retrieve",
+                        help="Capability pool the modules register")
+    parser.add_argument("--caps-per-module", type=int, default=2, help="Capabilities per module (0 = all)")
+    parser.add_argument("--no-subagents", dest="subagents", action="store_false",
+                        help="Do not register Planning/Execution agents per module")
+    parser.add_argument("--no-inventory", dest="inventory", action="store_false",
+                        help="Do not publish an initial inventoryUpdate per module")
+    parser.add_argument("--slots", type=int, default=4, help="Free slots in the initial InventorySummary")
+    parser.add_argument("--jitter", default="uniform:0,5", help="Module start offset distribution (s)")
+    parser.add_argument("--sub-jitter", default="uniform:0,0.5",
+                        help="Delay of the sub-agent registrations after their module starts (s)")
+    parser.add_argument("--heartbeat", type=float, default=1.0, help="Re-registration interval in s (0 = once)")
+    parser.add_argument("--connections", type=int, default=10, help="Publisher connections the modules share")
+    parser.add_argument("--receiver", default="Namespace", help="Receiver id of the module registrations")
+    parser.add_argument("--register-topic", default="/{ns}/register")
+    parser.add_argument("--sub-register-topic", default="/{ns}/{module}/register")
+    parser.add_argument("--inventory-topic", default="/{ns}/{module}/Inventory")
+    parser.add_argument("--state-topic", default="/{ns}/+/+/logs", help="Filter for the dispatchingStateLog")
+    parser.add_argument("--cfp-topic", default="/{ns}/ModuleHolon/broadcast/OfferedCapability/Request")
+    parser.add_argument("--response-topic", default="/{ns}/{requester}/OfferedCapability/Response")
+    parser.add_argument("--answer-cfps", action="store_true", help="Refuse CfPs addressed to simulated modules")
+    parser.add_argument("--sys-topic", default="$SYS/masbt/stats", help="Broker stats topic ('' = off)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--until", choices=["acked", "fanout"],
+                        help="Stop once all modules are acknowledged / in fan-out (else run --duration)")
+    parser.add_argument("--duration", type=float, default=120.0, help="Maximum seconds to run")
+    parser.add_argument("--settle", type=float, default=0.0, help="Seconds to keep running after --until is met")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--progress", type=float, default=1.0, help="Progress line interval in seconds (0 = off)")
+    parser.add_argument("--quiet", action="store_true", help="No progress lines (the timeline is still recorded)")
+    parser.add_argument("--top", type=int, default=10, help="Broker clients listed in the report")
+    parser.add_argument("--json-report", help="Write timeline and per-module times as JSON to this file")
+    args = parser.parse_args()
+
+    if args.modules < 1:
+        parser.error("--modules must be >= 1")
+    try:
+        storm = RegistrationStorm(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        asyncio.run(storm.run())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    if args.json_report:
+        try:
+            with open(args.json_report, "w", encoding="utf-8") as f:
+                json.dump(storm.json_report(), f, indent=2)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,55 +5,60 @@ Sends an I4.0-style message with a `frame` object containing
 `conversationId`, `type` and `sender`. Use `--type` to choose
 between `proposal` and `refuseProposal`.
 
+Batch mode (`--batch FILE`, `-` for stdin) reads one message spec per JSON
+line and publishes all of them over one persistent connection, with up to
+`--window` QoS 1 publishes awaiting their PUBACK at a time. A spec takes the
+same fields as the command line; missing ones fall back to the options:
+
+  {"conversation_id": "71e95af0-...", "type": "proposal", "topic": "/phuket/ProcessChain",
+   "sender": "ManualTester", "receiver": "Broadcast", "json": {...}, "qos": 1, "retain": false}
+  {"topic": "/phuket/P102/register", "message": {"frame": {...}, "interactionElements": [...]}}
+
+`message` is published as is. Blank lines and lines starting with `#` are
+skipped. On stdin the connection stays open until EOF, so a test script can
+keep feeding it. The run ends with the achieved rate, PUBACK latencies and
+the failed lines; the exit code is 1 if any line failed.
+
 Dependencies:
-  pip install paho-mqtt
+  pip install paho-mqtt   (single-message mode only)
 
 Example:
   python3 tools/send_proposal.py --conversation-id 71e95af0-... \
     --type proposal
+  python3 tools/send_proposal.py --broker localhost --batch proposals.jsonl --window 200
 """
 import argparse
+import asyncio
 import json
 import sys
-from datetime import datetime, timezone
+import time
 
-try:
-    import paho.mqtt.client as mqtt
-except Exception as e:
-    print("Missing dependency: paho-mqtt.", file=sys.stderr)
-    print(f"This Python interpreter is: {sys.executable}", file=sys.stderr)
-    print("Install with:", file=sys.stderr)
-    print(f"  {sys.executable} -m pip install --user paho-mqtt", file=sys.stderr)
-    print("or", file=sys.stderr)
-    print("  python3 -m pip install --user paho-mqtt", file=sys.stderr)
-    print(f"(original error: {e})", file=sys.stderr)
-    sys.exit(2)
+from masbt_tools import AsyncMqttClient, LatencyHistogram, MqttError, frame_message_template, new_conversation_id
+from masbt_tools.stats import format_summary_table
 
 
-def build_message(conversation_id: str, msg_type: str, sender_id: str, extra_payload: dict | None, receiver_id: str = None):
-    frame = {
-        "conversationId": conversation_id,
-        "type": msg_type,
-        "sender": {"id": sender_id},
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-    }
-
-    if receiver_id:
-        frame["receiver"] = {"id": receiver_id}
-
-    msg = {
-        "frame": frame,
-        "interactionElements": [],
-    }
+def _import_paho():
+    try:
+        import paho.mqtt.client as mqtt
+    except Exception as e:
+        print("Missing dependency: paho-mqtt.", file=sys.stderr)
+        print(f"This Python interpreter is: {sys.executable}", file=sys.stderr)
+        print("Install with:", file=sys.stderr)
+        print(f"  {sys.executable} -m pip install --user paho-mqtt", file=sys.stderr)
+        print("or", file=sys.stderr)
+        print("  python3 -m pip install --user paho-mqtt", file=sys.stderr)
+        print(f"(original error: {e})", file=sys.stderr)
+        sys.exit(2)
+    return mqtt
 
-    if extra_payload:
-        # attach under a single interaction element for simplicity
-        msg["interactionElements"].append({"value": extra_payload})
 
-    return msg
+def build_message(conversation_id: str, msg_type: str, sender_id: str, extra_payload: dict | None, receiver_id: str = None):
+    template = frame_message_template(msg_type, sender_id, receiver_id, extra_payload)
+    return template.render(conversation_id=conversation_id)
 
 
 def publish(broker, port, topic, payload, qos=1, retain=False, timeout=5):
+    mqtt = _import_paho()
     client = mqtt.Client()
 
     connected = False
@@ -73,8 +78,6 @@ def publish(broker, port, topic, payload, qos=1, retain=False, timeout=5):
         client.loop_start()
 
         # wait for connection
-        import time
-
         waited = 0.0
         while not connected and waited < timeout:
             time.sleep(0.1)
@@ -97,21 +100,170 @@ def publish(broker, port, topic, payload, qos=1, retain=False, timeout=5):
         return 3
 
 
+class BatchPublisher:
+    """Publishes message specs over one connection with a bounded QoS 1 window."""
+
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.window = asyncio.Semaphore(args.window)
+        self.tracking = set()
+        self.acks = LatencyHistogram()
+        self.sent = 0
+        self.acked = 0
+        self.failures = []  # (line number, reason)
+
+    def build(self, spec):
+        """(topic, payload, qos, retain) of one spec line."""
+        args = self.args
+        topic = spec.get("topic", args.topic)
+        qos = int(spec.get("qos", args.qos))
+        retain = bool(spec.get("retain", args.retain))
+        if qos not in (0, 1):
+            raise ValueError("qos must be 0 or 1")
+        if "message" in spec:
+            return topic, json.dumps(spec["message"], separators=(",", ":")), qos, retain
+        conversation_id = spec.get("conversation_id") or spec.get("conversationId")
+        if not conversation_id:
+            raise ValueError("no conversation_id")
+        msg_type = spec.get("type", args.type)
+        if msg_type == "refusal":
+            msg_type = "refuseProposal"
+        payload = build_message(conversation_id, msg_type, spec.get("sender", args.sender), spec.get("json"),
+                                receiver_id=spec.get("receiver", args.receiver))
+        return topic, payload, qos, retain
+
+    async def send(self, line_no, line):
+        try:
+            spec = json.loads(line)
+            if not isinstance(spec, dict):
+                raise ValueError("not a JSON object")
+            topic, payload, qos, retain = self.build(spec)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.failures.append((line_no, f"invalid spec: {e}"))
+            return
+        if qos:
+            await self.window.acquire()
+        tracked = False  # once _track owns the future it also releases the window slot
+        try:
+            if not self.client.connected:
+                raise MqttError("connection to the broker lost")
+            started = time.perf_counter()
+            future = self.client.publish(topic, payload, qos=qos, retain=retain)
+            self.sent += 1
+            if self.args.verbose:
+                print(f"line {line_no}: {topic} (qos={qos})")
+            if future is not None:
+                task = asyncio.create_task(self._track(line_no, future, started))
+                tracked = True
+                self.tracking.add(task)
+                task.add_done_callback(self.tracking.discard)
+        finally:
+            if qos and not tracked:
+                self.window.release()
+        await self.client.drain()
+
+    async def _track(self, line_no, future, started):
+        try:
+            await asyncio.wait_for(future, self.args.ack_timeout)
+            self.acked += 1
+            self.acks.record(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            self.failures.append((line_no, f"no PUBACK within {self.args.ack_timeout}s"))
+        except MqttError as e:
+            self.failures.append((line_no, str(e)))
+        finally:
+            self.window.release()
+
+    async def finish(self):
+        if self.tracking:
+            await asyncio.gather(*self.tracking)
+
+
+async def _spec_lines(path):
+    if path == "-":
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                return
+            yield line
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+
+async def run_batch(args):
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("SendProposalBatch"))
+    await client.connect()
+    print(f"Connected to MQTT broker {args.broker}:{args.port}", file=sys.stderr)
+    batch = BatchPublisher(client, args)
+    started = time.perf_counter()
+    last_report = started
+    try:
+        line_no = 0
+        async for line in _spec_lines(args.batch):
+            line_no += 1
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            await batch.send(line_no, line)
+            now = time.perf_counter()
+            if args.progress > 0 and now - last_report >= args.progress:
+                print(f"[{now - started:7.1f}s] {batch.sent} sent, {batch.acked} acknowledged, "
+                      f"{len(batch.failures)} failed, {client.inflight} in flight", file=sys.stderr, flush=True)
+                last_report = now
+        await batch.finish()
+    finally:
+        elapsed = time.perf_counter() - started
+        await client.disconnect()
+        print(f"{batch.sent} messages published in {elapsed:.2f}s "
+              f"({batch.sent / elapsed if elapsed else 0:.0f} msg/s), {batch.acked} acknowledged, "
+              f"{len(batch.failures)} failed", file=sys.stderr)
+        if batch.acks.count:
+            print(format_summary_table({"PUBACK": batch.acks.summary()}), file=sys.stderr)
+        for line_no, reason in batch.failures[:20]:
+            print(f"  line {line_no}: {reason}", file=sys.stderr)
+        if len(batch.failures) > 20:
+            print(f"  ... {len(batch.failures) - 20} more", file=sys.stderr)
+    return 1 if batch.failures else 0
+
+
 def main():
     parser = argparse.ArgumentParser(description="Send a proposal or refusal for testing MAS-BT agents")
     parser.add_argument("--broker", default="192.168.178.33", help="MQTT broker host (default: localhost)")
     parser.add_argument("--port", type=int, default=1883, help="MQTT broker port (default: 1883)")
     parser.add_argument("--topic", default="/phuket/ProcessChain", help="MQTT topic to publish to")
     parser.add_argument("--type", choices=["proposal", "refuseProposal", "refusal"], default="proposal", help="Message type to send (alias: 'refusal' -> 'refuseProposal')")
-    parser.add_argument("--conversation-id", required=True, help="ConversationId to use (use the one logged by the agent)")
+    parser.add_argument("--conversation-id", help="ConversationId to use (use the one logged by the agent)")
     parser.add_argument("--sender", default="ManualTester", help="Sender id to include in the frame")
     parser.add_argument("--receiver", default="Broadcast", help="Receiver id to include in the frame (default: Broadcast)")
     parser.add_argument("--qos", type=int, default=1, help="MQTT QoS level")
     parser.add_argument("--retain", action="store_true", help="Set MQTT retain flag")
     parser.add_argument("--json", help="Optional extra JSON payload to include as interactionElement")
+    parser.add_argument("--batch", metavar="FILE", help="Publish the JSONL message specs in FILE ('-' = stdin) over one connection")
+    parser.add_argument("--window", type=int, default=100, help="Batch mode: QoS 1 publishes awaiting PUBACK at a time")
+    parser.add_argument("--ack-timeout", type=float, default=10.0, help="Batch mode: seconds to wait for a PUBACK")
+    parser.add_argument("--progress", type=float, default=5.0, help="Batch mode: progress line interval in seconds (0 = off)")
+    parser.add_argument("--verbose", action="store_true", help="Batch mode: print every published line")
 
     args = parser.parse_args()
 
+    if args.batch:
+        if args.window < 1:
+            parser.error("--window must be at least 1")
+        try:
+            rc = asyncio.run(run_batch(args))
+        except (OSError, MqttError, asyncio.TimeoutError) as e:
+            print(f"MQTT error: {e}", file=sys.stderr)
+            rc = 3
+        except KeyboardInterrupt:
+            rc = 130
+        sys.exit(rc)
+    if not args.conversation_id:
+        parser.error("--conversation-id is required (or use --batch)")
+
     extra = None
     if args.json:
         try:
@@ -125,8 +277,7 @@ def main():
     if msg_type == "refusal":
         msg_type = "refuseProposal"
 
-    message = build_message(args.conversation_id, msg_type, args.sender, extra, receiver_id=args.receiver)
-    payload = json.dumps(message)
+    payload = build_message(args.conversation_id, msg_type, args.sender, extra, receiver_id=args.receiver)
 
     print("Message to publish:")
     print(payload)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""Answer CalcSimilarity requests from a precomputed similarity table.
+
+The SimilarityAnalysisAgent embeds both texts of every ``calcSimilarity``
+request through Ollama before it answers, although the capability
+vocabulary barely changes. This responder listens on the same topic
+(``/{ns}/{agentId}/CalcSimilarity``) and answers from a
+``masbt_tools.similarity_table.SimilarityTable`` in microseconds. The
+answer has the agent's wire format: an ``informConfirm`` on
+``/{ns}/{agentId}/CalcPairwiseSimilarity`` with ``CosineSimilarity`` and a
+``SimilarityMatrix`` of ``Pair_{n}`` (ElementA, ElementB, Similarity),
+best pair first.
+
+CalcEmbedding embeds ``"<idShort>: <value>"``, so that is the table key
+(``Capability_0: Assemble``). The table is filled
+
+* on start, with the capability names in ``--configs`` (and ``--texts``),
+  for every ``--id-short``;
+* from registrations (``/{ns}/register``, ``/{ns}/+/register``) that carry
+  new capabilities;
+* from the agent's CreateDescription answers (``Description_Result``): the
+  dispatcher sends those descriptions in its CalcSimilarity requests;
+* from requests that miss the table.
+
+Each new text costs one embedding (served by the shared embedding cache
+when seen before) and one appended table row. On a miss, ``--on-miss
+embed`` embeds the texts and answers itself. ``--on-miss defer`` leaves the
+answer to the live agent and learns the texts in the background. The
+dispatcher takes the first answer per conversation, so the responder can
+run next to the agent.
+
+  python3 tools/python_mqtt/similarity_responder.py --table ~/.cache/masbt/simtable
+  python3 tools/python_mqtt/similarity_responder.py --build-only --texts descriptions.txt
+
+Requires numpy. Defaults for namespace, agent id, Ollama endpoint/model and
+MaxInteractionElements come from SimilarityAnalysisAgent.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy  # noqa: F401  (masbt_tools.similarity_table needs it)
+except ImportError:
+    print("Missing dependency: numpy.")
+    print(f"Install with: {sys.executable} -m pip install --user numpy")
+    sys.exit(2)
+
+from masbt_tools import AsyncMqttClient, EmbeddingCache, LatencyHistogram, MqttError, new_conversation_id, now_iso
+from masbt_tools.codec import decode_payload
+from masbt_tools.messages import Collection, Frame, Message, Party, Property
+from masbt_tools.similarity_table import SimilarityTable
+from masbt_tools.stats import format_summary_table
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+AGENT_CONFIG = os.path.join(REPO_ROOT, "configs", "specific_configs", "NamespaceHolon", "SimilarityAnalysisAgent.json")
+
+
+def config_capabilities(root):
+    """Strings of every "Capabilities"/"CapabilityNames" list in the JSON configs below ``root``."""
+    names = []
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if not name.lower().endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    stack = [json.load(f)]
+            except (OSError, ValueError):
+                continue
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict):
+                    for key, value in node.items():
+                        if key in ("Capabilities", "CapabilityNames") and isinstance(value, list):
+                            names.extend(v for v in value if isinstance(v, str))
+                        else:
+                            stack.append(value)
+                elif isinstance(node, list):
+                    stack.extend(node)
+    return list(dict.fromkeys(names))
+
+
+def element_text(element):
+    """Text CalcEmbedding extracts from an interaction element (Property value, joined collection)."""
+    value = element.get("value")
+    model_type = element.get("modelType", "Property")
+    if model_type == "Property":
+        return "" if value is None or isinstance(value, list) else str(value)
+    if model_type == "SubmodelElementCollection" and isinstance(value, list):
+        return " ".join(element_text(child) for child in value if isinstance(child, dict))
+    return str(element.get("idShort") or "")
+
+
+def find_values(elements, id_short):
+    """Values of the Properties below every collection named ``id_short`` (e.g. registration Capabilities)."""
+    found = []
+    stack = [e for e in elements or () if isinstance(e, dict)]
+    while stack:
+        element = stack.pop()
+        children = element.get("value")
+        if not isinstance(children, list):
+            continue
+        if element.get("idShort") == id_short:
+            found.extend(str(c["value"]) for c in children if isinstance(c, dict) and c.get("value")
+                         and not isinstance(c.get("value"), list))
+        else:
+            stack.extend(c for c in children if isinstance(c, dict))
+    return found
+
+
+def _party(frame, key):
+    party = frame.get(key) or {}
+    identification = party.get("identification") or {}
+    role = party.get("role") or {}
+    return identification.get("id") or party.get("id"), role.get("name")
+
+
+class Embedder:
+    """Ollama ``/api/embeddings`` (the endpoint CalcEmbedding calls) behind the shared embedding cache."""
+
+    def __init__(self, endpoint, model, cache_dir=None, workers=4):
+        self.endpoint = endpoint.rstrip("/")
+        self.model = model
+        self.cache = None if (cache_dir or "").lower() == "off" else EmbeddingCache(cache_dir)
+        self.cache_model = None if self.cache is None else self.cache.model_key(model, self.endpoint)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.fetched = 0
+
+    def _fetch(self, text):
+        body = json.dumps({"model": self.model, "prompt": text}).encode("utf-8")
+        request = urllib.request.Request(f"{self.endpoint}/api/embeddings", body,
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())["embedding"]
+
+    def embed_many(self, texts):
+        """Vectors of ``texts`` in order (blocking). Only the Ollama requests of cache misses run in the pool;
+        cache reads and writes stay on the calling thread."""
+        cache = self.cache
+        vectors = [None if cache is None else cache.get(self.cache_model, text) for text in texts]
+        missing = [k for k, vector in enumerate(vectors) if vector is None]
+        for k, vector in zip(missing, self.pool.map(self._fetch, [texts[k] for k in missing])):
+            vectors[k] = vector
+            if cache is not None:
+                cache.put(self.cache_model, texts[k], vector)
+        self.fetched += len(missing)
+        return vectors
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.close()
+
+
+class SimilarityResponder:
+    def __init__(self, args, table, embedder):
+        self.args = args
+        self.table = table
+        self.embedder = embedder
+        self.client = None
+        self.request_topic = f"/{args.namespace}/{args.agent_id}/CalcSimilarity"
+        self.response_topic = f"/{args.namespace}/{args.agent_id}/CalcPairwiseSimilarity"
+        self.description_topic = f"/{args.namespace}/{args.agent_id}/CreateDescription"
+        self.learn_queue = asyncio.Queue()
+        self.queued = set()
+        self.tasks = set()
+        self.table_answer = LatencyHistogram()
+        self.embedded_answer = LatencyHistogram()
+        self.counts = {"requests": 0, "from_table": 0, "embedded": 0, "deferred": 0, "rejected": 0,
+                       "learned": 0, "embed_errors": 0}
+
+    # --- table ---------------------------------------------------------------
+
+    def texts_for(self, value):
+        return [f"{id_short}: {value}" for id_short in self.args.id_short]
+
+    def learn(self, texts):
+        for text in texts:
+            if text not in self.table and text not in self.queued:
+                self.queued.add(text)
+                self.learn_queue.put_nowait(text)
+
+    async def learn_loop(self):
+        while True:
+            batch = [await self.learn_queue.get()]
+            while not self.learn_queue.empty():
+                batch.append(self.learn_queue.get_nowait())
+            await self._add(batch)
+            self.queued.difference_update(batch)
+
+    async def _add(self, texts):
+        """Embed and append the texts that are not in the table yet; False if embedding failed."""
+        missing = [t for t in dict.fromkeys(texts) if t not in self.table]
+        if not missing:
+            return True
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(None, self.embedder.embed_many, missing)
+        except (OSError, ValueError, KeyError) as e:
+            self.counts["embed_errors"] += 1
+            print(f"embedding failed for {len(missing)} text(s): {e}", file=sys.stderr)
+            return False
+        self.table.add_many(missing, vectors)
+        self.counts["learned"] += len(missing)
+        if self.args.verbose:
+            print(f"table: +{len(missing)} -> {len(self.table)} texts")
+        return True
+
+    # --- messages ------------------------------------------------------------
+
+    def on_message(self, topic, payload, qos, retain):
+        try:
+            message = decode_payload(payload)
+        except ValueError:
+            return
+        frame = message.get("frame") or {}
+        msg_type = str(frame.get("type") or "").lower()
+        elements = message.get("interactionElements") or []
+        if topic == self.request_topic:
+            if msg_type == "calcsimilarity":
+                self.on_request(frame, elements, time.perf_counter())
+        elif topic == self.description_topic:
+            if msg_type == "informconfirm":
+                self.learn(t for d in self._descriptions(elements) for t in self.texts_for(d))
+        elif msg_type in ("registermessage", "moduleregistration"):
+            self.learn(t for c in find_values(elements, "Capabilities") for t in self.texts_for(c))
+
+    @staticmethod
+    def _descriptions(elements):
+        return [str(e["value"]) for e in elements
+                if isinstance(e, dict) and str(e.get("idShort", "")).lower() == "description_result" and e.get("value")]
+
+    def on_request(self, frame, elements, started):
+        self.counts["requests"] += 1
+        items = []
+        for element in elements:
+            if not isinstance(element, dict):
+                continue
+            text = element_text(element)
+            if not text.strip():
+                items = []
+                break
+            items.append((element.get("idShort") or "<unknown>", f"{element.get('idShort') or '<unknown>'}: {text}"))
+        if len(items) < 2 or (self.args.max_elements and len(items) > self.args.max_elements):
+            self.counts["rejected"] += 1  # CalcEmbedding fails these as well, the requester times out
+            return
+        texts = [text for _id_short, text in items]
+        if all(text in self.table for text in texts):
+            self.respond(frame, items)
+            self.counts["from_table"] += 1
+            self.table_answer.record(time.perf_counter() - started)
+            return
+        if self.args.on_miss == "defer":
+            self.counts["deferred"] += 1
+            self.learn(texts)
+            return
+        task = asyncio.get_running_loop().create_task(self._embed_and_respond(frame, items, started))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _embed_and_respond(self, frame, items, started):
+        if await self._add([text for _id_short, text in items]):
+            self.respond(frame, items)
+            self.counts["embedded"] += 1
+            self.embedded_answer.record(time.perf_counter() - started)
+
+    def respond(self, frame, items):
+        table = self.table
+        rows = [table.row(text) for _id_short, text in items]
+        pairs = [(items[i][0], items[j][0], table.similarity_rows(rows[i], rows[j]))
+                 for i in range(len(items)) for j in range(i + 1, len(items))]
+        pairs.sort(key=lambda p: p[2], reverse=True)  # stable, like OrderByDescending
+        sender, sender_role = _party(frame, "sender")
+        response = Message(
+            Frame(Party(self.args.agent_id, "AIAgent"), Party(sender or "unknown", sender_role or ""),
+                  "informConfirm", frame.get("conversationId") or new_conversation_id(), now_iso()),
+            [Property("CosineSimilarity", pairs[0][2], "xs:double"),
+             Collection("SimilarityMatrix", [
+                 Collection(f"Pair_{n}", [Property("ElementA", a), Property("ElementB", b),
+                                          Property("Similarity", s, "xs:double")])
+                 for n, (a, b, s) in enumerate(pairs)])])
+        self.client.publish(self.response_topic, response.to_json(), qos=self.args.qos)
+
+    def report(self):
+        stats = self.table.stats()
+        print()
+        print(", ".join(f"{v} {k.replace('_', ' ')}" for k, v in self.counts.items()) +
+              f"; table {stats['texts']} texts, {stats['bytes'] / 1e6:.1f} MB, {self.embedder.fetched} Ollama calls")
+        rows = {}
+        if self.table_answer.count:
+            rows["from table"] = self.table_answer.summary(scale=1e6)
+        if self.embedded_answer.count:
+            rows["embedded first"] = self.embedded_answer.summary(scale=1e6)
+        if rows:
+            print(format_summary_table(rows, unit="us"))
+
+
+def seed_texts(args):
+    values = []
+    if args.configs:
+        values.extend(config_capabilities(args.configs))
+    for path in args.texts or ():
+        with open(path, "r", encoding="utf-8") as f:
+            values.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+    return [f"{id_short}: {value}" for value in dict.fromkeys(values) for id_short in args.id_short]
+
+
+async def run(responder, args):
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("SimilarityResponder"),
+                             username=args.username, password=args.password)
+    responder.client = client
+    client.on_message = responder.on_message
+    await client.connect()
+    topics = [responder.request_topic, responder.description_topic,
+              f"/{args.namespace}/register", f"/{args.namespace}/+/register"]
+    await client.subscribe(*topics, qos=args.qos)
+    print(f"Connected to {args.broker}:{args.port}; answering {responder.request_topic} "
+          f"from {len(responder.table)} texts (on miss: {args.on_miss})")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    learner = asyncio.create_task(responder.learn_loop())
+    try:
+        if args.duration > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), args.duration)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await stop.wait()
+    finally:
+        learner.cancel()
+        for task in list(responder.tasks):
+            task.cancel()
+        await client.disconnect()
+
+
+def load_agent_config(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-path CalcSimilarity responder backed by a similarity table")
+    parser.add_argument("--agent-config", default=AGENT_CONFIG, help="SimilarityAnalysisAgent config for defaults")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", help="Default: Namespace of the agent config")
+    parser.add_argument("--agent-id", help="Similarity agent id (default: Agent.AgentId of the agent config)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--table", default=os.path.join(os.path.expanduser("~"), ".cache", "masbt", "simtable"),
+                        help="Similarity table directory")
+    parser.add_argument("--endpoint", help="Ollama endpoint (default: Ollama.Endpoint of the agent config)")
+    parser.add_argument("--model", help="Embedding model (default: Ollama.Model of the agent config)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Embedding cache directory ('off' to disable, default: MASBT_EMBEDDING_CACHE)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel Ollama requests while embedding")
+    parser.add_argument("--configs", default=os.path.join(REPO_ROOT, "configs"),
+                        help="Config tree whose capability names seed the table ('' to skip)")
+    parser.add_argument("--texts", action="append", help="File with further names/descriptions, one per line")
+    parser.add_argument("--id-short", action="append",
+                        help="Request idShorts to precompute (repeatable, default Capability_0 and Capability_1)")
+    parser.add_argument("--on-miss", choices=["embed", "defer"], default="embed",
+                        help="embed: embed unknown texts and answer; defer: leave the answer to the agent, learn later")
+    parser.add_argument("--max-elements", type=int, help="Default: SimilarityAnalysis.MaxInteractionElements")
+    parser.add_argument("--build-only", action="store_true", help="Seed the table and exit")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = load_agent_config(args.agent_config)
+    args.namespace = args.namespace or config.get("Namespace") or "phuket"
+    args.agent_id = args.agent_id or (config.get("Agent") or {}).get("AgentId") or "SimilarityAnalysisAgent"
+    ollama = config.get("Ollama") or {}
+    args.endpoint = args.endpoint or ollama.get("Endpoint") or "http://localhost:11434"
+    args.model = args.model or ollama.get("Model") or "nomic-embed-text"
+    if args.max_elements is None:
+        args.max_elements = int((config.get("SimilarityAnalysis") or {}).get("MaxInteractionElements") or 0)
+    args.id_short = args.id_short or ["Capability_0", "Capability_1"]
+
+    try:
+        table = SimilarityTable(args.table, args.model)
+        embedder = Embedder(args.endpoint, args.model, args.cache_dir, args.workers)
+        seeds = [t for t in seed_texts(args) if t not in table]
+        if seeds:
+            started = time.perf_counter()
+            table.add_many(seeds, embedder.embed_many(seeds))
+            print(f"Added {len(seeds)} texts to {args.table} in {time.perf_counter() - started:.1f}s "
+                  f"({embedder.fetched} Ollama calls)")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: cannot build the similarity table: {e}", file=sys.stderr)
+        sys.exit(1)
+    stats = table.stats()
+    print(f"Similarity table {args.table}: {stats['texts']} texts, {stats['pairs']} pairs, dim {stats['dim']}")
+    if args.build_only:
+        return
+
+    async def serve():
+        responder = SimilarityResponder(args, table, embedder)
+        try:
+            await run(responder, args)
+        finally:
+            responder.report()
+
+    try:
+        asyncio.run(serve())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        embedder.close()
+        table.close()
+
+
+if __name__ == "__main__":
+    main()
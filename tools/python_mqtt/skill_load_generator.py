@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Asyncio SkillRequest load generator with request/response latency histograms.
+
+Publishes SkillRequests to ``/{ns}/{moduleId}/Execution/SkillRequest`` for
+one or more modules and matches every SkillResponse back to its request by
+conversationId. Latency is measured from publish to the first response
+carrying each ActionState (or the frame type when no ActionState is
+present, e.g. ``refusal``).
+
+Modes:
+  poisson   open loop, exponential inter-arrival times at --rate req/s
+  fixed     open loop, constant inter-arrival time at --rate req/s
+  closed    closed loop, keeps --concurrency requests in flight
+
+Example:
+  python3 tools/python_mqtt/skill_load_generator.py --namespace phuket \
+    --modules P100,P101,P102 --actions Retrieve,Store --mode poisson --rate 50 --duration 60
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+from masbt_tools import skill_request_template
+from masbt_tools.async_client import AsyncMqttClient, MqttError
+from masbt_tools.frame_scan import FrameScanner
+from masbt_tools.stats import LatencyHistogram, format_summary_table
+
+TERMINAL_STATES = {"DONE", "ERROR", "ABORTED", "REFUSAL", "REFUSEPROPOSAL", "FAILURE"}
+RESPONSE_SCANNER = FrameScanner(("ActionState",))
+
+
+class Pending:
+    __slots__ = ("sent_at", "module", "action", "states")
+
+    def __init__(self, sent_at, module, action):
+        self.sent_at = sent_at
+        self.module = module
+        self.action = action
+        self.states = set()
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+        self.actions = [a.strip() for a in args.actions.split(",") if a.strip()]
+        self.rng = random.Random(args.seed)
+        self.run_id = f"{int(time.time()):x}"
+        self.seq = itertools.count(1)
+        self.client = AsyncMqttClient(args.broker, args.port, client_id=f"SkillLoadGenerator_{self.run_id}",
+                                      username=args.username, password=args.password)
+        self.client.on_message = self._on_message
+        self.pending: dict[str, Pending] = {}
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.sent = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.publish_errors = 0
+        self.unmatched = 0
+        self._slot_free = asyncio.Event()
+        self._request_topics = {m: args.request_topic.format(ns=args.namespace, module=m) for m in self.modules}
+        self._templates = {}
+
+    def _template(self, module, action):
+        key = (module, action)
+        tpl = self._templates.get(key)
+        if tpl is None:
+            tpl = skill_request_template(module, action, with_precondition=self.args.with_precondition,
+                                         verbose=self.args.verbose_payload)
+            self._templates[key] = tpl
+        return tpl
+
+    def _histogram(self, state):
+        h = self.histograms.get(state)
+        if h is None:
+            h = self.histograms[state] = LatencyHistogram()
+        return h
+
+    # --- sending -------------------------------------------------------------
+
+    def send_one(self):
+        seq = next(self.seq)
+        module = self.modules[seq % len(self.modules)]
+        action = self.rng.choice(self.actions)
+        conversation_id = f"load_{self.run_id}_{seq}"
+        product_id = f"https://smartfactory.de/shells/load_{self.run_id}_{seq}"
+        payload = self._template(module, action).render(conversation_id=conversation_id, product_id=product_id)
+        self.pending[conversation_id] = Pending(time.perf_counter(), module, action)
+        try:
+            future = self.client.publish(self._request_topics[module], payload, qos=self.args.qos)
+        except MqttError:
+            self.publish_errors += 1
+            self.pending.pop(conversation_id, None)
+            return
+        if future is not None:
+            future.add_done_callback(self._on_puback)
+        self.sent += 1
+
+    def _on_puback(self, future):
+        if future.exception() is not None:
+            self.publish_errors += 1
+
+    async def run_open_loop(self, deadline):
+        rate = self.args.rate
+        fixed = self.args.mode == "fixed"
+        start = time.perf_counter()
+        next_at = start
+        while True:
+            now = time.perf_counter()
+            if now >= deadline or self._count_reached():
+                return
+            # send everything that is due; never skip arrivals when we fall behind
+            while next_at <= now and not self._count_reached():
+                self.send_one()
+                next_at += (1.0 / rate) if fixed else self.rng.expovariate(rate)
+            await self.client.drain()
+            await asyncio.sleep(max(0.0, min(next_at, deadline) - time.perf_counter()))
+
+    async def run_closed_loop(self, deadline):
+        limit = self.args.concurrency
+        while time.perf_counter() < deadline and not self._count_reached():
+            # cleared before filling, so a response that arrives during drain() still wakes the wait below
+            self._slot_free.clear()
+            errors = self.publish_errors
+            for _ in range(limit - len(self.pending)):
+                if self._count_reached():
+                    break
+                self.send_one()
+            await self.client.drain()
+            if len(self.pending) < limit and self.publish_errors == errors:
+                continue  # a slot freed up meanwhile
+            try:
+                await asyncio.wait_for(self._slot_free.wait(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                return
+
+    def _count_reached(self):
+        return self.args.count is not None and self.sent >= self.args.count
+
+    # --- receiving -----------------------------------------------------------
+
+    def _on_message(self, topic, payload, qos, retain):
+        received_at = time.perf_counter()
+        fields = RESPONSE_SCANNER.scan(payload)
+        if fields is None:
+            return
+        pending = self.pending.get(fields.conversation_id)
+        if pending is None:
+            self.unmatched += 1
+            return
+        if fields.type == "request":
+            return  # our own request echoed back by a wide response filter
+        state = fields.values.get("ActionState") or fields.type or "UNKNOWN"
+        state = str(state).upper()
+        if state in pending.states:
+            return
+        pending.states.add(state)
+        self._histogram(state).record(received_at - pending.sent_at)
+        if state in TERMINAL_STATES:
+            self._finish(fields.conversation_id, pending, received_at)
+
+    def _finish(self, conversation_id, pending, now):
+        del self.pending[conversation_id]
+        self.completed += 1
+        self._histogram("_complete").record(now - pending.sent_at)
+        self._slot_free.set()
+
+    async def expire_loop(self):
+        timeout = self.args.timeout
+        while True:
+            await asyncio.sleep(min(1.0, timeout / 4))
+            now = time.perf_counter()
+            expired = [cid for cid, p in self.pending.items() if now - p.sent_at > timeout]
+            for cid in expired:
+                del self.pending[cid]
+                self.timeouts += 1
+            if expired:
+                self._slot_free.set()
+
+    async def progress_loop(self, start):
+        last_sent = last_done = 0
+        interval = self.args.progress
+        while True:
+            await asyncio.sleep(interval)
+            elapsed = time.perf_counter() - start
+            print(f"[{elapsed:7.1f}s] sent={self.sent} (+{(self.sent - last_sent) / interval:.1f}/s) "
+                  f"completed={self.completed} (+{(self.completed - last_done) / interval:.1f}/s) "
+                  f"in_flight={len(self.pending)} timeouts={self.timeouts}", flush=True)
+            last_sent, last_done = self.sent, self.completed
+
+    # --- main ----------------------------------------------------------------
+
+    async def run(self):
+        args = self.args
+        await self.client.connect()
+        filters = sorted({args.response_topic.format(ns=args.namespace, module=m) for m in self.modules})
+        await self.client.subscribe(*filters, qos=args.qos)
+        print(f"Connected to {args.broker}:{args.port}; {len(self.modules)} modules, mode={args.mode}, "
+              f"responses on {', '.join(filters[:3])}{' ...' if len(filters) > 3 else ''}")
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        helpers = [asyncio.create_task(self.expire_loop())]
+        if args.progress > 0:
+            helpers.append(asyncio.create_task(self.progress_loop(start)))
+        try:
+            if args.mode == "closed":
+                await self.run_closed_loop(deadline)
+            else:
+                await self.run_open_loop(deadline)
+            send_elapsed = time.perf_counter() - start
+            # let outstanding conversations finish (or time out)
+            drain_deadline = time.perf_counter() + args.timeout
+            while self.pending and time.perf_counter() < drain_deadline:
+                await asyncio.sleep(0.05)
+            self.timeouts += len(self.pending)
+            self.pending.clear()
+        finally:
+            for task in helpers:
+                task.cancel()
+            await self.client.disconnect()
+        return self.report(send_elapsed, time.perf_counter() - start)
+
+    def report(self, send_elapsed, total_elapsed):
+        rows = {state: h.summary() for state, h in sorted(self.histograms.items()) if state != "_complete"}
+        if "_complete" in self.histograms:
+            rows["request->terminal"] = self.histograms["_complete"].summary()
+        result = {
+            "mode": self.args.mode,
+            "modules": len(self.modules),
+            "sent": self.sent,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "publish_errors": self.publish_errors,
+            "unmatched_messages": self.unmatched,
+            "send_rate": self.sent / send_elapsed if send_elapsed else 0.0,
+            "completion_rate": self.completed / total_elapsed if total_elapsed else 0.0,
+            "latency_ms": rows,
+        }
+        print()
+        print(f"sent {self.sent} in {send_elapsed:.1f}s ({result['send_rate']:.1f} req/s), "
+              f"completed {self.completed} ({result['completion_rate']:.1f}/s), "
+              f"timeouts {self.timeouts}, publish errors {self.publish_errors}")
+        print(format_summary_table(rows))
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open/closed-loop SkillRequest load generator")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--namespace", default="phuket")
+    parser.add_argument("--modules", default="P102", help="Comma separated module ids")
+    parser.add_argument("--actions", default="Retrieve", help="Comma separated ActionTitles (picked at random)")
+    parser.add_argument("--mode", choices=["poisson", "fixed", "closed"], default="poisson")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests/s over all modules (open loop)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max requests in flight (closed loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--count", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds until an unanswered request counts as timeout")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--with-precondition", action="store_true", help="Add an InStorage precondition for the ProductId")
+    parser.add_argument("--verbose-payload", action="store_true", help="Send the full AAS form with semanticIds")
+    parser.add_argument("--request-topic", default="/{ns}/{module}/Execution/SkillRequest")
+    parser.add_argument("--response-topic", default="/{ns}/{module}/+/SkillResponse",
+                        help="Subscription filter per module for SkillResponses")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--progress", type=float, default=5.0, help="Progress line interval in seconds (0 = off)")
+    parser.add_argument("--json-report", help="Write the final report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode != "closed" and args.rate <= 0:
+        parser.error("--rate must be > 0")
+
+    try:
+        result = asyncio.run(LoadGenerator(args).run())
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    if args.json_report:
+        with open(args.json_report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
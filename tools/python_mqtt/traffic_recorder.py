@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Record MQTT traffic into compact, indexed segment files and query it.
+
+  record    subscribe to /{ns}/# (or custom filters) and append every
+            message to rotating zlib-compressed segments in --out
+  info      segments, record counts, time range, compression ratio and the
+            busiest topics / message types
+  show      every message of one conversation, topic or frame type,
+            read through the side indexes without scanning the segments
+  export    dump records as JSONL ({"ts", "topic", "qos", "retain", "payload"})
+  reindex   rebuild the .idx files after a crash or a copied segment
+
+Examples:
+  python3 tools/python_mqtt/traffic_recorder.py record --namespace phuket --out /tmp/traffic
+  python3 tools/python_mqtt/traffic_recorder.py info /tmp/traffic
+  python3 tools/python_mqtt/traffic_recorder.py show /tmp/traffic --conversation 6f0c...e1
+  python3 tools/python_mqtt/traffic_recorder.py show /tmp/traffic --type proposal/OfferedCapability --count
+  python3 tools/python_mqtt/traffic_recorder.py export /tmp/traffic --since 2025-01-01T10:00:00 > capture.jsonl
+
+Segments are append-only: a block of records is written once it reaches
+--block-kb or is --flush-interval seconds old, and its index line follows
+it. A reader can therefore open a directory while the recorder is running.
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from masbt_tools import AsyncMqttClient, MqttError, SegmentWriter, TrafficArchive, new_conversation_id
+from masbt_tools.codec import BinaryCodec, Dictionary, decode_payload
+from masbt_tools.traffic import rebuild_index
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.astimezone()
+        return moment.timestamp()
+
+
+def _format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds")
+
+
+def _payload_json(payload):
+    try:
+        return decode_payload(payload)
+    except ValueError:
+        return payload.decode("utf-8", "replace")
+
+
+# --- record ------------------------------------------------------------------
+
+async def record(args, codec=None):
+    writer = SegmentWriter(args.out, segment_bytes=int(args.segment_mb * 1024 * 1024),
+                           segment_seconds=args.segment_seconds, block_bytes=args.block_kb * 1024,
+                           flush_seconds=args.flush_interval, level=args.level, codec=codec)
+    filters = args.filter or [f"/{args.namespace}/#"]
+    client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("TrafficRecorder"),
+                             username=args.username, password=args.password)
+    client.on_message = lambda topic, payload, qos, retain: writer.append(topic, payload, qos, retain)
+    lost = asyncio.Event()
+    client.on_disconnect = lambda error: lost.set()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+    deadline = loop.time() + args.duration if args.duration > 0 else None
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    last_records, last_report = 0, start
+
+    try:
+        while not stop.is_set():
+            lost.clear()
+            try:
+                await client.connect()
+                await client.subscribe(*filters, qos=args.qos)
+            except (OSError, MqttError, asyncio.TimeoutError) as e:
+                if not args.reconnect:
+                    raise
+                print(f"Connect failed ({e}), retrying in {args.reconnect}s", file=sys.stderr)
+                await asyncio.sleep(args.reconnect)
+                continue
+            print(f"Recording {', '.join(filters)} from {args.broker}:{args.port} into {args.out}", flush=True)
+            while not stop.is_set() and not lost.is_set():
+                if deadline is not None and loop.time() >= deadline:
+                    stop.set()
+                    break
+                await asyncio.sleep(0.25)
+                writer.tick()
+                now = time.perf_counter()
+                if args.progress > 0 and now - last_report >= args.progress:
+                    rate = (writer.records - last_records) / (now - last_report)
+                    print(f"[{now - start:7.1f}s] {writer.records} records (+{rate:.0f}/s), "
+                          f"{writer.written_bytes / 1e6:.1f} MB on disk", flush=True)
+                    last_records, last_report = writer.records, now
+            if lost.is_set() and not stop.is_set():
+                if not args.reconnect:
+                    raise MqttError("connection to the broker lost")
+                print(f"Connection lost, reconnecting in {args.reconnect}s", file=sys.stderr)
+                await asyncio.sleep(args.reconnect)
+    finally:
+        await client.disconnect()
+        writer.close()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        ratio = writer.raw_bytes / writer.written_bytes if writer.written_bytes else 0.0
+        print()
+        print(f"{writer.records} records in {elapsed:.1f}s ({writer.records / elapsed if elapsed else 0:.0f}/s), "
+              f"{writer.raw_bytes / 1e6:.1f} MB raw -> {writer.written_bytes / 1e6:.1f} MB "
+              f"(x{ratio:.1f}) in {writer.segments} segment(s), CPU {100.0 * cpu / elapsed if elapsed else 0:.0f}%")
+
+
+# --- read side ---------------------------------------------------------------
+
+def cmd_info(args):
+    with TrafficArchive(args.path) as archive:
+        total_raw = total_disk = 0
+        first = last = None
+        print(f"{'segment':<40} {'records':>9} {'blocks':>7} {'MB':>8}  range")
+        for segment in archive.segments:
+            records = sum(b[1] for b in segment.blocks)
+            size = os.path.getsize(segment.path)
+            total_disk += size
+            if segment.blocks:
+                t0 = min(b[2] for b in segment.blocks)
+                t1 = max(b[3] for b in segment.blocks)
+                first = t0 if first is None else min(first, t0)
+                last = t1 if last is None else max(last, t1)
+                span = f"{_format_time(t0)} .. {_format_time(t1)}"
+            else:
+                span = "-"
+            print(f"{os.path.basename(segment.path):<40} {records:>9} {len(segment.blocks):>7} "
+                  f"{size / 1e6:>8.2f}  {span}")
+            total_raw += segment.raw_size()
+        print(f"{len(archive)} records, {len(archive.keys('conversation'))} conversations, "
+              f"{total_disk / 1e6:.2f} MB on disk")
+        if first is not None:
+            print(f"{_format_time(first)} .. {_format_time(last)} ({last - first:.1f}s)")
+        if total_disk:
+            print(f"{total_raw / 1e6:.2f} MB uncompressed (x{total_raw / total_disk:.1f})")
+        for field in ("topic", "type"):
+            counts = sorted(archive.keys(field).items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+            if counts:
+                print()
+                print(f"{field:<70} {'records':>9}")
+                for value, count in counts:
+                    print(f"{value[:70]:<70} {count:>9}")
+
+
+def cmd_show(args):
+    with TrafficArchive(args.path) as archive:
+        start = time.perf_counter()
+        if args.conversation:
+            records = archive.conversation(args.conversation)
+        elif args.topic:
+            records = archive.topic(args.topic)
+        else:
+            records = archive.type(args.type)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if args.count:
+            print(f"{len(records)} records ({elapsed_ms:.1f} ms)")
+            return
+        base = records[0].timestamp if records else 0.0
+        for r in records:
+            print(f"{_format_time(r.timestamp)} +{(r.timestamp - base) * 1000.0:9.1f} ms  q{r.qos}  {r.topic}")
+            if args.payload:
+                print(json.dumps(_payload_json(r.payload), indent=2, ensure_ascii=False))
+        print(f"{len(records)} records ({elapsed_ms:.1f} ms)", file=sys.stderr)
+
+
+def cmd_export(args):
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with TrafficArchive(args.path) as archive:
+            for r in archive.between(_parse_time(args.since), _parse_time(args.until)):
+                out.write(json.dumps({"ts": r.timestamp, "topic": r.topic, "qos": r.qos, "retain": r.retain,
+                                      "payload": _payload_json(r.payload)}, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def cmd_reindex(args):
+    paths = [args.path] if args.path.endswith(".mtr") else sorted(glob.glob(os.path.join(args.path, "seg-*.mtr")))
+    for path in paths:
+        print(f"{os.path.basename(path)}: {rebuild_index(path)} blocks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact append-only MQTT traffic recorder with indexes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record live traffic")
+    rec.add_argument("--broker", default="localhost")
+    rec.add_argument("--port", type=int, default=1883)
+    rec.add_argument("--username")
+    rec.add_argument("--password")
+    rec.add_argument("--namespace", default="phuket")
+    rec.add_argument("--filter", action="append", help="Topic filter to record (repeatable, default /{ns}/#)")
+    rec.add_argument("--out", required=True, help="Recording directory")
+    rec.add_argument("--qos", type=int, choices=[0, 1], default=0)
+    rec.add_argument("--segment-mb", type=float, default=256.0, help="Rotate segments at this size")
+    rec.add_argument("--segment-seconds", type=float, default=3600.0, help="Rotate segments after N seconds")
+    rec.add_argument("--block-kb", type=int, default=64, help="Uncompressed block size")
+    rec.add_argument("--flush-interval", type=float, default=1.0, help="Write partial blocks after N seconds")
+    rec.add_argument("--level", type=int, default=1, choices=range(0, 10), help="zlib compression level")
+    rec.add_argument("--codec", action="store_true",
+                     help="Store JSON payloads in the binary codec form (read back as compact JSON)")
+    rec.add_argument("--dictionary", help="Codec dictionary file (implies --codec), see wire_size_report.py --train")
+    rec.add_argument("--reconnect", type=float, default=2.0, help="Seconds before reconnecting (0 = exit)")
+    rec.add_argument("--duration", type=float, default=0.0, help="Seconds to record (0 = until Ctrl+C)")
+    rec.add_argument("--progress", type=float, default=10.0, help="Progress line interval in seconds (0 = off)")
+
+    info = sub.add_parser("info", help="Summarize a recording")
+    info.add_argument("path", help="Recording directory or .mtr segment")
+    info.add_argument("--top", type=int, default=10)
+    info.set_defaults(func=cmd_info)
+
+    show = sub.add_parser("show", help="Messages of one conversation, topic or type")
+    show.add_argument("path")
+    key = show.add_mutually_exclusive_group(required=True)
+    key.add_argument("--conversation")
+    key.add_argument("--topic")
+    key.add_argument("--type", help="frame.type, e.g. callForProposal/OfferedCapability")
+    show.add_argument("--payload", action="store_true", help="Print the payloads")
+    show.add_argument("--count", action="store_true", help="Only count the matches")
+    show.set_defaults(func=cmd_show)
+
+    export = sub.add_parser("export", help="Write records as JSONL")
+    export.add_argument("path")
+    export.add_argument("--since", help="Epoch seconds or ISO time")
+    export.add_argument("--until", help="Epoch seconds or ISO time")
+    export.add_argument("--output", "-o", help="File (default stdout)")
+    export.set_defaults(func=cmd_export)
+
+    reindex = sub.add_parser("reindex", help="Rebuild segment indexes")
+    reindex.add_argument("path")
+    reindex.set_defaults(func=cmd_reindex)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        codec = None
+        if args.codec or args.dictionary:
+            try:
+                codec = BinaryCodec(Dictionary.load(args.dictionary) if args.dictionary else None)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error: cannot load dictionary: {e}", file=sys.stderr)
+                sys.exit(1)
+        try:
+            asyncio.run(record(args, codec))
+        except (OSError, MqttError, asyncio.TimeoutError) as e:
+            print(f"MQTT error: {e}", file=sys.stderr)
+            sys.exit(3)
+        except KeyboardInterrupt:
+            pass
+        return
+    try:
+        args.func(args)
+    except BrokenPipeError:  # export | head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Replay captured namespace traffic against a broker.
+
+Reads a capture (traffic_recorder.py directory, its JSONL export or a JSON
+list like tests/TestResults/CabABlue-logs-*.json) and republishes it over a
+single persistent connection:
+
+  --speed 1      original timing
+  --speed 10     ten times faster (gaps divided by 10)
+  --speed max    as fast as the broker accepts
+
+Each run tags conversation and product ids with a fresh suffix, so
+repeated runs and the live agents' state do not collide (--no-rewrite
+keeps them). --role/--type/--topic choose which producers are replayed;
+everything else is left to the live agents. A recorded peak hour can then
+be replayed against two dispatcher builds:
+
+  python3 tools/python_mqtt/traffic_replay.py /tmp/traffic --speed 10 \
+    --role ProductAgent --type registerMessage \
+    --watch "/phuket/+/ManufacturingSequence/Response"
+
+--watch subscribes to reply topics and reports, per frame type, the time
+from a conversation's first replayed message to each reply carrying the
+same (rewritten) conversationId.
+
+--codec publishes the I4.0 messages in the binary form of
+masbt_tools.codec, for hops between Python tools (the simulated fleet,
+monitors, recorder); the agents themselves expect JSON.
+"""
+import argparse
+import asyncio
+import collections
+import sys
+import time
+
+from masbt_tools import AsyncMqttClient, LatencyHistogram, MqttError, new_conversation_id
+from masbt_tools.codec import BinaryCodec, Dictionary
+from masbt_tools.replay import PRODUCT_KEYS, IdRewriter, ReplayFilter, load_capture, parse_message
+from masbt_tools.stats import format_summary_table
+from masbt_tools.traffic import frame_fields
+
+
+def prepare(records, messages, args, run, codec=None):
+    """``(offset, topic, payload, qos, retain, conversationId)`` tuples of one run, ids rewritten."""
+    rewriter = None
+    if not args.no_rewrite:
+        tag = f"{args.tag}{run}" if args.tag else None
+        rewriter = IdRewriter(tag, args.product_key or PRODUCT_KEYS)
+        rewriter.collect(messages)
+    factor = None if args.speed == "max" else float(args.speed)
+    t0 = records[0].timestamp if records else 0.0
+    items = []
+    for record, message in zip(records, messages):
+        topic, payload = record.topic, record.payload
+        conversation_id = message["frame"].get("conversationId") if message else None
+        if rewriter is not None and message is not None:
+            topic, payload = rewriter.topic(topic), rewriter.message(message)
+            conversation_id = rewriter.mapping.get(conversation_id, conversation_id)
+        if codec is not None and message is not None:
+            payload = codec.encode_json(payload)
+        offset = 0.0 if factor is None else (record.timestamp - t0) / factor
+        qos = record.qos if args.qos is None else args.qos
+        items.append((offset, topic, payload, qos, record.retain, conversation_id))
+    return items
+
+
+class Replayer:
+    def __init__(self, args, codec=None):
+        self.args = args
+        self.codec = codec
+        self.client = AsyncMqttClient(args.broker, args.port, client_id=new_conversation_id("TrafficReplay"),
+                                      username=args.username, password=args.password)
+        self.client.on_message = self._on_message
+        self.lag = LatencyHistogram()
+        self.replies = collections.defaultdict(LatencyHistogram)
+        self.first_sent = {}
+        self.answered = set()
+        self.published = 0
+        self.own = set()  # hashes of replayed payloads, so --watch ignores our own messages
+
+    def _on_message(self, topic, payload, qos, retain):
+        if hash(payload) in self.own:
+            return
+        conversation_id, msg_type = frame_fields(payload)
+        sent = self.first_sent.get(conversation_id)
+        if sent is None:
+            return
+        self.replies[msg_type or "?"].record(time.perf_counter() - sent)
+        self.answered.add(conversation_id)
+
+    async def run_once(self, items):
+        args = self.args
+        loop = asyncio.get_running_loop()
+        window = collections.deque()
+        start = loop.time()
+        for offset, topic, payload, qos, retain, conversation_id in items:
+            target = start + offset
+            delay = target - loop.time()
+            if delay > 0.0005:
+                await asyncio.sleep(delay)
+            if args.speed != "max":
+                self.lag.record(max(0.0, loop.time() - target))
+            if conversation_id and conversation_id not in self.first_sent:
+                self.first_sent[conversation_id] = time.perf_counter()
+            if args.watch:
+                self.own.add(hash(payload))
+            future = self.client.publish(topic, payload, qos, retain)
+            self.published += 1
+            if qos:
+                window.append(future)
+                if len(window) >= args.max_inflight:
+                    await window.popleft()
+            elif self.published % 256 == 0:
+                await self.client.drain()
+        await self.client.drain()
+        if window:
+            await asyncio.gather(*window)
+        return loop.time() - start
+
+    async def run(self, records, messages):
+        args = self.args
+        await self.client.connect()
+        if args.watch:
+            await self.client.subscribe(*args.watch, qos=0)
+        print(f"Replaying {len(records)} messages to {args.broker}:{args.port} at speed {args.speed}", flush=True)
+        try:
+            for run in range(args.repeat):
+                items = prepare(records, messages, args, run, self.codec)
+                elapsed = await self.run_once(items)
+                span = items[-1][0] if items else 0.0
+                print(f"run {run + 1}/{args.repeat}: {len(items)} messages in {elapsed:.2f}s "
+                      f"({len(items) / elapsed if elapsed else 0:.0f}/s, schedule {span:.2f}s)", flush=True)
+            if args.watch and args.settle > 0:
+                await asyncio.sleep(args.settle)
+        finally:
+            await self.client.disconnect()
+        self.report()
+
+    def report(self):
+        rows = {}
+        if self.lag.count:
+            rows["schedule lag"] = self.lag.summary()
+        for msg_type, histogram in sorted(self.replies.items()):
+            rows[msg_type[:22]] = histogram.summary()
+        if rows:
+            print()
+            print(format_summary_table(rows))
+        if self.args.watch:
+            print(f"{len(self.answered)}/{len(self.first_sent)} replayed conversations got a reply")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-scaled replay of captured MQTT traffic")
+    parser.add_argument("capture", help="Recording directory, .mtr segment, JSONL or JSON capture")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--speed", default="1", help="Time compression factor, or 'max' (default 1 = original)")
+    parser.add_argument("--role", action="append", default=[], help="Replay messages of this sender role (repeatable)")
+    parser.add_argument("--type", action="append", default=[],
+                        help="Replay messages of this frame type, in addition to --role (repeatable)")
+    parser.add_argument("--topic", action="append", default=[], help="Only replay topics matching this filter")
+    parser.add_argument("--since", type=float, default=0.0, help="Skip the first N seconds of the capture")
+    parser.add_argument("--until", type=float, default=0.0, help="Stop N seconds into the capture (0 = end)")
+    parser.add_argument("--no-rewrite", action="store_true", help="Keep conversation and product ids")
+    parser.add_argument("--tag", help="Id suffix prefix (default random per run)")
+    parser.add_argument("--product-key", action="append", help="idShort holding product ids (repeatable)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], help="Override the recorded QoS")
+    parser.add_argument("--max-inflight", type=int, default=100, help="Unacknowledged QoS 1 publishes")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the capture N times")
+    parser.add_argument("--reverse", action="store_true",
+                        help="Capture lists newest first (CabABlue exports) and has no timestamps")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between records without timestamps")
+    parser.add_argument("--watch", action="append", default=[], help="Reply topic filter to time (repeatable)")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait for replies after the replay")
+    parser.add_argument("--codec", action="store_true",
+                        help="Publish I4.0 messages in the binary codec form (Python consumers only)")
+    parser.add_argument("--dictionary", help="Codec dictionary file (implies --codec)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would be replayed")
+    args = parser.parse_args()
+    if args.speed != "max":
+        try:
+            if float(args.speed) <= 0:
+                raise ValueError
+        except ValueError:
+            parser.error("--speed must be a positive number or 'max'")
+
+    try:
+        records = load_capture(args.capture, args.reverse, args.gap)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read capture: {e}", file=sys.stderr)
+        sys.exit(1)
+    if records and (args.since or args.until):
+        t0 = records[0].timestamp
+        records = [r for r in records if r.timestamp - t0 >= args.since
+                   and (not args.until or r.timestamp - t0 < args.until)]
+    messages = [parse_message(r.payload) for r in records]
+    selection = ReplayFilter(args.role, args.type, args.topic)
+    kept = [(r, m) for r, m in zip(records, messages) if selection.matches(r, m)]
+    if not kept:
+        print("Nothing to replay after filtering.", file=sys.stderr)
+        sys.exit(1)
+    records, messages = [r for r, _m in kept], [m for _r, m in kept]
+
+    codec = None
+    if args.codec or args.dictionary:
+        try:
+            codec = BinaryCodec(Dictionary.load(args.dictionary) if args.dictionary else None)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Cannot load dictionary: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.dry_run:
+        for offset, topic, payload, qos, _retain, conversation_id in prepare(records, messages, args, 0, codec):
+            print(f"+{offset:9.3f}s q{qos} {topic}  {conversation_id or ''}  ({len(payload)} B)")
+        return
+
+    replayer = Replayer(args, codec)
+    try:
+        asyncio.run(replayer.run(records, messages))
+    except (OSError, MqttError) as e:
+        print(f"MQTT error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,8 @@ using the same conversationId.
 Dependencies: paho-mqtt
 """
 import argparse
-import json
 import sys
 import time
-from datetime import datetime, timezone
-import re
 
 try:
     import paho.mqtt.client as mqtt
@@ -24,25 +21,12 @@ except Exception as e:
     print(f"Install with: {sys.executable} -m pip install --user paho-mqtt")
     sys.exit(2)
 
-
-def now_iso():
-    return datetime.now(timezone.utc).isoformat()
+from masbt_tools import frame_message_template
+from masbt_tools.frame_scan import scan_frame
 
 
 def make_response(conversation_id, msg_type, sender_id, receiver_id=None, extra=None):
-    frame = {
-        "conversationId": conversation_id,
-        "type": msg_type,
-        "sender": {"id": sender_id},
-        "timestamp": now_iso(),
-    }
-    if receiver_id:
-        frame["receiver"] = {"id": receiver_id}
-
-    msg = {"frame": frame, "interactionElements": []}
-    if extra:
-        msg["interactionElements"].append({"value": extra})
-    return json.dumps(msg)
+    return frame_message_template(msg_type, sender_id, receiver_id, extra).render(conversation_id=conversation_id)
 
 
 def main():
@@ -74,28 +58,19 @@ def main():
     def on_message(c, userdata, msg):
         nonlocal received
         try:
-            payload = msg.payload.decode('utf-8')
-            data = json.loads(payload)
-            frame = data.get('frame', {})
-            mtype = frame.get('type')
-            # Try to extract the exact conversationId string from the raw payload
-            # (so we preserve any formatting/characters exactly as published).
-            conv = None
-            try:
-                m = re.search(r'"conversationId"\s*:\s*"([^\"]+)"', payload)
-                if m:
-                    conv = m.group(1)
-            except Exception:
-                conv = None
-
-            # Fallback to parsed JSON value if regex didn't find a string
-            if conv is None:
-                conv = frame.get('conversationId')
+            # The scanner decodes the frame straight from the raw payload, so the
+            # conversationId keeps every character exactly as published (escapes included).
+            fields = scan_frame(msg.payload)
+            if fields is None:
+                print(f"Ignoring non-I4.0 message on {msg.topic}")
+                return
+            mtype = fields.type
+            conv = fields.conversation_id
 
             print(f"Received on {msg.topic}: type={mtype} conversationId={conv}")
             if mtype and mtype.lower() == 'callforproposal' and conv:
                 # store the exact conversation id string as received (no modification)
-                received = {'conversationId': conv, 'sender': frame.get('sender', {}).get('id')}
+                received = {'conversationId': conv, 'sender': fields.sender}
         except Exception as e:
             print(f"Failed to parse incoming message: {e}")
 
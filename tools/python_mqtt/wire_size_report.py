@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Bytes per message and encode/decode cost per message family, JSON vs. binary codec.
+
+Families are the frame types of a capture (traffic_recorder.py directory,
+JSONL export or a JSON list like tests/TestResults/CabABlue-logs-*.json),
+or, without a capture, the payload families of bench_suite.py (every file in
+tests/TestFiles plus the messages the load tools generate).
+
+  python3 tools/python_mqtt/wire_size_report.py
+  python3 tools/python_mqtt/wire_size_report.py /tmp/traffic --rate 500
+  python3 tools/python_mqtt/wire_size_report.py /tmp/traffic --train dictionary.json
+  python3 tools/python_mqtt/wire_size_report.py tests/TestResults/CabABlue-logs-20251220080546.json \
+    --dictionary dictionary.json
+
+Columns: sent (payload as captured; indent=2 for the built-in families),
+compact JSON, binary codec and its saving against compact JSON, zlib of the
+compact JSON for reference, then per message the cost of codec encode and
+decode next to json.dumps and json.loads. --rate N adds the link load of
+the whole mix at N messages per second. --train builds a shared dictionary
+from the inputs (strings that repeat across messages), saves it and
+reports with it; traffic_recorder.py and traffic_replay.py take the same
+file with --dictionary.
+"""
+import argparse
+import json
+import sys
+import zlib
+
+from masbt_tools.benchmark import measure
+from masbt_tools.codec import BinaryCodec, Dictionary, canonical_json
+from masbt_tools.replay import load_capture, parse_message
+
+
+def capture_families(paths, reverse, gap):
+    families = {}
+    for path in paths:
+        for record in load_capture(path, reverse, gap):
+            message = parse_message(record.payload)
+            if message is None:
+                continue
+            msg_type = str(message["frame"].get("type") or "?")
+            families.setdefault(msg_type, []).append((message, len(record.payload)))
+    return families
+
+
+def test_file_families():
+    from bench_suite import file_families, tool_families
+
+    return {name: [(message, len(json.dumps(message, indent=2).encode("utf-8")))]
+            for name, (message, _build, _render) in {**file_families(), **tool_families()}.items()}
+
+
+def per_message_ns(fn, items, args):
+    """Median ns per item of ``fn`` applied to every item."""
+    return measure(lambda: [fn(item) for item in items], args.repeat, 1, args.min_time)["median_ns"] / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire size and codec cost per message family")
+    parser.add_argument("capture", nargs="*", help="Recording directories, JSONL or JSON captures")
+    parser.add_argument("--reverse", action="store_true", help="Capture lists are newest first (CabABlue exports)")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between records without timestamps")
+    parser.add_argument("--dictionary", help="Codec dictionary file (default: built-in)")
+    parser.add_argument("--train", metavar="OUT", help="Build a dictionary from the inputs, save it and use it")
+    parser.add_argument("--dictionary-size", type=int, default=512, help="Strings in a trained dictionary")
+    parser.add_argument("--rate", type=float, default=0.0, help="Messages per second for the link-load line")
+    parser.add_argument("--sample", type=int, default=50, help="Messages per family used for timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.02)
+    parser.add_argument("--no-timing", action="store_true", help="Only sizes")
+    args = parser.parse_args()
+
+    try:
+        families = capture_families(args.capture, args.reverse, args.gap) if args.capture else test_file_families()
+        dictionary = Dictionary.load(args.dictionary) if args.dictionary else None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not families:
+        print("No I4.0 messages found.", file=sys.stderr)
+        sys.exit(1)
+    if args.train:
+        messages = [message for items in families.values() for message, _sent in items]
+        dictionary = Dictionary.build(messages, size=args.dictionary_size)
+        dictionary.save(args.train)
+        print(f"Dictionary with {len(dictionary)} strings (id {dictionary.id:08x}) -> {args.train}\n")
+    codec = BinaryCodec(dictionary)
+
+    header = (f"{'family':<40} {'n':>6} {'sent':>8} {'compact':>8} {'binary':>8} {'saved':>6} {'zlib':>8}"
+              + ("" if args.no_timing else f" {'encode':>8} {'decode':>8} {'dumps':>8} {'loads':>8}"))
+    print(header + ("" if args.no_timing else "   (bytes / us per message)"))
+    print("-" * len(header))
+    totals = [0, 0, 0, 0, 0]
+    for name, items in sorted(families.items(), key=lambda kv: -len(kv[1])):
+        messages = [message for message, _sent in items]
+        compact = [canonical_json(m) for m in messages]
+        binary = [codec.encode(m) for m in messages]
+        for original, wire in zip(messages, binary):
+            if codec.decode(wire) != original:
+                raise SystemExit(f"round trip failed for {name}")
+        n = len(items)
+        sent = sum(s for _m, s in items) / n
+        sizes = (sum(map(len, compact)) / n, sum(map(len, binary)) / n,
+                 sum(len(zlib.compress(c)) for c in compact) / n)
+        for i, value in enumerate((n, sent * n, sizes[0] * n, sizes[1] * n, sizes[2] * n)):
+            totals[i] += value
+        line = (f"{name[:40]:<40} {n:>6} {sent:>8.0f} {sizes[0]:>8.0f} {sizes[1]:>8.0f} "
+                f"{100.0 * (1.0 - sizes[1] / sizes[0]):>5.0f}% {sizes[2]:>8.0f}")
+        if not args.no_timing:
+            sample_messages, sample_compact, sample_binary = (messages[:args.sample], compact[:args.sample],
+                                                              binary[:args.sample])
+            costs = (per_message_ns(codec.encode, sample_messages, args),
+                     per_message_ns(codec.decode, sample_binary, args),
+                     per_message_ns(canonical_json, sample_messages, args),
+                     per_message_ns(json.loads, sample_compact, args))
+            line += "".join(f" {c / 1000.0:>8.1f}" for c in costs)
+        print(line, flush=True)
+
+    n, sent, compact, binary, compressed = totals
+    print("-" * len(header))
+    print(f"{'all':<40} {n:>6} {sent / n:>8.0f} {compact / n:>8.0f} {binary / n:>8.0f} "
+          f"{100.0 * (1.0 - binary / compact):>5.0f}% {compressed / n:>8.0f}")
+    if args.rate:
+        def load(total):
+            return total / n * args.rate * 8 / 1e6
+
+        print(f"\nAt {args.rate:g} msg/s: sent {load(sent):.2f} Mbit/s, compact {load(compact):.2f} Mbit/s, "
+              f"binary {load(binary):.2f} Mbit/s, zlib {load(compressed):.2f} Mbit/s")
+
+
+if __name__ == "__main__":
+    main()